@@ -0,0 +1,238 @@
+"""
+Performance benchmarks
+~~~~~~~~~~~~~~~~~~~~~~
+
+Times the calculation entry points over the reference dwellings in
+``benchmarks/dwellings``, plus the package import and PCDF load times,
+and compares the results against a stored JSON baseline.
+
+Run from the repository root::
+
+    python -m benchmarks.run_benchmarks run -o benchmarks/baselines/current.json
+    python -m benchmarks.run_benchmarks compare benchmarks/baselines/baseline.json \\
+        benchmarks/baselines/current.json --threshold 0.2
+
+``compare`` exits with status 1 if any timing regressed by more than the
+threshold (a fraction of the baseline time).
+
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DWELLINGS_FOLDER = os.path.join(_FOLDER, 'dwellings')
+REPO_ROOT = os.path.dirname(_FOLDER)
+
+CALCULATIONS = ('run_sap', 'run_der', 'run_fee', 'run_ter', 'run_improvements')
+
+
+def load_reference_dwellings(folder=DWELLINGS_FOLDER):
+    """
+    Returns:
+        dict of benchmark name -> dwelling, sorted by name
+    """
+    from epctk.io import yaml_io
+
+    files = sorted(glob.glob(os.path.join(folder, '*.yaml')))
+    return {os.path.splitext(os.path.basename(f))[0]: yaml_io.from_yaml(f) for f in files}
+
+
+def _calculation(name):
+    from epctk import runner
+    from epctk.appendix import appendix_t
+
+    if name == 'run_ter':
+        return appendix_t.run_ter
+
+    if name == 'run_improvements':
+        def improvements(dwelling):
+            sap = runner.run_sap(dwelling)
+            dwelling.sap_value = sap.sap_value
+            dwelling.emissions = sap.emissions
+            appendix_t.run_improvements(dwelling)
+        return improvements
+
+    return getattr(runner, name)
+
+
+def best_time(fn, repeat, number=1):
+    """
+    Best of `repeat` runs of `number` calls, in seconds per call
+    """
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+
+
+def time_import(repeat):
+    """
+    Time a cold `import epctk.runner` in a fresh interpreter, which includes
+    loading the SAP tables and the PCDF file
+    """
+    code = "import time; t = time.perf_counter(); import epctk.runner; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=REPO_ROOT)
+        times.append(float(out.decode().strip().splitlines()[-1]))
+    return min(times)
+
+
+def time_pcdf_load(repeat):
+    from epctk.io import pcdf
+    return best_time(lambda: pcdf.load_pcdf(pcdf._PCDF_DATA_FILE), repeat)
+
+
+def time_heat_required_kernel(repeat, cohort_size=1000):
+    """
+    Time the heat requirement kernel over a cohort built from the reference
+    dwellings, in seconds per dwelling
+    """
+    import numpy
+    from epctk import runner
+    from epctk.constants import T_EXTERNAL_HEATING
+    from epctk.heating import heat_required_inputs, heat_required_kernel
+
+    calculated = [runner.run_sap(d) for d in load_reference_dwellings().values()]
+    cohort = [calculated[i % len(calculated)] for i in range(cohort_size)]
+    inputs = heat_required_inputs(cohort)
+    heat_gains = numpy.array([d.winter_heat_gains for d in cohort])
+
+    return best_time(lambda: heat_required_kernel(T_EXTERNAL_HEATING, heat_gains, **inputs), repeat) / cohort_size
+
+
+def time_hot_water_kernel(repeat, cohort_size=1000):
+    """
+    Time the hot water kernel over a cohort built from the reference
+    dwellings, in seconds per dwelling
+    """
+    from epctk import runner
+    from epctk.domestic_hot_water import hot_water_inputs, hot_water_kernel
+
+    calculated = [runner.run_sap(d) for d in load_reference_dwellings().values()]
+    cohort = [calculated[i % len(calculated)] for i in range(cohort_size)]
+    inputs = hot_water_inputs(cohort)
+
+    return best_time(lambda: hot_water_kernel(**inputs), repeat) / cohort_size
+
+
+def run(repeat=5, number=5):
+    """
+    Run all benchmarks
+
+    Args:
+        repeat: number of repeats, the best time is kept
+        number: calls per repeat for the calculation benchmarks
+
+    Returns:
+        dict with the timings (seconds) and some environment information
+    """
+    from epctk import cache
+
+    cache.disable_results_cache()
+
+    timings = dict(import_epctk=time_import(repeat),
+                   pcdf_load=time_pcdf_load(repeat),
+                   heat_required_kernel=time_heat_required_kernel(repeat),
+                   hot_water_kernel=time_hot_water_kernel(repeat))
+
+    for dwelling_name, dwelling in load_reference_dwellings().items():
+        for calc_name in CALCULATIONS:
+            calc = _calculation(calc_name)
+            timings['%s/%s' % (dwelling_name, calc_name)] = best_time(lambda: calc(dwelling), repeat, number)
+
+    return dict(timings=timings,
+                python=platform.python_version(),
+                platform=platform.platform(),
+                created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two benchmark results
+
+    Args:
+        baseline: results dict from :func:`run`
+        current: results dict from :func:`run`
+        threshold: allowed slowdown as a fraction of the baseline time
+
+    Returns:
+        list of (name, baseline time, current time, relative change) for the
+        benchmarks that regressed by more than the threshold
+    """
+    regressions = []
+    for name, base_time in sorted(baseline['timings'].items()):
+        current_time = current['timings'].get(name)
+        if current_time is None or base_time <= 0:
+            continue
+
+        change = (current_time - base_time) / base_time
+        if change > threshold:
+            regressions.append((name, base_time, current_time, change))
+
+    return regressions
+
+
+def print_comparison(baseline, current):
+    for name in sorted(set(baseline['timings']) | set(current['timings'])):
+        base_time = baseline['timings'].get(name)
+        current_time = current['timings'].get(name)
+        if base_time is None or current_time is None:
+            print("{:60s} {}".format(name, "only in " + ("current" if base_time is None else "baseline")))
+            continue
+        print("{:60s} {:10.2f}ms {:10.2f}ms {:+7.1%}".format(
+            name, base_time * 1000, current_time * 1000, (current_time - base_time) / base_time))
+
+
+def cli():
+    parser = argparse.ArgumentParser(description='Run the epctk performance benchmarks.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and write the timings as JSON')
+    run_parser.add_argument('-o', '--output', help='output file, default is to print to stdout')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5, help='repeats per benchmark, best is kept')
+    run_parser.add_argument('-n', '--number', type=int, default=5, help='calculations timed per repeat')
+
+    compare_parser = subparsers.add_parser('compare', help='compare timings against a baseline')
+    compare_parser.add_argument('baseline', help='baseline JSON file')
+    compare_parser.add_argument('current', help='JSON file to check')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                                help='allowed slowdown as a fraction of the baseline, default 0.2')
+    return parser
+
+
+def handle_inputs(parser):
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = json.dumps(run(args.repeat, args.number), indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, 'w') as outfile:
+                outfile.write(results + "\n")
+        else:
+            print(results)
+        return 0
+
+    if args.command == 'compare':
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        with open(args.current) as infile:
+            current = json.load(infile)
+
+        print_comparison(baseline, current)
+        regressions = compare(baseline, current, args.threshold)
+        for name, base_time, current_time, change in regressions:
+            print("REGRESSION {}: {:.2f}ms -> {:.2f}ms ({:+.1%})".format(
+                name, base_time * 1000, current_time * 1000, change))
+        return 1 if regressions else 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(handle_inputs(cli()))
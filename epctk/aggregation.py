@@ -0,0 +1,389 @@
+"""
+Stock aggregation
+~~~~~~~~~~~~~~~~~
+
+Statistics of a stock of dwellings, reduced from the results as they are
+calculated rather than from a list of all the results::
+
+    result = aggregation.aggregate(dwellings, dict(
+        co2=aggregation.GroupBy('sap_region', aggregation.Sum('emissions')),
+        bands=aggregation.GroupBy(aggregation.sap_band, aggregation.Count()),
+        cost=aggregation.Quantiles('fuel_cost', (0.1, 0.5, 0.9)),
+    ), workers=8)
+    result.values['co2']  # {region: total CO2, ...}
+
+Each reducer takes a value of every calculated dwelling with :meth:`add`,
+combines with a reducer of another part of the stock with :meth:`merge`
+and gives its statistic with :meth:`result`. Values are read from the
+results of the calculation, so both the outputs (``'emissions'``) and the
+inputs (``'sap_region'``, or any key given to the dwellings such as a
+tenure) can be used, or a function of the results dwelling.
+
+:func:`aggregate` runs the calculation in worker processes on chunks of
+the dwellings, each worker reducing its chunk, and merges the reducers
+of the chunks. Only a bounded number of chunks are in flight, so the
+memory used depends on the number of groups and not on the number of
+dwellings. Quantiles are approximated by a sketch with bounded relative
+error, whose size depends on the range of the values only.
+"""
+import collections
+import concurrent.futures
+import copy
+import itertools
+import logging
+import math
+import os
+from collections import namedtuple
+
+import numpy
+
+from . import runner
+from .utils import SAPCalculationError, SAPInputError
+
+Aggregate = namedtuple('Aggregate', 'values, n_dwellings, n_failed')
+
+# Lowest rounded SAP rating of the bands G to A
+SAP_BANDS = (('G', 1), ('F', 21), ('E', 39), ('D', 55), ('C', 69), ('B', 81), ('A', 92))
+
+
+def sap_band(dwelling):
+    """
+    Returns:
+        letter of the SAP band of a calculated dwelling
+    """
+    rating = int(math.floor(dwelling.sap_value + 0.5))
+    band = 'G'
+    for letter, lowest in SAP_BANDS:
+        if rating >= lowest:
+            band = letter
+    return band
+
+
+def _get(dwelling, field):
+    return field(dwelling) if callable(field) else dwelling.get(field)
+
+
+class Reducer:
+    """
+    Streaming statistic of a value of the dwellings
+
+    Args:
+        field: name of a result or input, or function of the results dwelling
+        weight: name of an input with the weight of each dwelling, e.g.
+            the number of dwellings it stands for. Unweighted if None.
+    """
+    def __init__(self, field=None, weight=None):
+        self.field = field
+        self.weight = weight
+
+    def add(self, dwelling):
+        value = _get(dwelling, self.field) if self.field is not None else 1
+        if value is not None:
+            self.add_value(value, _get(dwelling, self.weight) if self.weight is not None else 1)
+
+    def add_value(self, value, weight):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Count(Reducer):
+    """
+    Number (or total weight) of the dwellings with a value of the field,
+    of all the dwellings if field is None
+    """
+    def __init__(self, field=None, weight=None):
+        super().__init__(field, weight)
+        self.count = 0
+
+    def add_value(self, value, weight):
+        self.count += weight
+
+    def merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return self.count
+
+
+class Sum(Reducer):
+    def __init__(self, field, weight=None):
+        super().__init__(field, weight)
+        self.total = 0.
+
+    def add_value(self, value, weight):
+        self.total += weight * value
+
+    def merge(self, other):
+        self.total += other.total
+
+    def result(self):
+        return self.total
+
+
+class Mean(Reducer):
+    """
+    Mean of the field, None if no dwelling had a value
+    """
+    def __init__(self, field, weight=None):
+        super().__init__(field, weight)
+        self.total = 0.
+        self.count = 0
+
+    def add_value(self, value, weight):
+        self.total += weight * value
+        self.count += weight
+
+    def merge(self, other):
+        self.total += other.total
+        self.count += other.count
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+class Histogram(Reducer):
+    """
+    Counts of the field between bin edges
+
+    Args:
+        field: see Reducer
+        edges: increasing bin edges. Values below the first edge and from
+            the last edge up are counted in the first and last bins.
+        weight: see Reducer
+    """
+    def __init__(self, field, edges, weight=None):
+        super().__init__(field, weight)
+        self.edges = numpy.asarray(edges, dtype=float)
+        self.counts = numpy.zeros(len(self.edges) + 1)
+
+    def add_value(self, value, weight):
+        self.counts[numpy.searchsorted(self.edges, value, side='right')] += weight
+
+    def merge(self, other):
+        if not numpy.array_equal(self.edges, other.edges):
+            raise SAPInputError("Cannot merge histograms with different bin edges")
+        self.counts += other.counts
+
+    def result(self):
+        """
+        Returns:
+            dict with the bin 'edges' and the 'counts', one more than the edges
+        """
+        return dict(edges=self.edges.tolist(), counts=self.counts.tolist())
+
+
+class Quantiles(Reducer):
+    """
+    Approximate quantiles of the field. Values are counted in logarithmic
+    buckets, so that every quantile is found within the relative accuracy
+    of its true value.
+
+    Args:
+        field: see Reducer
+        quantiles: the fractions to find, between 0 and 1
+        relative_accuracy: relative error of the quantiles
+        weight: see Reducer
+    """
+    # Values closer to zero than this are counted as zero
+    MIN_VALUE = 1e-9
+
+    def __init__(self, field, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9), relative_accuracy=0.005, weight=None):
+        super().__init__(field, weight)
+        self.quantiles = tuple(quantiles)
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = collections.Counter()
+        self.negative = collections.Counter()
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add_value(self, value, weight):
+        value = float(value)
+        if value > self.MIN_VALUE:
+            self.positive[self._key(value)] += weight
+        elif value < -self.MIN_VALUE:
+            self.negative[self._key(-value)] += weight
+        else:
+            self.zero += weight
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise SAPInputError("Cannot merge quantiles with different relative accuracies")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """
+        Returns:
+            approximate value of the q quantile, None if there were no values
+        """
+        if not self.count:
+            return None
+
+        buckets = ([(-self._bucket_value(k), n) for k, n in sorted(self.negative.items(), reverse=True)] +
+                   [(0., self.zero)] +
+                   [(self._bucket_value(k), n) for k, n in sorted(self.positive.items())])
+        # Rank of the lower of the two values that the quantile falls between
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for value, n in buckets:
+            cumulative += n
+            if cumulative > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def result(self):
+        """
+        Returns:
+            dict of quantile -> value
+        """
+        return {q: self.quantile(q) for q in self.quantiles}
+
+
+class GroupBy(Reducer):
+    """
+    A reducer for each value of a key
+
+    Args:
+        key: name of a result or input, or function of the results dwelling
+        reducer: Reducer copied for each group
+    """
+    def __init__(self, key, reducer):
+        super().__init__(key)
+        self.reducer = reducer
+        self.groups = dict()
+
+    def add(self, dwelling):
+        group = _get(dwelling, self.field)
+        if group not in self.groups:
+            self.groups[group] = copy.deepcopy(self.reducer)
+        self.groups[group].add(dwelling)
+
+    def merge(self, other):
+        for group, reducer in other.groups.items():
+            if group in self.groups:
+                self.groups[group].merge(reducer)
+            else:
+                self.groups[group] = reducer
+
+    def result(self):
+        """
+        Returns:
+            dict of group -> result of the group's reducer
+        """
+        return {group: reducer.result() for group, reducer in self.groups.items()}
+
+
+def reduce_results(results, reducers):
+    """
+    Feed calculated dwellings to reducers
+
+    Args:
+        results: iterable of results dwellings, e.g. a generator of runner.run_sap outputs
+        reducers: dict of name -> Reducer, updated in place
+
+    Returns:
+        number of dwellings reduced
+    """
+    n = 0
+    for dwelling in results:
+        for reducer in reducers.values():
+            reducer.add(dwelling)
+        n += 1
+    return n
+
+
+def _reduce_chunk(args):
+    dwellings, reducers, calculation = args
+    n_failed = 0
+    for dwelling in dwellings:
+        try:
+            calculated = calculation(dwelling)
+        except (SAPCalculationError, SAPInputError) as err:
+            logging.warning("aggregation.py: calculation failed: %r", err)
+            n_failed += 1
+            continue
+        for reducer in reducers.values():
+            reducer.add(calculated)
+    return reducers, len(dwellings), n_failed
+
+
+def _chunks(dwellings, chunk_size):
+    dwellings = iter(dwellings)
+    while True:
+        chunk = list(itertools.islice(dwellings, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def aggregate(dwellings, reducers, calculation=runner.run_sap, workers=None, chunk_size=256):
+    """
+    Calculate a stock of dwellings and reduce the results
+
+    Dwellings whose calculation raises SAPInputError or SAPCalculationError
+    are logged, counted and left out of the statistics. Any other error is
+    raised.
+
+    Args:
+        dwellings: iterable of input Dwellings, read a chunk at a time
+        reducers: dict of name -> empty Reducer
+        calculation: calculation entry point. With worker processes, it and
+            the fields of the reducers must be module level functions or names.
+        workers: number of worker processes, 1 to calculate in this process
+        chunk_size: number of dwellings calculated and reduced by a worker at once
+
+    Returns:
+        Aggregate of the dict of name -> result, the number of dwellings and
+        the number of failed calculations
+    """
+    total = copy.deepcopy(reducers)
+    n_dwellings = 0
+    n_failed = 0
+
+    def merge(chunk_result):
+        nonlocal n_dwellings, n_failed
+        chunk_reducers, n, failed = chunk_result
+        if chunk_reducers is not total:
+            for name, reducer in chunk_reducers.items():
+                total[name].merge(reducer)
+        n_dwellings += n
+        n_failed += failed
+
+    if workers == 1:
+        for chunk in _chunks(dwellings, chunk_size):
+            merge(_reduce_chunk((chunk, total, calculation)))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            # Chunks are merged in order, at most two per worker being in flight
+            max_pending = 2 * (workers or os.cpu_count() or 1)
+            pending = collections.deque()
+            for chunk in _chunks(dwellings, chunk_size):
+                if len(pending) >= max_pending:
+                    merge(pending.popleft().result())
+                pending.append(executor.submit(_reduce_chunk, (chunk, reducers, calculation)))
+            while pending:
+                merge(pending.popleft().result())
+
+    return Aggregate({name: reducer.result() for name, reducer in total.items()}, n_dwellings, n_failed)
@@ -6,6 +6,7 @@ Community heating, including schemes with Combined Heat and Power (CHP) and sche
 """
 from ..elements import CommunityDistributionTypes, HeatingTypes, HeatingSystem
 from ..fuels import CommunityFuel, Fuel
+from ..instrumentation import timed
 
 TABLE_12c = {
     CommunityDistributionTypes.PRE_1990_UNINSULATED: 1.2,
@@ -60,6 +61,8 @@ class CommunityHeating(HeatingSystem):
         boiler_co2_factor_sum = 0
         boiler_pe_factor_sum = 0
         boiler_price_sum = 0
+        boiler_price_weights = dict()
+        boiler_factor_weights = dict()
         boiler_fraction_sum = 0
         chp_system = None
         biggest_contributor = heat_sources[0]
@@ -75,6 +78,11 @@ class CommunityHeating(HeatingSystem):
                 boiler_co2_factor_sum += hs['fuel'].co2_factor * hs['fraction'] / hs['efficiency']
                 boiler_pe_factor_sum += hs['fuel'].primary_energy_factor * hs['fraction'] / hs['efficiency']
                 boiler_price_sum += hs['fuel'].unit_price() * hs['fraction']
+                for fuel_id, weight in hs['fuel'].unit_price_weights().items():
+                    boiler_price_weights[fuel_id] = boiler_price_weights.get(fuel_id, 0) + weight * hs['fraction']
+                for fuel_id, weight in hs['fuel'].factor_weights().items():
+                    boiler_factor_weights[fuel_id] = (boiler_factor_weights.get(fuel_id, 0) +
+                                                      weight * hs['fraction'] / hs['efficiency'])
 
             if hs['fraction'] > biggest_contributor['fraction']:
                 biggest_contributor = hs
@@ -84,15 +92,27 @@ class CommunityHeating(HeatingSystem):
         boiler_co2_factor = boiler_co2_factor_sum / boiler_fraction_sum
         boiler_pe_factor = boiler_pe_factor_sum / boiler_fraction_sum
         boiler_price = boiler_price_sum / boiler_fraction_sum
+        boiler_price_weights = {fuel_id: weight / boiler_fraction_sum
+                                for fuel_id, weight in boiler_price_weights.items()}
+        boiler_factor_weights = {fuel_id: weight / boiler_fraction_sum
+                                 for fuel_id, weight in boiler_factor_weights.items()}
 
         if chp_system is not None:
             self._setup_chp(chp_system, boiler_co2_factor, boiler_price, boiler_pe_factor)
+            self._setup_chp_factor_weights(chp_system, boiler_factor_weights)
+
+            # The CHP heat is priced as fuel 48, see _setup_chp
+            self.fuel_price_weights_ = {fuel_id: (1 - self.chp_fraction) * weight
+                                        for fuel_id, weight in boiler_price_weights.items()}
+            self.fuel_price_weights_[48] = self.fuel_price_weights_.get(48, 0) + self.chp_fraction
 
         else:
             self.heat_to_power_ratio = 0
             self.co2_factor_ = boiler_co2_factor
             self.pe_factor = boiler_pe_factor
             self.fuel_price_ = boiler_price
+            self.fuel_price_weights_ = boiler_price_weights
+            self.factor_weights_ = boiler_factor_weights
 
         # FIXME: This code was setting fuel_factor and emission factor, but values were always overridden afterwards...
         # this is for TER, not completely sure this is right - how do you
@@ -111,7 +131,7 @@ class CommunityHeating(HeatingSystem):
 
             self.fuel = CommunityFuel(fuel_factor, emission_factor_adjustment)
 
-    def space_heat_effy(self, _Q_space):
+    def space_heat_effy(self, _Q_space, dwelling=None):
         """
         Calculate the space heating efficiency.
 
@@ -128,25 +148,32 @@ class CommunityHeating(HeatingSystem):
         primary energy factors.
 
         :param _Q_space: ignored, included for compatiblity with equivalent function for regular heating
+        :param dwelling: ignored, as for _Q_space
         :return:
         """
 
         space_mult = 1 / (self.space_heat_charging_factor * self.distribution_loss_factor)
         return 100 * space_mult
 
-    def water_heat_effy(self, _Q_water):
+    def water_heat_effy(self, _Q_water, dwelling=None):
         space_mult = 1 / (self.dhw_charging_factor * self.distribution_loss_factor)
         return 100 * space_mult
 
     def fuel_price(self, dwelling):
         return self.fuel_price_
 
+    def fuel_price_weights(self, dwelling):
+        return self.fuel_price_weights_
+
     def co2_factor(self):
         return self.co2_factor_
 
     def primary_energy_factor(self):
         return self.pe_factor
 
+    def factor_weights(self):
+        return self.factor_weights_
+
     def water_fuel_price(self, dwelling):
         return self.fuel_price_
 
@@ -171,7 +198,17 @@ class CommunityHeating(HeatingSystem):
         self.fuel_price_ = (self.chp_fraction * chp_price +
                             (1 - self.chp_fraction) * boiler_price)
 
+    def _setup_chp_factor_weights(self, chp_system, boiler_factor_weights):
+        # As the CO2 and primary energy factors in _setup_chp
+        chp_effy = chp_system['efficiency'] * self.chp_heat_to_power / (1 + self.chp_heat_to_power)
+        self.factor_weights_ = {fuel_id: (1 - self.chp_fraction) * weight
+                                for fuel_id, weight in boiler_factor_weights.items()}
+        for fuel_id, weight in chp_system['fuel'].factor_weights().items():
+            self.factor_weights_[fuel_id] = (self.factor_weights_.get(fuel_id, 0) +
+                                             self.chp_fraction * weight / chp_effy)
+
 
+@timed()
 def chp(dwelling):
     if dwelling.get('chp_water_elec'):
         e_summer = dwelling.chp_water_elec
@@ -115,6 +115,14 @@ def wwhr_savings(dwelling):
     :param dwelling:
     :return:
     """
+    return wwhr_savings_kernel(dwelling.Nocc, wwhr_effective_savings(dwelling))
+
+
+def wwhr_effective_savings(dwelling):
+    """
+    Effective savings Seff of the WWHRS of a dwelling, averaged over its
+    rooms with a shower or bath
+    """
     # TODO: Variables were defined but not used
     # savings = 0
     # Nshower_with_bath = 1
@@ -128,13 +136,25 @@ def wwhr_savings(dwelling):
         S_sum += (sys['Nshowers_with_bath'] * .635 * effy *
                   util + sys['Nshowers_without_bath'] * effy * util)
 
-    Seff = S_sum / Nshower_and_bath
-    Tcoldm = numpy.array(
-            [11.1, 10.8, 11.8, 14.7, 16.1, 18.2, 21.3, 19.2, 18.8, 16.3, 13.3, 11.8])
-    Awm = .33 * 25 * MONTHLY_HOT_WATER_TEMPERATURE_RISE / (41 - Tcoldm) + 26.1
-    Bwm = .33 * 36 * MONTHLY_HOT_WATER_TEMPERATURE_RISE / (41 - Tcoldm)
+    return S_sum / Nshower_and_bath
+
+
+# Monthly cold water temperature for the WWHRS savings
+_TCOLD = numpy.array([11.1, 10.8, 11.8, 14.7, 16.1, 18.2, 21.3, 19.2, 18.8, 16.3, 13.3, 11.8])
+
+
+def wwhr_savings_kernel(Nocc, Seff):
+    """
+    Equation (G10) for one dwelling, or for N dwellings given as (N, 1)
+    columns of Nocc and Seff
+
+    Returns:
+        monthly savings, (12,) or (N, 12)
+    """
+    Awm = .33 * 25 * MONTHLY_HOT_WATER_TEMPERATURE_RISE / (41 - _TCOLD) + 26.1
+    Bwm = .33 * 36 * MONTHLY_HOT_WATER_TEMPERATURE_RISE / (41 - _TCOLD)
 
-    savings = (dwelling.Nocc * Awm + Bwm) * Seff * (35 - Tcoldm) * \
+    savings = (Nocc * Awm + Bwm) * Seff * (35 - _TCOLD) * \
               4.18 * DAYS_PER_MONTH * MONTHLY_HOT_WATER_FACTORS / 3600.
 
     return savings
@@ -3,20 +3,44 @@ Solar Hot Water
 ~~~~~~~~~~~~~~~
 
 """
-from ..tables import TABLE_H1, TABLE_H2, TABLE_H3, TABLE_H4
+import numpy
 
+from ..tables import (TABLE_H1, TABLE_H2_ARRAY, TABLE_H3_ARRAY, TABLE_H4_ARRAY, solar_pitch_index,
+                      solar_orientation_index)
+from ..instrumentation import timed
 
-def configure_solar_hw(dwelling):
-    if dwelling.get('solar_collector_aperture') is not None:
-        dwelling.collector_overshading_factor = TABLE_H4[dwelling.collector_overshading]
 
-        if str(dwelling.collector_pitch).lower() != "Horizontal".lower():
-            dwelling.collector_Igh = TABLE_H2[dwelling.collector_pitch][dwelling.collector_orientation]
+def collector_solar_data(pitches, orientations, overshadings):
+    """
+    Tables H2, H3 and H4 for a batch of solar collectors, in one indexed read
 
-        else:
-            dwelling.collector_Igh = TABLE_H2[dwelling.collector_pitch]
+    Args:
+        pitches: (N,) indices of the collector pitches, see solar_pitch_index
+        orientations: (N,) indices of the orientations, see
+            solar_orientation_index, any for horizontal collectors
+        overshadings: (N,) overshading codes
+
+    Returns:
+        (N,) annual radiation, (N, 12) monthly solar factors and (N,)
+        overshading factors
+    """
+    pitches = numpy.asarray(pitches)
+    return (TABLE_H2_ARRAY[pitches, orientations],
+            TABLE_H3_ARRAY[pitches],
+            TABLE_H4_ARRAY[numpy.asarray(overshadings, dtype=int)])
 
-        dwelling.monthly_solar_hw_factors = TABLE_H3[dwelling.collector_pitch]
+
+@timed()
+def configure_solar_hw(dwelling):
+    if dwelling.get('solar_collector_aperture') is not None:
+        pitch = solar_pitch_index(dwelling.collector_pitch)
+        orientation = 0 if pitch == 0 else solar_orientation_index(dwelling.collector_orientation)
+        Igh, monthly_factors, overshading_factor = collector_solar_data(
+                [pitch], [orientation], [dwelling.collector_overshading])
+
+        dwelling.collector_Igh = float(Igh[0])
+        dwelling.monthly_solar_hw_factors = monthly_factors[0]
+        dwelling.collector_overshading_factor = float(overshading_factor[0])
 
         if dwelling.solar_storage_combined_cylinder:
             dwelling.solar_effective_storage_volume = dwelling.solar_dedicated_storage_volume + 0.3 * (
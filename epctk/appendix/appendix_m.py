@@ -6,6 +6,7 @@ Energy from Photovoltaic (PV) technology, small and micro wind turbines and smal
 import math
 
 from ..tables import TABLE_M1,  TABLE_H2, TABLE_H4
+from ..instrumentation import timed
 
 
 def pv_Igh(pitch, orientation=None):
@@ -29,11 +30,13 @@ def configure_pv_system(pv_system):
     pv_system['Igh'] = pv_Igh(pv_system['pitch'], pv_system.get('orientation'))
 
 
+@timed()
 def configure_pv(dwelling):
     for pv_system in dwelling.get('photovoltaic_systems', []):
         configure_pv_system(pv_system)
 
 
+@timed()
 def configure_wind_turbines(dwelling):
     """
     Set the wind turbine speed correction factor `wind_turbine_speed_correction_factor`
@@ -79,6 +82,7 @@ def m1_correction_factor(terrain_type, wind_speed):
         return v1 + (v2 - v1) * (wind_speed - closest_below) / (closest_above - closest_below)
 
 
+@timed()
 def pv(dwelling):
     if dwelling.get('photovoltaic_systems'):
         onsite_fraction = 0.5
@@ -94,6 +98,7 @@ def pv(dwelling):
     return dict(pv_electricity=electricity,
                 pv_electricity_onsite_fraction=onsite_fraction)
 
+@timed()
 def wind_turbines(dwelling):
     """
     Calculate the wind power generated and the graction of wind energy generated onsite
@@ -118,6 +123,7 @@ def wind_turbines(dwelling):
                 wind_electricity_onsite_fraction=onsite_fraction)
 
 
+@timed()
 def hydro(dwelling):
     electricity = dwelling.get('hydro_electricity')
     if electricity:
@@ -8,35 +8,72 @@ which describes heat pumps and micro CHP units
 
 
 """
-# types is used for MethodType, which is use to dynamically add methods to heating systems
-import types
-
 import numpy
 
 from ..elements import HeatingTypes, FuelTypes, HeatingSystem
 from ..constants import SUMMER_MONTHS, USE_TABLE_4D_FOR_RESPONSIVENESS
 from ..tables import table_n4_heating_days, table_n8_secondary_fraction, interpolate_psr_table, interpolate_efficiency
-from ..utils import weighted_effy
+from ..utils import weighted_effy, SAPInputError
 
 
-def add_appendix_n_equations_heat_pumps(dwelling, sys, pcdf_data):
+def plant_size_ratio(dwelling, maximum_output):
     """
-    Add the appendix n equations, which overwrite the default methods in some
-    cases
+    Plant size ratio of a heat pump or micro CHP unit in the dwelling (N3.1)
 
     Args:
         dwelling:
-        sys:
-        pcdf_data:
+        maximum_output: maximum output of the unit from the PCDF, kW
 
     Returns:
+        float: plant size ratio
+    """
+    h_mean = sum(dwelling.h) / 12
+    return 1000 * maximum_output / (h_mean * 24.2)
+
 
+class AppendixNSystem(HeatingSystem):
     """
-    add_appendix_n_equations_shared(dwelling, sys, pcdf_data)
+    Heat pump or micro CHP unit from the PCDF, whose efficiencies are
+    given by the Appendix N equations rather than fixed seasonal values.
 
-    def heat_pump_space_effy(self, Q_space):
-        h_mean = sum(dwelling.h) / 12
-        psr = 1000 * pcdf_data['maximum_output'] / (h_mean * 24.2)
+    The efficiency methods need the dwelling being calculated, which must
+    be passed in; the system only holds its PCDF record so it can be
+    pickled along with the dwelling.
+
+    Args:
+        system_type (HeatingTypes):
+        pcdf_data (dict): PCDF record of the unit
+        fuel (Fuel):
+        use_immersion_in_summer (bool):
+    """
+    def __init__(self, system_type, pcdf_data, fuel, use_immersion_in_summer):
+        # !!! Probably should check provision type in here for consistency
+        # !!! with water sys inputs (e.g. summer immersion, etc)
+        super().__init__(system_type,
+                         -1,
+                         -1,
+                         summer_immersion=use_immersion_in_summer,
+                         has_flue_fan=False,  # !!!
+                         has_ch_pump=pcdf_data['separate_circulator'],
+                         table2b_row=2,
+                         default_secondary_fraction=0,  # overwritten below
+                         fuel=fuel)
+        self.pcdf_data = pcdf_data
+
+    def _require_dwelling(self, dwelling):
+        if dwelling is None:
+            raise SAPInputError('Appendix N heating systems need the dwelling object '
+                                'to calculate their efficiency')
+
+
+class HeatPumpSystem(AppendixNSystem):
+    def __init__(self, pcdf_data, fuel, use_immersion_in_summer):
+        super().__init__(HeatingTypes.pcdf_heat_pump, pcdf_data, fuel, use_immersion_in_summer)
+
+    def space_heat_effy(self, Q_space, dwelling=None):
+        self._require_dwelling(dwelling)
+        pcdf_data = self.pcdf_data
+        psr = plant_size_ratio(dwelling, pcdf_data['maximum_output'])
 
         if not pcdf_data['number_of_air_flow_rates'] is None:
             throughput = 0.5  # !!!
@@ -78,10 +115,12 @@ def add_appendix_n_equations_heat_pumps(dwelling, sys, pcdf_data):
         space_heat_in_use_factor = 0.95
         return effy * space_heat_in_use_factor
 
-    def heat_pump_water_effy(self, Q_water):
+    def water_heat_effy(self, Q_water, dwelling=None):
+        pcdf_data = self.pcdf_data
         if pcdf_data['hw_vessel'] == 1:  # integral
             in_use_factor = .95
         elif pcdf_data['hw_vessel'] == 2:  # separate, specified
+            self._require_dwelling(dwelling)
             dwelling.hw_cylinder_area = 9e9  # !!! Should be input
             # !!! Need to check performance criteria of cylinder (table N7)
             if (dwelling.hw_cylinder_volume >= pcdf_data['vessel_volume'] and
@@ -105,9 +144,49 @@ def add_appendix_n_equations_heat_pumps(dwelling, sys, pcdf_data):
 
         return water_effy
 
-    # Dynamically add a method to the system
-    sys.water_heat_effy = types.MethodType(heat_pump_water_effy, sys)
-    sys.space_heat_effy = types.MethodType(heat_pump_space_effy, sys)
+
+class MicroCHPSystem(AppendixNSystem):
+    def __init__(self, pcdf_data, fuel, use_immersion_in_summer):
+        super().__init__(HeatingTypes.microchp, pcdf_data, fuel, use_immersion_in_summer)
+
+    def space_heat_effy(self, Q_space, dwelling=None):
+        self._require_dwelling(dwelling)
+        psr = plant_size_ratio(dwelling, self.pcdf_data['maximum_output'])
+        effy = interpolate_efficiency(psr, self.pcdf_data['psr_datasets'][0])
+        self.effy_space = effy
+        space_heat_in_use_factor = 1
+        self.Q_space = Q_space
+
+        dwelling.chp_space_elec = interpolate_psr_table(
+                psr, self.pcdf_data['psr_datasets'][0],
+                key=lambda x: x['psr'],
+                data=lambda x: x['specific_elec_consumed'])
+
+        return effy * space_heat_in_use_factor
+
+    def water_heat_effy(self, Q_water, dwelling=None):
+        # !!! Can this all be replaced with regular water function?
+        # !!! Winter effy might be the problem as it needs psr
+        pcdf_data = self.pcdf_data
+
+        # !!! adjustments can apply??
+        if not pcdf_data['water_heating_effy_sch3'] is None:
+            self._require_dwelling(dwelling)
+            Vd = dwelling.daily_hot_water_use
+            summereff = sch3_calc(Vd,
+                                  pcdf_data['water_heating_effy_sch2'],
+                                  pcdf_data['water_heating_effy_sch3'])
+        else:
+            summereff = pcdf_data['water_heating_effy_sch2']
+        wintereff = self.effy_space
+
+        water_effy = weighted_effy(self.Q_space, Q_water, wintereff, summereff)
+
+        if self.summer_immersion:
+            for i in SUMMER_MONTHS:
+                water_effy[i] = 100
+
+        return water_effy
 
 
 def sch3_calc(daily_hot_water_use, sch2val, sch3val):
@@ -138,16 +217,27 @@ def table_n3(heating_duration, psr):
     return N16_9, N24_16, N24_9
 
 
-def add_appendix_n_equations_shared(dwelling, sys, pcdf_data):
-    def longer_heating_days(self):
-        h_mean = sum(dwelling.h) / 12
-        psr = 1000 * pcdf_data['maximum_output'] / (h_mean * 24.2)
+class LongerHeatingDays:
+    """
+    Number of days per month on which an undersized heat pump or micro CHP
+    unit operates for longer hours (Tables N3 and N5). Set on the dwelling
+    as `longer_heating_days` and called with the dwelling.
+
+    Args:
+        pcdf_data (dict): PCDF record of the unit
+    """
+    def __init__(self, pcdf_data):
+        self.maximum_output = pcdf_data['maximum_output']
+        self.heating_duration = pcdf_data['heating_duration']
+
+    def __call__(self, dwelling):
+        psr = plant_size_ratio(dwelling, self.maximum_output)
 
         # !!! Not the best place to set this
-        dwelling.fraction_of_heat_from_main = 1 - table_n8_secondary_fraction(psr, pcdf_data['heating_duration'])
+        dwelling.fraction_of_heat_from_main = 1 - table_n8_secondary_fraction(psr, self.heating_duration)
 
         # TABLE N3
-        N16_9, N24_16, N24_9 = table_n3(pcdf_data['heating_duration'], psr)
+        N16_9, N24_16, N24_9 = table_n3(self.heating_duration, psr)
 
         # TABLE N5
         MONTH_ORDER = [0, 11, 1, 2, 10, 3, 9, 4, 5, 6, 7, 8]
@@ -174,66 +264,9 @@ def add_appendix_n_equations_shared(dwelling, sys, pcdf_data):
 
         return numpy.array(N24_16_m), numpy.array(N24_9_m), numpy.array(N16_9_m),
 
-    dwelling.longer_heating_days = types.MethodType(longer_heating_days, dwelling)
-
-
-def add_appendix_n_equations_microchp(dwelling, sys, pcdf_data):
-    add_appendix_n_equations_shared(dwelling, sys, pcdf_data)
-
-    def micro_chp_space_effy(self, Q_space):
-        h_mean = sum(dwelling.h) / 12
-        psr = 1000 * pcdf_data['maximum_output'] / (h_mean * 24.2)
-        effy = interpolate_efficiency(psr, pcdf_data['psr_datasets'][0])
-        sys.effy_space = effy
-        space_heat_in_use_factor = 1
-        self.Q_space = Q_space
-
-        dwelling.chp_space_elec = interpolate_psr_table(
-                psr, pcdf_data['psr_datasets'][0],
-                key=lambda x: x['psr'],
-                data=lambda x: x['specific_elec_consumed'])
-
-        return effy * space_heat_in_use_factor
-
-    def micro_chp_water_effy(self, Q_water):
-        # !!! Can this all be replaced with regular water function?
-        # !!! Winter effy might be the problem as it needs psr
-
-        # !!! adjustments can apply??
-        if not pcdf_data['water_heating_effy_sch3'] is None:
-            Vd = dwelling.daily_hot_water_use
-            summereff = sch3_calc(Vd,
-                                  pcdf_data['water_heating_effy_sch2'],
-                                  pcdf_data['water_heating_effy_sch3'])
-        else:
-            summereff = pcdf_data['water_heating_effy_sch2']
-        wintereff = sys.effy_space
-
-        water_effy = weighted_effy(self.Q_space, Q_water, wintereff, summereff)
-
-        if self.summer_immersion:
-            for i in SUMMER_MONTHS:
-                water_effy[i] = 100
-
-        return water_effy
-
-    # Dynamically set the efficiency methods to micro chp methods, overriding the default ones.
-    sys.water_heat_effy = types.MethodType(micro_chp_water_effy, sys)
-    sys.space_heat_effy = types.MethodType(micro_chp_space_effy, sys)
-
 
 def micro_chp_from_pcdf(dwelling, pcdf_data, fuel, use_immersion_in_summer):
-    # !!! Probably should check provision type in here for consistency
-    # !!! with water sys inputs (e.g. summer immersion, etc)
-    sys = HeatingSystem(HeatingTypes.microchp,
-                        -1,
-                        -1,
-                        summer_immersion=use_immersion_in_summer,
-                        has_flue_fan=False,  # !!!
-                        has_ch_pump=pcdf_data['separate_circulator'],
-                        table2b_row=2,
-                        default_secondary_fraction=0,  # overwritten below
-                        fuel=fuel)
+    sys = MicroCHPSystem(pcdf_data, fuel, use_immersion_in_summer)
 
     sys.responsiveness = USE_TABLE_4D_FOR_RESPONSIVENESS
 
@@ -266,23 +299,13 @@ def micro_chp_from_pcdf(dwelling, pcdf_data, fuel, use_immersion_in_summer):
     else:
         dwelling.chp_water_elec = pcdf_data['net_specific_elec_consumed_sch2']
 
-    add_appendix_n_equations_microchp(dwelling, sys, pcdf_data)
+    dwelling.longer_heating_days = LongerHeatingDays(pcdf_data)
     return sys
 
 
 def heat_pump_from_pcdf(dwelling, pcdf_data, fuel, use_immersion_in_summer):
     # FIXME: this really messes with the dwelling object, making it hard to track changes to the contents
-    # !!! Probably should check provision type in here for consistency
-    # !!! with water sys inputs (e.g. summer immersion, etc)
-    sys = HeatingSystem(HeatingTypes.pcdf_heat_pump,
-                        -1,
-                        -1,
-                        summer_immersion=use_immersion_in_summer,
-                        has_flue_fan=False,  # !!!
-                        has_ch_pump=pcdf_data['separate_circulator'],
-                        table2b_row=2,
-                        default_secondary_fraction=0,  # overwritten below
-                        fuel=fuel)
+    sys = HeatPumpSystem(pcdf_data, fuel, use_immersion_in_summer)
 
     if pcdf_data['emitter_type'] == "4":
         sys.responsiveness = 1
@@ -307,7 +330,7 @@ def heat_pump_from_pcdf(dwelling, pcdf_data, fuel, use_immersion_in_summer):
         dwelling.secondary_heating_type_code = 693
         dwelling.secondary_sys_fuel = dwelling.electricity_tariff
 
-    add_appendix_n_equations_heat_pumps(dwelling, sys, pcdf_data)
+    dwelling.longer_heating_days = LongerHeatingDays(pcdf_data)
     return sys
 
 
@@ -9,6 +9,8 @@ from ..elements import HeatLossElementTypes, HeatLossElement, OpeningType, Glazi
     VentilationTypes, HeatEmitters, CylinderInsulationTypes, HeatingTypes, PVOvershading
 from ..fuels import fuel_from_code
 from .. import worksheet
+from ..cache import cached_calculation
+from ..instrumentation import timed
 from ..configure import lookup_sap_tables
 from ..dwelling import DwellingResults
 from ..tables import table_2a_hot_water_vol_factor
@@ -168,6 +170,8 @@ def apply_previous_improvements(base, target, previous):
         improve(base, target)
 
 
+@timed()
+@cached_calculation('improvements', outputs=('improvement_results', 'improved_results'))
 def run_improvements(dwelling):
     """
     Need to run the dwelling twice: once with pcdf fuel prices to
@@ -294,6 +298,8 @@ def element_type_area(etype, els):
     return sum(e.area for e in els if e.element_type == etype)
 
 
+@timed()
+@cached_calculation('ter')
 def run_ter(input_dwelling):
     """
     Run the Target Energy Rating (TER) for the input dwelling.
@@ -0,0 +1,214 @@
+"""
+Batch calculations
+~~~~~~~~~~~~~~~~~~
+
+Helpers for running a calculation over many dwellings.
+
+Flats in the same block or houses on a new build estate frequently have
+identical calculation inputs. :func:`run_batch` collapses exact
+duplicates before calculating, runs each unique configuration once and
+fans the results back out to every member of the group.
+
+A calculated DwellingResults keeps every intermediate of the worksheet
+(monthly arrays, the flattened fuel use stats, heating system objects),
+about 30 kB per dwelling for the synthetic stock of
+:mod:`epctk.synthetic`. In lean mode, with the ``outputs`` of
+:func:`run_batch` given, only those results are kept, in a dict per
+dwelling (under 1 kB for a few scalars), and the DwellingResults of a
+calculation is released as soon as they have been read. A calculation
+in flight peaks at about 40 kB beyond the tables, which are loaded once
+per process (measured with :func:`measure_memory`), so 64 concurrent
+calculations need a few MB on top of the tables of their processes.
+
+"""
+import gc
+import hashlib
+import logging
+import tracemalloc
+from collections import OrderedDict
+
+from . import runner
+from .cache import calculation_results, canonical_form, input_items
+from .dwelling import DwellingResults, reporting
+
+
+def dwelling_fingerprint(dwelling):
+    """
+    Hash of the canonicalized dwelling inputs. Dwellings with the same
+    fingerprint give identical calculation results.
+
+    Args:
+        dwelling: Dwelling
+
+    Returns:
+        str: hex digest
+    """
+    return hashlib.sha256(repr(canonical_form(input_items(dwelling))).encode()).hexdigest()
+
+
+class DuplicateGroups:
+    """
+    Groups of dwellings with identical inputs
+
+    Attributes:
+        representatives: first dwelling of each group, in order of first occurrence
+        members: for each group, the indices of its dwellings in the input sequence
+    """
+    def __init__(self, dwellings, fingerprint=dwelling_fingerprint):
+        groups = OrderedDict()
+        self.n_dwellings = 0
+        for i, dwelling in enumerate(dwellings):
+            groups.setdefault(fingerprint(dwelling), (dwelling, []))[1].append(i)
+            self.n_dwellings += 1
+
+        self.fingerprints = list(groups)
+        self.representatives = [rep for rep, _ in groups.values()]
+        self.members = [idx for _, idx in groups.values()]
+
+    @property
+    def n_unique(self):
+        return len(self.representatives)
+
+    @property
+    def compression_ratio(self):
+        """
+        Number of input dwellings per calculation actually performed
+        """
+        return self.n_dwellings / self.n_unique if self.n_unique else 1.0
+
+    @property
+    def duplicate_fraction(self):
+        return 1 - self.n_unique / self.n_dwellings if self.n_dwellings else 0.0
+
+
+def collapse_duplicates(dwellings):
+    """
+    Args:
+        dwellings: iterable of Dwellings
+
+    Returns:
+        DuplicateGroups
+    """
+    return DuplicateGroups(dwellings)
+
+
+class BatchResult:
+    def __init__(self, results, groups):
+        self.results = results
+        self.groups = groups
+
+    @property
+    def compression_ratio(self):
+        return self.groups.compression_ratio
+
+    def summary(self):
+        return dict(n_dwellings=self.groups.n_dwellings,
+                    n_calculated=self.groups.n_unique,
+                    compression_ratio=self.groups.compression_ratio,
+                    duplicate_fraction=self.groups.duplicate_fraction)
+
+
+def _fan_out(calculated, representative, member):
+    """
+    Wrap another member of a duplicate group with the representative's results.
+    The result values are shared, not copied.
+    """
+    if member is representative:
+        return calculated
+
+    values, results = calculation_results(calculated, representative)
+    dwelling = DwellingResults(member)
+    dwelling.update(values)
+    dwelling['results'].update(results)
+    return dwelling
+
+
+def _lean_results(calculated, outputs):
+    return {name: calculated.get(name) for name in outputs}
+
+
+def run_batch(dwellings, calculation=runner.run_sap, collapse=True, report=False, outputs=None):
+    """
+    Run a calculation over a batch of dwellings, calculating each unique
+    configuration only once
+
+    Args:
+        dwellings: sequence of input Dwellings
+        calculation: calculation entry point, e.g. runner.run_sap or appendix_t.run_ter
+        collapse: set False to calculate every dwelling individually
+        report: record the calculation reports, off by default for batches
+        outputs: names of the results to keep, for the lean mode. By default
+            the whole DwellingResults of every dwelling is kept.
+
+    Returns:
+        BatchResult: results in input order and the duplicate grouping that
+        was used. In lean mode each result is a dict of output name -> value.
+    """
+    dwellings = list(dwellings)
+
+    if collapse:
+        groups = collapse_duplicates(dwellings)
+    else:
+        # Only the very same object passed twice is treated as a duplicate
+        groups = DuplicateGroups(dwellings, fingerprint=id)
+
+    logging.info("batch.py: %d dwellings, %d unique configurations (compression ratio %.2f)",
+                 groups.n_dwellings, groups.n_unique, groups.compression_ratio)
+
+    results = [None] * len(dwellings)
+    with reporting(report):
+        for representative, members in zip(groups.representatives, groups.members):
+            calculated = calculation(representative)
+            if outputs is not None:
+                lean = _lean_results(calculated, outputs)
+                del calculated
+                for i in members:
+                    results[i] = dict(lean)
+            else:
+                for i in members:
+                    results[i] = _fan_out(calculated, representative, dwellings[i])
+
+    return BatchResult(results, groups)
+
+
+def measure_memory(dwelling, calculation=runner.run_sap, outputs=None):
+    """
+    Memory used by the calculation of a dwelling, traced with tracemalloc.
+    Tables loaded by the calculation are counted, so calculate a dwelling
+    first to measure a calculation in a warm process.
+
+    Args:
+        dwelling: input Dwelling
+        calculation: calculation entry point
+        outputs: names of the results kept, as in the lean mode of
+            :func:`run_batch`. By default the DwellingResults is kept.
+
+    Returns:
+        tuple of the peak bytes allocated during the calculation and the
+        bytes still held by the results kept
+
+    Raises:
+        RuntimeError: if tracemalloc is already tracing and cannot reset
+            its peak, before Python 3.9
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        # The peak starts from the memory traced now
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        raise RuntimeError("Memory can only be measured while tracemalloc is already tracing from Python 3.9")
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        with reporting(False):
+            calculated = calculation(dwelling)
+            if outputs is not None:
+                calculated = _lean_results(calculated, outputs)
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return peak - start, current - start
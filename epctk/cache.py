@@ -0,0 +1,352 @@
+"""
+Results cache
+~~~~~~~~~~~~~
+
+Content-addressed cache of calculation results, persisted between runs.
+
+Results are keyed on a canonical hash of the dwelling inputs, the edition
+of the SAP tables and PCDF data files, and the calculation type
+(sap, der, fee, ter, improvements).  A rerun of an unchanged portfolio
+can then be served from the cache rather than recalculated.
+
+The cache is disabled by default.  Enable it once per process with
+:func:`enable_results_cache` and the ``runner`` entry points (and
+``appendix_t.run_ter``/``run_improvements``) consult it transparently.
+
+"""
+import enum
+import functools
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import numpy
+
+from .instrumentation import cache_lookup
+from .io import pcdf
+
+_DATA_FOLDER = os.path.join(os.path.dirname(__file__), 'data')
+
+# Bumped whenever the layout of the cached payload changes
+CACHE_FORMAT_VERSION = 1
+
+# Keys of a DwellingResults that are bookkeeping rather than inputs/results
+_EXCLUDED_KEYS = ('results', 'report')
+
+_RESULTS_CACHE = None
+_TABLES_EDITION = None
+
+
+def canonical_form(value):
+    """
+    Reduce a dwelling input value to a structure made of plain str/int/float/
+    tuple values so that equal inputs always give the same representation
+
+    Args:
+        value: any value stored on a dwelling
+
+    Returns:
+        canonical, hashable representation of the value
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+
+    if isinstance(value, enum.Enum):
+        return type(value).__name__, value.name
+
+    if isinstance(value, (int, float)):
+        return value
+
+    if isinstance(value, numpy.generic):
+        return value.item()
+
+    if isinstance(value, numpy.ndarray):
+        return 'ndarray', str(value.dtype), value.shape, tuple(value.ravel().tolist())
+
+    if isinstance(value, dict):
+        return type(value).__name__, tuple(sorted(((str(k), canonical_form(v)) for k, v in value.items()
+                                                   if k not in _EXCLUDED_KEYS)))
+
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, tuple(canonical_form(v) for v in value)
+
+    if isinstance(value, (set, frozenset)):
+        return type(value).__name__, tuple(sorted(repr(canonical_form(v)) for v in value))
+
+    if isinstance(value, functools.partial):
+        return ('partial', canonical_form(value.func), canonical_form(value.args),
+                canonical_form(value.keywords))
+
+    if callable(value) and hasattr(value, '__qualname__'):
+        return 'callable', getattr(value, '__module__', ''), value.__qualname__
+
+    if hasattr(value, '__dict__'):
+        # Fuels, heat loss elements, openings, ... Private attributes are
+        # treated as derived state (e.g. Fuel._fuel_data)
+        attrs = tuple(sorted((k, canonical_form(v)) for k, v in vars(value).items()
+                             if not k.startswith('_')))
+        return type(value).__name__, attrs
+
+    return type(value).__name__, repr(value)
+
+
+def tables_edition():
+    """
+    Hash of the SAP table and PCDF data files the calculation will use.
+    Computed once per process.
+
+    Returns:
+        str: hex digest identifying the data edition
+    """
+    global _TABLES_EDITION
+    if _TABLES_EDITION is None:
+        digest = hashlib.sha1()
+        data_files = sorted(glob.glob(os.path.join(_DATA_FOLDER, '*.csv')))
+        data_files.append(os.path.abspath(pcdf._PCDF_DATA_FILE))
+
+        for fname in data_files:
+            digest.update(os.path.basename(fname).encode())
+            with open(fname, 'rb') as datafile:
+                for chunk in iter(functools.partial(datafile.read, 1 << 20), b''):
+                    digest.update(chunk)
+
+        _TABLES_EDITION = digest.hexdigest()
+
+    return _TABLES_EDITION
+
+
+def input_items(dwelling):
+    """
+    The input values of a dwelling. For a DwellingResults these are the
+    wrapped dwelling's values overlaid with anything set since wrapping.
+
+    Args:
+        dwelling: Dwelling or DwellingResults
+
+    Returns:
+        dict of input values
+    """
+    items = {k: v for k, v in dict.items(dwelling) if k not in _EXCLUDED_KEYS}
+    overlay = dict.get(dwelling, 'results') or {}
+    items.update((k, v) for k, v in overlay.items() if k not in _EXCLUDED_KEYS)
+    return items
+
+
+def input_hash(dwelling, calc_type):
+    """
+    Canonical hash of the dwelling inputs for the given calculation type
+
+    Args:
+        dwelling: input dwelling
+        calc_type: one of 'sap', 'der', 'fee', 'ter', 'improvements'
+
+    Returns:
+        str: hex digest to use as cache key
+    """
+    key = (CACHE_FORMAT_VERSION, calc_type, tables_edition(), canonical_form(input_items(dwelling)))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+class ResultsCache:
+    """
+    sqlite backed store of pickled calculation results with least recently
+    used eviction once the stored payload exceeds ``max_bytes``
+
+    """
+    def __init__(self, path, max_bytes=1024 ** 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                           "key TEXT PRIMARY KEY, "
+                           "payload BLOB NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        """
+        Args:
+            key: key from :func:`input_hash`
+
+        Returns:
+            the cached results, or None if not present
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            cache_lookup('results', row is not None)
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        return pickle.loads(row[0])
+
+    def put(self, key, results):
+        """
+        Store results under the given key. Results that cannot be pickled are
+        not cached.
+
+        Args:
+            key: key from :func:`input_hash`
+            results: results to store
+        """
+        try:
+            payload = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as err:
+            logging.debug("cache.py: results not cached, cannot pickle: %s", err)
+            return
+
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._total_bytes -= row[0]
+
+            self._conn.execute("INSERT OR REPLACE INTO results (key, payload, size, last_access) "
+                               "VALUES (?, ?, ?, ?)", (key, payload, len(payload), time.time()))
+            self._total_bytes += len(payload)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute("SELECT key, size FROM results ORDER BY last_access")
+        evicted = []
+        for key, size in cursor:
+            if self._total_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+
+        self._conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def size_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def enable_results_cache(path, max_bytes=1024 ** 3):
+    """
+    Enable the results cache for this process
+
+    Args:
+        path: sqlite database file; created if it does not exist
+        max_bytes: size bound of the stored results before eviction
+
+    Returns:
+        ResultsCache: the cache now in use
+    """
+    global _RESULTS_CACHE
+    disable_results_cache()
+    _RESULTS_CACHE = ResultsCache(path, max_bytes)
+    return _RESULTS_CACHE
+
+
+def disable_results_cache():
+    global _RESULTS_CACHE
+    if _RESULTS_CACHE is not None:
+        _RESULTS_CACHE.close()
+    _RESULTS_CACHE = None
+
+
+def get_results_cache():
+    return _RESULTS_CACHE
+
+
+def calculation_results(dwelling, input_dwelling):
+    """
+    Everything a calculation added to a DwellingResults. Stage results are
+    merged into the dwelling dict itself, while attributes set go to
+    the `results` dict, so both are collected.
+
+    Args:
+        dwelling (DwellingResults): calculated dwelling
+        input_dwelling: the dwelling it was created from
+
+    Returns:
+        tuple of (dwelling values, results) dicts
+    """
+    values = {k: v for k, v in dict.items(dwelling)
+              if k not in _EXCLUDED_KEYS and (k not in input_dwelling or dict.get(input_dwelling, k) is not v)}
+    results = {k: v for k, v in dwelling['results'].items() if k not in _EXCLUDED_KEYS}
+    return values, results
+
+
+def cached_calculation(calc_type, outputs=None):
+    """
+    Decorator for a calculation entry point taking the input dwelling.
+    When the results cache is enabled the results are looked up by input
+    hash and only calculated on a miss.
+
+    By default the entry point returns a DwellingResults. Entry points that
+    instead set their results on the input dwelling name them in `outputs`.
+
+    Args:
+        calc_type: calculation type used in the cache key
+        outputs: attributes set on the input dwelling by the entry point
+
+    """
+    def decorator(run):
+        @functools.wraps(run)
+        def wrapper(input_dwelling):
+            results_cache = _RESULTS_CACHE
+            if results_cache is None:
+                return run(input_dwelling)
+
+            key = input_hash(input_dwelling, calc_type)
+            cached = results_cache.get(key)
+
+            if outputs is not None:
+                if cached is None:
+                    run(input_dwelling)
+                    results_cache.put(key, {name: input_dwelling[name] for name in outputs})
+                else:
+                    for name, value in cached.items():
+                        setattr(input_dwelling, name, value)
+                return None
+
+            if cached is None:
+                dwelling = run(input_dwelling)
+                results_cache.put(key, calculation_results(dwelling, input_dwelling))
+                return dwelling
+
+            from .dwelling import DwellingResults
+
+            values, results = cached
+            dwelling = DwellingResults(input_dwelling)
+            dwelling.update(values)
+            dwelling['results'].update(results)
+            return dwelling
+
+        return wrapper
+
+    return decorator
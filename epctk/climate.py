@@ -0,0 +1,172 @@
+"""
+Regional climate
+~~~~~~~~~~~~~~~~
+
+Monthly climate data for every SAP region, held as (regions x 12) arrays
+and built once per process.
+
+SAP 2009 calculates heating with the UK average climate of
+:mod:`epctk.constants` and uses the regional data of Table 10 only for
+the summer: latitude, solar radiation and external temperature. Both
+are stored per region here so that a batch of dwellings can gather all
+its climate data by region code in one indexed read::
+
+    climate = regional_climate()
+    rows = climate.rows(region_codes)
+    climate.external_temperature_summer[rows]  # (dwellings, 12)
+
+The solar coefficients A, B and C of :class:`epctk.constants.SolarConstants`
+give the irradiance on a vertical surface of any orientation. The
+irradiance is also tabulated for the eight compass orientations of
+:data:`ORIENTATIONS`.
+"""
+from collections import namedtuple
+
+import numpy
+
+from .constants import (HEATING_LATITUDE, IGH_HEATING, T_EXTERNAL_HEATING, WIND_SPEED,
+                        SolarConstants)
+from .instrumentation import cache_lookup
+from .tables import TABLE_10
+from .utils import SAPInputError
+
+# Orientations of the tabulated vertical irradiance, degrees clockwise from north
+ORIENTATIONS = numpy.arange(0, 360, 45)
+
+# Coefficients of the vertical irradiance, each an array of 12 monthly values
+SolarCoefficients = namedtuple('SolarCoefficients', 'A, B, C')
+
+
+def vertical_irradiance(Igh, coefficients, orientation_degrees):
+    """
+    Irradiance on vertical surfaces, as :func:`epctk.solar.incident_solar_vertical`
+
+    Args:
+        Igh: (..., 12) horizontal solar radiation
+        coefficients: SolarCoefficients of (..., 12) arrays
+        orientation_degrees: array of orientations
+
+    Returns:
+        (..., orientations, 12) array
+    """
+    orientation = numpy.radians(numpy.asarray(orientation_degrees, dtype=float))[:, numpy.newaxis]
+    A, B, C = (numpy.asarray(c)[..., numpy.newaxis, :] for c in coefficients)
+    return numpy.asarray(Igh)[..., numpy.newaxis, :] * (
+            A + B * numpy.cos(orientation) + C * numpy.cos(2 * orientation))
+
+
+class RegionalClimate:
+    """
+    Climate arrays for all the regions of Table 10, in order of region code
+
+    Attributes:
+        codes: (regions,) region codes
+        latitude: (regions,) latitudes
+        external_temperature_heating, Igh_heating, wind_speed: (regions, 12)
+            climate used for the heating calculation
+        external_temperature_summer, Igh_summer: (regions, 12) summer climate,
+            zero outside June to August
+        solar_heating, solar_summer: SolarCoefficients of (regions, 12) arrays
+        vertical_irradiance_heating, vertical_irradiance_summer:
+            (regions, orientations, 12) irradiance for ORIENTATIONS
+    """
+    def __init__(self, table_10):
+        regions = [table_10[code] for code in sorted(table_10)]
+        n = len(regions)
+
+        self.codes = numpy.array([r['code'] for r in regions])
+        self.names = [r['name'] for r in regions]
+        self._rows = {code: i for i, code in enumerate(self.codes.tolist())}
+
+        self.latitude = numpy.array([r['latitude'] for r in regions])
+        self.external_temperature_summer = numpy.array([r['external_temperature'] for r in regions])
+        self.Igh_summer = numpy.array([r['solar_radiation'] for r in regions])
+
+        self.external_temperature_heating = numpy.tile(T_EXTERNAL_HEATING.astype(float), (n, 1))
+        self.Igh_heating = numpy.tile(IGH_HEATING.astype(float), (n, 1))
+        self.wind_speed = numpy.tile(WIND_SPEED.astype(float), (n, 1))
+
+        self.solar_heating = self._solar_coefficients([HEATING_LATITUDE] * n)
+        self.solar_summer = self._solar_coefficients(self.latitude)
+
+        self.vertical_irradiance_heating = vertical_irradiance(self.Igh_heating, self.solar_heating,
+                                                               ORIENTATIONS)
+        self.vertical_irradiance_summer = vertical_irradiance(self.Igh_summer, self.solar_summer,
+                                                              ORIENTATIONS)
+
+        for array in self._arrays():
+            array.flags.writeable = False
+
+    @staticmethod
+    def _solar_coefficients(latitudes):
+        constants = [SolarConstants(latitude) for latitude in latitudes]
+        return SolarCoefficients(*(numpy.array([getattr(c, name) for c in constants])
+                                   for name in SolarCoefficients._fields))
+
+    def _arrays(self):
+        return ([self.codes, self.latitude, self.external_temperature_summer, self.Igh_summer,
+                 self.external_temperature_heating, self.Igh_heating, self.wind_speed,
+                 self.vertical_irradiance_heating, self.vertical_irradiance_summer] +
+                list(self.solar_heating) + list(self.solar_summer))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def row(self, region_code):
+        """
+        Returns:
+            index of the region in the climate arrays
+        """
+        try:
+            return self._rows[int(region_code)]
+        except (KeyError, TypeError, ValueError):
+            raise SAPInputError("Unknown SAP region {!r}".format(region_code))
+
+    def rows(self, region_codes):
+        """
+        Args:
+            region_codes: sequence of region codes
+
+        Returns:
+            array of indices of the regions in the climate arrays
+        """
+        codes = numpy.asarray(region_codes, dtype=int)
+        rows = numpy.searchsorted(self.codes, codes)
+        rows = numpy.minimum(rows, len(self.codes) - 1)
+        unknown = self.codes[rows] != codes
+        if unknown.any():
+            raise SAPInputError("Unknown SAP regions {}".format(sorted(set(codes[unknown].tolist()))))
+        return rows
+
+    def solar_summer_coefficients(self, region_code):
+        """
+        Returns:
+            SolarCoefficients for the summer solar gains of the region
+        """
+        row = self.row(region_code)
+        return SolarCoefficients(*(c[row] for c in self.solar_summer))
+
+    def summer_properties(self, region_code):
+        """
+        Returns:
+            dict of the regional values set on a dwelling by configure
+        """
+        row = self.row(region_code)
+        return dict(external_temperature_summer=self.external_temperature_summer[row],
+                    Igh_summer=self.Igh_summer[row],
+                    latitude=float(self.latitude[row]))
+
+
+_REGIONAL_CLIMATE = None
+
+
+def regional_climate():
+    """
+    Returns:
+        RegionalClimate for the regions of Table 10, built on first use
+    """
+    global _REGIONAL_CLIMATE
+    cache_lookup('regional_climate', _REGIONAL_CLIMATE is not None)
+    if _REGIONAL_CLIMATE is None:
+        _REGIONAL_CLIMATE = RegionalClimate(TABLE_10)
+    return _REGIONAL_CLIMATE
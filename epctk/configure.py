@@ -1,3 +1,6 @@
+import copy
+
+from .climate import regional_climate
 from .cooling import configure_cooling_system
 from .domestic_hot_water import hw_primary_circuit_loss
 from .utils import SAPInputError
@@ -5,38 +8,24 @@ from . import fuels
 from .fuels import ELECTRICITY_STANDARD
 from .constants import USE_TABLE_4D_FOR_RESPONSIVENESS
 from .domestic_hot_water import get_water_heater
-from .elements import HeatingTypes
+from .cache import input_items
+from .elements import HeatingTypes, HeatingSystem
 from .fuel_use import configure_fuel_costs
 from .heating_loaders import sedbuk_2005_heating_system, sedbuk_2009_heating_system, pcdf_heating_system
 from .solar import overshading_factors
-from .tables import (table_1b_occupancy, table_1b_daily_hot_water, TABLE_10, table_2a_hot_water_vol_factor,
+from .tables import (table_1b_occupancy, table_1b_daily_hot_water, table_2a_hot_water_vol_factor,
                      table_2_hot_water_store_loss_factor, table_2b_hot_water_temp_factor,
                      TABLE_4D, TABLE_4E, table_4f_fans_pumps_keep_hot, apply_table_4e,
                      table_5a_fans_and_pumps_gain)
 from .ventilation import ventilation_properties, infiltration
 from .appendix import appendix_a, appendix_c, appendix_g, appendix_h, appendix_m
+from .instrumentation import timed
 
 
-def lookup_sap_tables(dwelling):
+def configure_inputs(dwelling):
     """
-    Lookup data from SAP tables for given dwelling
-
-    .. note::
-        This modifies the input dwelling! The dwelling is returned anyway
-        In the future, shift to "immutable" style where the copies are always
-        returned without modifying input data, enabling a "pipeling" style
-        workflow and easier testing of partially configured dwellings
-
-    Args:
-        dwelling input dwelling data
-
-    Returns:
-        dwelling where input data has been converted to configured
-        dwelling elements, values converted, sap table lookups performed, etc
-
-        NOTE that this also MODIFIES the inputs.
+    Fix up the inputs: fuel prices used, cylinderstat and electricity tariff
     """
-
     # FIXME: use of global variable is a problem!
     if dwelling.get('use_pcdf_fuel_prices'):
         fuels.PREFER_PCDF_FUEL_PRICES = True
@@ -53,14 +42,16 @@ def lookup_sap_tables(dwelling):
     if dwelling.get('secondary_sys_fuel') == ELECTRICITY_STANDARD:
         dwelling.secondary_sys_fuel = dwelling.electricity_tariff
 
+
+def configure_occupancy(dwelling):
     # Calulate the number of occupants
     # FIXME: shouldn't this by Total floor area not Ground floor area??
     dwelling.Nocc = table_1b_occupancy(dwelling.GFA)
 
     dwelling.daily_hot_water_use = table_1b_daily_hot_water(dwelling.Nocc, dwelling.low_water_use)
 
-    set_regional_properties(dwelling)
 
+def configure_ventilation(dwelling):
     if not dwelling.get('living_area_fraction'):
         dwelling.living_area_fraction = dwelling.living_area / dwelling.GFA
 
@@ -70,19 +61,18 @@ def lookup_sap_tables(dwelling):
 
     dwelling.update(ventilation_properties(dwelling))
 
+
+def configure_overshading(dwelling):
     # Add overshading factors
     dwelling.update(overshading_factors(dwelling.overshading))
 
-    # TODO: change the following to return dicts of properties to extend the dwelling definition
-    configure_heat_systems(dwelling)
-    configure_cooling_system(dwelling)
 
+def configure_renewables(dwelling):
     appendix_m.configure_wind_turbines(dwelling)
     appendix_m.configure_pv(dwelling)
-    appendix_h.configure_solar_hw(dwelling)
 
-    configure_fans_and_pumps(dwelling)
 
+def configure_misc(dwelling):
     # Bit of a special case here!
     if dwelling.get('reassign_systems_for_test_case_30'):
         # FIXME @Andy: Basically, I have no idea what happens here
@@ -90,9 +80,27 @@ def lookup_sap_tables(dwelling):
 
     dwelling.update(fix_misc_configuration(dwelling))
 
-    return dwelling
+
+def copy_heating_systems(dwelling):
+    """
+    Give a copy of a configured dwelling its own heating systems. The
+    worksheet stages set calculated values on the systems, so a configured
+    dwelling that is calculated more than once, e.g. by
+    :mod:`epctk.inverse`, needs copies. A system shared by two keys, e.g.
+    main_sys_1 and water_sys, stays shared.
+
+    Args:
+        dwelling: DwellingResults wrapping the configured dwelling
+    """
+    copies = {}
+    for key, value in input_items(dwelling).items():
+        if isinstance(value, HeatingSystem):
+            if id(value) not in copies:
+                copies[id(value)] = copy.copy(value)
+            dwelling[key] = copies[id(value)]
 
 
+@timed()
 def fix_misc_configuration(dwelling):
     # FIXME: dump for various special case fixes that are pulled from elsewhere. Cleanup!
 
@@ -364,6 +372,7 @@ def configure_water(dwelling):
     configure_water_storage(dwelling)
 
 
+@timed()
 def configure_heat_systems(dwelling):
     """
     Configure space and water heating systems
@@ -403,16 +412,64 @@ def configure_heat_systems(dwelling):
     configure_controls(dwelling)
 
 
+@timed()
 def configure_fans_and_pumps(dwelling):
     table_5a_fans_and_pumps_gain(dwelling)
     table_4f_fans_pumps_keep_hot(dwelling)
 
     configure_responsiveness(dwelling)
-    configure_fuel_costs(dwelling)
 
 
+@timed()
 def set_regional_properties(dwelling):
-    region = dwelling['sap_region']
-    dwelling['external_temperature_summer'] = TABLE_10[region]['external_temperature']
-    dwelling['Igh_summer'] = TABLE_10[region]['solar_radiation']
-    dwelling['latitude'] = TABLE_10[region]['latitude']
+    for key, value in regional_climate().summer_properties(dwelling['sap_region']).items():
+        dwelling[key] = value
+
+
+# Sub-steps of lookup_sap_tables, in the order they are performed. The
+# worksheet demand stages (up to the heat and cooling requirements) do not
+# use the renewables or the fuel costs.
+LOOKUP_STEPS = (
+    ('inputs', configure_inputs),
+    ('occupancy', configure_occupancy),
+    ('climate', set_regional_properties),
+    ('ventilation', configure_ventilation),
+    ('overshading', configure_overshading),
+    # TODO: change the following to return dicts of properties to extend the dwelling definition
+    ('heat_systems', configure_heat_systems),
+    ('cooling', configure_cooling_system),
+    ('renewables', configure_renewables),
+    ('solar_hw', appendix_h.configure_solar_hw),
+    ('fans_and_pumps', configure_fans_and_pumps),
+    ('fuel_costs', configure_fuel_costs),
+    ('misc', configure_misc),
+)
+
+
+@timed()
+def lookup_sap_tables(dwelling, skip=()):
+    """
+    Lookup data from SAP tables for given dwelling
+
+    .. note::
+        This modifies the input dwelling! The dwelling is returned anyway
+        In the future, shift to "immutable" style where the copies are always
+        returned without modifying input data, enabling a "pipeling" style
+        workflow and easier testing of partially configured dwellings
+
+    Args:
+        dwelling input dwelling data
+        skip: names of LOOKUP_STEPS not to perform, for calculations that
+            do not need them
+
+    Returns:
+        dwelling where input data has been converted to configured
+        dwelling elements, values converted, sap table lookups performed, etc
+
+        NOTE that this also MODIFIES the inputs.
+    """
+    for name, step in LOOKUP_STEPS:
+        if name not in skip:
+            step(dwelling)
+
+    return dwelling
@@ -8,8 +8,10 @@ import numpy
 from .constants import DAYS_PER_MONTH
 from .heating import calc_heat_required
 from .tables import TABLE_10C
+from .instrumentation import timed
 
 
+@timed()
 def configure_cooling_system(dwelling):
     """
 
@@ -47,6 +49,7 @@ def configure_cooling_system(dwelling):
     dwelling.cooling_seer = cooling_seer
 
 
+@timed()
 def cooling_requirement(dwelling):
     """
     Calculate the dwelling cooling requirement
@@ -7,6 +7,10 @@ from .constants import DAYS_PER_MONTH, SUMMER_MONTHS
 from .elements import HeatingTypes, DedicatedWaterSystem
 from .tables import (TABLE_3, TABLE_4A, get_4a_system, TABLE_H5, MONTHLY_HOT_WATER_FACTORS, MONTHLY_HOT_WATER_TEMPERATURE_RISE)
 from .utils import SAPInputError
+from .instrumentation import timed
+
+# Months without primary circuit loss when an immersion heats the water in summer
+_SUMMER = numpy.isin(numpy.arange(12), SUMMER_MONTHS)
 
 
 def get_water_heater(dwelling):
@@ -70,162 +74,331 @@ def get_water_heater(dwelling):
     return water_sys
 
 
-def solar_system_output(dwelling, hw_energy_content, daily_hot_water_use):
+def solar_system_output(hw_energy_content, daily_hot_water_use, aperture, zero_loss_effy, heat_loss_coeff,
+                        Igh, overshading_factor, monthly_solar_hw_factors, effective_storage_volume,
+                        utilisation_factor):
     """
-    Calculate the solar system output as a function of the dwelling data, the
-    hot water energy content and daily hot water usage
+    Appendix H solar water heating output of N collectors
 
     Args:
-        dwelling:
-        hw_energy_content:
-        daily_hot_water_use:
+        hw_energy_content: (N, 12) energy content of the hot water, less
+            the WWHRS savings
+        daily_hot_water_use: (N,) average daily hot water use
+        aperture, zero_loss_effy, heat_loss_coeff: (N,) collector data
+        Igh, overshading_factor: (N,) annual radiation on the collector
+            and its overshading factor, from Tables H2 and H4
+        monthly_solar_hw_factors: (N, 12) Table H3 factors
+        effective_storage_volume: (N,) effective solar storage volume
+        utilisation_factor: (N,) 0.9 for a boiler without cylinderstat, 1 otherwise
 
     Returns:
-
+        (N, 12) solar input, negative
     """
-    collector_zero_loss_effy = dwelling.collector_zero_loss_effy
+    def column(values):
+        return numpy.asarray(values, dtype=float)[:, numpy.newaxis]
 
-    performance_ratio = dwelling.collector_heat_loss_coeff / collector_zero_loss_effy
+    zero_loss_effy = numpy.asarray(zero_loss_effy, dtype=float)
+    performance_ratio = numpy.asarray(heat_loss_coeff, dtype=float) / zero_loss_effy
 
-    annual_radiation = dwelling.collector_Igh
+    available_energy = numpy.asarray(aperture, dtype=float) * zero_loss_effy
+    available_energy *= numpy.asarray(Igh, dtype=float) * overshading_factor
 
-    overshading_factor = dwelling.collector_overshading_factor
+    # Summed month by month, in the order of the scalar calculation
+    solar_to_load = available_energy / numpy.add.accumulate(hw_energy_content, axis=1)[:, -1]
+    utilisation = (1 - numpy.exp(-1 / solar_to_load)) * utilisation_factor
 
-    available_energy = dwelling.solar_collector_aperture * collector_zero_loss_effy
-    available_energy *= annual_radiation * overshading_factor
+    performance_factor = numpy.where(performance_ratio < 20,
+                                     0.97 - 0.0367 * performance_ratio + 0.0006 * performance_ratio ** 2,
+                                     0.693 - 0.0108 * performance_ratio)
 
-    solar_to_load = available_energy / sum(hw_energy_content)
-    utilisation = 1 - math.exp(-1 / solar_to_load)
+    volume_ratio = numpy.asarray(effective_storage_volume, dtype=float) / daily_hot_water_use
 
-    if dwelling.water_sys.system_type in [
-        HeatingTypes.regular_boiler,
-        HeatingTypes.room_heater,  # must be back boiler
-    ] and not dwelling.has_cylinderstat:
-        utilisation *= 0.9
+    storage_volume_factor = numpy.minimum(1., 1 + 0.2 * numpy.log(volume_ratio))
 
-    if performance_ratio < 20:
-        performance_factor = 0.97 - 0.0367 * performance_ratio + 0.0006 * performance_ratio ** 2
-    else:
-        performance_factor = 0.693 - 0.0108 * performance_ratio
+    Qsolar_annual = available_energy * utilisation * performance_factor * storage_volume_factor
 
-    effective_solar_volume = dwelling.solar_effective_storage_volume
+    return - column(Qsolar_annual) * monthly_solar_hw_factors * DAYS_PER_MONTH / 365
 
-    volume_ratio = effective_solar_volume / daily_hot_water_use
 
-    storage_volume_factor = numpy.minimum(1., 1 + 0.2 * numpy.log(volume_ratio))
+def hot_water_energy_content(daily_hot_water_use):
+    """
+    Args:
+        daily_hot_water_use: average daily hot water use, or a (N, 1) column of them
 
-    Qsolar_annual = available_energy * utilisation * performance_factor * storage_volume_factor
+    Returns:
+        monthly daily hot water use and energy content of the hot water used
+    """
+    hw_use_daily = daily_hot_water_use * MONTHLY_HOT_WATER_FACTORS
 
-    Qsolar = - Qsolar_annual * dwelling.monthly_solar_hw_factors * DAYS_PER_MONTH / 365
+    hw_energy_content = (4.19 / 3600.0) * hw_use_daily * DAYS_PER_MONTH * MONTHLY_HOT_WATER_TEMPERATURE_RISE
+    return hw_use_daily, hw_energy_content
 
-    return Qsolar
 
+@timed()
+def hot_water_use(dwelling):
+    """
+    Calculate hot water use variables, see :func:`hot_water_kernel`
 
-def distribution_storage_loss(dwelling, hw_energy_content):
-    if dwelling.get('instantaneous_pou_water_heating'):
-        distribution_loss = 0
-        storage_loss = 0
+    Args:
+        dwelling:
 
+    Returns:
+        dict of monthly arrays
+    """
+    # The kernel arithmetic on the monthly arrays of one dwelling, without
+    # gathering a cohort of one
+    inputs, solar = _dwelling_hot_water_inputs(dwelling)
+    hw_use_daily, hw_energy_content = hot_water_energy_content(inputs['daily_hot_water_use'])
+    if inputs['combi_loss'] is None:
+        inputs['combi_loss'] = numpy.zeros(12)
+    if inputs['fghrs_input_from_solar'] is None:
+        inputs['fghrs_input_from_solar'] = numpy.zeros(12)
+
+    losses = _hot_water_losses(hw_energy_content, inputs['Nocc'], inputs['instantaneous_pou'],
+                               inputs['cylinder_loss'], inputs['storage_loss_fraction'],
+                               inputs['primary_circuit_loss_annual'], inputs['immersion_in_summer'],
+                               inputs['combi_loss'], inputs['wwhrs_Seff'])
+
+    if solar is None:
+        input_from_solar = numpy.zeros(12)
     else:
-        distribution_loss = 0.15 * hw_energy_content
+        input_from_solar = solar_system_output(
+                (hw_energy_content - losses['savings_from_wwhrs'])[numpy.newaxis],
+                numpy.array([inputs['daily_hot_water_use']]),
+                **{key: numpy.array([value]) for key, value in solar.items()})[0]
+        if inputs['solar_reduces_primary_loss']:
+            losses['primary_circuit_loss'] *= TABLE_H5
 
-        if dwelling.get('measured_cylinder_loss') is not None:
-            storage_loss = dwelling.measured_cylinder_loss * \
-                           dwelling.temperature_factor * DAYS_PER_MONTH
+    return _hot_water_results(hw_use_daily, hw_energy_content, input_from_solar, inputs['cylinder_in_heated_space'],
+                              inputs['fghrs_input_from_solar'], **losses)
 
-        elif dwelling.get('hw_cylinder_volume') is not None:
-            cylinder_loss = dwelling.hw_cylinder_volume * dwelling.storage_loss_factor * \
-                            dwelling.volume_factor * dwelling.temperature_factor
-            storage_loss = cylinder_loss * DAYS_PER_MONTH
 
-        else:
-            storage_loss = 0
+def hot_water_use_cohort(dwellings):
+    """
+    :func:`hot_water_use` for a cohort of configured dwellings in one array pass
+
+    Args:
+        dwellings: sequence of dwellings
+
+    Returns:
+        dict of (dwellings, 12) arrays
+    """
+    return hot_water_kernel(**hot_water_inputs(dwellings))
 
-    return distribution_loss, storage_loss
 
+def _dwelling_hot_water_inputs(dwelling):
+    """
+    Inputs of :func:`hot_water_kernel` for one configured dwelling
 
-def hot_water_from_solar(dwelling, hw_energy_content, savings_from_wwhrs, primary_circuit_loss_annual,
-                         primary_circuit_loss):
-    if dwelling.get('solar_collector_aperture') is not None:
-        input_from_solar = solar_system_output(dwelling,
-                                               hw_energy_content - savings_from_wwhrs,
-                                               dwelling.daily_hot_water_use)
+    Returns:
+        tuple of a dict of the dwelling's values, None for the monthly
+        combi loss and FGHRS solar input of dwellings without, and a dict
+        of the arguments of :func:`solar_system_output` for its solar water
+        heating, or None
+    """
+    inputs = dict(daily_hot_water_use=dwelling.daily_hot_water_use, Nocc=dwelling.Nocc,
+                  instantaneous_pou=False, cylinder_loss=0., storage_loss_fraction=1., wwhrs_Seff=0.,
+                  combi_loss=None, fghrs_input_from_solar=None, solar_reduces_primary_loss=False)
+    if dwelling.get('instantaneous_pou_water_heating'):
+        inputs['instantaneous_pou'] = True
+    elif dwelling.get('measured_cylinder_loss') is not None:
+        inputs['cylinder_loss'] = dwelling.measured_cylinder_loss * dwelling.temperature_factor
+    elif dwelling.get('hw_cylinder_volume') is not None:
+        inputs['cylinder_loss'] = dwelling.hw_cylinder_volume * dwelling.storage_loss_factor * \
+                                  dwelling.volume_factor * dwelling.temperature_factor
+
+    if dwelling.get("solar_storage_combined_cylinder"):
+        inputs['storage_loss_fraction'] = (dwelling.hw_cylinder_volume -
+                                           dwelling.solar_dedicated_storage_volume) / dwelling.hw_cylinder_volume
 
-        if primary_circuit_loss_annual > 0 and dwelling.hw_cylinder_volume > 0 and dwelling.has_cylinderstat:
-            primary_circuit_loss *= TABLE_H5
+    if dwelling.get('primary_loss_override') is not None:
+        inputs['primary_circuit_loss_annual'] = dwelling.primary_loss_override
     else:
-        input_from_solar = 0
-    return input_from_solar
+        inputs['primary_circuit_loss_annual'] = dwelling.primary_circuit_loss_annual
 
+    if dwelling.get('combi_loss') is not None:
+        hw_use_daily, _ = hot_water_energy_content(dwelling.daily_hot_water_use)
+        inputs['combi_loss'] = dwelling.combi_loss(hw_use_daily)
 
-def hot_water_use(dwelling):
-    """
-    Calculate hot water use variables.
+    inputs['immersion_in_summer'] = bool(dwelling.get('use_immersion_heater_summer', False))
+
+    if dwelling.get('wwhr_systems') is not None:
+        inputs['wwhrs_Seff'] = appendix_g.wwhr_effective_savings(dwelling)
+
+    solar = None
+    if dwelling.get('solar_collector_aperture') is not None:
+        solar = dict(aperture=dwelling.solar_collector_aperture,
+                     zero_loss_effy=dwelling.collector_zero_loss_effy,
+                     heat_loss_coeff=dwelling.collector_heat_loss_coeff,
+                     Igh=dwelling.collector_Igh,
+                     overshading_factor=dwelling.collector_overshading_factor,
+                     monthly_solar_hw_factors=dwelling.monthly_solar_hw_factors,
+                     effective_storage_volume=dwelling.solar_effective_storage_volume,
+                     utilisation_factor=0.9 if (dwelling.water_sys.system_type in [
+                         HeatingTypes.regular_boiler,
+                         HeatingTypes.room_heater,  # must be back boiler
+                     ] and not dwelling.has_cylinderstat) else 1.)
+
+        inputs['solar_reduces_primary_loss'] = bool(inputs['primary_circuit_loss_annual'] > 0 and
+                                                    dwelling.hw_cylinder_volume > 0 and dwelling.has_cylinderstat)
+
+    if dwelling.get('fghrs') is not None and dwelling.fghrs['has_pv_module']:
+        _, hw_energy_content = hot_water_energy_content(dwelling.daily_hot_water_use)
+        inputs['fghrs_input_from_solar'] = fghrs_solar_input(dwelling.fghrs, hw_energy_content,
+                                                             dwelling.daily_hot_water_use)
+
+    # Assumes the cylinder is in the heated space if input is missing
+    inputs['cylinder_in_heated_space'] = bool(dwelling.get('cylinder_in_heated_space', True))
+    return inputs, solar
 
-    .. todo::
-        break function into smaller chunks. Could probably string together a series of .updates
-        for each sub-section.
+
+def hot_water_inputs(dwellings):
+    """
+    Gather the inputs of :func:`hot_water_kernel` for a cohort of
+    configured dwellings. Combi losses and the FGHRS solar input depend
+    on system specific functions and data, so they are evaluated here
+    for each dwelling that has them.
 
     Args:
-        dwelling:
+        dwellings: sequence of dwellings
 
     Returns:
+        dict of keyword arguments, arrays with one row per dwelling
+    """
+    n = len(dwellings)
+    rows = [_dwelling_hot_water_inputs(dwelling) for dwelling in dwellings]
+
+    inputs = {}
+    for key in ('daily_hot_water_use', 'Nocc', 'cylinder_loss', 'primary_circuit_loss_annual', 'wwhrs_Seff',
+                'storage_loss_fraction'):
+        inputs[key] = numpy.array([row[key] for row, _ in rows], dtype=float)
+    for key in ('instantaneous_pou', 'immersion_in_summer', 'solar_reduces_primary_loss',
+                'cylinder_in_heated_space'):
+        inputs[key] = numpy.array([row[key] for row, _ in rows], dtype=bool)
+    for key in ('combi_loss', 'fghrs_input_from_solar'):
+        inputs[key] = numpy.zeros((n, 12))
+        for i, (row, _) in enumerate(rows):
+            if row[key] is not None:
+                inputs[key][i] = row[key]
+
+    solar_rows = [i for i, (_, solar) in enumerate(rows) if solar is not None]
+    solar = {key: numpy.array([rows[i][1][key] for i in solar_rows], dtype=float)
+             for key in ('aperture', 'zero_loss_effy', 'heat_loss_coeff', 'Igh', 'overshading_factor',
+                         'monthly_solar_hw_factors', 'effective_storage_volume', 'utilisation_factor')}
+    return dict(solar_rows=numpy.array(solar_rows, dtype=int), solar=solar, **inputs)
+
+
+def hot_water_kernel(daily_hot_water_use, Nocc, instantaneous_pou, cylinder_loss, storage_loss_fraction,
+                     primary_circuit_loss_annual, immersion_in_summer, combi_loss, wwhrs_Seff,
+                     cylinder_in_heated_space, fghrs_input_from_solar, solar_rows=(), solar=None,
+                     solar_reduces_primary_loss=None):
+    """
+    Hot water energy content, losses, WWHRS savings, solar input and heat
+    gains (Section 4) for a cohort of N dwellings in one array pass.
+    Options of the dwellings are masks.
+
+    Args:
+        daily_hot_water_use, Nocc: (N,) average daily hot water use and occupancy
+        instantaneous_pou: (N,) bool, instantaneous point of use water
+            heating, without distribution or storage losses
+        cylinder_loss: (N,) daily storage loss of the cylinder, measured or
+            from Table 2, 0 for none
+        storage_loss_fraction: (N,) share of the cylinder not dedicated to
+            solar storage, 1 for cylinders that are not combined
+        primary_circuit_loss_annual: (N,) annual primary circuit loss
+        immersion_in_summer: (N,) bool, no primary circuit loss in the summer
+        combi_loss: (N, 12) combi loss as a function of the daily hot water use
+        wwhrs_Seff: (N,) effective WWHRS savings, 0 for none
+        cylinder_in_heated_space: (N,) bool
+        fghrs_input_from_solar: (N, 12) solar input of FGHRS PV modules
+        solar_rows: indices of the dwellings with solar water heating
+        solar: dict of the arguments of :func:`solar_system_output` for
+            the solar_rows, other than the hot water use
+        solar_reduces_primary_loss: (N,) bool, the Table H5 factor applies
+            to the primary circuit loss, for solar water heating with a
+            primary circuit loss, a cylinder and a cylinderstat
 
+    Returns:
+        dict of (N, 12) arrays
     """
-    hw_use_daily = dwelling.daily_hot_water_use * MONTHLY_HOT_WATER_FACTORS
+    def column(values):
+        return numpy.asarray(values)[:, numpy.newaxis]
 
-    hw_energy_content = (4.19 / 3600.0) * hw_use_daily * DAYS_PER_MONTH * MONTHLY_HOT_WATER_TEMPERATURE_RISE
+    n = len(daily_hot_water_use)
+    daily_hot_water_use = numpy.asarray(daily_hot_water_use, dtype=float)
+    hw_use_daily, hw_energy_content = hot_water_energy_content(column(daily_hot_water_use))
 
-    distribution_loss, storage_loss = distribution_storage_loss(dwelling, hw_energy_content)
+    losses = _hot_water_losses(hw_energy_content, column(Nocc), column(instantaneous_pou), column(cylinder_loss),
+                               column(storage_loss_fraction), column(primary_circuit_loss_annual),
+                               column(immersion_in_summer), numpy.asarray(combi_loss), column(wwhrs_Seff))
 
-    if dwelling.get("solar_storage_combined_cylinder"):
-        storage_loss *= (dwelling.hw_cylinder_volume -
-                         dwelling.solar_dedicated_storage_volume) / dwelling.hw_cylinder_volume
+    input_from_solar = numpy.zeros((n, 12))
+    solar_rows = numpy.asarray(solar_rows, dtype=int)
+    if len(solar_rows):
+        input_from_solar[solar_rows] = solar_system_output(
+                (hw_energy_content - losses['savings_from_wwhrs'])[solar_rows], daily_hot_water_use[solar_rows],
+                **solar)
 
-    if dwelling.get('primary_loss_override') is not None:
-        primary_circuit_loss_annual = dwelling.primary_loss_override
-    else:
-        primary_circuit_loss_annual = dwelling.primary_circuit_loss_annual
+        losses['primary_circuit_loss'][numpy.asarray(solar_reduces_primary_loss, dtype=bool)] *= TABLE_H5
 
-    # This will produce an Array
-    primary_circuit_loss = (primary_circuit_loss_annual / 365.0) * DAYS_PER_MONTH  # type: numpy.array
+    return _hot_water_results(hw_use_daily, hw_energy_content, input_from_solar, column(cylinder_in_heated_space),
+                              numpy.asarray(fghrs_input_from_solar, dtype=float), **losses)
 
-    if dwelling.get('combi_loss') is not None:
-        combi_loss_monthly = dwelling.combi_loss(hw_use_daily) * DAYS_PER_MONTH / 365
+
+def _hot_water_losses(hw_energy_content, Nocc, instantaneous_pou, cylinder_loss, storage_loss_fraction,
+                      primary_circuit_loss_annual, immersion_in_summer, combi_loss, wwhrs_Seff):
+    """
+    Losses and WWHRS savings of :func:`hot_water_kernel`, on per-dwelling
+    values that broadcast against the monthly arrays: (N, 1) columns of a
+    cohort, or the values of one dwelling
+    """
+    one_dwelling = numpy.ndim(instantaneous_pou) == 0
+    if one_dwelling:
+        # Branch rather than evaluate both sides
+        distribution_loss = numpy.zeros(12) if instantaneous_pou else 0.15 * hw_energy_content
     else:
-        combi_loss_monthly = 0
+        distribution_loss = numpy.where(instantaneous_pou, 0., 0.15 * hw_energy_content)
+    storage_loss = cylinder_loss * DAYS_PER_MONTH
+    storage_loss *= storage_loss_fraction
 
-    if dwelling.get('use_immersion_heater_summer', False):
-        for i in SUMMER_MONTHS:
-            primary_circuit_loss[i] = 0
+    primary_circuit_loss = (primary_circuit_loss_annual / 365.0) * DAYS_PER_MONTH
+    if (immersion_in_summer if one_dwelling else immersion_in_summer.any()):
+        primary_circuit_loss = numpy.where(immersion_in_summer & _SUMMER, 0., primary_circuit_loss)
 
-    if dwelling.get('wwhr_systems') is not None:
-        savings_from_wwhrs = appendix_g.wwhr_savings(dwelling)
+    combi_loss_monthly = combi_loss * DAYS_PER_MONTH / 365
+
+    if (wwhrs_Seff if one_dwelling else wwhrs_Seff.any()):
+        savings_from_wwhrs = appendix_g.wwhr_savings_kernel(Nocc, wwhrs_Seff)
     else:
-        savings_from_wwhrs = 0
+        savings_from_wwhrs = numpy.zeros(hw_energy_content.shape)
 
-    input_from_solar = hot_water_from_solar(dwelling, hw_energy_content, savings_from_wwhrs,
-                                            primary_circuit_loss_annual, primary_circuit_loss)
+    return dict(distribution_loss=distribution_loss,
+                storage_loss=storage_loss,
+                primary_circuit_loss=primary_circuit_loss,
+                combi_loss_monthly=combi_loss_monthly,
+                savings_from_wwhrs=savings_from_wwhrs)
 
-    if dwelling.get('fghrs') is not None and dwelling.fghrs['has_pv_module']:
-        fghrs_input_from_solar = fghrs_solar_input(dwelling.fghrs, hw_energy_content, dwelling.daily_hot_water_use)
-    else:
-        fghrs_input_from_solar = 0
 
+def _hot_water_results(hw_use_daily, hw_energy_content, input_from_solar, cylinder_in_heated_space,
+                       fghrs_input_from_solar, distribution_loss, storage_loss, primary_circuit_loss,
+                       combi_loss_monthly, savings_from_wwhrs):
     total_water_heating = 0.85 * hw_energy_content + distribution_loss + \
                           storage_loss + primary_circuit_loss + \
                           combi_loss_monthly
 
-    # Assumes the cylinder is in the heated space if input is missing
-    # i.e default value is True if missing
-    if dwelling.get('cylinder_in_heated_space', True):
-        heat_gains_from_hw = 0.25 * (0.85 * hw_energy_content + combi_loss_monthly) + 0.8 * (
+    def gains_in_heated_space():
+        return 0.25 * (0.85 * hw_energy_content + combi_loss_monthly) + 0.8 * (
             distribution_loss + primary_circuit_loss)
-    else:
-        heat_gains_from_hw = 0.25 * (0.85 * hw_energy_content + combi_loss_monthly) + 0.8 * (
-            distribution_loss + storage_loss + primary_circuit_loss)
 
-        heat_gains_from_hw = numpy.maximum(0, heat_gains_from_hw)
+    def gains_outside_heated_space():
+        return numpy.maximum(0, 0.25 * (0.85 * hw_energy_content + combi_loss_monthly) + 0.8 * (
+            distribution_loss + storage_loss + primary_circuit_loss))
+
+    if numpy.ndim(cylinder_in_heated_space) == 0:
+        heat_gains_from_hw = gains_in_heated_space() if cylinder_in_heated_space else gains_outside_heated_space()
+    else:
+        heat_gains_from_hw = numpy.where(cylinder_in_heated_space, gains_in_heated_space(),
+                                         gains_outside_heated_space())
 
     return dict(
         hw_use_daily=hw_use_daily,
@@ -1,3 +1,10 @@
+import contextlib
+import html
+import json
+from collections import namedtuple
+
+import numpy
+
 from .constants import (IGH_HEATING, T_EXTERNAL_HEATING, WIND_SPEED,
                         LIVING_AREA_T_HEATING, COOLING_BASE_TEMPERATURE)
 from .fuels import Fuel, ElectricityTariff
@@ -29,9 +36,25 @@ class Dwelling(dict):
         super().__init__(**kwargs)
         # TODO: allow attributes to be sorted. Could be done by subclassing ordereddict
         # IMPORTANT: best to only set values explicitly as dict values here
-        self['use_pcdf_fuel_prices'] = True
-        self['results'] = dict() #needs to be defined here to avoid circular issues between getatte and getitem
-        self['report'] = CalculationReport(self)
+        # needs to be defined here to avoid circular issues between getattr and getitem.
+        # Set on the underlying dict so that a DwellingResults gets its own results
+        # rather than writing into those of the dwelling it wraps
+        dict.__setitem__(self, 'results', dict())
+        # Keep the setting of a wrapped dwelling
+        if 'use_pcdf_fuel_prices' not in kwargs:
+            self['use_pcdf_fuel_prices'] = True
+
+    @property
+    def report(self):
+        """
+        The CalculationReport of this dwelling, created on first use. It is kept
+        outside the dict so that it is not shared with a wrapping DwellingResults.
+        """
+        try:
+            return self.__dict__['_report']
+        except KeyError:
+            report = self.__dict__['_report'] = CalculationReport(self)
+            return report
 
     def __setattr__(self, key, value):
         """
@@ -61,6 +84,16 @@ class Dwelling(dict):
             except KeyError:
                 raise AttributeError(item)
 
+    def __reduce__(self):
+        """
+        Pickle the underlying dict directly: the default dict subclass
+        pickling goes through __setitem__, which DwellingResults overrides
+        """
+        return _new_dwelling, (self.__class__,), dict(self)
+
+    def __setstate__(self, state):
+        dict.update(self, state)
+
     def __str__(self):
         s = ''
         for k, v in self.items():
@@ -71,6 +104,10 @@ class Dwelling(dict):
         return self.__str__()
 
 
+def _new_dwelling(cls):
+    return dict.__new__(cls)
+
+
 class DwellingResults(Dwelling):
     """
     Dwelling Results allows you to "freeze" a dwelling configuration.
@@ -174,31 +211,146 @@ class DwellingResults(Dwelling):
 #         super().__init__(*args, **kwargs)
 
 
-# TODO IDEA: instead of building strings, build a report as a data tree which can be formatted later
+_REPORTING_ENABLED = True
+
+
+def enable_reporting():
+    global _REPORTING_ENABLED
+    _REPORTING_ENABLED = True
+
+
+def disable_reporting():
+    global _REPORTING_ENABLED
+    _REPORTING_ENABLED = False
+
+
+def is_reporting_enabled():
+    return _REPORTING_ENABLED
+
+
+@contextlib.contextmanager
+def reporting(enabled):
+    """
+    Context manager to turn report recording on or off for a block, e.g.
+    off while running a batch
+
+    Args:
+        enabled: whether entries are recorded inside the block
+    """
+    global _REPORTING_ENABLED
+    previous = _REPORTING_ENABLED
+    _REPORTING_ENABLED = enabled
+    try:
+        yield
+    finally:
+        _REPORTING_ENABLED = previous
+
+
+# A section header has label, code and value None; an annotation has code and value None
+ReportEntry = namedtuple('ReportEntry', ['section', 'label', 'code', 'value'])
+
+
+def _json_value(value):
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
 class CalculationReport(object):
+    """
+    Structured report of a calculation: a list of (section, label, code, value)
+    entries. Entries are only recorded while reporting is enabled, and are
+    rendered on demand with :meth:`to_text`, :meth:`to_json` or :meth:`to_html`.
+    """
     def __init__(self, dwelling):
         self.dwelling = dwelling
-        self.text = ""
+        self.entries = []
+        self._section = None
 
     def start_section(self, number, title):
-        title_str = "%s %s\n" % (number, title)
-        self.text += "\n"
-        self.text += title_str
-        self.text += "=" * len(title_str) + "\n"
+        if not _REPORTING_ENABLED:
+            return
+        self._section = ("%s" % (number,), title)
+        self.entries.append(ReportEntry(self._section, None, None, None))
 
     def add_annotation(self, label):
-        self.text += "%s\n" % (label,)
+        if _REPORTING_ENABLED:
+            self.entries.append(ReportEntry(self._section, label, None, None))
 
     def add_single_result(self, label, code, values):
         self.add_monthly_result(label, code, values)
 
     def add_monthly_result(self, label, code, values):
-        if code is not None:
-            self.text += "%s %s (%s)\n" % (label, values, code)
-        else:
-            self.text += "%s %s\n" % (label, values)
+        if _REPORTING_ENABLED:
+            self.entries.append(ReportEntry(self._section, label, "" if code is None else code, values))
+
+    def to_text(self):
+        lines = []
+        for section, label, code, value in self.entries:
+            if label is None:
+                title_str = "%s %s\n" % section
+                lines.append("\n" + title_str + "=" * len(title_str) + "\n")
+            elif code is None:
+                lines.append("%s\n" % (label,))
+            elif code != "":
+                lines.append("%s %s (%s)\n" % (label, value, code))
+            else:
+                lines.append("%s %s\n" % (label, value))
+        return "".join(lines)
+
+    @property
+    def text(self):
+        return self.to_text()
+
+    def to_dicts(self):
+        return [dict(section=None if section is None else " ".join(section).strip(),
+                     label=label,
+                     code=code or None,
+                     value=_json_value(value))
+                for section, label, code, value in self.entries if label is not None]
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dicts(), indent=indent)
+
+    def to_html(self):
+        parts = []
+        in_table = False
+        for section, label, code, value in self.entries:
+            if label is None:
+                if in_table:
+                    parts.append("</table>")
+                parts.append("<h2>%s</h2>" % html.escape("%s %s" % section))
+                parts.append("<table>")
+                in_table = True
+                continue
+
+            if not in_table:
+                parts.append("<table>")
+                in_table = True
+
+            if code is None:
+                parts.append('<tr><td colspan="3"><em>%s</em></td></tr>' % html.escape(str(label)))
+            else:
+                parts.append("<tr><td>%s</td><td>%s</td><td>%s</td></tr>" % (
+                    html.escape(str(label)), html.escape(str(code)), html.escape(str(value))))
+
+        if in_table:
+            parts.append("</table>")
+        return "\n".join(parts) + "\n"
 
     def build_report(self):
+        """
+        Record the worksheet results of the dwelling. This is an explicit request
+        for a report, so entries are recorded even when reporting is disabled.
+        """
+        with reporting(True):
+            self._build_report()
+
+    def _build_report(self):
         dwelling = self.dwelling
 
         self.start_section("2", "Ventilation rate")
@@ -384,7 +536,7 @@ class CalculationReport(object):
             "Annual consumption", "L8", dwelling.annual_light_consumption)
 
     def __str__(self):
-        return self.text
+        return self.to_text()
 
 
 def log_dwelling_params(param_set, prefix, k, v):
@@ -62,11 +62,11 @@ class HeatingSystem:
 
         self.Q_space = 0
 
-    def space_heat_effy(self, Q_space):
+    def space_heat_effy(self, Q_space, dwelling=None):
         self.Q_space = Q_space
         return (self.heating_effy_winter + self.space_adj) * self.space_mult
 
-    def water_heat_effy(self, Q_water):
+    def water_heat_effy(self, Q_water, dwelling=None):
 
         if hasattr(self, 'water_effy'):
             # Override for systems like gas warm air system with circulator
@@ -107,9 +107,33 @@ class HeatingSystem:
         else:
             return self.fuel.unit_price()
 
+    def fuel_price_weights(self, dwelling):
+        """
+        Fuel price as a weighting of the fuel prices it is made of, see
+        :meth:`Fuel.unit_price_weights`
+
+        Args:
+            dwelling:
+
+        Returns:
+            dict of fuel id -> weight
+        """
+        if self.fuel.is_electric:
+            on_peak = self._space_heat_on_peak_fraction(dwelling)
+            return self.fuel.unit_price_weights(on_peak)
+        else:
+            return self.fuel.unit_price_weights()
+
     def co2_factor(self):
         return self.fuel.co2_factor
 
+    def factor_weights(self):
+        """
+        CO2 and primary energy factors as a weighting of fuel factors, see
+        :meth:`Fuel.factor_weights`
+        """
+        return self.fuel.factor_weights()
+
     def primary_energy_factor(self):
         return self.fuel.primary_energy_factor
 
@@ -206,7 +230,7 @@ class DedicatedWaterSystem(HeatingSystem):
         self.water_mult = 1  # Might be changed after init
         self.is_community_heating = False
 
-    def water_heat_effy(self, _Q_water):
+    def water_heat_effy(self, _Q_water, dwelling=None):
         water_effy = self.base_effy * self.water_mult
 
         if self.summer_immersion:
@@ -236,10 +260,10 @@ class SecondarySystem(HeatingSystem):
         self.is_community_heating = False
         self.sap_code = sap_code
 
-    def space_heat_effy(self, _Q_space):
+    def space_heat_effy(self, _Q_space, dwelling=None):
         return self.effy
 
-    def water_heat_effy(self, _Q_water):
+    def water_heat_effy(self, _Q_water, dwelling=None):
         if hasattr(self, 'water_effy'):
             # Override for systems like gas warm air system with circulator
             return self.water_effy
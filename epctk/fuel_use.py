@@ -10,9 +10,10 @@ import numpy
 
 from .heating_loaders import immersion_on_peak_fraction
 from .elements import HeatingTypes
-from .constants import SUMMER_MONTHS
-from .fuels import ELECTRICITY_SOLD, ELECTRICITY_OFFSET
+from .constants import DAYS_PER_MONTH, SUMMER_MONTHS
+from .fuels import ELECTRICITY_SOLD, ELECTRICITY_OFFSET, ELECTRICITY_STANDARD, CommunityFuel
 from .utils import sum_
+from .instrumentation import timed
 
 # Some private namedtuples to make it easier and more reliable to track results
 # and avoid unintended changes to the values
@@ -20,6 +21,9 @@ EnergySubtotal = namedtuple('_EnergySumResults', 'energy_use, primary_energy, em
 EnergyTotals = namedtuple('_EnergyTotals',
                            'energy_use, energy_use_offset, emissions, emissions_offset, fuel_cost, cost_offset, primary_energy, primary_energy_offset')
 
+# Only cooking, mech vent and fans, and appliances are 'unregulated'
+UNREGULATED_USES = ('cooking', 'mech_vent_fans', 'appliances')
+
 
 def sub_total(energy, primary_energy_factor, co2_factor, cost):
     """
@@ -54,8 +58,7 @@ def sum_energy_stats(energy_stats, cost_standing):
     primary_energy_offset = 0
 
     for label, subtot in energy_stats.items():
-        # Only cooking, mech vent and fans, and appliances are 'unregulated'
-        regulated = True if label not in ['cooking', 'mech_vent_fans', 'appliances'] else False
+        regulated = label not in UNREGULATED_USES
 
         # Offset energy is always regulated?
         if subtot.energy_use < 0:
@@ -109,6 +112,7 @@ def flatten_for_now(energy_stats: Dict[str, EnergySubtotal]):
     return flat
 
 
+@timed()
 def fuel_use(dwelling):
     """
     Calculate the fuel/energy stats for each dwelling subsystem and
@@ -196,9 +200,193 @@ def fuel_use(dwelling):
     flat_stats = flatten_for_now(fuel_stats)
 
     flat_stats.update(totals._asdict())
+
+    price_weights = end_use_price_weights(dwelling)
+    flat_stats['fuel_cost_exposure'] = cost_exposure(fuel_stats, price_weights,
+                                                     appendix_q_exposure(dwelling))
+
+    monthly_energy = dict(heating_main=q_spaceheat_main,
+                          heating_main_2=dwelling.get('Q_spaceheat_main_2', 0),
+                          water=q_water_heater,
+                          heating_secondary=dwelling.get('Q_spaceheat_secondary', 0),
+                          water_summer_immersion=waterheat - q_water_heater,
+                          cooling=q_spacecooling)
+    flat_stats['fuel_factor_exposure'] = factor_exposure(fuel_stats, monthly_energy,
+                                                         end_use_factor_weights(dwelling),
+                                                         appendix_q_factor_exposure(dwelling))
+    # Not linear in the factors, so kept as calculated
+    flat_stats['emissions_fixed'] = community_neg.emissions
     return flat_stats
 
 
+def end_use_price_weights(dwelling):
+    """
+    Price of each regulated end use as a weighting of fuel prices, mirroring the
+    prices used by :func:`fuel_use`. End uses that are not charged are left out.
+
+    Args:
+        dwelling:
+
+    Returns:
+        dict of end use label -> dict of fuel id -> weight
+    """
+    def net_weights(gen_frac):
+        weights = {k: w * gen_frac for k, w in el_weights.items()}
+        for k, w in ELECTRICITY_SOLD.unit_price_weights().items():
+            weights[k] = weights.get(k, 0) + w * (1 - gen_frac)
+        return weights
+
+    el_weights = dwelling.general_elec_price_weights
+    weights = dict(heating_main=dwelling.main_sys_1.fuel_price_weights(dwelling),
+                   water=dwelling.water_sys.fuel_price_weights(dwelling),
+                   water_summer_immersion=dwelling.get('water_fuel_price_immersion_weights', {}),
+                   cooling=el_weights,
+                   fans_and_pumps=el_weights,
+                   lighting=el_weights,
+                   pv=net_weights(dwelling.pv_electricity_onsite_fraction),
+                   wind=net_weights(dwelling.wind_electricity_onsite_fraction),
+                   hydro=net_weights(dwelling.hydro_electricity_onsite_fraction),
+                   chp=net_weights(dwelling.chp_electricity_onsite_fraction))
+
+    if dwelling.get('main_sys_2'):
+        weights['heating_main_2'] = dwelling.main_sys_2.fuel_price_weights(dwelling)
+    if dwelling.get('secondary_sys'):
+        weights['heating_secondary'] = dwelling.secondary_sys.fuel_price_weights(dwelling)
+
+    return weights
+
+
+def appendix_q_exposure(dwelling):
+    """
+    Net energy of the Appendix Q systems by fuel price, as in :func:`appendix_q_fuel`
+    """
+    exposure = dict()
+    for sys in dwelling.get('appendix_q_systems') or []:
+        if 'fuel_saved' in sys:
+            weights = sys['fuel_saved'].unit_price_weights()
+        else:
+            weights = dwelling.general_elec_price_weights
+
+        for fuel_id, weight in weights.items():
+            exposure[fuel_id] = exposure.get(fuel_id, 0) + (sys['used'] - sys['generated']) * weight
+    return exposure
+
+
+def cost_exposure(fuel_stats, price_weights, exposure=None):
+    """
+    Energy bought at each fuel price. Together with the standing charges, the
+    regulated fuel cost is linear in the fuel prices:
+
+        fuel_cost = sum(exposure[fuel] * price[fuel]) / 100 + standing charges
+
+    Args:
+        fuel_stats: dict of end use label -> EnergySubtotal
+        price_weights: dict of end use label -> price weights, see end_use_price_weights
+        exposure: exposure to add to, e.g. from appendix_q_exposure
+
+    Returns:
+        dict of fuel id -> kWh
+    """
+    exposure = dict(exposure or {})
+    for label, subtot in fuel_stats.items():
+        if label in UNREGULATED_USES:
+            continue
+        for fuel_id, weight in price_weights.get(label, {}).items():
+            exposure[fuel_id] = exposure.get(fuel_id, 0) + subtot.energy_use * weight
+    return exposure
+
+
+def end_use_factor_weights(dwelling):
+    """
+    CO2 and primary energy factor of each regulated end use as a weighting of
+    fuel factors, mirroring the factors used by :func:`fuel_use`
+
+    Args:
+        dwelling:
+
+    Returns:
+        dict of end use label -> dict of fuel id -> weight
+    """
+    el_weights = dwelling.electricity_tariff.factor_weights()
+    offset_weights = ELECTRICITY_OFFSET.factor_weights()
+    weights = dict(heating_main=dwelling.main_sys_1.factor_weights(),
+                   water=dwelling.water_sys.factor_weights(),
+                   water_summer_immersion=el_weights,
+                   community_elec_credits=offset_weights,
+                   # Distribution electricity uses the standard tariff factors
+                   community_distribution=ELECTRICITY_STANDARD.factor_weights(),
+                   cooling=el_weights,
+                   fans_and_pumps=el_weights,
+                   lighting=el_weights,
+                   pv=offset_weights,
+                   wind=offset_weights,
+                   hydro=offset_weights,
+                   chp=offset_weights)
+
+    if dwelling.get('main_sys_2'):
+        weights['heating_main_2'] = dwelling.main_sys_2.factor_weights()
+    if dwelling.get('secondary_sys'):
+        weights['heating_secondary'] = dwelling.secondary_sys.factor_weights()
+
+    return weights
+
+
+def monthly_profile(energy):
+    """
+    Energy as a monthly array, annual values being spread over the months by
+    their number of days
+    """
+    energy = numpy.asarray(energy)
+    if energy.shape == (12,):
+        return energy
+    return sum_(energy) * DAYS_PER_MONTH / 365.
+
+
+def appendix_q_factor_exposure(dwelling):
+    """
+    Net monthly energy of the Appendix Q systems by fuel factor, as in :func:`appendix_q_fuel`
+    """
+    exposure = dict()
+    for sys in dwelling.get('appendix_q_systems') or []:
+        if 'fuel_saved' in sys:
+            weights = sys['fuel_saved'].factor_weights()
+        else:
+            weights = dwelling.electricity_tariff.factor_weights()
+
+        energy = monthly_profile(sys['used'] - sys['generated'])
+        for fuel_id, weight in weights.items():
+            exposure[fuel_id] = exposure.get(fuel_id, 0) + energy * weight
+    return exposure
+
+
+def factor_exposure(fuel_stats, monthly_energy, factor_weights, exposure=None):
+    """
+    Monthly energy weighted to each fuel's CO2 and primary energy factors. The
+    regulated emissions are linear in the factors:
+
+        emissions = sum(exposure[fuel] * co2_factor[fuel]) + emissions_fixed
+
+    and likewise for primary energy.
+
+    Args:
+        fuel_stats: dict of end use label -> EnergySubtotal
+        monthly_energy: dict of end use label -> monthly energy, where known
+        factor_weights: dict of end use label -> factor weights, see end_use_factor_weights
+        exposure: exposure to add to, e.g. from appendix_q_factor_exposure
+
+    Returns:
+        dict of fuel id -> array of monthly kWh
+    """
+    exposure = dict(exposure or {})
+    for label, subtot in fuel_stats.items():
+        if label in UNREGULATED_USES or label not in factor_weights:
+            continue
+        energy = monthly_profile(monthly_energy.get(label, subtot.energy_use))
+        for fuel_id, weight in factor_weights[label].items():
+            exposure[fuel_id] = exposure.get(fuel_id, 0) + energy * weight
+    return exposure
+
+
 def system_fuel(dwelling, system, heat):
     if system is not None:
         sub_totals = sub_total(heat, system.primary_energy_factor(),
@@ -278,7 +466,9 @@ def community_fuel(system_1, water_sys, q_water_heater, q_spaceheat_main,
     if community_distribution_elec > 0:
         # TODO Fuel costs should come from sap_tables
 
-        community_result = sub_total(community_distribution_elec, 2.92, 0.517, 0)
+        community_result = sub_total(community_distribution_elec,
+                                     ELECTRICITY_STANDARD.primary_energy_factor,
+                                     ELECTRICITY_STANDARD.co2_factor, 0)
 
         heat_emissions = emissions_heating_main if system_1.system_type == HeatingTypes.community else 0
         water_emissions = emissions_water if water_sys.system_type == HeatingTypes.community else 0
@@ -356,6 +546,9 @@ def configure_fuel_costs(dwelling):
     dwelling.mech_vent_elec_price = dwelling.electricity_tariff.unit_price(
         dwelling.electricity_tariff.mech_vent_elec_on_peak_fraction)
 
+    dwelling.general_elec_price_weights = dwelling.electricity_tariff.unit_price_weights(
+        dwelling.electricity_tariff.general_elec_on_peak_fraction)
+
     dwelling.general_elec_PE = dwelling.electricity_tariff.primary_energy_factor
 
     if dwelling.water_sys.summer_immersion:
@@ -366,6 +559,7 @@ def configure_fuel_costs(dwelling):
                                              dwelling.hw_cylinder_volume,
                                              dwelling.immersion_type)
         dwelling.water_fuel_price_immersion = dwelling.electricity_tariff.unit_price(on_peak)
+        dwelling.water_fuel_price_immersion_weights = dwelling.electricity_tariff.unit_price_weights(on_peak)
 
     fuels = set()
     fuels.add(dwelling.main_sys_1.fuel)
@@ -383,6 +577,16 @@ def configure_fuel_costs(dwelling):
         fuels.add(dwelling.electricity_tariff)
 
     standing_charge = 0
+    standing_charge_fixed = 0
+    standing_charge_fuels = dict()
     for f in fuels:
         standing_charge += f.standing_charge
+        if isinstance(f, CommunityFuel):
+            # Not from the fuel price tables
+            standing_charge_fixed += f.standing_charge
+        else:
+            standing_charge_fuels[f.fuel_id] = standing_charge_fuels.get(f.fuel_id, 0) + 1
+
     dwelling.cost_standing = standing_charge
+    dwelling.cost_standing_fixed = standing_charge_fixed
+    dwelling.standing_charge_exposure = standing_charge_fuels
@@ -4,6 +4,7 @@ import os.path
 
 from .elements import FuelTypes
 from .constants import COMMUNITY_FUEL_ID
+from .instrumentation import cache_lookup
 from .utils import float_or_none, csv_to_dict
 
 _DATA_FOLDER = os.path.join(os.path.dirname(__file__), 'data')
@@ -49,6 +50,21 @@ class Fuel(object):
     def unit_price(self):
         return self.fuel_data.price
 
+    def unit_price_weights(self):
+        """
+        Returns:
+            dict of fuel id -> weight, the unit price being the weighted sum of those fuels' prices
+        """
+        return {self.fuel_id: 1.0}
+
+    def factor_weights(self):
+        """
+        Returns:
+            dict of fuel id -> weight, the CO2 and primary energy factors being
+            the weighted sums of those fuels' factors
+        """
+        return {self.fuel_id: 1.0}
+
     @property
     def standing_charge(self):
         return self.fuel_data.standing_charge
@@ -192,6 +208,11 @@ class ElectricityTariff(Fuel):
         price_off_peak = self.off_peak_data.price
         return price_on_peak * onpeak_fraction + price_off_peak * (1 - onpeak_fraction)
 
+    def unit_price_weights(self, onpeak_fraction=1):
+        weights = {self.on_peak_fuel_code: onpeak_fraction}
+        weights[self.off_peak_fuel_code] = weights.get(self.off_peak_fuel_code, 0) + 1 - onpeak_fraction
+        return weights
+
     @property
     def type(self):
         return FuelTypes.ELECTRIC
@@ -265,10 +286,19 @@ _TABLE_12_DATA_CACHE = None
 
 
 def get_fuel_data_table_12(fuel_id):
+    return table_12_fuel_data()[fuel_id]
+
+
+def table_12_fuel_data():
+    """
+    Returns:
+        dict of fuel id -> FuelData for all the fuels in Table 12
+    """
     global _TABLE_12_DATA_CACHE
+    cache_lookup('table_12', _TABLE_12_DATA_CACHE is not None)
     if _TABLE_12_DATA_CACHE is None:
         _TABLE_12_DATA_CACHE = csv_to_dict(os.path.join(_DATA_FOLDER, 'table_12.csv'), translate_12_row)
-    return _TABLE_12_DATA_CACHE[fuel_id]
+    return _TABLE_12_DATA_CACHE
 
 
 _PCDF_FUEL_PRICES_CACHE = None
@@ -290,6 +320,7 @@ def get_fuel_data_pcdf(fuel_id):
     :return:
     """
     global _PCDF_FUEL_PRICES_CACHE
+    cache_lookup('pcdf_fuel_prices', _PCDF_FUEL_PRICES_CACHE is not None)
     if _PCDF_FUEL_PRICES_CACHE is None:
         from .io.pcdf import pcdf_fuel_prices
         _PCDF_FUEL_PRICES_CACHE = pcdf_fuel_prices()
@@ -2,6 +2,11 @@ import numpy
 
 from .appendix import appendix_b
 from .constants import SUMMER_MONTHS, DAYS_PER_MONTH, T_EXTERNAL_HEATING
+from .instrumentation import timed
+
+# Weekend and weekday days per month, for Appendix N heating days
+_WEEKEND_DAYS = numpy.array([9, 8, 9, 8, 9, 9, 9, 9, 8, 9, 8, 9])
+_WEEKDAYS = numpy.array([22, 20, 22, 22, 22, 21, 22, 22, 22, 22, 22, 22])
 
 
 def heat_utilisation_factor(a, heat_gains, heat_loss):
@@ -17,16 +22,16 @@ def heat_utilisation_factor(a, heat_gains, heat_loss):
 
     """
     gamma = heat_gains / heat_loss
-    if 1 in gamma:
-        # !!! Is this really right??
-        raise Exception("Do we ever get here?")
+    if not (gamma == 1).any():
+        return (1 - gamma ** a) / (1 - gamma ** (a + 1))
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
         return numpy.where(gamma != 1,
                            (1 - gamma ** a) / (1 - gamma ** (a + 1)),
                            a / (a + 1))
-    else:
-        return (1 - gamma ** a) / (1 - gamma ** (a + 1))
 
 
+@timed()
 def heating_requirement(dwelling):
 
     heat_calc_results = calc_heat_required(
@@ -43,71 +48,187 @@ def heating_requirement(dwelling):
     return heat_calc_results
 
 
+def heating_requirement_cohort(dwellings):
+    """
+    :func:`heating_requirement` for a cohort of configured dwellings in one
+    array pass
+
+    Args:
+        dwellings: sequence of dwellings, with their winter heat gains calculated
+
+    Returns:
+        dict of (dwellings, 12) arrays
+    """
+    heat_gains = numpy.array([d.winter_heat_gains for d in dwellings])
+    heat_calc_results = heat_required_kernel(T_EXTERNAL_HEATING, heat_gains, **heat_required_inputs(dwellings))
+
+    for key in ('heat_required', 'loss', 'utilisation', 'useful_gain'):
+        heat_calc_results[key][:, SUMMER_MONTHS] = 0
+
+    return heat_calc_results
+
+
 def calc_heat_required(dwelling, Texternal, heat_gains):
-    tau = dwelling.thermal_mass_parameter / (3.6 * dwelling.hlp)
-    a = 1 + tau / 15.
+    """
+    Mean internal temperature and monthly heat requirement of a dwelling,
+    see :func:`heat_required_kernel`
+
+    Args:
+        dwelling:
+        Texternal: monthly external temperature
+        heat_gains: monthly heat gains
 
+    Returns:
+        dict of monthly arrays
+    """
     # These are for pcdf heat pumps - when heat pump is undersized it
     # can operator for longer hours on some days
     if dwelling.get('longer_heating_days'):
-        N24_16_m, N24_9_m, N16_9_m = dwelling.longer_heating_days()
+        heating_days = numpy.array(dwelling.longer_heating_days(dwelling))
     else:
-        N24_16_m, N24_9_m, N16_9_m = (None, None, None)
+        heating_days = None
+
+    # The kernel arithmetic on the monthly arrays of one dwelling, without
+    # gathering a cohort of one
+    return _heat_required(numpy.asarray(Texternal), numpy.asarray(heat_gains), dwelling.h, dwelling.hlp,
+                          dwelling.thermal_mass_parameter, dwelling.heating_responsiveness,
+                          dwelling.living_area_Theating, dwelling.living_area_fraction,
+                          dwelling.temperature_adjustment, appendix_b.range_cooker_factor(dwelling),
+                          dwelling.heating_control_type_sys1, dwelling.get('heating_control_type_sys2') or 0,
+                          rest_of_dwelling_sys1_weight(dwelling), heating_days)
+
 
-    living_area_Theating = dwelling.living_area_Theating
+def heat_required_inputs(dwellings):
+    """
+    Gather the inputs of :func:`heat_required_kernel`, other than the
+    external temperature and heat gains, for a cohort of configured dwellings
+
+    Args:
+        dwellings: sequence of dwellings
+
+    Returns:
+        dict of keyword arguments, arrays with one row per dwelling
+    """
+    n = len(dwellings)
+    heating_days = numpy.full((3, n, 12), numpy.nan)
+    for i, dwelling in enumerate(dwellings):
+        # These are for pcdf heat pumps - when heat pump is undersized it
+        # can operator for longer hours on some days
+        if dwelling.get('longer_heating_days'):
+            heating_days[:, i] = dwelling.longer_heating_days(dwelling)
+
+    # Built with numpy.array rather than filled in, so that inputs carrying
+    # derivatives (epctk.sensitivity) give object arrays
+    monthly = dict(h=numpy.array([dwelling.h for dwelling in dwellings]),
+                   hlp=numpy.array([dwelling.hlp for dwelling in dwellings]))
+    scalars = dict(
+        thermal_mass_parameter=numpy.array([d.thermal_mass_parameter for d in dwellings]),
+        heating_responsiveness=numpy.array([d.heating_responsiveness for d in dwellings]),
+        living_area_Theating=numpy.array([d.living_area_Theating for d in dwellings]),
+        living_area_fraction=numpy.array([d.living_area_fraction for d in dwellings]),
+        temperature_adjustment=numpy.array([d.temperature_adjustment for d in dwellings]),
+        range_cooker_factor=numpy.array([appendix_b.range_cooker_factor(d) for d in dwellings]),
+        rest_of_dwelling_sys1_weight=numpy.array([rest_of_dwelling_sys1_weight(d) for d in dwellings]))
+    control_types = dict(
+        control_type_sys1=numpy.array([d.heating_control_type_sys1 for d in dwellings], dtype=int),
+        control_type_sys2=numpy.array([d.get('heating_control_type_sys2') or 0 for d in dwellings], dtype=int))
+
+    return dict(heating_days=heating_days, **monthly, **scalars, **control_types)
+
+
+def rest_of_dwelling_sys1_weight(dwelling):
+    """
+    Share of the rest of the dwelling heated to the control type of main
+    system 1, the rest being heated to that of main system 2
+    """
     living_area_fraction = dwelling.living_area_fraction
 
-    L = dwelling.h * (living_area_Theating - Texternal)
+    if dwelling.main_heating_fraction < 1 and dwelling.get('heating_systems_heat_separate_areas'):
+        if dwelling.main_heating_fraction > living_area_fraction:
+            # both systems contribute to rest of house
+            return 1 - dwelling.main_heating_2_fraction / (1 - living_area_fraction)
+        else:
+            # only sys2 does rest of house
+            return 0
+    return 1
+
+
+def heat_required_kernel(Texternal, heat_gains, h, hlp, thermal_mass_parameter, heating_responsiveness,
+                         living_area_Theating, living_area_fraction, temperature_adjustment,
+                         range_cooker_factor, control_type_sys1, control_type_sys2,
+                         rest_of_dwelling_sys1_weight, heating_days=None):
+    """
+    Mean internal temperatures, utilisation factors and monthly heat
+    requirement (Section 7 and 8) for a cohort of N dwellings in one array
+    pass. Control type branches are evaluated as masks.
+
+    Args:
+        Texternal: (12,) or (N, 12) external temperature
+        heat_gains: (N, 12) heat gains
+        h, hlp: (N, 12) heat transfer coefficient and heat loss parameter
+        thermal_mass_parameter, heating_responsiveness, living_area_Theating,
+            living_area_fraction, temperature_adjustment, range_cooker_factor: (N,)
+        control_type_sys1, control_type_sys2: (N,) heating control types, 0 for no system 2
+        rest_of_dwelling_sys1_weight: (N,) see :func:`rest_of_dwelling_sys1_weight`
+        heating_days: (3, N, 12) Appendix N days of longer heating N24_16, N24_9
+            and N16_9, NaN for dwellings without
+
+    Returns:
+        dict of (N, 12) arrays
+    """
+    def column(values):
+        return numpy.asarray(values)[:, numpy.newaxis]
+
+    return _heat_required(numpy.asarray(Texternal), numpy.asarray(heat_gains), numpy.asarray(h), numpy.asarray(hlp),
+                          column(thermal_mass_parameter), column(heating_responsiveness),
+                          column(living_area_Theating), column(living_area_fraction),
+                          column(temperature_adjustment), column(range_cooker_factor),
+                          column(control_type_sys1), column(control_type_sys2),
+                          column(rest_of_dwelling_sys1_weight), heating_days)
+
+
+def _heat_required(Texternal, heat_gains, h, hlp, thermal_mass_parameter, responsiveness, living_area_Theating,
+                   living_area_fraction, temperature_adjustment, range_cooker_factor, control_type_sys1,
+                   control_type_sys2, weight_1, heating_days):
+    """
+    Body of :func:`heat_required_kernel`, on per-dwelling values that
+    broadcast against the monthly arrays: (N, 1) columns of a cohort, or the
+    scalars of one dwelling
+    """
+    tau = thermal_mass_parameter / (3.6 * hlp)
+    a = 1 + tau / 15.
+
+    L = h * (living_area_Theating - Texternal)
     util_living = heat_utilisation_factor(a, heat_gains, L)
     Tno_heat_living = temperature_no_heat(Texternal,
                                           living_area_Theating,
-                                          dwelling.heating_responsiveness,
+                                          responsiveness,
                                           util_living,
                                           heat_gains,
-                                          dwelling.h)
+                                          h)
 
-    Tmean_living_area = Tmean(
-        Texternal, living_area_Theating, Tno_heat_living,
-        tau, dwelling.heating_control_type_sys1, N24_16_m, N24_9_m, N16_9_m, living_space=True)
-
-    if dwelling.main_heating_fraction < 1 and dwelling.get('heating_systems_heat_separate_areas'):
-        if dwelling.main_heating_fraction > living_area_fraction:
-            # both systems contribute to rest of house
-            weight_1 = 1 - dwelling.main_heating_2_fraction / (1 - living_area_fraction)
+    Tmean_living_area = Tmean(Texternal, living_area_Theating, Tno_heat_living, tau, control_type_sys1,
+                              heating_days, living_space=True)
 
-            Tmean_other_1 = temperature_rest_of_dwelling(
-                dwelling, Texternal, tau, a, L, heat_gains, dwelling.heating_control_type_sys1, N24_16_m, N24_9_m,
-                N16_9_m)
-            Tmean_other_2 = temperature_rest_of_dwelling(
-                dwelling, Texternal, tau, a, L, heat_gains, dwelling.heating_control_type_sys2, N24_16_m, N24_9_m,
-                N16_9_m)
+    def rest_of_dwelling(control_type):
+        return temperature_rest_of_dwelling(Texternal, tau, a, heat_gains, h, hlp, responsiveness,
+                                            control_type, heating_days)
 
-            Tmean_other = Tmean_other_1 * \
-                          weight_1 + Tmean_other_2 * (1 - weight_1)
-        else:
-            # only sys2 does rest of house
-            Tmean_other = temperature_rest_of_dwelling(
-                dwelling, Texternal, tau, a, L, heat_gains, dwelling.heating_control_type_sys2, N24_16_m, N24_9_m,
-                N16_9_m)
+    Tmean_other_1 = rest_of_dwelling(control_type_sys1)
+    if numpy.all(weight_1 == 1):
+        Tmean_other = Tmean_other_1
     else:
-        Tmean_other = temperature_rest_of_dwelling(
-            dwelling, Texternal, tau, a, L, heat_gains, dwelling.heating_control_type_sys1, N24_16_m, N24_9_m,
-            N16_9_m)
-
-    # if not dwelling.get('living_area_fraction'):
-    #     # TODO: this should probably be verified right at the start!
-    #     living_area_fraction = dwelling.living_area / dwelling.GFA
-    #
-    #     dwelling.living_area_fraction = living_area_fraction
-    # else:
-    #     living_area_fraction = dwelling.living_area_fraction
+        Tmean_other_2 = rest_of_dwelling(control_type_sys2)
+        Tmean_other = numpy.where(weight_1 == 1, Tmean_other_1,
+                                  numpy.where(weight_1 == 0, Tmean_other_2,
+                                              Tmean_other_1 * weight_1 + Tmean_other_2 * (1 - weight_1)))
 
     mean_T = living_area_fraction * Tmean_living_area + (1 - living_area_fraction) * \
-                                                       Tmean_other + dwelling.temperature_adjustment
-    L = dwelling.h * (mean_T - Texternal)
+                                                        Tmean_other + temperature_adjustment
+    L = h * (mean_T - Texternal)
     utilisation = heat_utilisation_factor(a, heat_gains, L)
 
-    heat_req = (appendix_b.range_cooker_factor(dwelling) * 0.024 * (L - utilisation * heat_gains) * DAYS_PER_MONTH)
+    heat_req = (range_cooker_factor * 0.024 * (L - utilisation * heat_gains) * DAYS_PER_MONTH)
 
     return dict(
         tau=tau,
@@ -124,21 +245,22 @@ def calc_heat_required(dwelling, Texternal, heat_gains):
     )
 
 
-def temperature_rest_of_dwelling(dwelling, Texternal, tau, a, L, heat_gains, control_type, N24_16_m, N24_9_m, N16_9_m):
-    Theat_other = heating_temperature_other_space(dwelling.hlp, control_type)
-    L = dwelling.h * (Theat_other - Texternal)
+def temperature_rest_of_dwelling(Texternal, tau, a, heat_gains, h, hlp, responsiveness, control_type,
+                                 heating_days):
+    Theat_other = heating_temperature_other_space(hlp, control_type)
+    L = h * (Theat_other - Texternal)
     Tno_heat_other = temperature_no_heat(Texternal,
                                          Theat_other,
-                                         dwelling.heating_responsiveness,
+                                         responsiveness,
                                          heat_utilisation_factor(
                                              a, heat_gains, L),
                                          heat_gains,
-                                         dwelling.h)
-    return Tmean(Texternal, Theat_other, Tno_heat_other, tau, control_type, N24_16_m, N24_9_m, N16_9_m,
+                                         h)
+    return Tmean(Texternal, Theat_other, Tno_heat_other, tau, control_type, heating_days,
                  living_space=False)
 
 
-def Tmean(Texternal, T_heat, T_no_heat, tau, control_type, N24_16_m, N24_9_m, N16_9_m, living_space):
+def Tmean(Texternal, T_heat, T_no_heat, tau, control_type, heating_days, living_space):
     """
 
     Args:
@@ -146,10 +268,9 @@ def Tmean(Texternal, T_heat, T_no_heat, tau, control_type, N24_16_m, N24_9_m, N1
         T_heat:
         T_no_heat:
         tau:
-        control_type:
-        N24_16_m:
-        N24_9_m:
-        N16_9_m:
+        control_type: control type, or array of them
+        heating_days: None, or Appendix N days of longer heating N24_16, N24_9 and N16_9,
+            NaN where there are none
         living_space:
 
     Returns:
@@ -159,37 +280,30 @@ def Tmean(Texternal, T_heat, T_no_heat, tau, control_type, N24_16_m, N24_9_m, N1
     tc = 4 + 0.25 * tau
     dT = T_heat - T_no_heat
 
-    if control_type == 1 or control_type == 2 or living_space:
-        # toff1=7
-        # toff2=8
-        # toff3=0
-        # toff4=8
-        # weekday
-        u1 = temperature_reduction(dT, tc, 7)
+    # Heating off 7 and 8 hours on weekdays and 8 at weekends for control
+    # types 1 and 2 and the living area, otherwise 9 and 8 every day
+    two_periods = living_space | (control_type == 1) | (control_type == 2)
+    if numpy.ndim(two_periods) == 0:
+        # One dwelling: branch rather than evaluate both sides
+        u1 = temperature_reduction(dT, tc, 7 if two_periods else 9)
         u2 = temperature_reduction(dT, tc, 8)
         Tweekday = T_heat - (u1 + u2)
-
-        # weekend
-        u3 = 0  # (since Toff3=0)
-        u4 = u2  # (since Toff4=Toff2)
-        Tweekend = T_heat - (u3 + u4)
+        Tweekend = T_heat - (0 + u2) if two_periods else Tweekday
     else:
-        # toff1=9
-        # toff2=8
-        # toff3=9
-        # toff4=8
-        u1 = temperature_reduction(dT, tc, 9)
+        u1 = temperature_reduction(dT, tc, numpy.where(two_periods, 7, 9))
         u2 = temperature_reduction(dT, tc, 8)
         Tweekday = T_heat - (u1 + u2)
-        Tweekend = Tweekday
+        Tweekend = numpy.where(two_periods, T_heat - (0 + u2), Tweekday)
 
-    if N24_16_m is None:
-        return (5. / 7.) * Tweekday + (2. / 7.) * Tweekend
-    else:
-        WEm = numpy.array([9, 8, 9, 8, 9, 9, 9, 9, 8, 9, 8, 9])
-        WDm = numpy.array([22, 20, 22, 22, 22, 21, 22, 22, 22, 22, 22, 22])
-        return ((N24_16_m + N24_9_m) * T_heat + (WEm - N24_16_m + N16_9_m) * Tweekend + (
-            WDm - N16_9_m - N24_9_m) * Tweekday) / (WEm + WDm)
+    T = (5. / 7.) * Tweekday + (2. / 7.) * Tweekend
+    if heating_days is None:
+        return T
+
+    N24_16_m, N24_9_m, N16_9_m = heating_days
+    with numpy.errstate(invalid='ignore'):
+        T_longer = ((N24_16_m + N24_9_m) * T_heat + (_WEEKEND_DAYS - N24_16_m + N16_9_m) * Tweekend + (
+            _WEEKDAYS - N16_9_m - N24_9_m) * Tweekday) / (_WEEKEND_DAYS + _WEEKDAYS)
+    return numpy.where(numpy.isnan(N24_16_m), T, T_longer)
 
 
 def temperature_reduction(delta_T, tc, time_off):
@@ -205,9 +319,6 @@ def temperature_no_heat(
 
 def heating_temperature_other_space(hlp, control_type):
     hlp = numpy.where(hlp < 6, hlp, 6)
-    if control_type == 1:
-        return 21. - 0.5 * hlp
-    else:
-        return 21. - hlp + 0.085 * hlp ** 2
-
-
+    return numpy.where(control_type == 1,
+                       21. - 0.5 * hlp,
+                       21. - hlp + 0.085 * hlp ** 2)
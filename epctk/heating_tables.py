@@ -0,0 +1,246 @@
+"""
+Compiled heating tables
+~~~~~~~~~~~~~~~~~~~~~~~
+
+SAP Tables 4a, 4b and 4e held as dense arrays indexed by row, built once
+per process from the dicts of :mod:`epctk.tables`, so that a batch of
+dwellings gathers its heating system and control data in one indexed
+read::
+
+    tables = heating_tables()
+    rows = tables.table_4a.rows(main_heating_codes, electricity_tariffs)
+    tables.table_4a.responsiveness[rows]  # (dwellings,)
+    tables.table_4a.efficiency(rows, mains_gas)
+
+Electric storage heaters appear twice in Table 4a with the same code,
+for off-peak and 24 hour tariffs. Both records are rows of the arrays and
+the tariff variant is resolved by :meth:`Table4a.rows`, as
+:func:`epctk.tables.get_4a_system` does for one dwelling.
+
+Values missing from a table are NaN: the responsiveness and fraction of
+heat from secondary of the water heating systems of Table 4a, and the
+water efficiency of the systems whose water heating efficiency is the
+"same" as their space heating.
+A responsiveness taken from Table 4d is
+:data:`epctk.constants.USE_TABLE_4D_FOR_RESPONSIVENESS`, as in the dicts.
+Flags stored as "TRUE"/"FALSE" strings in the dicts are boolean arrays.
+"""
+from collections import namedtuple
+
+import numpy
+
+# epctk.tables first: epctk.fuels cannot be imported before epctk.elements
+from .tables import TABLE_4A, TABLE_4B, TABLE_4E
+from .fuels import ELECTRICITY_24HR
+from .instrumentation import cache_lookup
+from .utils import SAPInputError
+
+# Table 4c subsections applied by the controls of Table 4e, 0 for none
+TABLE_4C_SUBSECTIONS = (None, 'table 4c(1)', 'table 4c(2)', 'table 4c(3)', 'table 4c(4)')
+
+HeatingTables = namedtuple('HeatingTables', 'table_4a, table_4b, table_4e')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return numpy.nan
+
+
+def _read_only(arrays):
+    for array in arrays:
+        array.flags.writeable = False
+
+
+class _CodeTable:
+    """
+    Arrays of a table with one row per code, in order of code
+
+    Attributes:
+        codes: (rows,) codes of the table
+    """
+    name = None
+
+    def __init__(self, records):
+        self.codes = numpy.array([record['code'] for record in records])
+
+    def _arrays(self):
+        return [value for value in vars(self).values() if isinstance(value, numpy.ndarray)]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _code_rows(self, codes):
+        codes = numpy.asarray(codes, dtype=int)
+        rows = numpy.minimum(numpy.searchsorted(self.codes, codes), len(self.codes) - 1)
+        unknown = self.codes[rows] != codes
+        if unknown.any():
+            raise SAPInputError("Unknown {} codes {}".format(self.name, sorted(set(codes[unknown].tolist()))))
+        return rows
+
+    def rows(self, codes):
+        """
+        Args:
+            codes: sequence of codes
+
+        Returns:
+            array of the rows of the codes in the table arrays
+        """
+        return self._code_rows(codes)
+
+
+class Table4a(_CodeTable):
+    """
+    Table 4a heating systems, with a row per record: electric storage
+    heaters have two rows, see :meth:`rows`
+
+    Attributes:
+        codes: (records,) system codes, in order
+        effy, effy_hetas, effy_gas, effy_lpg: (records,) efficiencies, 0
+            where not given
+        responsiveness, fraction_of_heat_from_secondary, water_effy: (records,)
+        table2b_row: (records,) Table 2b row, -1 for none
+        flue_fan, warm_air_fan: (records,) bool
+        water_heating_only: (records,) bool, True for the 900 codes
+    """
+    name = 'Table 4a'
+
+    def __init__(self, table_4a):
+        records = [record for code in sorted(table_4a) for record in table_4a[code]]
+        super().__init__(records)
+
+        self.effy = numpy.array([float(r['effy']) for r in records])
+        self.effy_hetas = numpy.array([r.get('effy_hetas', 0.) for r in records])
+        self.effy_gas = numpy.array([r.get('effy_gas', 0.) for r in records])
+        self.effy_lpg = numpy.array([r.get('effy_lpg', 0.) for r in records])
+        self.responsiveness = numpy.array([_float(r.get('responsiveness')) for r in records])
+        self.table2b_row = numpy.array([r['table2b_row'] for r in records])
+        self.fraction_of_heat_from_secondary = numpy.array(
+                [_float(r.get('fraction_of_heat_from_secondary')) for r in records])
+        self.water_effy = numpy.array([_float(r.get('water_effy')) for r in records])
+        self.flue_fan = numpy.array([r.get('flue_fan') == 'TRUE' for r in records])
+        self.warm_air_fan = numpy.array([r.get('warm_air_fan') == 'TRUE' for r in records])
+        self.water_heating_only = numpy.array(['responsiveness' not in r for r in records])
+
+        # The first row of a code, and the row of its 24 hour tariff variant
+        first = numpy.searchsorted(self.codes, self.codes, side='left')
+        last = numpy.searchsorted(self.codes, self.codes, side='right') - 1
+        self._first_row = first
+        self._tariff_24hr_row = last
+
+        _read_only(self._arrays())
+
+    def rows(self, codes, electricity_tariffs=None):
+        """
+        Args:
+            codes: sequence of system codes
+            electricity_tariffs: sequence of the dwellings' electricity
+                tariffs, to pick the variant of electric storage heaters.
+                The off-peak variant is used if None.
+
+        Returns:
+            array of the rows of the systems in the table arrays
+        """
+        rows = self._first_row[self._code_rows(codes)]
+        if electricity_tariffs is not None:
+            tariff_24hr = numpy.array([tariff == ELECTRICITY_24HR for tariff in electricity_tariffs], dtype=bool)
+            rows = numpy.where(tariff_24hr, self._tariff_24hr_row[rows], rows)
+        return rows
+
+    def efficiency(self, rows, mains_gas, hetas_approved=False):
+        """
+        Space heating efficiency of the systems, as chosen for a main or
+        secondary system by :mod:`epctk.appendix.appendix_a`
+
+        Args:
+            rows: rows of the systems
+            mains_gas: bool array, whether each system burns mains gas
+                rather than LPG, for the systems with gas and LPG efficiencies
+            hetas_approved: bool array, whether each appliance is HETAS
+                approved
+
+        Returns:
+            (systems,) array of efficiencies
+        """
+        rows = numpy.asarray(rows)
+        effy = numpy.where(self.effy[rows] > 0, self.effy[rows],
+                           numpy.where(mains_gas, self.effy_gas[rows], self.effy_lpg[rows]))
+        hetas = self.effy_hetas[rows]
+        effy = numpy.where(numpy.logical_and(hetas_approved, hetas > 0), hetas, effy)
+        if (effy <= 0).any():
+            raise SAPInputError("No Table 4a efficiency for codes {}".format(
+                    sorted(set(self.codes[rows[effy <= 0]].tolist()))))
+        return effy
+
+
+class Table4b(_CodeTable):
+    """
+    Table 4b boilers
+
+    Attributes:
+        codes: (systems,) system codes, in order
+        effy_winter, effy_summer: (systems,) seasonal efficiencies
+        table2b_row, boiler_type: (systems,) int
+        responsiveness, fraction_of_heat_from_secondary: (systems,)
+        flue_fan, condensing: (systems,) bool
+    """
+    name = 'Table 4b'
+
+    def __init__(self, table_4b):
+        records = [table_4b[code] for code in sorted(table_4b)]
+        super().__init__(records)
+
+        self.effy_winter = numpy.array([r['effy_winter'] for r in records])
+        self.effy_summer = numpy.array([r['effy_summer'] for r in records])
+        self.table2b_row = numpy.array([r['table2b_row'] for r in records])
+        self.boiler_type = numpy.array([r['boiler_type'] for r in records])
+        self.responsiveness = numpy.array([float(r['responsiveness']) for r in records])
+        self.fraction_of_heat_from_secondary = numpy.array(
+                [r['fraction_of_heat_from_secondary'] for r in records])
+        self.flue_fan = numpy.array([r['flue_fan'] == 'TRUE' for r in records])
+        self.condensing = numpy.array([r['condensing'] for r in records])
+
+        _read_only(self._arrays())
+
+
+class Table4e(_CodeTable):
+    """
+    Table 4e heating controls
+
+    Attributes:
+        codes: (controls,) control codes, in order
+        control_type: (controls,) int
+        Tadjustment: (controls,) temperature adjustment
+        thermostat, trv: (controls,) bool
+        other_adj_table: (controls,) index of the Table 4c subsection in
+            TABLE_4C_SUBSECTIONS, 0 for none
+    """
+    name = 'Table 4e'
+
+    def __init__(self, table_4e):
+        records = [table_4e[code] for code in sorted(table_4e)]
+        super().__init__(records)
+
+        self.control_type = numpy.array([r['control_type'] for r in records])
+        self.Tadjustment = numpy.array([r['Tadjustment'] for r in records])
+        self.thermostat = numpy.array([r['thermostat'] == 'TRUE' for r in records])
+        self.trv = numpy.array([r['trv'] == 'TRUE' for r in records])
+        self.other_adj_table = numpy.array([TABLE_4C_SUBSECTIONS.index(r['other_adj_table']) for r in records])
+
+        _read_only(self._arrays())
+
+
+_HEATING_TABLES = None
+
+
+def heating_tables():
+    """
+    Returns:
+        HeatingTables of Tables 4a, 4b and 4e, built on first use
+    """
+    global _HEATING_TABLES
+    cache_lookup('heating_tables', _HEATING_TABLES is not None)
+    if _HEATING_TABLES is None:
+        _HEATING_TABLES = HeatingTables(Table4a(TABLE_4A), Table4b(TABLE_4B), Table4e(TABLE_4E))
+    return _HEATING_TABLES
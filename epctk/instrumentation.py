@@ -0,0 +1,210 @@
+"""
+Instrumentation
+~~~~~~~~~~~~~~~
+
+Lightweight timing and counters for the calculation stages, PCDF and SAP
+table loads and the various caches, for watching where time goes in
+production without an external profiler.
+
+Instrumentation is off by default. Enable it with :func:`enable`, or
+by setting the ``EPCTK_INSTRUMENTATION`` environment variable to also
+capture the loads made at import.  While disabled, a :func:`timed`
+function costs one global lookup and a branch per call, and
+:func:`count` returns immediately.
+
+Usage::
+
+    from epctk import instrumentation
+    instrumentation.enable()
+    runner.run_sap(dwelling)
+    print(instrumentation.to_prometheus())
+
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_ENABLED = os.environ.get('EPCTK_INSTRUMENTATION', '') not in ('', '0')
+
+# name -> [calls, total seconds, max seconds]
+_TIMINGS = {}
+# name -> count
+_COUNTERS = {}
+
+_LOCK = threading.Lock()
+
+
+def enable():
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable():
+    global _ENABLED
+    _ENABLED = False
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def reset():
+    with _LOCK:
+        _TIMINGS.clear()
+        _COUNTERS.clear()
+
+
+def _record(name, elapsed):
+    with _LOCK:
+        stats = _TIMINGS.get(name)
+        if stats is None:
+            _TIMINGS[name] = [1, elapsed, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            if elapsed > stats[2]:
+                stats[2] = elapsed
+
+
+def timed(name=None):
+    """
+    Decorator recording the wall time and number of calls of a function
+
+    Args:
+        name: metric name, defaults to "<module>.<function>"
+
+    """
+    def decorator(fn):
+        metric = name or "{}.{}".format(fn.__module__.rsplit('.', 1)[-1], fn.__qualname__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(metric, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class stage:
+    """
+    Context manager timing a block of code under the given name
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _ENABLED:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if _ENABLED:
+            _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def count(name, n=1):
+    """
+    Increment a counter
+
+    Args:
+        name: counter name
+        n: increment
+    """
+    if not _ENABLED:
+        return
+
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+def cache_lookup(cache_name, hit):
+    """
+    Record a hit or miss of the named cache
+    """
+    if _ENABLED:
+        count(cache_name + ('.hit' if hit else '.miss'))
+
+
+def snapshot():
+    """
+    Returns:
+        dict with "timings" (calls, total/mean/max seconds per name), "counters",
+        and "caches" (hits, misses and hit rate per cache)
+    """
+    with _LOCK:
+        timings = {name: dict(calls=calls, total_s=total, mean_s=total / calls, max_s=max_s)
+                   for name, (calls, total, max_s) in _TIMINGS.items()}
+        counters = dict(_COUNTERS)
+
+    caches = {}
+    for name, value in counters.items():
+        for suffix, field in (('.hit', 'hits'), ('.miss', 'misses')):
+            if name.endswith(suffix):
+                caches.setdefault(name[:-len(suffix)], dict(hits=0, misses=0))[field] = value
+
+    for stats in caches.values():
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+
+    return dict(timings=timings, counters=counters, caches=caches)
+
+
+def to_json(indent=None):
+    return json.dumps(snapshot(), indent=indent, sort_keys=True)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def to_prometheus(prefix='epctk'):
+    """
+    Render the current snapshot in the Prometheus text exposition format
+
+    Args:
+        prefix: metric name prefix
+
+    Returns:
+        str
+    """
+    data = snapshot()
+    lines = []
+
+    metrics = (
+        ('stage_calls_total', 'counter', 'Number of calls of a calculation stage',
+         [(name, t['calls']) for name, t in data['timings'].items()]),
+        ('stage_seconds_total', 'counter', 'Wall time spent in a calculation stage',
+         [(name, t['total_s']) for name, t in data['timings'].items()]),
+        ('stage_seconds_max', 'gauge', 'Longest single call of a calculation stage',
+         [(name, t['max_s']) for name, t in data['timings'].items()]),
+    )
+    for metric, metric_type, help_text, samples in metrics:
+        lines.append("# HELP {}_{} {}".format(prefix, metric, help_text))
+        lines.append("# TYPE {}_{} {}".format(prefix, metric, metric_type))
+        for name, value in sorted(samples):
+            lines.append('{}_{}{{stage="{}"}} {!r}'.format(prefix, metric, _label(name), value))
+
+    lines.append("# HELP {}_events_total Instrumentation counters".format(prefix))
+    lines.append("# TYPE {}_events_total counter".format(prefix))
+    for name, value in sorted(data['counters'].items()):
+        lines.append('{}_events_total{{event="{}"}} {}'.format(prefix, _label(name), value))
+
+    lines.append("# HELP {}_cache_hit_ratio Cache hit rate".format(prefix))
+    lines.append("# TYPE {}_cache_hit_ratio gauge".format(prefix))
+    for name, stats in sorted(data['caches'].items()):
+        lines.append('{}_cache_hit_ratio{{cache="{}"}} {!r}'.format(prefix, _label(name), stats['hit_rate']))
+
+    return "\n".join(lines) + "\n"
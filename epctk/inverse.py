@@ -0,0 +1,328 @@
+"""
+Inverse solver
+~~~~~~~~~~~~~~
+
+Finds the value of one or more free inputs of a dwelling for which a
+rating reaches a target, e.g. the air permeability needed for a DER that
+is 10% better than the TER, or the wall U-value for a SAP rating of 70::
+
+    solution = inverse.solve(dwelling, 'sap', 70,
+                             [inverse.ElementUValue(HeatLossElementTypes.EXTERNAL_WALL, 1.5, 0.15)])
+    solution.values  # {'Uvalue_EXTERNAL_WALL': 0.62}
+
+Each free parameter moves linearly from its ``start`` to its ``end``
+value as a single position goes from 0 to 1, so several parameters are
+improved together. The solution is the first position, from the start,
+at which the target is reached.
+
+The target is bracketed by the two ends and narrowed with a multi-section
+search: every iteration evaluates a batch of evenly spaced positions
+together with a regula falsi estimate, and keeps the sub-interval in which
+the rating crosses the target.
+
+The dwelling is configured (:func:`epctk.configure.lookup_sap_tables`)
+once, and each candidate runs only the worksheet stages on a copy of the
+configured dwelling. Parameters that are read by the configuration, e.g.
+a boiler efficiency or the floor area, are flagged with ``reconfigure``
+and are calculated in full instead. Element U-values and the inputs of
+:data:`WORKSHEET_ATTRIBUTES` are the only ones that take the fast path.
+"""
+import concurrent.futures
+import math
+from collections import namedtuple
+
+import numpy
+
+from . import runner
+from .appendix import appendix_t
+from .cache import input_items
+from .configure import copy_heating_systems, lookup_sap_tables
+from .dwelling import Dwelling, DwellingResults
+from .elements import HeatLossElement
+from .utils import SAPInputError
+
+Solution = namedtuple('Solution', 'values, position, rating, converged, evaluations, message')
+
+# Calculation preparation, completion and rating of each target
+_CALCULATIONS = dict(
+    sap=(runner.prepare_sap, runner.complete_sap, 'sap_value'),
+    der=(runner.prepare_der, runner.complete_der, 'der_rating'),
+    ter_margin=(runner.prepare_der, runner.complete_der, 'der_rating'),
+    fee=(runner.prepare_fee, runner.complete_fee, 'fee_rating'),
+)
+
+TARGETS = tuple(_CALCULATIONS)
+
+# Inputs read only by the worksheet stages, never by the configuration, so
+# that candidates can reuse the configured dwelling
+WORKSHEET_ATTRIBUTES = frozenset(['pressurisation_test_result', 'thermal_mass_parameter'])
+
+
+class Parameter:
+    """
+    Free input of the inverse solver, moved from start to end
+
+    Args:
+        name: name of the parameter in the solution
+        start: value at position 0
+        end: value at position 1
+        reconfigure: the value is read by the configuration stage, so
+            candidates are calculated in full
+        changes_notional: the value changes the notional dwelling of the
+            TER, which is then recalculated for each candidate
+    """
+    keys = ()
+
+    def __init__(self, name, start, end, reconfigure=False, changes_notional=False):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.reconfigure = reconfigure
+        self.changes_notional = changes_notional
+
+    def value(self, position):
+        return (1 - position) * self.start + position * self.end
+
+    def apply(self, dwelling, value):
+        raise NotImplementedError
+
+
+class Attribute(Parameter):
+    """
+    A numeric input of the dwelling, e.g. pressurisation_test_result or
+    living_area. Candidates are calculated in full unless the input is one
+    of WORKSHEET_ATTRIBUTES.
+
+    Raises:
+        SAPInputError: if reconfigure is False for an input that is not
+            one of WORKSHEET_ATTRIBUTES
+    """
+    def __init__(self, name, start, end, reconfigure=None, changes_notional=False):
+        if reconfigure is None:
+            reconfigure = name not in WORKSHEET_ATTRIBUTES
+        elif not reconfigure and name not in WORKSHEET_ATTRIBUTES:
+            raise SAPInputError("{} may be read by the configuration, so it cannot reuse the configured "
+                                "dwelling".format(name))
+        super().__init__(name, start, end, reconfigure, changes_notional)
+        self.keys = (name,)
+
+    def apply(self, dwelling, value):
+        dwelling[self.name] = value
+
+
+class ElementUValue(Parameter):
+    """
+    U-value of all the heat loss elements of a type
+
+    Args:
+        element_type: HeatLossElementTypes
+        start: U-value at position 0
+        end: U-value at position 1
+    """
+    keys = ('heat_loss_elements',)
+
+    def __init__(self, element_type, start, end):
+        super().__init__('Uvalue_{}'.format(element_type.name), start, end)
+        self.element_type = element_type
+
+    def apply(self, dwelling, value):
+        elements = []
+        for e in dwelling['heat_loss_elements']:
+            if e.element_type == self.element_type:
+                e = HeatLossElement(e.area, value, e.is_external, e.element_type, e.name)
+            elements.append(e)
+        dwelling['heat_loss_elements'] = elements
+
+
+class InverseProblem:
+    """
+    Rating of a dwelling as a function of the position of its free parameters
+
+    Args:
+        dwelling: input Dwelling
+        target: one of TARGETS: 'sap' (SAP value), 'der', 'ter_margin'
+            (percentage by which the DER is below the TER) or 'fee'
+        value: target value of the rating
+        parameters: list of Parameters
+    """
+    def __init__(self, dwelling, target, value, parameters):
+        if target not in _CALCULATIONS:
+            raise SAPInputError("Unknown target {!r}, expected one of {}".format(target, TARGETS))
+        if not parameters:
+            raise SAPInputError("No free parameters")
+
+        self.dwelling = dwelling
+        self.target = target
+        self.value = value
+        self.parameters = list(parameters)
+        self.evaluations = 0
+
+        self._prepare, self._complete, self._rating = _CALCULATIONS[target]
+        self._configured = None
+        self._ter = None
+        if not any(p.reconfigure for p in self.parameters):
+            self._configured = self._configure()
+
+    def _configure(self):
+        dwelling = self._prepare(self.dwelling)
+        # Parameters overridden by the calculation, e.g. ventilation for
+        # the FEE, have no effect and must not be reapplied
+        overridden = set(dwelling['results'])
+        self._applied = [p for p in self.parameters if not overridden.intersection(p.keys)]
+        return input_items(lookup_sap_tables(dwelling))
+
+    def values(self, position):
+        """
+        Returns:
+            dict of parameter name -> value at the position
+        """
+        return {p.name: float(p.value(position)) for p in self.parameters}
+
+    def candidate_input(self, position):
+        """
+        Returns:
+            input Dwelling with the parameters set to their values at the position
+        """
+        dwelling = Dwelling(**input_items(self.dwelling))
+        for p in self.parameters:
+            p.apply(dwelling, p.value(position))
+        return dwelling
+
+    def _calculate(self, position):
+        if self._configured is None:
+            return self._complete(lookup_sap_tables(self._prepare(self.candidate_input(position))))
+
+        dwelling = DwellingResults(self._configured)
+        copy_heating_systems(dwelling)
+        for p in self._applied:
+            p.apply(dwelling, p.value(position))
+        return self._complete(dwelling)
+
+    def _ter_rating(self, position):
+        if any(p.changes_notional for p in self.parameters):
+            return appendix_t.run_ter(self.candidate_input(position)).ter_rating
+        if self._ter is None:
+            self._ter = appendix_t.run_ter(self.dwelling).ter_rating
+        return self._ter
+
+    def rating(self, position):
+        """
+        Returns:
+            the rating of the target at the position
+        """
+        self.evaluations += 1
+        rating = self._calculate(position)[self._rating]
+        if self.target == 'ter_margin':
+            ter = self._ter_rating(position)
+            rating = 100 * (ter - rating) / ter
+        return rating
+
+    def evaluate(self, positions):
+        """
+        Args:
+            positions: array of positions between 0 and 1
+
+        Returns:
+            array of the rating at each position
+        """
+        return numpy.array([self.rating(t) for t in numpy.asarray(positions, dtype=float)])
+
+    def solve(self, points=8, xtol=1e-6, ftol=1e-3, max_iterations=20):
+        """
+        Args:
+            points: positions evaluated together in each iteration
+            xtol: width of the bracket, as a fraction of the parameter range, at
+                which to stop
+            ftol: distance of the rating from the target at which to stop
+            max_iterations: maximum number of iterations
+
+        Returns:
+            Solution
+        """
+        a, b = 0., 1.
+        fa, fb = self.evaluate([a, b]) - self.value
+
+        if fa == 0:
+            return self._solution(a, fa, True, "Target met at the start values")
+        if numpy.sign(fa) == numpy.sign(fb):
+            best = a if abs(fa) <= abs(fb) else b
+            return self._solution(best, min(fa, fb, key=abs), False,
+                                  "Target not reached between the start and end values")
+
+        for _ in range(max_iterations):
+            # Regula falsi estimate followed by evenly spaced positions
+            estimate = a - fa * (b - a) / (fb - fa)
+            positions = numpy.concatenate([[estimate], a + (b - a) * numpy.arange(1, points + 1) / (points + 1)])
+            f = self.evaluate(positions) - self.value
+
+            if abs(f[0]) <= ftol:
+                return self._solution(estimate, f[0], True, "Converged")
+
+            order = numpy.argsort(positions)
+            grid = numpy.concatenate([[a], positions[order], [b]])
+            f_grid = numpy.concatenate([[fa], f[order], [fb]])
+            crossing = numpy.flatnonzero(numpy.sign(f_grid[:-1]) != numpy.sign(f_grid[1:]))[0]
+            a, b = grid[crossing], grid[crossing + 1]
+            fa, fb = f_grid[crossing], f_grid[crossing + 1]
+
+            if fa == 0 or fb == 0 or b - a <= xtol:
+                position, f = (a, fa) if abs(fa) <= abs(fb) else (b, fb)
+                return self._solution(position, f, True, "Converged")
+
+        position, f = (a, fa) if abs(fa) <= abs(fb) else (b, fb)
+        return self._solution(position, f, False, "Maximum number of iterations reached")
+
+    def _solution(self, position, f, converged, message):
+        return Solution(self.values(position), float(position), float(f + self.value), converged,
+                        self.evaluations, message)
+
+
+def solve(dwelling, target, value, parameters, **kwargs):
+    """
+    Values of the free parameters of a dwelling for which a rating reaches
+    a target
+
+    Args:
+        dwelling: input Dwelling
+        target: one of TARGETS
+        value: target value of the rating
+        parameters: list of Parameters
+        **kwargs: options of :meth:`InverseProblem.solve`
+
+    Returns:
+        Solution
+    """
+    return InverseProblem(dwelling, target, value, parameters).solve(**kwargs)
+
+
+def _solve_job(args):
+    dwelling, target, value, parameters, kwargs = args
+    try:
+        return solve(dwelling, target, value, parameters, **kwargs)
+    except Exception as err:
+        return Solution({}, math.nan, math.nan, False, 0, "{}: {}".format(type(err).__name__, err))
+
+
+def solve_portfolio(dwellings, target, value, parameters, workers=None, **kwargs):
+    """
+    :func:`solve` for each dwelling of a portfolio, in parallel worker
+    processes. A dwelling that cannot be calculated gets an unconverged
+    Solution with the error as its message.
+
+    Args:
+        dwellings: iterable of input Dwellings
+        target: one of TARGETS
+        value: target value, the same for every dwelling
+        parameters: list of Parameters, the same for every dwelling
+        workers: number of worker processes, 1 to solve in this process
+        **kwargs: options of :meth:`InverseProblem.solve`
+
+    Returns:
+        list of Solutions, in the order of the dwellings
+    """
+    jobs = [(d, target, value, parameters, kwargs) for d in dwellings]
+    if workers == 1:
+        return [_solve_job(job) for job in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_solve_job, jobs))
@@ -0,0 +1,256 @@
+"""
+Columnar results
+~~~~~~~~~~~~~~~~
+
+Results of many calculated dwellings stored by column rather than by
+dwelling. A store is a folder with one ``.npy`` file per column: annual
+results are arrays of shape (dwellings,) and monthly results arrays of
+shape (dwellings, 12). Results are written a chunk of dwellings at a time
+and columns are read independently, memory mapped, so loading one result
+of millions of dwellings reads only that column's file::
+
+    with ColumnarWriter('results') as writer:
+        for dwelling in dwellings:
+            writer.append(runner.run_sap(dwelling))
+
+    columns = read_columns('results', ['sap_value', 'emissions'])
+    columns['sap_value'].mean()
+
+Every value is stored as float64, with NaN where a dwelling has no value
+(or None) for a column. The columns of a store are fixed when it is
+created, by default :data:`ANNUAL_RESULTS` and :data:`MONTHLY_RESULTS`.
+A name ``key.item`` reads ``item`` of the dict result ``key``, e.g.
+``heat_calc_results.Tmean``.
+"""
+import json
+import os
+import struct
+
+import numpy
+
+from ..utils import SAPInputError
+
+SCHEMA_FILE = 'schema.json'
+
+# Bumped whenever the layout of a store changes
+COLUMNAR_FORMAT_VERSION = 1
+
+# Uses of the fuel_use stats, each giving energy_use_, primary_energy_,
+# emissions_ and cost_ results
+FUEL_USES = ('heating_main', 'heating_main_2', 'water', 'heating_secondary', 'water_summer_immersion',
+             'community_elec_credits', 'community_distribution', 'negative_community_emissions_correction',
+             'cooking', 'appendix_q_generated', 'appendix_q_used', 'cooling', 'fans_and_pumps', 'lighting',
+             'appliances', 'mech_vent_fans', 'pv', 'wind', 'hydro', 'chp')
+
+ANNUAL_RESULTS = (
+    'sap_value', 'sap_energy_cost_factor', 'fuel_cost', 'cost_offset', 'emissions', 'emissions_offset',
+    'energy_use', 'energy_use_offset', 'primary_energy', 'primary_energy_offset', 'emissions_fixed',
+    'h_fabric', 'h_bridging', 'h_vent_annual', 'infiltration_ach_annual', 'annual_light_consumption',
+    'daily_hot_water_use', 'Nocc', 'living_area_fraction', 'sys1_space_effy', 'sys2_space_effy',
+    'pv_electricity', 'wind_electricity', 'hydro_electricity', 'chp_electricity',
+) + tuple('{}_{}'.format(stat, use)
+          for use in FUEL_USES for stat in ('energy_use', 'primary_energy', 'emissions', 'cost'))
+
+MONTHLY_RESULTS = (
+    'Q_required', 'Q_spaceheat_main', 'Q_spaceheat_main_2', 'Q_spaceheat_secondary', 'Q_spacecooling',
+    'Q_waterheat', 'output_from_water_heater', 'total_water_heating', 'water_effy', 'heat_gains_from_hw',
+    'h', 'hlp', 'h_vent', 'infiltration_ach', 'total_internal_gains', 'solar_gain_winter',
+    'heat_calc_results.Tmean', 'heat_calc_results.Tmean_living_area', 'heat_calc_results.Tmean_other',
+    'heat_calc_results.loss', 'heat_calc_results.utilisation', 'heat_calc_results.useful_gain',
+    'heat_calc_results.heat_required',
+)
+
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Headers are written at a fixed length, so that they can be rewritten in
+# place with the number of rows as chunks are appended
+_NPY_HEADER_LENGTH = 118
+
+
+def _npy_header(shape):
+    header = "{{'descr': '<f8', 'fortran_order': False, 'shape': {}, }}".format(tuple(shape))
+    return _NPY_MAGIC + struct.pack('<H', _NPY_HEADER_LENGTH) + header.ljust(_NPY_HEADER_LENGTH - 1).encode() + b'\n'
+
+
+def _column_path(folder, name):
+    return os.path.join(folder, name + '.npy')
+
+
+def _get(dwelling, name):
+    key, _, item = name.partition('.')
+    value = dwelling.get(key)
+    if item and value is not None:
+        value = value.get(item)
+    return value
+
+
+def load_schema(folder):
+    """
+    Returns:
+        dict with the 'annual' and 'monthly' column names of a store
+    """
+    with open(os.path.join(folder, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema.get('version') != COLUMNAR_FORMAT_VERSION:
+        raise SAPInputError("{} is not a columnar results store of version {}".format(
+            folder, COLUMNAR_FORMAT_VERSION))
+    return schema
+
+
+class ColumnarWriter:
+    """
+    Writes the results of calculated dwellings to a new columnar store
+
+    Args:
+        folder: folder of the store, created if needed. An existing store
+            in it is replaced.
+        annual: names of the annual results
+        monthly: names of the monthly results
+        chunk_size: number of dwellings held before they are written
+    """
+    def __init__(self, folder, annual=ANNUAL_RESULTS, monthly=MONTHLY_RESULTS, chunk_size=4096):
+        self.folder = folder
+        self.annual = tuple(annual)
+        self.monthly = tuple(monthly)
+        self.chunk_size = chunk_size
+        self.n_rows = 0
+
+        duplicated = set(name for name in self.annual + self.monthly
+                         if (self.annual + self.monthly).count(name) > 1)
+        if duplicated:
+            raise SAPInputError("Columns given more than once: {}".format(sorted(duplicated)))
+
+        self._annual = numpy.full((len(self.annual), chunk_size), numpy.nan)
+        self._monthly = numpy.full((len(self.monthly), chunk_size, 12), numpy.nan)
+        self._pending = 0
+
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, SCHEMA_FILE), 'w') as f:
+            json.dump(dict(version=COLUMNAR_FORMAT_VERSION, annual=self.annual, monthly=self.monthly), f)
+        for name in self.annual + self.monthly:
+            with open(_column_path(folder, name), 'wb') as f:
+                f.write(_npy_header(self._shape(name, 0)))
+
+    def _shape(self, name, n_rows):
+        return (n_rows, 12) if name in self.monthly else (n_rows,)
+
+    def append(self, dwelling):
+        """
+        Add the results of a calculated dwelling
+
+        Args:
+            dwelling: DwellingResults, or any mapping of result names to values
+        """
+        row = self._pending
+        for i, name in enumerate(self.annual):
+            value = _get(dwelling, name)
+            self._annual[i, row] = numpy.nan if value is None else value
+        for i, name in enumerate(self.monthly):
+            value = _get(dwelling, name)
+            if value is None:
+                self._monthly[i, row] = numpy.nan
+            elif numpy.ndim(value) == 0 or numpy.shape(value) == (12,):
+                self._monthly[i, row] = value
+            else:
+                raise SAPInputError("Monthly result {} has shape {}".format(name, numpy.shape(value)))
+
+        self._pending += 1
+        if self._pending == self.chunk_size:
+            self.flush()
+
+    def extend(self, dwellings):
+        """
+        Returns:
+            number of dwellings added
+        """
+        n = 0
+        for dwelling in dwellings:
+            self.append(dwelling)
+            n += 1
+        return n
+
+    def flush(self):
+        """
+        Write the dwellings held. The store can be read up to them even if
+        the writer is not closed.
+        """
+        if not self._pending:
+            return
+
+        n_rows = self.n_rows + self._pending
+        blocks = [(name, self._annual[i, :self._pending]) for i, name in enumerate(self.annual)]
+        blocks += [(name, self._monthly[i, :self._pending]) for i, name in enumerate(self.monthly)]
+        for name, block in blocks:
+            with open(_column_path(self.folder, name), 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                f.write(numpy.ascontiguousarray(block, dtype='<f8').tobytes())
+                # The header is updated after the data so that a store is always readable
+                f.seek(0)
+                f.write(_npy_header(self._shape(name, n_rows)))
+
+        self.n_rows = n_rows
+        self._annual.fill(numpy.nan)
+        self._monthly.fill(numpy.nan)
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def write_results(dwellings, folder, **kwargs):
+    """
+    Write the results of calculated dwellings to a new columnar store
+
+    Args:
+        dwellings: iterable of DwellingResults
+        folder: folder of the store
+        kwargs: columns and chunk size, see :class:`ColumnarWriter`
+
+    Returns:
+        number of dwellings written
+    """
+    with ColumnarWriter(folder, **kwargs) as writer:
+        return writer.extend(dwellings)
+
+
+def read_columns(folder, columns=None, mmap_mode='r'):
+    """
+    Read columns of a store. Only the files of the requested columns are
+    opened.
+
+    Args:
+        folder: folder of the store
+        columns: names of the columns, all of them if None
+        mmap_mode: as for numpy.load, None to read the columns into memory
+
+    Returns:
+        dict of name -> array of shape (dwellings,) or (dwellings, 12)
+    """
+    schema = load_schema(folder)
+    names = schema['annual'] + schema['monthly']
+    if columns is None:
+        columns = names
+    missing = [name for name in columns if name not in names]
+    if missing:
+        raise SAPInputError("No columns {} in {}".format(missing, folder))
+
+    return {name: numpy.load(_column_path(folder, name), mmap_mode=mmap_mode) for name in columns}
+
+
+def n_rows(folder):
+    """
+    Returns:
+        number of dwellings in a store
+    """
+    schema = load_schema(folder)
+    name = (schema['annual'] + schema['monthly'])[0]
+    with open(_column_path(folder, name), 'rb') as f:
+        numpy.lib.format.read_magic(f)
+        shape, _, _ = numpy.lib.format.read_array_header_1_0(f)
+    return shape[0]
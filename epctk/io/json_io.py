@@ -1,5 +1,157 @@
-from jsonschema import validate
+"""
+JSON dwellings
+~~~~~~~~~~~~~~
 
-from .dwelling_schema import sap_schema
+Read and write dwellings as JSON. Values that have no JSON equivalent are
+written as single key objects tagged like in the YAML format::
 
+    {"!fuel": {"fuel_code": 1}}
+    {"!enum": "HeatEmitters.RADIATORS"}
+    {"!Opening": {"area": 1.2, ...}}
+    {"!Array": [1.0, 2.0, ...]}
 
+"""
+import enum
+import json
+
+import numpy
+
+from .. import elements, fuels
+from ..dwelling import Dwelling
+from ..elements import HeatLossElement, ThermalMassElement, Opening, OpeningType
+
+_OBJECT_TAGS = {
+    '!HeatLossElement': HeatLossElement,
+    '!ThermalMassElement': ThermalMassElement,
+    '!Opening': Opening,
+    '!OpeningType': OpeningType,
+}
+
+
+def to_jsonable(value):
+    """
+    Convert a dwelling value to plain JSON types
+
+    Args:
+        value: any value stored on a dwelling
+
+    Returns:
+        value made of dicts, lists, str, float, int, bool and None
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+
+    if isinstance(value, enum.Enum):
+        return {'!enum': '%s.%s' % (type(value).__name__, value.name)}
+
+    if isinstance(value, (int, float)):
+        return value
+
+    if isinstance(value, numpy.generic):
+        return value.item()
+
+    if isinstance(value, numpy.ndarray):
+        return {'!Array': [to_jsonable(v) for v in value.tolist()]}
+
+    if isinstance(value, fuels.ElectricityTariff):
+        return {'!fuel': dict(fuel_code=value.on_peak_fuel_code)}
+
+    if isinstance(value, fuels.Fuel):
+        return {'!fuel': dict(fuel_code=value.fuel_id)}
+
+    if isinstance(value, OpeningType):
+        data = {k: v for k, v in value.items() if k != 'light_transmittance'}
+        return {'!OpeningType': to_jsonable(data)}
+
+    if isinstance(value, (HeatLossElement, ThermalMassElement, Opening)):
+        return {'!%s' % type(value).__name__: to_jsonable(vars(value))}
+
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+
+    raise TypeError("Cannot convert {} to JSON".format(type(value).__name__))
+
+
+def from_jsonable(value):
+    """
+    Inverse of :func:`to_jsonable`
+
+    Args:
+        value: value decoded from JSON
+
+    Returns:
+        value with tagged objects reconstructed
+    """
+    if isinstance(value, list):
+        return [from_jsonable(v) for v in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    if len(value) == 1:
+        tag, data = next(iter(value.items()))
+
+        if tag == '!enum':
+            enum_name, member = data.split('.')
+            return getattr(elements, enum_name)[member]
+
+        if tag == '!fuel':
+            return fuels.fuel_from_code(data['fuel_code'])
+
+        if tag == '!Array':
+            return numpy.array(data)
+
+        if tag in _OBJECT_TAGS:
+            return _OBJECT_TAGS[tag](**from_jsonable(data))
+
+    return {k: from_jsonable(v) for k, v in value.items()}
+
+
+def dwelling_to_dict(d):
+    """
+    Args:
+        d: Dwelling
+
+    Returns:
+        dict of the dwelling inputs in plain JSON types
+    """
+    data = {k: v for k, v in dict.items(d) if k not in ('results', 'use_pcdf_fuel_prices')}
+    data.pop("parser_use_input_file_store_params", None)
+    return to_jsonable(data)
+
+
+def dwelling_from_dict(data):
+    """
+    Args:
+        data: dict as returned by :func:`dwelling_to_dict`
+
+    Returns:
+        Dwelling
+    """
+    dwelling = Dwelling()
+    for key, value in data.items():
+        dwelling[key] = from_jsonable(value)
+
+    return dwelling
+
+
+def to_json(d, stream):
+    json.dump(dwelling_to_dict(d), stream)
+
+
+def from_json(fname):
+    with open(fname, 'r') as f:
+        return dwelling_from_dict(json.load(f))
+
+
+def validate_sap_json(data):
+    """
+    Validate a JSON dwelling against the SAP input schema. Requires jsonschema.
+    """
+    from jsonschema import validate
+    from .dwelling_schema import sap_schema
+
+    validate(data, sap_schema)
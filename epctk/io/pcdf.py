@@ -8,6 +8,7 @@ import os
 
 from ..elements import VentilationTypes, DuctTypes
 from ..utils import int_or_none, float_or_none
+from ..instrumentation import cache_lookup, timed
 
 _PCDF_DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'pcdf2009.dat')
 _PCDF_CACHE = None
@@ -82,9 +83,10 @@ def row_id(table_id, toks):
         return toks[0]
 
 
+@timed()
 def load_pcdf(pcdf_data_file):
     logging.info("LOADING PCDF: " + pcdf_data_file)
-    with open(pcdf_data_file, 'rU') as datafile:
+    with open(pcdf_data_file, 'r') as datafile:
         pcdf_data = dict()
         current = dict()
         currentid = None
@@ -107,8 +109,15 @@ def load_pcdf(pcdf_data_file):
 
 def get_table(table):
     global _PCDF_CACHE
+    cache_lookup('pcdf', _PCDF_CACHE is not None)
     if _PCDF_CACHE is None:
-        _PCDF_CACHE = load_pcdf(_PCDF_DATA_FILE)
+        shared_tables_path = os.environ.get('EPCTK_SHARED_TABLES')
+        if shared_tables_path:
+            # Tables shared by a parent process, see epctk.shared_tables
+            from ..shared_tables import SharedTables
+            _PCDF_CACHE = SharedTables(shared_tables_path)
+        else:
+            _PCDF_CACHE = load_pcdf(_PCDF_DATA_FILE)
     return _PCDF_CACHE[table]
 
 
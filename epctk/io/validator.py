@@ -161,7 +161,8 @@ class one_of:
 def main_heating_is_oil_boiler(dwelling):
     # !!! need to also tests that system is a boiler - oil room heaters
     # !!! don't have a pump
-    return dwelling.main_sys_fuel.type() == FuelTypes.OIL
+    fuel = dwelling.get('main_sys_fuel')
+    return fuel is not None and fuel.type == FuelTypes.OIL
 
 
 def main_heating_uses_table_4d(dwelling):
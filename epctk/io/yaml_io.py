@@ -1,9 +1,9 @@
-import copy
+import enum
 
 import numpy
 import yaml
 
-from .. import fuels
+from .. import elements, fuels
 from ..elements import HeatLossElement, ThermalMassElement, Opening, OpeningType
 from ..dwelling import Dwelling
 
@@ -27,10 +27,16 @@ def opening_type_representer(dumper, data):
     return dumper.represent_mapping('!OpeningType', real_data)
 
 
-def opening_representer(dumper, data):
-    real_data = dict(data.__dict__)
-    real_data["opening_type"] = data.opening_type.name
-    return dumper.represent_mapping('!Opening', real_data)
+def enum_representer(dumper, data):
+    return dumper.represent_scalar('!enum', '%s.%s' % (type(data).__name__, data.name))
+
+
+def enum_constructor(loader, node):
+    """
+    Construct an enum from the elements module, written as e.g. `!enum HeatEmitters.RADIATORS`
+    """
+    enum_name, member = loader.construct_scalar(node).split('.')
+    return getattr(elements, enum_name)[member]
 
 
 def array_as_list_representer(dumper, data):
@@ -83,6 +89,9 @@ def configure_yaml():
     create_mapper(ThermalMassElement, "ThermalMassElement")
     create_mapper(Opening, "Opening")
 
+    yaml.add_multi_representer(enum.Enum, enum_representer)
+    yaml.add_constructor('!enum', enum_constructor)
+
     yaml.add_representer(OpeningType, opening_type_representer)
     yaml.add_constructor(
         "!OpeningType", SimpleTagUnMapper(OpeningType))
@@ -93,11 +102,9 @@ def configure_yaml():
 
 def to_yaml(d, stream):
     configure_yaml()
-    data = copy.deepcopy(d._attrs)
+    data = {k: v for k, v in dict.items(d) if k not in ('results', 'use_pcdf_fuel_prices')}
 
-    del data["Tcooling"]
-    del data["living_area_Theating"]
-    del data["parser_use_input_file_store_params"]
+    data.pop("parser_use_input_file_store_params", None)
 
     stream.write(yaml.dump(data, width=200))
 
@@ -105,7 +112,7 @@ def to_yaml(d, stream):
 def from_yaml(fname):
     configure_yaml()
     with open(fname, 'r') as f:
-        loaded = yaml.load(f)
+        loaded = yaml.load(f, Loader=yaml.Loader)
 
     dwelling = Dwelling()
     for key, value in loaded.items():
@@ -0,0 +1,265 @@
+"""
+Batch jobs
+~~~~~~~~~~
+
+Batch calculations over a whole stock that can be stopped and resumed.
+The dwellings are calculated a chunk at a time and the results of every
+chunk are committed to the job folder as soon as the chunk is done, so a
+job that dies part way is restarted with the same dwellings and only the
+chunks that were not committed are calculated::
+
+    summary = jobs.run_job(dwellings, 'stock-2024', workers=32)
+    results = jobs.read_results('stock-2024', ['sap_value', 'emissions'])
+
+The job folder holds ``job.json``, the parameters of the job and its
+progress, and a folder per committed chunk in ``chunks``, with the
+results as a :mod:`epctk.io.columnar` store and ``chunk.json``. A chunk is
+written under a temporary name and renamed when complete, so a chunk
+folder is either missing or whole.
+
+A dwelling whose calculation raises is quarantined: its results are NaN
+and its index, input hash and exception are recorded in the chunk, see
+:func:`read_quarantine`.
+
+With worker processes each worker calculates and commits its chunks
+itself, so a restart loses at most the chunk each worker was busy with.
+"""
+import collections
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+import traceback
+from collections import namedtuple
+
+import numpy
+
+from . import runner
+from .batch import dwelling_fingerprint
+from .dwelling import reporting
+from .io import columnar
+from .utils import SAPInputError
+
+JOB_FILE = 'job.json'
+CHUNKS_FOLDER = 'chunks'
+CHUNK_FILE = 'chunk.json'
+
+# Bumped whenever the layout of a job folder changes
+JOB_FORMAT_VERSION = 1
+
+JobSummary = namedtuple('JobSummary', 'n_dwellings, n_failed, n_chunks, n_resumed_chunks')
+
+
+def _write_json(path, data):
+    # Written aside and renamed, so that the file is never partly written
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _chunk_folder(folder, index):
+    return os.path.join(folder, CHUNKS_FOLDER, '{:08d}'.format(index))
+
+
+def _input_hash(dwelling):
+    try:
+        return dwelling_fingerprint(dwelling)
+    except Exception as err:
+        return "unhashable: {!r}".format(err)
+
+
+def _chunks(dwellings, chunk_size):
+    dwellings = iter(dwellings)
+    while True:
+        chunk = list(itertools.islice(dwellings, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def committed_chunks(folder):
+    """
+    Returns:
+        dict of chunk index -> contents of its chunk.json, for the chunks
+        committed to a job folder
+    """
+    chunks_folder = os.path.join(folder, CHUNKS_FOLDER)
+    if not os.path.isdir(chunks_folder):
+        return dict()
+
+    chunks = dict()
+    for name in sorted(os.listdir(chunks_folder)):
+        if name.isdigit():
+            with open(os.path.join(chunks_folder, name, CHUNK_FILE)) as f:
+                chunks[int(name)] = json.load(f)
+    return chunks
+
+
+def run_chunk(folder, index, start, dwellings, calculation, annual, monthly):
+    """
+    Calculate a chunk of dwellings and commit its results to the job
+    folder. Runs in the worker processes.
+
+    Returns:
+        contents of the chunk's chunk.json
+    """
+    final = _chunk_folder(folder, index)
+    temporary = os.path.join(folder, CHUNKS_FOLDER, '.tmp-{:08d}-{}'.format(index, os.getpid()))
+    if os.path.isdir(temporary):
+        shutil.rmtree(temporary)
+
+    quarantined = []
+    with reporting(False), \
+            columnar.ColumnarWriter(temporary, annual, monthly, chunk_size=max(len(dwellings), 1)) as writer:
+        for offset, dwelling in enumerate(dwellings):
+            try:
+                writer.append(calculation(dwelling))
+            except Exception as err:
+                logging.debug("jobs.py: calculation of dwelling %d failed: %r", start + offset, err)
+                quarantined.append(dict(index=start + offset, input_hash=_input_hash(dwelling),
+                                        error="{}: {}".format(type(err).__name__, err),
+                                        traceback=traceback.format_exc(limit=-3)))
+                writer.append(dict())
+
+    chunk = dict(index=index, start=start, n_dwellings=len(dwellings), n_failed=len(quarantined),
+                 first_input_hash=_input_hash(dwellings[0]) if dwellings else None,
+                 quarantined=quarantined)
+    _write_json(os.path.join(temporary, CHUNK_FILE), chunk)
+
+    if os.path.isdir(final):
+        # Committed by an earlier run that was not recorded as done
+        shutil.rmtree(temporary)
+    else:
+        os.rename(temporary, final)
+    return chunk
+
+
+def _run_chunk_job(args):
+    return run_chunk(*args)
+
+
+def _job_parameters(calculation, chunk_size, annual, monthly):
+    return dict(version=JOB_FORMAT_VERSION,
+                calculation='{}.{}'.format(calculation.__module__, calculation.__qualname__),
+                chunk_size=chunk_size, annual=list(annual), monthly=list(monthly))
+
+
+def run_job(dwellings, folder, calculation=runner.run_sap, workers=None, chunk_size=256,
+            annual=columnar.ANNUAL_RESULTS, monthly=columnar.MONTHLY_RESULTS):
+    """
+    Calculate a stock of dwellings, committing the results a chunk at a
+    time to the job folder. If the folder holds a job that was stopped,
+    it is resumed: the chunks already committed are not calculated again.
+
+    Args:
+        dwellings: iterable of input Dwellings, in the same order every
+            time the job is run
+        folder: job folder, created if needed
+        calculation: calculation entry point, a module level function
+        workers: number of worker processes, 1 to calculate in this process
+        chunk_size: number of dwellings committed at once
+        annual: names of the annual results stored, see :mod:`epctk.io.columnar`
+        monthly: names of the monthly results stored
+
+    Returns:
+        JobSummary of the whole job, including the resumed chunks
+    """
+    parameters = _job_parameters(calculation, chunk_size, annual, monthly)
+    job_file = os.path.join(folder, JOB_FILE)
+    if os.path.exists(job_file):
+        with open(job_file) as f:
+            stored = json.load(f)
+        if {key: stored.get(key) for key in parameters} != parameters:
+            raise SAPInputError("{} holds a job with other parameters: {}".format(folder, stored))
+
+    chunks_folder = os.path.join(folder, CHUNKS_FOLDER)
+    os.makedirs(chunks_folder, exist_ok=True)
+    # Chunks left part written by a stopped run
+    for name in os.listdir(chunks_folder):
+        if name.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(chunks_folder, name))
+
+    committed = committed_chunks(folder)
+    progress = dict(n_dwellings=0, n_failed=0, n_chunks=0, n_resumed_chunks=0)
+
+    def write_progress(complete=False):
+        _write_json(job_file, dict(parameters, updated=time.time(), complete=complete, **progress))
+
+    def record(chunk, resumed=False):
+        progress['n_dwellings'] += chunk['n_dwellings']
+        progress['n_failed'] += chunk['n_failed']
+        progress['n_chunks'] += 1
+        progress['n_resumed_chunks'] += resumed
+        if not resumed:
+            write_progress()
+
+    def chunk_jobs():
+        start = 0
+        for index, chunk in enumerate(_chunks(dwellings, chunk_size)):
+            if index in committed:
+                done = committed[index]
+                if done['n_dwellings'] != len(chunk) or done['first_input_hash'] != _input_hash(chunk[0]):
+                    raise SAPInputError("Chunk {} of {} was committed with other dwellings".format(index, folder))
+                record(done, resumed=True)
+            else:
+                yield folder, index, start, chunk, calculation, tuple(annual), tuple(monthly)
+            start += len(chunk)
+
+    write_progress()
+    if workers == 1:
+        for job in chunk_jobs():
+            record(_run_chunk_job(job))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            # At most two chunks per worker are in flight
+            max_pending = 2 * (workers or os.cpu_count() or 1)
+            pending = collections.deque()
+            for job in chunk_jobs():
+                if len(pending) >= max_pending:
+                    record(pending.popleft().result())
+                pending.append(executor.submit(_run_chunk_job, job))
+            while pending:
+                record(pending.popleft().result())
+
+    write_progress(complete=True)
+    return JobSummary(**progress)
+
+
+def read_results(folder, columns=None):
+    """
+    Results of the committed chunks of a job, in the order of the dwellings
+
+    Args:
+        folder: job folder
+        columns: names of the columns, all of them if None
+
+    Returns:
+        dict of name -> array, with 'index' the index of each dwelling in
+        the job, which has gaps if the job is not complete
+    """
+    chunks = committed_chunks(folder)
+    parts = [columnar.read_columns(_chunk_folder(folder, index), columns, mmap_mode=None)
+             for index in chunks]
+    if columns is None:
+        with open(os.path.join(folder, JOB_FILE)) as f:
+            stored = json.load(f)
+        columns = stored['annual'] + stored['monthly']
+
+    results = {name: numpy.concatenate([part[name] for part in parts]) if parts else numpy.zeros(0)
+               for name in columns}
+    results['index'] = numpy.concatenate(
+        [numpy.arange(chunk['start'], chunk['start'] + chunk['n_dwellings']) for chunk in chunks.values()]
+        or [numpy.zeros(0, dtype=int)])
+    return results
+
+
+def read_quarantine(folder):
+    """
+    Returns:
+        list of dicts with the index, input_hash, error and traceback of
+        the dwellings whose calculation failed, in the committed chunks
+    """
+    return [record for chunk in committed_chunks(folder).values() for record in chunk['quarantined']]
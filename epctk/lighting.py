@@ -3,6 +3,7 @@ import math
 import numpy
 
 from .constants import DAYS_PER_MONTH
+from .instrumentation import timed
 
 
 def _lighting_sum(openings):
@@ -83,6 +84,7 @@ def lighting_consumption_variables(N_occ, grnd_flr_a, openings, light_access_fac
                 lighting_C2=C2)
 
 
+@timed()
 def lighting_consumption(dwelling):
     low_energy_bulb_ratio = dwelling.get('low_energy_bulb_ratio')
     if not low_energy_bulb_ratio:
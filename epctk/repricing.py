@@ -0,0 +1,185 @@
+"""
+Fuel price repricing
+~~~~~~~~~~~~~~~~~~~~
+
+The energy use of a dwelling does not depend on fuel prices, and its
+regulated fuel cost is linear in them. :func:`epctk.fuel_use.fuel_use`
+records, for every calculated dwelling, the energy bought at each fuel
+price (``fuel_cost_exposure``) and the fuels whose standing charge is paid
+(``standing_charge_exposure``). From those the fuel cost, ECF and SAP
+rating under any price table are a matrix product away, without rerunning
+the worksheet::
+
+    exposure = CostExposure.from_dwellings(runner.run_sap(d) for d in dwellings)
+    result = exposure.reprice([PriceTable.from_pcdf(), PriceTable.from_table_12()])
+    result.sap_value[:, 1]  # SAP ratings with Table 12 prices
+
+"""
+from collections import namedtuple
+
+import numpy
+
+from . import fuels
+from .utils import SAPInputError
+
+# Arrays of shape (dwellings, price tables)
+RepricingResult = namedtuple('RepricingResult', 'fuel_cost, sap_energy_cost_factor, sap_value')
+
+
+class PriceTable:
+    """
+    Unit prices and standing charges by fuel id
+
+    Args:
+        prices: dict of fuel id -> unit price, p/kWh
+        standing_charges: dict of fuel id -> standing charge, GBP/year
+        name: label of the table
+    """
+    def __init__(self, prices, standing_charges, name=None):
+        self.prices = dict(prices)
+        self.standing_charges = dict(standing_charges)
+        self.name = name
+
+    @classmethod
+    def from_fuel_data(cls, get_fuel_data, name=None):
+        # Table 12 has no price or standing charge (None) where they do not apply
+        fuel_data = {fuel_id: get_fuel_data(fuel_id) for fuel_id in fuels.table_12_fuel_data()}
+        return cls({fuel_id: data.price for fuel_id, data in fuel_data.items()
+                    if data.price is not None},
+                   {fuel_id: data.standing_charge for fuel_id, data in fuel_data.items()
+                    if data.standing_charge is not None},
+                   name)
+
+    @classmethod
+    def from_table_12(cls):
+        return cls.from_fuel_data(fuels.get_fuel_data_table_12, 'table_12')
+
+    @classmethod
+    def from_pcdf(cls):
+        """
+        PCDF prices, falling back to Table 12 as :func:`epctk.fuels.get_fuel_data_pcdf` does
+        """
+        return cls.from_fuel_data(fuels.get_fuel_data_pcdf, 'pcdf')
+
+    def updated(self, prices=None, standing_charges=None, name=None):
+        """
+        Returns:
+            copy of this table with some prices or standing charges replaced
+        """
+        table = PriceTable(self.prices, self.standing_charges, name or self.name)
+        table.prices.update(prices or {})
+        table.standing_charges.update(standing_charges or {})
+        return table
+
+
+def sap_rating(energy_cost_factor):
+    """
+    Vectorized :func:`epctk.worksheet.sap` rating from the energy cost factor
+    """
+    ecf = numpy.asarray(energy_cost_factor, dtype=float)
+    return numpy.where(ecf >= 3.5,
+                       117 - 121 * numpy.log10(numpy.maximum(ecf, 3.5)),
+                       100 - 13.95 * ecf)
+
+
+class CostExposure:
+    """
+    Price exposure of a portfolio of calculated dwellings
+
+    Args:
+        fuel_ids: fuel id of each column
+        energy: (dwellings, fuels) array of kWh bought at each fuel price
+        standing: (dwellings, fuels) array of standing charges paid for each fuel
+        fixed_cost: (dwellings,) array of costs not from the price tables, GBP
+        floor_area: (dwellings,) array of GFA
+    """
+    def __init__(self, fuel_ids, energy, standing, fixed_cost, floor_area):
+        self.fuel_ids = list(fuel_ids)
+        self.energy = numpy.asarray(energy, dtype=float)
+        self.standing = numpy.asarray(standing, dtype=float)
+        self.fixed_cost = numpy.asarray(fixed_cost, dtype=float)
+        self.floor_area = numpy.asarray(floor_area, dtype=float)
+
+    @classmethod
+    def from_dwellings(cls, dwellings):
+        """
+        Args:
+            dwellings: calculated dwellings, e.g. from runner.run_sap
+
+        Returns:
+            CostExposure
+        """
+        dwellings = list(dwellings)
+        fuel_ids = sorted({fuel_id for d in dwellings
+                           for fuel_id in list(d.fuel_cost_exposure) + list(d.standing_charge_exposure)})
+        column = {fuel_id: i for i, fuel_id in enumerate(fuel_ids)}
+
+        energy = numpy.zeros((len(dwellings), len(fuel_ids)))
+        standing = numpy.zeros((len(dwellings), len(fuel_ids)))
+        for i, d in enumerate(dwellings):
+            for fuel_id, kwh in d.fuel_cost_exposure.items():
+                energy[i, column[fuel_id]] = kwh
+            for fuel_id, n in d.standing_charge_exposure.items():
+                standing[i, column[fuel_id]] = n
+
+        return cls(fuel_ids, energy, standing,
+                   [d.cost_standing_fixed for d in dwellings],
+                   [d.GFA for d in dwellings])
+
+    def __len__(self):
+        return len(self.fixed_cost)
+
+    def _price_matrix(self, price_tables, attr, exposure):
+        used = exposure.any(axis=0)
+        matrix = numpy.zeros((len(self.fuel_ids), len(price_tables)))
+        for j, table in enumerate(price_tables):
+            values = getattr(table, attr)
+            for i, fuel_id in enumerate(self.fuel_ids):
+                if fuel_id in values:
+                    matrix[i, j] = values[fuel_id]
+                elif used[i]:
+                    raise SAPInputError("No {} for fuel {} in price table {}".format(
+                        attr.rstrip('s').replace('_', ' '), fuel_id, table.name))
+        return matrix
+
+    def fuel_cost(self, price_tables):
+        """
+        Args:
+            price_tables: list of PriceTable
+
+        Returns:
+            (dwellings, price tables) array of regulated fuel costs, GBP/year
+        """
+        prices = self._price_matrix(price_tables, 'prices', self.energy)
+        standing_charges = self._price_matrix(price_tables, 'standing_charges', self.standing)
+        return (self.energy @ prices / 100 + self.standing @ standing_charges +
+                self.fixed_cost[:, numpy.newaxis])
+
+    def reprice(self, price_tables):
+        """
+        Fuel cost, energy cost factor and SAP rating of every dwelling under
+        each price table
+
+        Args:
+            price_tables: a PriceTable or a list of them
+
+        Returns:
+            RepricingResult of (dwellings, price tables) arrays
+        """
+        if isinstance(price_tables, PriceTable):
+            price_tables = [price_tables]
+
+        cost = self.fuel_cost(price_tables)
+        ecf = 0.47 * cost / (self.floor_area[:, numpy.newaxis] + 45)
+        return RepricingResult(cost, ecf, sap_rating(ecf))
+
+    def save(self, path):
+        numpy.savez_compressed(path, fuel_ids=numpy.array(self.fuel_ids), energy=self.energy,
+                               standing=self.standing, fixed_cost=self.fixed_cost,
+                               floor_area=self.floor_area)
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as data:
+            return cls(data['fuel_ids'].tolist(), data['energy'], data['standing'],
+                       data['fixed_cost'], data['floor_area'])
@@ -0,0 +1,319 @@
+"""
+Retrofit packages
+~~~~~~~~~~~~~~~~~
+
+Searches combinations of improvement measures for the packages that give
+the largest SAP gain or CO2 saving for their cost, within a budget::
+
+    front = retrofit.optimize(dwelling, budget=10000, objective='co2')
+    [(p.measures, p.cost, p.co2_saving) for p in front]
+
+:func:`appendix_t.run_improvements` applies the Appendix T measures in a
+fixed order. Here packages of applicable measures within the budget are
+calculated, and the result is the Pareto front of cost against the
+objective: the packages not beaten by a cheaper or equally priced one.
+
+Calculating every package takes 2 ** n calculations for n measures, 512
+for the nine default measures. By default :func:`optimize` calculates
+packages in order of cost and only extends the packages that were on the
+front when they were calculated, see :meth:`PackageEvaluator.packages`.
+Measures interact, so this can miss a front package whose sub-packages
+are all dominated; ``exhaustive=True`` calculates every package.
+
+The measures are the Appendix T ones and a set of fabric measures. Their
+costs are indicative and are meant to be replaced with local costs,
+e.g. ``Measure('W', ..., cost=my_wall_cost, ...)``.
+
+Fabric measures only change the worksheet stages. Each combination of the
+other measures is configured once and reused by every package that
+differs from it only by fabric measures.
+"""
+import concurrent.futures
+import itertools
+from collections import namedtuple
+
+from . import runner
+from .appendix import appendix_t
+from .cache import input_items
+from .configure import copy_heating_systems, lookup_sap_tables
+from .dwelling import DwellingResults
+from .elements import HeatLossElement, HeatLossElementTypes
+from .utils import SAPInputError
+
+# A package of measures and its calculated performance
+Package = namedtuple('Package', 'measures, cost, sap_value, emissions, sap_gain, co2_saving')
+
+OBJECTIVES = dict(sap='sap_gain', co2='co2_saving')
+
+
+class Measure:
+    """
+    Improvement measure
+
+    Args:
+        tag: short identifier, e.g. an Appendix T letter
+        description: description of the measure
+        cost: cost in pounds, or a function of the dwelling giving it
+        apply: function(base, dwelling) that applies the measure to the
+            dwelling and returns False if it does not apply, as the
+            functions of :data:`appendix_t.IMPROVEMENTS`. base is the
+            configured unimproved dwelling.
+        reconfigure: the measure changes values read by the configuration
+    """
+    def __init__(self, tag, description, cost, apply, reconfigure=True):
+        self.tag = tag
+        self.description = description
+        self.cost = cost
+        self.apply = apply
+        self.reconfigure = reconfigure
+
+    def cost_for(self, dwelling):
+        return self.cost(dwelling) if callable(self.cost) else self.cost
+
+
+def improve_elements(dwelling, element_type, Uvalue):
+    """
+    Set the U-value of the elements of a type that are worse than Uvalue
+
+    Returns:
+        True if any element was improved
+    """
+    elements = dwelling['heat_loss_elements']
+    if not any(e.element_type == element_type and e.Uvalue > Uvalue for e in elements):
+        return False
+
+    dwelling['heat_loss_elements'] = [
+        HeatLossElement(e.area, Uvalue, e.is_external, e.element_type, e.name)
+        if e.element_type == element_type and e.Uvalue > Uvalue else e
+        for e in elements]
+    return True
+
+
+def apply_wall_insulation(base, dwelling):
+    return improve_elements(dwelling, HeatLossElementTypes.EXTERNAL_WALL, 0.3)
+
+
+def apply_roof_insulation(base, dwelling):
+    return improve_elements(dwelling, HeatLossElementTypes.EXTERNAL_ROOF, 0.16)
+
+
+def apply_floor_insulation(base, dwelling):
+    return improve_elements(dwelling, HeatLossElementTypes.EXTERNAL_FLOOR, 0.25)
+
+
+def apply_glazing(base, dwelling):
+    return improve_elements(dwelling, HeatLossElementTypes.GLAZING, 1.4)
+
+
+def apply_air_tightness(base, dwelling):
+    if dwelling.get('pressurisation_test_result') is not None and dwelling.pressurisation_test_result <= 5:
+        return False
+
+    dwelling['pressurisation_test_result'] = 5
+    return True
+
+
+def wall_insulation_cost(dwelling):
+    return 100 * appendix_t.element_type_area(HeatLossElementTypes.EXTERNAL_WALL, dwelling.heat_loss_elements)
+
+
+def roof_insulation_cost(dwelling):
+    return 20 * appendix_t.element_type_area(HeatLossElementTypes.EXTERNAL_ROOF, dwelling.heat_loss_elements)
+
+
+def floor_insulation_cost(dwelling):
+    return 50 * appendix_t.element_type_area(HeatLossElementTypes.EXTERNAL_FLOOR, dwelling.heat_loss_elements)
+
+
+def glazing_cost(dwelling):
+    return 400 * appendix_t.element_type_area(HeatLossElementTypes.GLAZING, dwelling.heat_loss_elements)
+
+
+MEASURES = [
+    Measure("E", "Low energy lighting", 30, appendix_t.apply_low_energy_lighting),
+    Measure("N", "Solar water heating", 5000, appendix_t.apply_solar_hot_water),
+    Measure("U", "Photovoltaics, 2.5 kWp", 12000, appendix_t.apply_pv),
+    Measure("V", "Wind turbine", 2500, appendix_t.apply_wind),
+    Measure("W", "Wall insulation to 0.3 W/m2K", wall_insulation_cost, apply_wall_insulation,
+            reconfigure=False),
+    Measure("R", "Roof insulation to 0.16 W/m2K", roof_insulation_cost, apply_roof_insulation,
+            reconfigure=False),
+    Measure("F", "Floor insulation to 0.25 W/m2K", floor_insulation_cost, apply_floor_insulation,
+            reconfigure=False),
+    Measure("G", "Glazing to 1.4 W/m2K", glazing_cost, apply_glazing, reconfigure=False),
+    Measure("A", "Air tightness to 5 m3/h.m2", 1500, apply_air_tightness, reconfigure=False),
+]
+
+
+class PackageEvaluator:
+    """
+    SAP calculation of packages of measures on a dwelling. Configured
+    dwellings and package results are memoized.
+
+    Args:
+        dwelling: input Dwelling
+        measures: list of Measures
+    """
+    def __init__(self, dwelling, measures=MEASURES):
+        self.dwelling = dwelling
+        self._base = lookup_sap_tables(runner.prepare_sap(dwelling))
+        self._configured = dict()
+        self._packages = dict()
+
+        self.measures = [m for m in measures if m.apply(self._base, runner.prepare_sap(dwelling))]
+        self.costs = {m.tag: m.cost_for(dwelling) for m in self.measures}
+        self.base = self.evaluate(())
+
+    def _configure(self, measures):
+        tags = tuple(m.tag for m in measures)
+        if tags not in self._configured:
+            dwelling = runner.prepare_sap(self.dwelling)
+            for m in measures:
+                m.apply(self._base, dwelling)
+            self._configured[tags] = input_items(lookup_sap_tables(dwelling))
+        return self._configured[tags]
+
+    def evaluate(self, measures):
+        """
+        Args:
+            measures: sequence of Measures, in the order of self.measures
+
+        Returns:
+            Package
+        """
+        tags = tuple(m.tag for m in measures)
+        if tags in self._packages:
+            return self._packages[tags]
+
+        dwelling = DwellingResults(self._configure([m for m in measures if m.reconfigure]))
+        copy_heating_systems(dwelling)
+        for m in measures:
+            if not m.reconfigure:
+                m.apply(self._base, dwelling)
+        dwelling = runner.complete_sap(dwelling)
+
+        base = self._packages.get(())
+        package = Package(tags, sum(self.costs[t] for t in tags), dwelling.sap_value, dwelling.emissions,
+                          dwelling.sap_value - base.sap_value if base else 0.,
+                          base.emissions - dwelling.emissions if base else 0.)
+        self._packages[tags] = package
+        return package
+
+    def packages(self, budget=None, max_measures=None, objective=None):
+        """
+        Calculate the packages within the budget
+
+        Without an objective every package is calculated. With one, the
+        packages are calculated in order of cost, and a package is skipped
+        unless one of the packages it extends by a single measure was on
+        the Pareto front of the packages calculated before it. Measures
+        can reinforce each other, so a skipped package can be on the front.
+
+        Args:
+            budget: maximum cost of a package, unlimited if None
+            max_measures: maximum number of measures in a package
+            objective: 'sap' or 'co2' to skip the extensions of dominated
+                packages, None to calculate every package
+
+        Returns:
+            list of Packages, starting with the empty package
+        """
+        max_measures = len(self.measures) if max_measures is None else max_measures
+        combinations = [combination
+                        for n in range(max_measures + 1)
+                        for combination in itertools.combinations(self.measures, n)
+                        if budget is None or sum(self.costs[m.tag] for m in combination) <= budget]
+        if objective is None:
+            return [self.evaluate(combination) for combination in combinations]
+
+        field = _objective_field(objective)
+        combinations.sort(key=lambda c: (sum(self.costs[m.tag] for m in c), len(c)))
+
+        # Whether each calculated package was on the front when calculated
+        on_front = dict()
+        best = None
+        packages = []
+        for combination in combinations:
+            tags = tuple(m.tag for m in combination)
+            if tags and not any(on_front.get(tags[:i] + tags[i + 1:]) for i in range(len(tags))):
+                continue
+
+            package = self.evaluate(combination)
+            benefit = getattr(package, field)
+            on_front[tags] = best is None or benefit > best
+            best = benefit if best is None else max(best, benefit)
+            packages.append(package)
+        return packages
+
+
+def _objective_field(objective):
+    if objective not in OBJECTIVES:
+        raise SAPInputError("Unknown objective {!r}, expected one of {}".format(objective, list(OBJECTIVES)))
+    return OBJECTIVES[objective]
+
+
+def pareto_front(packages, objective='sap'):
+    """
+    Packages that no cheaper or equally priced package matches on the objective
+
+    Args:
+        packages: list of Packages
+        objective: 'sap' for the SAP gain or 'co2' for the CO2 saving
+
+    Returns:
+        list of Packages, by increasing cost and benefit
+    """
+    field = _objective_field(objective)
+
+    front = []
+    for package in sorted(packages, key=lambda p: (p.cost, -getattr(p, field), len(p.measures))):
+        if not front or getattr(package, field) > getattr(front[-1], field):
+            front.append(package)
+    return front
+
+
+def optimize(dwelling, measures=MEASURES, budget=None, objective='sap', max_measures=None, exhaustive=False):
+    """
+    Pareto front of the retrofit packages of a dwelling
+
+    Args:
+        dwelling: input Dwelling
+        measures: list of Measures
+        budget: maximum cost of a package, unlimited if None
+        objective: 'sap' or 'co2'
+        max_measures: maximum number of measures in a package
+        exhaustive: calculate every package rather than skipping the
+            extensions of dominated packages, see
+            :meth:`PackageEvaluator.packages`
+
+    Returns:
+        list of Packages, see :func:`pareto_front`
+    """
+    evaluator = PackageEvaluator(dwelling, measures)
+    packages = evaluator.packages(budget, max_measures, None if exhaustive else objective)
+    return pareto_front(packages, objective)
+
+
+def _optimize_job(args):
+    dwelling, kwargs = args
+    return optimize(dwelling, **kwargs)
+
+
+def optimize_portfolio(dwellings, workers=None, **kwargs):
+    """
+    :func:`optimize` for each dwelling of a portfolio, in parallel worker processes
+
+    Args:
+        dwellings: iterable of input Dwellings
+        workers: number of worker processes, 1 to run in this process
+        **kwargs: arguments of :func:`optimize`
+
+    Returns:
+        list of Pareto fronts, in the order of the dwellings
+    """
+    jobs = [(d, kwargs) for d in dwellings]
+    if workers == 1:
+        return [_optimize_job(job) for job in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_optimize_job, jobs))
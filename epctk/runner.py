@@ -1,11 +1,16 @@
 from . import worksheet
+from .cache import cached_calculation
+from .instrumentation import timed
 from .configure import lookup_sap_tables
 from .dwelling import DwellingResults
 from .elements import (OvershadingTypes,
                        HeatEmitters, VentilationTypes)
 from .fuels import fuel_from_code
+from .utils import SAPInputError
 from .appendix import appendix_t
 
+@timed()
+@cached_calculation('sap')
 def run_sap(input_dwelling):
     """
     Run SAP on the input dwelling
@@ -13,13 +18,29 @@ def run_sap(input_dwelling):
     Args:
         input_dwelling:
 
+    """
+    dwelling = prepare_sap(input_dwelling)
+
+    dwelling = lookup_sap_tables(dwelling)
+
+    return complete_sap(dwelling)
+
+
+def prepare_sap(input_dwelling):
+    """
+    Inputs of the SAP rating, before configuration
     """
     dwelling = DwellingResults(input_dwelling)
 
     dwelling.reduced_gains = False
 
-    dwelling = lookup_sap_tables(dwelling)
+    return dwelling
 
+
+def complete_sap(dwelling):
+    """
+    Worksheet stages of the SAP rating, on a configured dwelling
+    """
     dwelling = worksheet.perform_full_calc(dwelling)
 
     sap_value, sap_energy_cost_factor = worksheet.sap(dwelling.GFA, dwelling.fuel_cost)
@@ -30,6 +51,8 @@ def run_sap(input_dwelling):
     return dwelling
 
 
+@timed()
+@cached_calculation('der')
 def run_der(input_dwelling):
     """
 
@@ -38,6 +61,17 @@ def run_der(input_dwelling):
 
     Returns:
 
+    """
+    dwelling = prepare_der(input_dwelling)
+
+    dwelling = lookup_sap_tables(dwelling)
+
+    return complete_der(dwelling)
+
+
+def prepare_der(input_dwelling):
+    """
+    Inputs of the DER, before configuration
     """
     dwelling = DwellingResults(input_dwelling)
     dwelling.reduced_gains = True
@@ -45,16 +79,21 @@ def run_der(input_dwelling):
     if dwelling.overshading == OvershadingTypes.VERY_LITTLE:
         dwelling.overshading = OvershadingTypes.AVERAGE
 
-    dwelling = lookup_sap_tables(dwelling)
+    return dwelling
 
+
+def complete_der(dwelling):
+    """
+    Worksheet stages of the DER, on a configured dwelling
+    """
     worksheet.perform_full_calc(dwelling)
     dwelling.der_rating = worksheet.der(dwelling.GFA, dwelling.emissions)
 
-
-
     return dwelling
 
 
+@timed()
+@cached_calculation('fee')
 def run_fee(input_dwelling):
     """
     Run Fabric Energy Efficiency FEE for dwelling
@@ -62,6 +101,18 @@ def run_fee(input_dwelling):
     :param input_dwelling:
     :return:
     """
+    dwelling = prepare_fee(input_dwelling)
+
+    dwelling = lookup_sap_tables(dwelling)
+
+    return complete_fee(dwelling)
+
+
+def prepare_fee(input_dwelling):
+    """
+    Inputs of the FEE, the dwelling with its standard heating and
+    ventilation, before configuration
+    """
     dwelling = DwellingResults(input_dwelling)
     dwelling.reduced_gains = True
 
@@ -103,8 +154,13 @@ def run_fee(input_dwelling):
     dwelling.main_heating_fraction = 1
     dwelling.main_heating_2_fraction = 0
 
-    dwelling = lookup_sap_tables(dwelling)
+    return dwelling
+
 
+def complete_fee(dwelling):
+    """
+    Worksheet stages of the FEE, on a configured dwelling
+    """
     dwelling.pump_gain = 0
     dwelling.heating_system_pump_gain = 0
 
@@ -114,6 +170,66 @@ def run_fee(input_dwelling):
     return dwelling
 
 
+# Configuration steps skipped when only demand outputs are needed
+DEMAND_SKIPPED_STEPS = ('renewables', 'fuel_costs')
+
+# The calculation giving each rating
+RATING_CALCULATIONS = dict(sap_value='sap', sap_energy_cost_factor='sap', der_rating='der', fee_rating='fee')
+
+_PREPARE = dict(sap=prepare_sap, der=prepare_der, fee=prepare_fee)
+_COMPLETE = dict(sap=complete_sap, der=complete_der, fee=complete_fee)
+
+
+@timed()
+def evaluate(input_dwelling, outputs, calculation=None):
+    """
+    Calculate only the requested outputs of a dwelling. When they are all
+    results of worksheet.DEMAND_STAGES (or the FEE), the renewables and
+    fuel costs configuration and the energy use stages are skipped, as are
+    the demand stages after the last one needed. The results are not cached.
+
+    Args:
+        input_dwelling:
+        outputs: names of the results, e.g. ['sap_value', 'emissions']
+        calculation: 'sap', 'der' or 'fee'. Defaults to the calculation of
+            the rating among the outputs, else 'sap'.
+
+    Returns:
+        dict of output name -> value
+    """
+    outputs = list(outputs)
+    if calculation is None:
+        calculations = set(RATING_CALCULATIONS[name] for name in outputs if name in RATING_CALCULATIONS)
+        if len(calculations) > 1:
+            raise SAPInputError("Outputs of more than one calculation: {}".format(sorted(calculations)))
+        calculation = calculations.pop() if calculations else 'sap'
+    if calculation not in _PREPARE:
+        raise SAPInputError("Unknown calculation {}".format(calculation))
+
+    wrong_rating = [name for name in outputs if RATING_CALCULATIONS.get(name, calculation) != calculation]
+    demand_only = all(name in worksheet.DEMAND_OUTPUTS or name == 'fee_rating' for name in outputs)
+    if wrong_rating or (calculation == 'fee' and not demand_only):
+        raise SAPInputError("The {} calculation does not give {}".format(
+            calculation, wrong_rating or [name for name in outputs if name not in worksheet.DEMAND_OUTPUTS]))
+
+    dwelling = _PREPARE[calculation](input_dwelling)
+    if demand_only:
+        dwelling = lookup_sap_tables(dwelling, skip=DEMAND_SKIPPED_STEPS)
+        if calculation == 'fee':
+            dwelling = complete_fee(dwelling)
+        else:
+            stages = [stage.name for stage in worksheet.DEMAND_STAGES]
+            until = max((stages.index(worksheet.DEMAND_OUTPUTS[name]) for name in outputs), default=0)
+            dwelling = worksheet.perform_demand_calc(dwelling, until=stages[until])
+    else:
+        dwelling = _COMPLETE[calculation](lookup_sap_tables(dwelling))
+
+    missing = [name for name in outputs if name not in dwelling['results'] and name not in dwelling]
+    if missing:
+        raise SAPInputError("No results {} in the {} calculation".format(missing, calculation))
+    return {name: dwelling.get(name) for name in outputs}
+
+
 #
 # def run_dwelling(dwelling):
 #     """
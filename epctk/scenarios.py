@@ -0,0 +1,173 @@
+"""
+Emission factor scenarios
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+The regulated CO2 emissions and primary energy of a dwelling are linear in
+the fuel CO2 and primary energy factors. :func:`epctk.fuel_use.fuel_use`
+records, for every calculated dwelling, the monthly energy weighted to each
+fuel's factors (``fuel_factor_exposure``). A factor set, with annual or
+monthly factors per fuel, then gives the emissions and primary energy of a
+whole portfolio in one matrix product::
+
+    exposure = FactorExposure.from_dwellings(runner.run_der(d) for d in dwellings)
+    grid_2030 = FactorSet.from_table_12().with_electricity(co2=monthly_co2_2030)
+    result = exposure.evaluate([FactorSet.from_table_12(), grid_2030])
+    result.der[:, 1]  # DER with the 2030 grid factors
+
+The emissions that are not linear in the factors (the correction for negative
+community heating emissions) are kept as calculated.
+"""
+from collections import namedtuple
+
+import numpy
+
+from . import fuels
+from .elements import FuelTypes
+from .utils import SAPInputError
+
+# Arrays of shape (dwellings, factor sets)
+ScenarioResult = namedtuple('ScenarioResult', 'emissions, primary_energy, der')
+
+
+class FactorSet:
+    """
+    CO2 and primary energy factors by fuel id. Each factor is either a single
+    annual value or an array of 12 monthly values.
+
+    Args:
+        co2: dict of fuel id -> CO2 factor, kg/kWh
+        primary_energy: dict of fuel id -> primary energy factor
+        name: label of the factor set
+    """
+    def __init__(self, co2, primary_energy, name=None):
+        self.co2 = dict(co2)
+        self.primary_energy = dict(primary_energy)
+        self.name = name
+
+    @classmethod
+    def from_table_12(cls):
+        # Table 12 has no factors (None) for fuels that are not burned, e.g. electricity sold
+        fuel_data = fuels.table_12_fuel_data()
+        return cls({fuel_id: data.co2_factor for fuel_id, data in fuel_data.items()
+                    if data.co2_factor is not None},
+                   {fuel_id: data.primary_energy_factor for fuel_id, data in fuel_data.items()
+                    if data.primary_energy_factor is not None},
+                   'table_12')
+
+    def updated(self, co2=None, primary_energy=None, name=None):
+        """
+        Returns:
+            copy of this factor set with some factors replaced
+        """
+        factors = FactorSet(self.co2, self.primary_energy, name or self.name)
+        factors.co2.update(co2 or {})
+        factors.primary_energy.update(primary_energy or {})
+        return factors
+
+    def with_electricity(self, co2=None, primary_energy=None, name=None):
+        """
+        Copy of this factor set with the factors of every electricity fuel,
+        including electricity displaced by generation, replaced
+
+        Args:
+            co2: annual or monthly grid CO2 factor
+            primary_energy: annual or monthly grid primary energy factor
+            name: label of the new factor set
+        """
+        electric = [fuel_id for fuel_id, data in fuels.table_12_fuel_data().items()
+                    if data.fuel_type == FuelTypes.ELECTRIC and fuel_id in self.co2]
+        return self.updated(
+                co2={fuel_id: co2 for fuel_id in electric} if co2 is not None else None,
+                primary_energy={fuel_id: primary_energy for fuel_id in electric}
+                if primary_energy is not None else None,
+                name=name)
+
+
+class FactorExposure:
+    """
+    Factor exposure of a portfolio of calculated dwellings
+
+    Args:
+        fuel_ids: fuel id of each column
+        energy: (dwellings, fuels, 12) array of monthly kWh weighted to each fuel's factors
+        emissions_fixed: (dwellings,) array of emissions not linear in the factors, kg/year
+        floor_area: (dwellings,) array of GFA
+    """
+    def __init__(self, fuel_ids, energy, emissions_fixed, floor_area):
+        self.fuel_ids = list(fuel_ids)
+        self.energy = numpy.asarray(energy, dtype=float)
+        self.emissions_fixed = numpy.asarray(emissions_fixed, dtype=float)
+        self.floor_area = numpy.asarray(floor_area, dtype=float)
+
+    @classmethod
+    def from_dwellings(cls, dwellings):
+        """
+        Args:
+            dwellings: calculated dwellings, e.g. from runner.run_der
+
+        Returns:
+            FactorExposure
+        """
+        dwellings = list(dwellings)
+        fuel_ids = sorted({fuel_id for d in dwellings for fuel_id in d.fuel_factor_exposure})
+        column = {fuel_id: i for i, fuel_id in enumerate(fuel_ids)}
+
+        energy = numpy.zeros((len(dwellings), len(fuel_ids), 12))
+        for i, d in enumerate(dwellings):
+            for fuel_id, kwh in d.fuel_factor_exposure.items():
+                energy[i, column[fuel_id]] = kwh
+
+        return cls(fuel_ids, energy,
+                   [d.emissions_fixed for d in dwellings],
+                   [d.GFA for d in dwellings])
+
+    def __len__(self):
+        return len(self.emissions_fixed)
+
+    def _factor_matrix(self, factor_sets, attr):
+        """
+        Returns:
+            (fuels * 12, factor sets) array of the monthly factors
+        """
+        used = self.energy.any(axis=(0, 2))
+        matrix = numpy.zeros((len(self.fuel_ids), 12, len(factor_sets)))
+        for j, factor_set in enumerate(factor_sets):
+            values = getattr(factor_set, attr)
+            for i, fuel_id in enumerate(self.fuel_ids):
+                if fuel_id in values:
+                    matrix[i, :, j] = values[fuel_id]
+                elif used[i]:
+                    raise SAPInputError("No {} factor for fuel {} in factor set {}".format(
+                        attr.replace('_', ' '), fuel_id, factor_set.name))
+        return matrix.reshape(-1, len(factor_sets))
+
+    def evaluate(self, factor_sets):
+        """
+        Regulated emissions, primary energy and DER of every dwelling under
+        each factor set
+
+        Args:
+            factor_sets: a FactorSet or a list of them
+
+        Returns:
+            ScenarioResult of (dwellings, factor sets) arrays
+        """
+        if isinstance(factor_sets, FactorSet):
+            factor_sets = [factor_sets]
+
+        energy = self.energy.reshape(len(self), -1)
+        emissions = (energy @ self._factor_matrix(factor_sets, 'co2') +
+                     self.emissions_fixed[:, numpy.newaxis])
+        primary_energy = energy @ self._factor_matrix(factor_sets, 'primary_energy')
+        return ScenarioResult(emissions, primary_energy,
+                              emissions / self.floor_area[:, numpy.newaxis])
+
+    def save(self, path):
+        numpy.savez_compressed(path, fuel_ids=numpy.array(self.fuel_ids), energy=self.energy,
+                               emissions_fixed=self.emissions_fixed, floor_area=self.floor_area)
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as data:
+            return cls(data['fuel_ids'].tolist(), data['energy'],
+                       data['emissions_fixed'], data['floor_area'])
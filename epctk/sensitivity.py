@@ -0,0 +1,311 @@
+"""
+Sensitivities
+~~~~~~~~~~~~~
+
+Derivatives of the SAP rating, emissions and fuel cost with respect to the
+continuous inputs of a dwelling, found in one pass of the worksheet with
+forward mode automatic differentiation::
+
+    result = sensitivity.sensitivities(dwelling)
+    result.gradient('sap_value')['heat_loss_elements[0].Uvalue']
+
+Each input is replaced by a :class:`Dual` number that carries, besides its
+value, its derivatives with respect to all the inputs. The worksheet
+arithmetic propagates them to the outputs, so the full gradient costs one
+calculation on object arrays instead of one calculation per input.
+
+The dwelling is configured with the plain input values, and the inputs
+are seeded on the configured dwelling: the derivatives are those of the
+worksheet stages. Table lookups and rounding are piecewise constant and
+contribute nothing. :class:`Dual` has no ``__float__``, so code that would
+silently drop the derivatives raises a TypeError instead.
+"""
+import copy
+import math
+
+import numpy
+
+from . import runner, worksheet
+from .cache import input_items
+from .configure import copy_heating_systems, lookup_sap_tables
+from .dwelling import DwellingResults
+from .utils import SAPInputError
+
+OUTPUTS = ('sap_value', 'emissions', 'fuel_cost', 'primary_energy')
+
+# Configured heating systems, in the order their efficiencies are seeded
+_SYSTEM_KEYS = ('main_sys_1', 'main_sys_2', 'secondary_sys', 'water_sys')
+_EFFICIENCIES = ('heating_effy_winter', 'heating_effy_summer')
+_ATTRIBUTES = ('thermal_mass_parameter', 'pressurisation_test_result', 'Uthermalbridges')
+
+
+class Dual:
+    """
+    Number with derivatives
+
+    Args:
+        value: float value
+        grad: array of the derivatives with respect to each input
+    """
+    __slots__ = ('value', 'grad')
+
+    def __init__(self, value, grad):
+        self.value = value
+        self.grad = grad
+
+    # Arrays handle a Dual operand element by element, giving object arrays
+    def __add__(self, other):
+        if isinstance(other, numpy.ndarray):
+            return NotImplemented
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.grad + other.grad)
+        return Dual(self.value + other, self.grad)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, numpy.ndarray):
+            return NotImplemented
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.grad - other.grad)
+        return Dual(self.value - other, self.grad)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.grad)
+
+    def __mul__(self, other):
+        if isinstance(other, numpy.ndarray):
+            return NotImplemented
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.grad * other.value + other.grad * self.value)
+        return Dual(self.value * other, self.grad * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, numpy.ndarray):
+            return NotImplemented
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        (self.grad * other.value - other.grad * self.value) / other.value ** 2)
+        return Dual(self.value / other, self.grad / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.value, -other * self.grad / self.value ** 2)
+
+    def __pow__(self, other):
+        if isinstance(other, numpy.ndarray):
+            return NotImplemented
+        if isinstance(other, Dual):
+            value = self.value ** other.value
+            return Dual(value, value * (other.grad * math.log(self.value) +
+                                        other.value * self.grad / self.value))
+        if other == 0:
+            return Dual(1., numpy.zeros_like(self.grad))
+        return Dual(self.value ** other, other * self.value ** (other - 1) * self.grad)
+
+    def __rpow__(self, other):
+        value = other ** self.value
+        return Dual(value, value * math.log(other) * self.grad)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.grad)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self if self.value >= 0 else -self
+
+    # Comparisons and rounding use the value, their derivative being zero
+    def __eq__(self, other):
+        return self.value == _value(other)
+
+    def __ne__(self, other):
+        return self.value != _value(other)
+
+    def __lt__(self, other):
+        return self.value < _value(other)
+
+    def __le__(self, other):
+        return self.value <= _value(other)
+
+    def __gt__(self, other):
+        return self.value > _value(other)
+
+    def __ge__(self, other):
+        return self.value >= _value(other)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __round__(self, ndigits=None):
+        return round(self.value, ndigits)
+
+    # Called by the numpy functions on object arrays
+    def exp(self):
+        value = math.exp(self.value)
+        return Dual(value, value * self.grad)
+
+    def log(self):
+        return Dual(math.log(self.value), self.grad / self.value)
+
+    def log10(self):
+        return Dual(math.log10(self.value), self.grad / (self.value * math.log(10)))
+
+    def sqrt(self):
+        value = math.sqrt(self.value)
+        return Dual(value, self.grad / (2 * value))
+
+    def sin(self):
+        return Dual(math.sin(self.value), math.cos(self.value) * self.grad)
+
+    def cos(self):
+        return Dual(math.cos(self.value), -math.sin(self.value) * self.grad)
+
+    def __repr__(self):
+        return 'Dual({!r}, {!r})'.format(self.value, self.grad)
+
+
+def _value(x):
+    return x.value if isinstance(x, Dual) else x
+
+
+class Sensitivities:
+    """
+    Outputs of a calculation and their derivatives
+
+    Attributes:
+        inputs: names of the inputs
+        values: dict of output -> value
+        gradients: dict of output -> array of the derivatives with respect to each input
+    """
+    def __init__(self, inputs, values, gradients):
+        self.inputs = inputs
+        self.values = values
+        self.gradients = gradients
+
+    def gradient(self, output):
+        """
+        Returns:
+            dict of input name -> derivative of the output
+        """
+        return dict(zip(self.inputs, self.gradients[output].tolist()))
+
+
+def _input_slots(dwelling):
+    """
+    The continuous inputs of a configured dwelling, with private copies of
+    the elements and openings that hold them
+
+    Returns:
+        list of (name, owner, attribute), where owner is the dwelling for
+        dwelling values
+    """
+    slots = []
+
+    elements = [copy.copy(e) for e in dwelling['heat_loss_elements']]
+    dwelling['heat_loss_elements'] = elements
+    for i, e in enumerate(elements):
+        slots.append(('heat_loss_elements[{}].Uvalue'.format(i), e, 'Uvalue'))
+        slots.append(('heat_loss_elements[{}].area'.format(i), e, 'area'))
+
+    openings = [copy.copy(o) for o in dwelling.get('openings') or []]
+    dwelling['openings'] = openings
+    for i, o in enumerate(openings):
+        slots.append(('openings[{}].area'.format(i), o, 'area'))
+
+    for key in _ATTRIBUTES:
+        if _is_number(dwelling.get(key)):
+            slots.append((key, dwelling, key))
+
+    seeded = set()
+    for key in _SYSTEM_KEYS:
+        system = dwelling.get(key)
+        if system is None or id(system) in seeded:
+            continue
+        seeded.add(id(system))
+        for attr in _EFFICIENCIES:
+            if _is_number(getattr(system, attr, None)):
+                slots.append(('{}.{}'.format(key, attr), system, attr))
+
+    return slots
+
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _sap_value(ground_floor_area, fuel_cost):
+    """
+    :func:`epctk.worksheet.sap` for a fuel cost with derivatives
+    """
+    sap_value, ecf = worksheet.sap(ground_floor_area, _value(fuel_cost))
+    if not isinstance(fuel_cost, Dual):
+        return sap_value
+
+    d_ecf = 0.47 / (ground_floor_area + 45)
+    d_sap = -121 / (ecf * math.log(10)) if ecf >= 3.5 else -13.95
+    return Dual(sap_value, d_sap * d_ecf * fuel_cost.grad)
+
+
+def continuous_inputs(dwelling):
+    """
+    Args:
+        dwelling: input Dwelling
+
+    Returns:
+        names of the inputs of the dwelling for which sensitivities are found
+    """
+    configured = DwellingResults(input_items(lookup_sap_tables(runner.prepare_sap(dwelling))))
+    return [name for name, _, _ in _input_slots(configured)]
+
+
+def sensitivities(dwelling, outputs=OUTPUTS, inputs=None):
+    """
+    Derivatives of the outputs of the SAP calculation of a dwelling with
+    respect to its continuous inputs
+
+    Args:
+        dwelling: input Dwelling
+        outputs: names of the outputs, see OUTPUTS
+        inputs: names of the inputs, defaults to all those of :func:`continuous_inputs`
+
+    Returns:
+        Sensitivities
+    """
+    configured = DwellingResults(input_items(lookup_sap_tables(runner.prepare_sap(dwelling))))
+    copy_heating_systems(configured)
+
+    slots = _input_slots(configured)
+    if inputs is not None:
+        by_name = {slot[0]: slot for slot in slots}
+        unknown = [name for name in inputs if name not in by_name]
+        if unknown:
+            raise SAPInputError("Unknown continuous inputs {}".format(unknown))
+        slots = [by_name[name] for name in inputs]
+
+    seed = numpy.eye(len(slots))
+    for i, (name, owner, attr) in enumerate(slots):
+        if owner is configured:
+            configured[attr] = Dual(configured[attr], seed[i])
+        else:
+            setattr(owner, attr, Dual(getattr(owner, attr), seed[i]))
+
+    calculated = worksheet.perform_full_calc(configured)
+    results = dict(sap_value=_sap_value(calculated.GFA, calculated.fuel_cost))
+
+    values = dict()
+    gradients = dict()
+    for output in outputs:
+        result = results[output] if output in results else calculated[output]
+        values[output] = float(_value(result))
+        gradients[output] = result.grad if isinstance(result, Dual) else numpy.zeros(len(slots))
+
+    return Sensitivities([name for name, _, _ in slots], values, gradients)
@@ -0,0 +1,506 @@
+"""
+Calculation service
+~~~~~~~~~~~~~~~~~~~
+
+Long running local service, so that callers do not pay the interpreter
+start-up and the PCDF and SAP table loads on every calculation.
+
+An asyncio front-end accepts JSON dwellings (see :mod:`epctk.io.json_io`)
+over HTTP on a TCP port or a Unix socket. Dwellings from concurrent
+requests are gathered into small batches and run on a pool of worker
+processes that loaded all the data tables when they started.
+
+When more than ``max_pending`` dwellings are waiting or being calculated,
+new requests are refused with ``503 Service Unavailable`` rather than
+queued without bound. A request of more than ``max_pending`` dwellings
+could never be accepted and is refused with ``413 Payload Too Large``.
+
+Run with::
+
+    python -m epctk.service --unix /run/epctk.sock --workers 8
+
+and request a calculation with e.g.::
+
+    curl --unix-socket /run/epctk.sock -d @dwelling.json http://localhost/calculate/sap
+
+The request body is either a dwelling, ``{"dwelling": {...}}`` or
+``{"dwellings": [...]}``, optionally with ``"outputs": [names]`` to choose
+the result values returned.
+
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from . import instrumentation
+
+# Result values returned when the request does not name its outputs
+DEFAULT_OUTPUTS = {
+    'sap': ('sap_value', 'sap_energy_cost_factor', 'fuel_cost', 'emissions'),
+    'der': ('der_rating', 'emissions'),
+    'fee': ('fee_rating',),
+    'ter': ('ter_rating',),
+}
+
+_MAX_HEADER_LINES = 100
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+}
+
+
+class ServiceOverloaded(Exception):
+    pass
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _calculations():
+    from . import runner
+    from .appendix import appendix_t
+
+    return {
+        'sap': runner.run_sap,
+        'der': runner.run_der,
+        'fee': runner.run_fee,
+        'ter': appendix_t.run_ter,
+    }
+
+
+def warm_up():
+    """
+    Load the PCDF, SAP tables and fuel data into this process
+    """
+    # The runner must be imported first, importing epctk.fuels on its own is circular
+    _calculations()
+
+    from . import fuels
+    from .io import pcdf
+
+    pcdf.get_table('191')
+    fuels.get_fuel_data_table_12(1)
+    fuels.get_fuel_data_pcdf(1)
+
+
+def _init_worker():
+    warm_up()
+
+    from .dwelling import disable_reporting
+    disable_reporting()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _result_value(value):
+    from .io.json_io import to_jsonable
+
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    return to_jsonable(value)
+
+
+def run_jobs(jobs):
+    """
+    Calculate a batch of dwellings. Runs in the worker processes.
+
+    Args:
+        jobs: list of (calculation type, JSON dwelling dict, output names)
+
+    Returns:
+        list with for each job {"results": {...}} or {"error": message}
+    """
+    from .io.json_io import dwelling_from_dict
+
+    calculations = _calculations()
+    out = []
+    for calc_type, data, outputs in jobs:
+        try:
+            dwelling = calculations[calc_type](dwelling_from_dict(data))
+            out.append(dict(results={name: _result_value(dwelling.get(name)) for name in outputs}))
+        except Exception as err:
+            logging.debug("service.py: %s calculation failed: %r", calc_type, err)
+            out.append(dict(error="{}: {}".format(type(err).__name__, err)))
+
+    return out
+
+
+class CalculationService:
+    """
+    Pool of warm worker processes fed with micro-batches of dwellings
+
+    Args:
+        workers: number of worker processes, defaults to the number of CPUs
+        batch_size: maximum number of dwellings sent to a worker at once
+        batch_window: seconds to wait for more dwellings to fill a batch
+        max_pending: dwellings accepted (queued or running) before refusing requests
+        shared_tables: share one read-only copy of the PCDF between the workers,
+            see :mod:`epctk.shared_tables`
+    """
+    def __init__(self, workers=None, batch_size=16, batch_window=0.002, max_pending=4096,
+                 shared_tables=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.shared_tables = shared_tables
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self.n_calculated = 0
+        self.n_rejected = 0
+
+        self._pool = None
+        self._shared_tables = None
+        self._queue = None
+        self._batcher = None
+        self._in_flight = None
+        self._tasks = set()
+
+    async def start(self):
+        """
+        Start the worker processes and wait until they have all loaded their data
+        """
+        loop = asyncio.get_running_loop()
+        # Forked workers then start with the data already loaded
+        warm_up()
+        if self.shared_tables:
+            from .shared_tables import create_shared_tables
+            self._shared_tables = create_shared_tables()
+
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        # Submitting one task per worker at once makes the pool start them all now
+        await asyncio.gather(*[loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)])
+
+        self._queue = asyncio.Queue()
+        # Keep at most two batches per worker with the pool so that the rest
+        # wait here, where they can still be collected into larger batches
+        self._in_flight = asyncio.Semaphore(2 * self.workers)
+        self._batcher = asyncio.ensure_future(self._collect_batches())
+        logging.info("service.py: %d workers ready", self.workers)
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+        if self._shared_tables is not None:
+            from .shared_tables import close_shared_tables
+            close_shared_tables(self._shared_tables)
+            self._shared_tables = None
+
+    async def calculate(self, calc_type, dwellings, outputs=None):
+        """
+        Calculate a list of JSON dwellings
+
+        Args:
+            calc_type: one of 'sap', 'der', 'fee', 'ter'
+            dwellings: list of JSON dwelling dicts
+            outputs: names of the result values to return, see DEFAULT_OUTPUTS
+
+        Raises:
+            RequestTooLarge: if there are more dwellings than max_pending
+            ServiceOverloaded: if accepting the dwellings would exceed max_pending
+
+        Returns:
+            list with for each dwelling {"results": {...}} or {"error": message}
+        """
+        if calc_type not in DEFAULT_OUTPUTS:
+            raise ValueError("Unknown calculation type {}".format(calc_type))
+
+        if len(dwellings) > self.max_pending:
+            raise RequestTooLarge("At most {} dwellings can be calculated at once, {} were sent".format(
+                    self.max_pending, len(dwellings)))
+
+        if self.pending + len(dwellings) > self.max_pending:
+            self.n_rejected += len(dwellings)
+            instrumentation.count('service.rejected', len(dwellings))
+            raise ServiceOverloaded("{} dwellings already pending".format(self.pending))
+
+        outputs = tuple(outputs or DEFAULT_OUTPUTS[calc_type])
+        loop = asyncio.get_running_loop()
+        futures = []
+        self.pending += len(dwellings)
+        for data in dwellings:
+            future = loop.create_future()
+            futures.append(future)
+            self._queue.put_nowait(((calc_type, data, outputs), future))
+
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            self.pending -= len(dwellings)
+
+    async def _collect_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._in_flight.acquire()
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            jobs = [job for job, _ in batch]
+            with instrumentation.stage('service.batch'):
+                results = await loop.run_in_executor(self._pool, run_jobs, jobs)
+        except Exception as err:
+            results = [dict(error="{}: {}".format(type(err).__name__, err))] * len(batch)
+        finally:
+            self._in_flight.release()
+
+        instrumentation.count('service.dwellings', len(batch))
+        instrumentation.count('service.batches')
+        self.n_calculated += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def status(self):
+        return dict(workers=self.workers,
+                    pending=self.pending,
+                    calculated=self.n_calculated,
+                    rejected=self.n_rejected)
+
+
+def _parse_body(body):
+    """
+    Returns:
+        tuple of (list of JSON dwellings, output names or None, whether a single dwelling was sent)
+    """
+    try:
+        data = json.loads(body.decode('utf-8'))
+    except ValueError as err:
+        raise RequestError(400, "Invalid JSON: {}".format(err))
+
+    if not isinstance(data, dict):
+        raise RequestError(400, "Request body must be a JSON object")
+
+    outputs = data.get('outputs')
+    if outputs is not None and not (isinstance(outputs, list) and all(isinstance(o, str) for o in outputs)):
+        raise RequestError(400, "outputs must be a list of names")
+
+    if 'dwellings' in data:
+        dwellings = data['dwellings']
+        if not isinstance(dwellings, list) or not all(isinstance(d, dict) for d in dwellings):
+            raise RequestError(400, "dwellings must be a list of objects")
+        return dwellings, outputs, False
+
+    if 'dwelling' in data:
+        if not isinstance(data['dwelling'], dict):
+            raise RequestError(400, "dwelling must be an object")
+        return [data['dwelling']], outputs, True
+
+    data.pop('outputs', None)
+    return [data], outputs, True
+
+
+class HTTPFrontEnd:
+    """
+    Minimal HTTP/1.1 front-end for a CalculationService
+
+    Routes:
+        POST /calculate/<sap|der|fee|ter>
+        GET /health
+        GET /metrics (Prometheus text format)
+
+    """
+    def __init__(self, service, max_body_bytes=16 * 1024 ** 2):
+        self.service = service
+        self.max_body_bytes = max_body_bytes
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                status, payload, content_type = await self._dispatch(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        line = await reader.readline()
+        if not line:
+            return None
+
+        try:
+            method, path, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            await self._respond(writer, 400, dict(error="Malformed request line"), keep_alive=False)
+            return None
+
+        headers = {}
+        for _ in range(_MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            await self._respond(writer, 400, dict(error="Malformed Content-Length"), keep_alive=False)
+            return None
+
+        if length > self.max_body_bytes:
+            await self._respond(writer, 413, dict(error="Request body too large"), keep_alive=False)
+            return None
+
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), path, headers, body
+
+    async def _dispatch(self, method, path, body):
+        path = path.split('?', 1)[0].rstrip('/')
+        try:
+            if path == '/health':
+                return 200, dict(status='ok', **self.service.status()), 'application/json'
+
+            if path == '/metrics':
+                return 200, instrumentation.to_prometheus(), 'text/plain; version=0.0.4'
+
+            if path.startswith('/calculate/'):
+                if method != 'POST':
+                    raise RequestError(405, "Use POST to request a calculation")
+
+                calc_type = path[len('/calculate/'):]
+                if calc_type not in DEFAULT_OUTPUTS:
+                    raise RequestError(404, "Unknown calculation type {}".format(calc_type))
+
+                dwellings, outputs, single = _parse_body(body)
+                results = await self.service.calculate(calc_type, dwellings, outputs)
+                return 200, results[0] if single else dict(results=results), 'application/json'
+
+            raise RequestError(404, "Not found: {}".format(path))
+
+        except RequestError as err:
+            return err.status, dict(error=str(err)), 'application/json'
+        except RequestTooLarge as err:
+            return 413, dict(error=str(err)), 'application/json'
+        except ServiceOverloaded as err:
+            return 503, dict(error=str(err)), 'application/json'
+
+    async def _respond(self, writer, status, payload, content_type='application/json', keep_alive=True):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+        else:
+            body = json.dumps(payload).encode('utf-8')
+
+        headers = ["HTTP/1.1 {} {}".format(status, _REASONS.get(status, '')),
+                   "Content-Type: {}".format(content_type),
+                   "Content-Length: {}".format(len(body)),
+                   "Connection: {}".format('keep-alive' if keep_alive else 'close')]
+        if status == 503:
+            headers.append("Retry-After: 1")
+
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+
+async def start_server(service, host='127.0.0.1', port=8000, path=None):
+    """
+    Start the service and listen on a TCP port, or on a Unix socket if `path` is given
+
+    Returns:
+        asyncio server
+    """
+    await service.start()
+    front_end = HTTPFrontEnd(service)
+
+    if path is not None:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(front_end.handle_connection, path=path)
+        logging.info("service.py: listening on %s", path)
+    else:
+        server = await asyncio.start_server(front_end.handle_connection, host=host, port=port)
+        logging.info("service.py: listening on %s:%d", host, port)
+
+    return server
+
+
+async def serve(service, host='127.0.0.1', port=8000, path=None):
+    server = await start_server(service, host, port, path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the epctk calculation service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--batch-window', type=float, default=0.002, help="seconds")
+    parser.add_argument('--max-pending', type=int, default=4096)
+    parser.add_argument('--shared-tables', action='store_true',
+                        help="share one copy of the PCDF between the workers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = CalculationService(args.workers, args.batch_size, args.batch_window, args.max_pending,
+                                 args.shared_tables)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
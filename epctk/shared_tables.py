@@ -0,0 +1,300 @@
+"""
+Shared tables
+~~~~~~~~~~~~~
+
+Read-only PCDF store shared between worker processes.
+
+The parsed PCDF is by far the largest table a calculation process
+holds: its ~8000 rows become ~170k Python strings and lists, about
+12 MB per process, and fork's copy-on-write sharing does not survive
+reference counting touching them. The SAP tables (4a, 4b, 4e, 12 and
+Appendix S) are a few kB each and stay as module level dicts.
+
+:func:`create_shared_tables` writes the PCDF rows once to a memory
+mapped file (in /dev/shm when available), with numpy index arrays
+to find a product by table and id. Processes attach to it read-only,
+so all of them share the same physical pages, and a row is only split
+into tokens when it is looked up.
+
+Worker processes attach automatically when the ``EPCTK_SHARED_TABLES``
+environment variable names the store, which :func:`create_shared_tables`
+sets for processes started afterwards.
+
+Usage::
+
+    with shared_tables.create_shared_tables():
+        with ProcessPoolExecutor(32) as pool:
+            ...
+
+"""
+import collections.abc
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy
+
+from .io import pcdf
+
+SHARED_TABLES_ENV = 'EPCTK_SHARED_TABLES'
+
+_MAGIC = b'EPCTKST1'
+_HEADER = struct.Struct('<8sQ')
+_ALIGN = 8
+
+
+class SharedPCDFTable(collections.abc.Mapping):
+    """
+    One PCDF table, mapping product id to the list of row tokens as
+    returned by :func:`epctk.io.pcdf.load_pcdf`
+    """
+    def __init__(self, store, start, stop):
+        self._store = store
+        self._start = start
+        self._stop = stop
+
+    def __getitem__(self, product_id):
+        index = self._store.find(self._start, self._stop, product_id)
+        if index is None:
+            raise KeyError(product_id)
+        return self._store.row(index)
+
+    def __iter__(self):
+        for product_id in self._store.ids[self._start:self._stop]:
+            yield product_id.decode()
+
+    def __len__(self):
+        return self._stop - self._start
+
+
+class SharedTables(collections.abc.Mapping):
+    """
+    PCDF tables held in a memory mapped file, used in place of the dict
+    returned by :func:`epctk.io.pcdf.load_pcdf`
+
+    Args:
+        path: store file written by :func:`write_shared_tables`
+        owner: whether to delete the file on close
+    """
+    def __init__(self, path, owner=False):
+        self.path = path
+        self.owner = owner
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise ValueError("{} is not a shared tables file".format(path))
+
+        header = json.loads(self._mmap[_HEADER.size:_HEADER.size + header_length].decode())
+        self.source = header['source']
+
+        arrays = {name: numpy.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+                  for name, (dtype, count, offset) in header['arrays'].items()}
+        self.ids = arrays['ids']
+        self._sorted_ids = arrays['sorted_ids']
+        self._sorted_index = arrays['sorted_index']
+        self._offsets = arrays['offsets']
+        self._lengths = arrays['lengths']
+        self._blob_offset = header['blob_offset']
+
+        self._tables = {table_id: SharedPCDFTable(self, start, stop)
+                        for table_id, (start, stop) in header['tables'].items()}
+
+    def __getitem__(self, table_id):
+        return self._tables[table_id]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def find(self, start, stop, product_id):
+        """
+        Returns:
+            index of the row with the given id in the table stored in rows
+            [start, stop), or None if there is no such row
+        """
+        key = str(product_id).encode()
+        ids = self._sorted_ids[start:stop]
+        i = int(numpy.searchsorted(ids, key))
+        if i < len(ids) and ids[i] == key:
+            return int(self._sorted_index[start + i])
+        return None
+
+    def row(self, index):
+        offset = self._blob_offset + int(self._offsets[index])
+        return self._mmap[offset:offset + int(self._lengths[index])].decode().split(',')
+
+    def close(self):
+        # Arrays viewing the map must go before it can be closed
+        self.ids = self._sorted_ids = self._sorted_index = self._offsets = self._lengths = None
+        self._tables = {}
+        self._mmap.close()
+        if self.owner and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        close_shared_tables(self)
+        return False
+
+
+def _pcdf_rows(pcdf_data_file):
+    """
+    PCDF rows grouped by table in file order, keeping the last row for
+    a repeated id as load_pcdf does
+
+    Returns:
+        dict of table id -> dict of product id -> row line
+    """
+    tables = dict()
+    current = dict()
+    currentid = None
+    with open(pcdf_data_file, 'r') as datafile:
+        for line in datafile:
+            if line[0] == "#":
+                continue
+
+            tokens = line.split(',')
+            if line[0] == "$":
+                currentid = tokens[0][1:]
+                current = dict()
+                tables[currentid] = current
+            else:
+                current[pcdf.row_id(currentid, tokens)] = line
+    return tables
+
+
+def write_shared_tables(path, pcdf_data_file=None):
+    """
+    Write the PCDF rows and their index to a shared tables file
+
+    Args:
+        path: file to write
+        pcdf_data_file: PCDF file, defaults to the one used by the calculation
+    """
+    pcdf_data_file = pcdf_data_file or pcdf._PCDF_DATA_FILE
+    tables = _pcdf_rows(pcdf_data_file)
+
+    ids = []
+    lines = []
+    bounds = {}
+    for table_id, rows in tables.items():
+        bounds[table_id] = (len(ids), len(ids) + len(rows))
+        ids.extend(rows.keys())
+        lines.extend(line.encode() for line in rows.values())
+
+    width = max([len(i.encode()) for i in ids] + [1])
+    ids = numpy.array([i.encode() for i in ids], dtype='S%d' % width)
+    lengths = numpy.array([len(line) for line in lines], dtype='<i8')
+    offsets = numpy.zeros(len(lines), dtype='<i8')
+    numpy.cumsum(lengths[:-1], out=offsets[1:])
+
+    # Sort ids within each table, so that a row can be found by binary search
+    sorted_index = numpy.arange(len(ids), dtype='<i8')
+    for start, stop in bounds.values():
+        sorted_index[start:stop] = start + numpy.argsort(ids[start:stop], kind='stable')
+    sorted_ids = ids[sorted_index]
+
+    arrays = [('ids', ids), ('sorted_ids', sorted_ids), ('sorted_index', sorted_index),
+              ('offsets', offsets), ('lengths', lengths)]
+
+    def layout(header_length):
+        position = _HEADER.size + header_length
+        placed = {}
+        for name, array in arrays:
+            position += -position % _ALIGN
+            placed[name] = (array.dtype.str, len(array), position)
+            position += array.nbytes
+        return placed, position
+
+    # The header holds the array offsets, which depend on the header length
+    header_length = 0
+    while True:
+        placed, blob_offset = layout(header_length)
+        header = json.dumps(dict(source=os.path.abspath(pcdf_data_file), tables=bounds,
+                                 arrays=placed, blob_offset=blob_offset)).encode()
+        if len(header) == header_length:
+            break
+        header_length = len(header)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(header)))
+        f.write(header)
+        for name, array in arrays:
+            f.seek(placed[name][2])
+            f.write(array.tobytes())
+        f.seek(blob_offset)
+        f.write(b''.join(lines))
+
+
+def _default_folder():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def install_shared_tables(tables):
+    """
+    Use the shared tables for PCDF lookups in this process
+
+    Args:
+        tables: SharedTables
+    """
+    pcdf._PCDF_CACHE = tables
+
+
+def create_shared_tables(path=None, pcdf_data_file=None):
+    """
+    Build the shared tables, use them in this process and set
+    EPCTK_SHARED_TABLES so that processes started later attach to them.
+    The file is deleted when the returned SharedTables is closed.
+
+    Args:
+        path: store file, defaults to a new file in /dev/shm
+        pcdf_data_file: PCDF file, defaults to the one used by the calculation
+
+    Returns:
+        SharedTables
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='epctk-tables-', suffix='.bin', dir=_default_folder())
+        os.close(fd)
+
+    write_shared_tables(path, pcdf_data_file)
+    tables = SharedTables(path, owner=True)
+    install_shared_tables(tables)
+    os.environ[SHARED_TABLES_ENV] = path
+    logging.info("shared_tables.py: PCDF shared from %s", path)
+    return tables
+
+
+def attach_shared_tables(path):
+    """
+    Attach read-only to shared tables made by another process and use them
+    in this process
+
+    Returns:
+        SharedTables
+    """
+    tables = SharedTables(path)
+    install_shared_tables(tables)
+    return tables
+
+
+def close_shared_tables(tables):
+    """
+    Stop using the shared tables in this process and close them. The PCDF is
+    loaded again by the next lookup.
+    """
+    if pcdf._PCDF_CACHE is tables:
+        pcdf._PCDF_CACHE = None
+    if tables.owner and os.environ.get(SHARED_TABLES_ENV) == tables.path:
+        del os.environ[SHARED_TABLES_ENV]
+    tables.close()
@@ -3,9 +3,12 @@ import math
 import numpy
 
 from .tables import TABLE_6D
-from .constants import SOLAR_HEATING, SolarConstants
+from .climate import regional_climate
+from .constants import SOLAR_HEATING
+from .instrumentation import timed
 
 
+@timed()
 def overshading_factors(dwelling_overshading):
     """
     Set dwelling overshading factors from Table 6D, based on the shading amount
@@ -50,6 +53,7 @@ def solar_access_factor_summer(dwelling, opening):
         return dwelling.solar_access_factor_summer
 
 
+@timed()
 def solar(dwelling):
     solar_gain_winter = sum(
         0.9 * solar_access_factor_winter(dwelling,
@@ -61,10 +65,11 @@ def solar(dwelling):
         for o in dwelling.openings)
 
     # TODO Really only want to do this if we have cooling
+    solar_summer = regional_climate().solar_summer_coefficients(dwelling.sap_region)
     sol_gain = 0
     for o in dwelling.openings:
         sol_inc = incident_solar(dwelling.Igh_summer,
-                                 SolarConstants(dwelling.latitude),
+                                 solar_summer,
                                  o.orientation_degrees * math.pi / 180,
                                  o.opening_type.roof_window)
         sol_access = solar_access_factor_summer(dwelling, o)
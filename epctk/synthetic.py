@@ -0,0 +1,521 @@
+"""
+Synthetic dwellings
+~~~~~~~~~~~~~~~~~~~
+
+Random but valid dwelling inputs, to load test batch calculations with
+workloads much larger than the reference cases::
+
+    for dwelling in synthetic.generate(10000, seed=1):
+        runner.run_sap(dwelling)
+
+Each dwelling is drawn from its own random generator seeded with the seed
+and the index of the dwelling, so a stream is reproducible, and a slice
+of it, ``generate(n, seed, start=k)``, can be made without drawing the
+dwellings before it. Nothing is kept once a dwelling has been yielded.
+
+The samples cover house and flat archetypes, fabric by age band, all the
+SAP regions, natural and mechanical ventilation, and heating by Table 4b
+and PCDF boilers, Table 4a and PCDF heat pumps, solid fuel boilers,
+electric storage heaters, room heaters and community heating, with
+optional secondary heating, solar water heating, PV and wind. Every
+dwelling has the inputs required by :data:`epctk.io.validator.ATTRIBUTES`.
+
+Streams are written as YAML documents (see :mod:`epctk.io.yaml_io`) or
+as the ``{"dwellings": [...]}`` body of a batch request to
+:mod:`epctk.service`::
+
+    python -m epctk.synthetic -n 100000 --seed 1 --format batch -o dwellings.json
+"""
+import argparse
+import json
+import math
+import sys
+
+import numpy
+
+# elements is imported before dwelling, which imports it through fuels
+from .elements import (CommunityDistributionTypes, CylinderInsulationTypes, DuctTypes, FloorTypes, GlazingTypes,
+                       HeatEmitters, HeatLossElement, HeatLossElementTypes, ImmersionTypes, Opening,
+                       OpeningType, OvershadingTypes, PVOvershading, TerrainTypes, VentilationTypes,
+                       WallTypes)
+from .dwelling import Dwelling
+from .fuels import ELECTRICITY_7HR, ELECTRICITY_STANDARD, fuel_from_code
+from .io import pcdf
+
+# name: (weight, storeys and their weights, median floor area, exposed fraction of the perimeter)
+ARCHETYPES = {
+    'detached': (0.25, ((1, 2, 3), (0.2, 0.7, 0.1)), 120., 1.),
+    'semi_detached': (0.3, ((1, 2, 3), (0.1, 0.85, 0.05)), 90., 0.75),
+    'end_terrace': (0.1, ((2, 3), (0.85, 0.15)), 80., 0.75),
+    'mid_terrace': (0.15, ((2, 3), (0.85, 0.15)), 75., 0.5),
+    'flat': (0.2, ((1,), (1.,)), 60., 0.5),
+}
+
+# name: (weight, wall, roof and floor U-values, glazing type, glazing U-value,
+#        thermal bridging, probability of a pressure test)
+AGE_BANDS = {
+    'pre_1919': (0.2, 1.7, 2.3, 0.8, GlazingTypes.SINGLE, 4.8, 0.15, 0.),
+    '1919_1964': (0.3, 1.5, 1.5, 0.7, GlazingTypes.DOUBLE, 3.1, 0.15, 0.),
+    '1965_1990': (0.25, 1.0, 0.4, 0.6, GlazingTypes.DOUBLE, 2.8, 0.15, 0.),
+    '1991_2005': (0.15, 0.45, 0.25, 0.25, GlazingTypes.DOUBLE, 2.0, 0.11, 0.3),
+    'post_2006': (0.1, 0.28, 0.16, 0.2, GlazingTypes.DOUBLE, 1.6, 0.08, 1.),
+}
+
+# ventilation type: weight, for dwellings built since 2006. Older
+# dwellings are naturally ventilated or have extract ventilation.
+VENTILATION = {
+    VentilationTypes.NATURAL: 0.5,
+    VentilationTypes.MEV_CENTRALISED: 0.15,
+    VentilationTypes.MVHR: 0.25,
+    VentilationTypes.MV: 0.05,
+    VentilationTypes.PIV_FROM_OUTSIDE: 0.05,
+}
+
+GAS_COMBI_CODES = (103, 104, 107, 108, 112, 113, 118)
+GAS_REGULAR_CODES = (101, 102, 105, 106, 110, 111, 114, 115, 117)
+OIL_BOILER_CODES = (124, 125, 126, 127, 129, 130)
+SOLID_FUEL_BOILER_CODES = (151, 153, 155, 158)
+HEAT_PUMP_CODES = (201, 202, 203, 204)
+STORAGE_HEATER_CODES = (401, 402, 403, 404, 405, 406, 407)
+ROOM_HEATER_CODES = (601, 603, 605, 609, 610)
+SECONDARY_HEATER_CODES = (691, 692, 693, 694)
+
+_PCDF_BOILERS = None
+_PCDF_HEAT_PUMPS = None
+
+
+def pcdf_boilers():
+    """
+    Returns:
+        sorted ids of the mains gas regular and combi boilers of the PCDF,
+        except the combis with losses from Table 3c, which is not implemented
+    """
+    global _PCDF_BOILERS
+    if _PCDF_BOILERS is None:
+        _PCDF_BOILERS = sorted(boiler_id for boiler_id, fields in pcdf.get_table('104').items()
+                               if fields[10] == '1' and fields[13] in ('1', '2') and fields[14] == '0' and
+                               pcdf.get_boiler(boiler_id).get('storage_loss_factor_f2') is None)
+    return _PCDF_BOILERS
+
+
+def pcdf_heat_pumps():
+    """
+    Returns:
+        list of (id, maximum output, lowest and highest plant size ratio)
+        of the electric space and water heating heat pumps of the PCDF
+        with a separate cylinder, sorted by id
+    """
+    global _PCDF_HEAT_PUMPS
+    if _PCDF_HEAT_PUMPS is None:
+        _PCDF_HEAT_PUMPS = []
+        for hp_id in sorted(pcdf.get_table('361')):
+            hp = pcdf.get_heat_pump(hp_id)
+            if hp['fuel'] == '39' and hp['service_provision'] == '1' and hp['hw_vessel'] == 2:
+                # The range accepted by tables_appendix_n.interpolate_efficiency
+                psrs = hp['psr_datasets'][0]
+                _PCDF_HEAT_PUMPS.append((hp_id, hp['maximum_output'], psrs[0]['psr'], psrs[-1]['psr']))
+    return _PCDF_HEAT_PUMPS
+
+
+def heat_loss_coefficient(dwelling):
+    """
+    Rough heat loss coefficient of a dwelling, W/K, from its fabric and
+    an assumed air change rate of 0.7 per hour
+    """
+    elements = dwelling['heat_loss_elements']
+    return (sum(e.area * e.Uvalue for e in elements) +
+            dwelling['Uthermalbridges'] * sum(e.area for e in elements) +
+            0.33 * 0.7 * dwelling['volume'])
+
+
+def _choice(rng, options, weights=None):
+    if weights is not None:
+        weights = numpy.asarray(weights, dtype=float)
+        weights = weights / weights.sum()
+    return options[rng.choice(len(options), p=weights)]
+
+
+def _weighted_key(rng, table):
+    keys = list(table)
+    weights = [v[0] if isinstance(v, tuple) else v for v in table.values()]
+    return _choice(rng, keys, weights)
+
+
+def _round(x, digits=2):
+    return round(float(x), digits)
+
+
+def _cylinder(rng, volume=None):
+    return dict(
+        has_hw_cylinder=True,
+        hw_cylinder_volume=volume or float(_choice(rng, (110., 120., 150., 180., 210.))),
+        hw_cylinder_insulation_type=CylinderInsulationTypes.FOAM,
+        hw_cylinder_insulation=float(_choice(rng, (25, 38, 50, 80))),
+        cylinder_in_heated_space=bool(rng.random() < 0.8),
+        has_cylinderstat=bool(rng.random() < 0.8),
+        has_hw_time_control=bool(rng.random() < 0.6),
+        primary_pipework_insulated=bool(rng.random() < 0.5),
+    )
+
+
+def _no_cylinder():
+    return dict(has_hw_cylinder=False, has_hw_time_control=False)
+
+
+def _boiler(rng, code, fuel_code, combi):
+    heating = dict(
+        main_heating_type_code=code,
+        main_sys_fuel=fuel_from_code(fuel_code),
+        heating_emitter_type=HeatEmitters.RADIATORS,
+        control_type_code=_choice(rng, (2102, 2104, 2106, 2107, 2110)),
+        sys1_has_boiler_interlock=bool(rng.random() < 0.8),
+        central_heating_pump_in_heated_space=True,
+        water_heating_type_code=901,
+        water_sys_fuel=fuel_from_code(fuel_code),
+    )
+    heating.update(_no_cylinder() if combi else _cylinder(rng))
+    return heating
+
+
+def gas_boiler(rng, dwelling):
+    combi = rng.random() < 0.6
+    return _boiler(rng, _choice(rng, GAS_COMBI_CODES if combi else GAS_REGULAR_CODES), 1, combi)
+
+
+def pcdf_boiler(rng, dwelling):
+    boiler_id = _choice(rng, pcdf_boilers())
+    combi = pcdf.get_boiler(boiler_id)['main_type'] != 'Regular'
+    heating = _boiler(rng, None, 1, combi)
+    heating['main_heating_pcdf_id'] = boiler_id
+    return heating
+
+
+def oil_boiler(rng, dwelling):
+    code = _choice(rng, OIL_BOILER_CODES)
+    heating = _boiler(rng, code, 4, code in (129, 130))
+    heating['main_heating_oil_pump_inside_dwelling'] = bool(rng.random() < 0.5)
+    return heating
+
+
+def solid_fuel_boiler(rng, dwelling):
+    code = _choice(rng, SOLID_FUEL_BOILER_CODES)
+    heating = _boiler(rng, code, 23 if code == 155 else _choice(rng, (11, 15, 20)), False)
+    heating['control_type_code'] = _choice(rng, (2102, 2104, 2106))
+    return heating
+
+
+def heat_pump(rng, dwelling):
+    heating = dict(
+        main_heating_type_code=_choice(rng, HEAT_PUMP_CODES),
+        main_sys_fuel=ELECTRICITY_STANDARD,
+        heating_emitter_type=_choice(rng, (HeatEmitters.RADIATORS, HeatEmitters.UNDERFLOOR_SCREED)),
+        control_type_code=_choice(rng, (2201, 2204, 2205, 2207)),
+        sys1_has_boiler_interlock=False,
+        central_heating_pump_in_heated_space=True,
+        water_heating_type_code=901,
+        water_sys_fuel=ELECTRICITY_STANDARD,
+    )
+    heating.update(_cylinder(rng, 180.))
+    return heating
+
+
+def pcdf_heat_pump(rng, dwelling):
+    """
+    A PCDF heat pump whose plant size ratio is within its data for the
+    estimated heat loss of the dwelling, or a Table 4a heat pump if there is none
+    """
+    heating = heat_pump(rng, dwelling)
+    psr = 1000 / (24.2 * heat_loss_coefficient(dwelling))
+    candidates = [hp_id for hp_id, maximum_output, psr_min, psr_max in pcdf_heat_pumps()
+                  if 1.5 * psr_min < maximum_output * psr < 0.7 * psr_max]
+    if candidates:
+        heating.update(main_heating_type_code=None, main_heating_pcdf_id=_choice(rng, candidates),
+                       control_type_code=2207, measured_cylinder_loss=_round(rng.uniform(1.2, 2.5)))
+        del heating['hw_cylinder_insulation_type'], heating['hw_cylinder_insulation']
+    return heating
+
+
+def storage_heaters(rng, dwelling):
+    heating = dict(
+        main_heating_type_code=_choice(rng, STORAGE_HEATER_CODES),
+        main_sys_fuel=ELECTRICITY_7HR,
+        electricity_tariff=ELECTRICITY_7HR,
+        control_type_code=_choice(rng, (2401, 2402, 2403)),
+        heating_emitter_type=None,
+        secondary_heating_type_code=_choice(rng, SECONDARY_HEATER_CODES),
+        secondary_sys_fuel=ELECTRICITY_7HR,
+        water_heating_type_code=903,
+        water_sys_fuel=ELECTRICITY_7HR,
+        immersion_type=_choice(rng, (ImmersionTypes.SINGLE, ImmersionTypes.DUAL)),
+    )
+    heating.update(_cylinder(rng))
+    return heating
+
+
+def room_heaters(rng, dwelling):
+    heating = dict(
+        main_heating_type_code=_choice(rng, ROOM_HEATER_CODES),
+        main_sys_fuel=fuel_from_code(1),
+        control_type_code=_choice(rng, (2601, 2602, 2603)),
+        heating_emitter_type=None,
+        water_heating_type_code=903,
+        water_sys_fuel=ELECTRICITY_STANDARD,
+        immersion_type=ImmersionTypes.DUAL,
+    )
+    heating.update(_cylinder(rng))
+    return heating
+
+
+def community_heating(rng, dwelling):
+    heating = dict(
+        main_heating_type_code='community',
+        main_sys_fuel=None,
+        community_heat_sources=[dict(heat_source_type=1, fraction=1.0,
+                                     efficiency=_round(rng.uniform(0.75, 0.9)), fuel=fuel_from_code(51))],
+        sap_community_distribution_type=_choice(rng, list(CommunityDistributionTypes)),
+        control_type_code=_choice(rng, (2301, 2303, 2306)),
+        heating_emitter_type=HeatEmitters.RADIATORS,
+        water_heating_type_code=901,
+        water_sys_fuel=None,
+    )
+    heating.update(_cylinder(rng, 110.))
+    return heating
+
+
+# name: (weight, function(rng, dwelling) -> dict of heating inputs)
+HEATING = {
+    'gas_boiler': (0.45, gas_boiler),
+    'pcdf_boiler': (0.2, pcdf_boiler),
+    'oil_boiler': (0.05, oil_boiler),
+    'solid_fuel_boiler': (0.02, solid_fuel_boiler),
+    'heat_pump': (0.04, heat_pump),
+    'pcdf_heat_pump': (0.03, pcdf_heat_pump),
+    'storage_heaters': (0.1, storage_heaters),
+    'room_heaters': (0.05, room_heaters),
+    'community': (0.06, community_heating),
+}
+
+
+def _fabric(rng, archetype, age_band, gfa, storeys, storey_height):
+    _, _, _, exposed = ARCHETYPES[archetype]
+    _, wall_u, roof_u, floor_u, glazing_type, glazing_u, _, _ = AGE_BANDS[age_band]
+
+    footprint = gfa / storeys
+    aspect = rng.uniform(1., 2.)
+    width = math.sqrt(footprint / aspect)
+    perimeter = 2 * (width + footprint / width)
+    gross_wall = perimeter * exposed * storey_height * storeys
+
+    window_area = min(gfa * rng.uniform(0.12, 0.25), 0.5 * gross_wall)
+    door_area = 1.85 * (1 if archetype == 'flat' else int(rng.integers(1, 3)))
+
+    def element(area, uvalue, element_type):
+        return HeatLossElement(area=_round(area), Uvalue=_round(uvalue * rng.uniform(0.9, 1.1)),
+                               is_external=True, element_type=element_type)
+
+    elements = [element(gross_wall - window_area - door_area, wall_u, HeatLossElementTypes.EXTERNAL_WALL),
+                element(door_area, 3., HeatLossElementTypes.OPAQUE_DOOR),
+                element(window_area, glazing_u, HeatLossElementTypes.GLAZING)]
+    # Flats have a roof on the top floor and a floor on the ground floor only
+    if archetype != 'flat' or rng.random() < 1 / 3:
+        elements.append(element(footprint, roof_u, HeatLossElementTypes.EXTERNAL_ROOF))
+    if archetype != 'flat' or rng.random() < 1 / 3:
+        elements.append(element(footprint, floor_u, HeatLossElementTypes.EXTERNAL_FLOOR))
+
+    glazing = OpeningType(glazing_type=glazing_type, gvalue=0.85 if glazing_type == GlazingTypes.SINGLE else 0.72,
+                          frame_factor=0.7, Uvalue=glazing_u, roof_window=False)
+    n_orientations = int(rng.integers(2, 5))
+    first = int(rng.integers(0, 8)) * 45
+    shares = rng.dirichlet(numpy.ones(n_orientations))
+    openings = [Opening(area=_round(window_area * share), orientation_degrees=(first + 90 * i) % 360,
+                        opening_type=glazing)
+                for i, share in enumerate(shares)]
+    return elements, openings
+
+
+def _ventilation(rng, age_band):
+    if age_band == 'post_2006':
+        ventilation_type = _weighted_key(rng, VENTILATION)
+    else:
+        ventilation_type = VentilationTypes.MEV_CENTRALISED if rng.random() < 0.05 else VentilationTypes.NATURAL
+    old = age_band in ('pre_1919', '1919_1964')
+
+    ventilation = dict(
+        ventilation_type=ventilation_type,
+        Nchimneys=int(rng.integers(0, 3)) if old else 0,
+        Nflues=int(rng.integers(0, 2)),
+        Nintermittentfans=0 if ventilation_type != VentilationTypes.NATURAL else int(rng.integers(0, 4)),
+        Npassivestacks=0,
+        Nfluelessgasfires=0,
+    )
+
+    if ventilation_type == VentilationTypes.MVHR:
+        ventilation['mv_ducttype'] = _choice(rng, (DuctTypes.FLEXIBLE_INSULATED, DuctTypes.RIGID_INSULATED))
+    elif ventilation_type != VentilationTypes.NATURAL:
+        ventilation['mv_ducttype'] = _choice(rng, (DuctTypes.FLEXIBLE, DuctTypes.RIGID))
+
+    pressure_test = AGE_BANDS[age_band][7]
+    if ventilation_type != VentilationTypes.NATURAL or rng.random() < pressure_test:
+        ventilation['pressurisation_test_result'] = _round(rng.uniform(2., 10.) if not old else rng.uniform(8., 15.))
+    else:
+        ventilation.update(
+            has_draught_lobby=bool(rng.random() < 0.2),
+            floor_type=_choice(rng, list(FloorTypes)),
+            draught_stripping=_round(rng.uniform(0., 1.)),
+            wall_type=_choice(rng, list(WallTypes)),
+        )
+    return ventilation
+
+
+def _renewables(rng, heating, archetype):
+    renewables = dict()
+    if archetype != 'flat' and rng.random() < 0.08:
+        renewables['photovoltaic_systems'] = [dict(
+            kWp=_round(rng.uniform(1., 4.)), pitch=30, orientation=_choice(rng, (135, 180, 225)),
+            overshading_category=_choice(rng, list(PVOvershading)))]
+    if archetype == 'detached' and rng.random() < 0.01:
+        renewables.update(N_wind_turbines=1, wind_turbine_rotor_diameter=2.0, wind_turbine_hub_height=6.0)
+    if heating.get('has_hw_cylinder') and heating['water_heating_type_code'] == 901 and rng.random() < 0.05:
+        renewables.update(
+            solar_collector_aperture=_round(rng.uniform(2., 5.)),
+            collector_zero_loss_effy=0.7,
+            collector_heat_loss_coeff=1.8,
+            collector_orientation=180,
+            collector_pitch=30,
+            collector_overshading=PVOvershading.MODEST,
+            has_electric_shw_pump=True,
+            solar_dedicated_storage_volume=75.0,
+            solar_storage_combined_cylinder=True,
+            hw_cylinder_volume=210.0,
+        )
+    return renewables
+
+
+def sample_dwelling(rng):
+    """
+    Draw one dwelling
+
+    Args:
+        rng: numpy.random.Generator
+
+    Returns:
+        Dwelling
+    """
+    archetype = _weighted_key(rng, ARCHETYPES)
+    _, (storey_options, storey_weights), median_area, _ = ARCHETYPES[archetype]
+    age_band = _weighted_key(rng, AGE_BANDS)
+
+    storeys = int(_choice(rng, storey_options, storey_weights))
+    gfa = _round(min(max(median_area * rng.lognormal(0., 0.3), 25.), 400.), 1)
+    storey_height = rng.uniform(2.4, 2.8)
+    elements, openings = _fabric(rng, archetype, age_band, gfa, storeys, storey_height)
+
+    n_outlets = max(int(gfa / 8), 4)
+    dwelling = Dwelling()
+    dwelling.update(dict(
+        GFA=gfa,
+        volume=_round(gfa * storey_height, 1),
+        Nstoreys=storeys,
+        living_area=_round(gfa * rng.uniform(0.15, 0.35), 1),
+        thermal_mass_parameter=float(_choice(rng, (100., 250., 450.))),
+        Uthermalbridges=AGE_BANDS[age_band][6],
+        sap_region=int(rng.integers(1, 22)),
+        terrain_type=_choice(rng, list(TerrainTypes)),
+        is_flat=archetype == 'flat',
+        overshading=_choice(rng, list(OvershadingTypes), (0.05, 0.2, 0.6, 0.15)),
+        Nshelteredsides=int(min(rng.integers(0, 3) + (1 - ARCHETYPES[archetype][3]) * 4, 4)),
+
+        low_water_use=bool(rng.random() < 0.1),
+        lighting_outlets_total=n_outlets,
+        lighting_outlets_low_energy=int(rng.integers(0, n_outlets + 1)),
+        electricity_tariff=ELECTRICITY_STANDARD,
+        secondary_heating_type_code=None,
+
+        heat_loss_elements=elements,
+        openings=openings,
+    ))
+    dwelling.update(_ventilation(rng, age_band))
+
+    heating = HEATING[_weighted_key(rng, HEATING)][1](rng, dwelling)
+    dwelling.update(heating)
+    if dwelling['secondary_heating_type_code'] is None and rng.random() < 0.15:
+        dwelling.update(secondary_heating_type_code=_choice(rng, SECONDARY_HEATER_CODES),
+                        secondary_sys_fuel=dwelling['electricity_tariff'])
+    dwelling.update(_renewables(rng, heating, archetype))
+    return dwelling
+
+
+def generate(n, seed=0, start=0):
+    """
+    Stream synthetic dwellings
+
+    Args:
+        n: number of dwellings
+        seed: seed of the stream
+        start: index of the first dwelling in the stream
+
+    Yields:
+        Dwelling
+    """
+    for i in range(start, start + n):
+        yield sample_dwelling(numpy.random.default_rng([seed, i]))
+
+
+def write_yaml(dwellings, stream):
+    """
+    Write dwellings as a stream of YAML documents
+
+    Returns:
+        number of dwellings written
+    """
+    from .io import yaml_io
+
+    n = 0
+    for dwelling in dwellings:
+        stream.write('---\n')
+        yaml_io.to_yaml(dwelling, stream)
+        n += 1
+    return n
+
+
+def write_batch(dwellings, stream):
+    """
+    Write dwellings as the JSON body of a batch request to epctk.service
+
+    Returns:
+        number of dwellings written
+    """
+    from .io import json_io
+
+    n = 0
+    stream.write('{"dwellings": [')
+    for dwelling in dwellings:
+        stream.write(',\n' if n else '\n')
+        json.dump(json_io.dwelling_to_dict(dwelling), stream)
+        n += 1
+    stream.write('\n]}\n')
+    return n
+
+
+WRITERS = dict(yaml=write_yaml, batch=write_batch)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Write synthetic dwellings")
+    parser.add_argument('-n', type=int, default=1000, help="number of dwellings")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=0, help="index of the first dwelling")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='batch')
+    parser.add_argument('-o', '--output', help="output file, standard output if not given")
+    options = parser.parse_args(args)
+
+    dwellings = generate(options.n, options.seed, options.start)
+    if options.output:
+        with open(options.output, 'w') as f:
+            WRITERS[options.format](dwellings, f)
+    else:
+        WRITERS[options.format](dwellings, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,8 @@ from .tables_part_four import (TABLE_4A, TABLE_4B, get_4a_system, TABLE_4D, TABL
                                mech_vent_default_in_use_factor, mech_vent_default_hr_effy_factor,
                                mech_vent_in_use_factor, mech_vent_in_use_factor_hr)
 
-from .tables_appendix_h import TABLE_H1, TABLE_H2, TABLE_H3, TABLE_H4, TABLE_H5
+from .tables_appendix_h import (TABLE_H1, TABLE_H2, TABLE_H3, TABLE_H4, TABLE_H5,
+                                TABLE_H2_ARRAY, TABLE_H3_ARRAY, TABLE_H4_ARRAY,
+                                solar_pitch_index, solar_orientation_index)
 from .tables_appendix_n import table_n4_heating_days, table_n8_secondary_fraction, interpolate_psr_table, interpolate_efficiency
 from .tables_appendix_s import table_s1_age_band
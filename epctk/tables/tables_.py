@@ -1,3 +1,4 @@
+import functools
 import math
 import os.path
 
@@ -214,6 +215,10 @@ def combi_loss_storage_combi_less_than_55l(Vc, daily_hot_water_use):
     return (600 - (Vc - 15) * 15) * fn
 
 
+def combi_loss_storage_loss_factor(storage_loss_factor_f1, daily_hot_water_use):
+    return 365 * storage_loss_factor_f1
+
+
 def combi_loss_table_3a(storage_volume, system):
     if storage_volume == 0:
         if system.get("table3a_fn"):
@@ -222,7 +227,7 @@ def combi_loss_table_3a(storage_volume, system):
             # !!! Need other keep hot types
             return combi_loss_instant_without_keep_hot
     elif storage_volume < 55:
-        return lambda hw_use: combi_loss_storage_combi_less_than_55l(storage_volume, hw_use)
+        return functools.partial(combi_loss_storage_combi_less_than_55l, storage_volume)
     else:
         return combi_loss_storage_combi_more_than_55l
 
@@ -234,7 +239,7 @@ def combi_loss_table_3b(pcdf_data):
     # dwelling.has_hw_cylinder=True
     # system.table2b_row=5
     # dwelling.has_cylinderstat=True
-    return lambda x: 365 * pcdf_data['storage_loss_factor_f1']
+    return functools.partial(combi_loss_storage_loss_factor, pcdf_data['storage_loss_factor_f1'])
 
 
 # !!! Need to complete this table
@@ -1,6 +1,7 @@
 import numpy
 
 from ..elements import SHWCollectorTypes, PVOvershading
+from ..utils import SAPInputError
 
 TABLE_H1 = {
     SHWCollectorTypes.EVACUATED_TUBE: [0.6, 3, .72],
@@ -64,4 +65,51 @@ TABLE_H4 = {
     PVOvershading.MODEST: 0.8,
     PVOvershading.NONE_OR_VERY_LITTLE: 1,
 }
-TABLE_H5 = [1.0, 1.0, 0.94, 0.70, 0.45, 0.44, 0.44, 0.48, 0.76, 0.94, 1.0, 1.0]
\ No newline at end of file
+TABLE_H5 = [1.0, 1.0, 0.94, 0.70, 0.45, 0.44, 0.44, 0.48, 0.76, 0.94, 1.0, 1.0]
+# Tables H2 and H3 as arrays, indexed by the position of the collector
+# pitch in SOLAR_PITCHES and of its orientation in SOLAR_ORIENTATIONS.
+# The annual radiation of a horizontal collector is the same for every orientation.
+SOLAR_PITCHES = ("Horizontal", 30, 45, 60, "Vertical")
+SOLAR_ORIENTATIONS = (0, 45, 90, 135, 180, 225, 270, 315)
+
+TABLE_H2_ARRAY = numpy.array([[TABLE_H2[pitch]] * len(SOLAR_ORIENTATIONS) if pitch == "Horizontal" else
+                              [TABLE_H2[pitch][orientation] for orientation in SOLAR_ORIENTATIONS]
+                              for pitch in SOLAR_PITCHES], dtype=float)
+TABLE_H3_ARRAY = numpy.array([TABLE_H3[pitch] for pitch in SOLAR_PITCHES])
+
+# Indexed by overshading code
+TABLE_H4_ARRAY = numpy.array([numpy.nan] + [TABLE_H4[PVOvershading(code)] for code in range(1, 5)])
+
+for _array in (TABLE_H2_ARRAY, TABLE_H3_ARRAY, TABLE_H4_ARRAY):
+    _array.flags.writeable = False
+
+
+def solar_pitch_index(pitch):
+    """
+    Args:
+        pitch: collector pitch in degrees, or "Horizontal" or "Vertical"
+            in any case
+
+    Returns:
+        index of the pitch in SOLAR_PITCHES
+    """
+    if isinstance(pitch, str):
+        pitch = pitch.capitalize()
+    try:
+        return SOLAR_PITCHES.index(pitch)
+    except ValueError:
+        raise SAPInputError("Unknown collector pitch {!r}".format(pitch))
+
+
+def solar_orientation_index(orientation):
+    """
+    Args:
+        orientation: collector orientation in degrees from north
+
+    Returns:
+        index of the orientation in SOLAR_ORIENTATIONS
+    """
+    try:
+        return SOLAR_ORIENTATIONS.index(orientation)
+    except ValueError:
+        raise SAPInputError("Unknown collector orientation {!r}".format(orientation))
@@ -1,8 +1,10 @@
 import csv
+import os
 
 import numpy
 
 from .constants import DAYS_PER_MONTH
+from .instrumentation import stage
 
 
 def float_or_none(val):
@@ -27,7 +29,7 @@ class SAPInputError(ValueError):
 
 def csv_to_dict(filename, translator):
     results = {}
-    with open(filename, 'r') as infile:
+    with stage('table_load.' + os.path.basename(filename)), open(filename, 'r') as infile:
         reader = csv.reader(infile)
         for row in reader:
             if row[0][0] == '#':
@@ -62,14 +64,9 @@ def weighted_effy(q_space, q_water, wintereff, summereff):
          array with 12 monthly efficiences
     """
     # If there is no space or water demand then divisor will be zero
-    water_effy = numpy.zeros(12)
     divisor = q_space / wintereff + q_water / summereff
-    for i in range(12):
-        if divisor[i] != 0:
-            water_effy[i] = (q_space[i] + q_water[i]) / divisor[i]
-        else:
-            water_effy[i] = 100
-    return water_effy
+    return numpy.array([(q_space[i] + q_water[i]) / divisor[i] if divisor[i] != 0 else 100.
+                        for i in range(12)])
 
 
 def sum_summer(l):
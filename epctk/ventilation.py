@@ -12,8 +12,10 @@ from .io.pcdf import get_mev_system
 from .tables import (mech_vent_default_in_use_factor, mech_vent_default_hr_effy_factor,
                      mech_vent_in_use_factor, mech_vent_in_use_factor_hr, FLOOR_INFILTRATION)
 from .utils import monthly_to_annual, SAPInputError
+from .instrumentation import timed
 
 
+@timed()
 def ventilation_properties(dwelling):
     """
 
@@ -228,6 +230,7 @@ def piv_sfp(mv_ducttype, mv_approved, ventilation_type, piv_sfp=None):
     return piv_sfp * in_use_factor
 
 
+@timed()
 def infiltration(wall_type=None, floor_type=None):
     out = {}
     if wall_type:
@@ -238,6 +241,7 @@ def infiltration(wall_type=None, floor_type=None):
     return out
 
 
+@timed()
 def ventilation(dwelling):
     """
     Ventilation part of the worksheet.
@@ -1,4 +1,5 @@
 import math
+from collections import namedtuple
 
 import numpy
 
@@ -12,8 +13,10 @@ from .solar import solar
 from .utils import monthly_to_annual
 from .ventilation import ventilation
 from .appendix import appendix_m, appendix_g, appendix_c
+from .instrumentation import timed
 
 
+@timed()
 def heat_loss(dwelling):
     """
     Return the attributes `h` (Total heat loss),
@@ -51,6 +54,7 @@ def heat_loss(dwelling):
         h_vent_annual=monthly_to_annual(h_vent))
 
 
+@timed()
 def water_heater_output(dwelling):
     if dwelling.get('fghrs') is not None:
         dwelling.savings_from_fghrs = appendix_g.fghr_savings(dwelling)
@@ -65,6 +69,7 @@ def water_heater_output(dwelling):
                          dwelling.savings_from_fghrs)
 
 
+@timed()
 def internal_heat_gain(dwelling):
     """
     Calculate internal heat games.
@@ -135,10 +140,11 @@ def internal_heat_gain(dwelling):
                 total_internal_gains_summer=total_internal_gains_summer)
 
 
+@timed()
 def heating_systems_energy(dwelling):
     Q_main_1 = dwelling.fraction_of_heat_from_main * dwelling.main_heating_fraction * dwelling.Q_required
 
-    sys1_space_effy = dwelling.main_sys_1.space_heat_effy(Q_main_1)
+    sys1_space_effy = dwelling.main_sys_1.space_heat_effy(Q_main_1, dwelling)
 
     Q_spaceheat_main = 100 * Q_main_1 / sys1_space_effy
 
@@ -146,7 +152,7 @@ def heating_systems_energy(dwelling):
         Q_main_2 = dwelling.fraction_of_heat_from_main * \
                    dwelling.main_heating_2_fraction * dwelling.Q_required
 
-        sys2_space_effy = dwelling.main_sys_2.space_heat_effy(Q_main_2)
+        sys2_space_effy = dwelling.main_sys_2.space_heat_effy(Q_main_2, dwelling)
 
         Q_spaceheat_main_2 = 100 * Q_main_2 / sys2_space_effy
 
@@ -158,14 +164,14 @@ def heating_systems_energy(dwelling):
     if dwelling.fraction_of_heat_from_main < 1:
         q_secondary = (1 - dwelling.fraction_of_heat_from_main) * dwelling.Q_required
 
-        secondary_space_effy = dwelling.secondary_sys.space_heat_effy(q_secondary)
+        secondary_space_effy = dwelling.secondary_sys.space_heat_effy(q_secondary, dwelling)
         q_spaceheat_secondary = 100 * q_secondary / secondary_space_effy
 
     else:
         q_spaceheat_secondary = numpy.zeros(12)
         secondary_space_effy = None
 
-    water_effy = dwelling.water_sys.water_heat_effy(dwelling.output_from_water_heater)
+    water_effy = dwelling.water_sys.water_heat_effy(dwelling.output_from_water_heater, dwelling)
 
     if hasattr(dwelling.water_sys, "keep_hot_elec_consumption"):
         Q_waterheat = 100 * (
@@ -247,39 +253,75 @@ def ter(dwelling, heating_fuel):
     r.add_single_result("TER", 273, dwelling.ter_rating)
 
 
-def perform_demand_calc(dwelling):
-    """
-    Calculate the SAP energy demand for a dwelling
-
-    Args:
-        dwelling (Dwelling):
-
-    """
-
-    # TODO: modify functions to take only the arguments they need instead of the whole dwelling data.
-    dwelling.update(ventilation(dwelling))
+def _heat_requirement(dwelling):
+    # Need to copy the Q_required from the heat calc results to it's own attribute for compatibility
+    dwelling.heat_calc_results = heating_requirement(dwelling)
+    dwelling.Q_required = dwelling.heat_calc_results['heat_required']
 
-    dwelling.update(heat_loss(dwelling))
 
-    dwelling.update(hot_water_use(dwelling))
+def _cooling_requirement(dwelling):
+    dwelling.Q_cooling_required = cooling_requirement(dwelling)
 
-    dwelling.update(lighting_consumption(dwelling))
 
-    dwelling.update(internal_heat_gain(dwelling))
+def _water_heater_output(dwelling):
+    dwelling.output_from_water_heater = water_heater_output(dwelling)
 
-    dwelling.update(solar(dwelling))
 
-    # Need to copy the Q_required from the heat calc results to it's own attribute for compatibility
-    dwelling.heat_calc_results = heating_requirement(dwelling)
-    dwelling.Q_required = dwelling.heat_calc_results['heat_required']
+def _updating(calculation):
+    def stage(dwelling):
+        dwelling.update(calculation(dwelling))
+    return stage
+
+
+# Stages of the demand calculation, in order: name, function of the
+# dwelling and the results it sets
+DemandStage = namedtuple('DemandStage', 'name, run, outputs')
+
+DEMAND_STAGES = (
+    DemandStage('ventilation', _updating(ventilation),
+                ('base_infiltration_rate', 'inf_chimneys_ach', 'infiltration_ach', 'infiltration_ach_annual')),
+    DemandStage('heat_loss', _updating(heat_loss),
+                ('h', 'hlp', 'h_fabric', 'h_bridging', 'h_vent', 'h_vent_annual')),
+    DemandStage('hot_water', _updating(hot_water_use),
+                ('hw_use_daily', 'hw_energy_content', 'distribution_loss', 'storage_loss', 'primary_circuit_loss',
+                 'combi_loss_monthly', 'total_water_heating', 'heat_gains_from_hw', 'input_from_solar',
+                 'fghrs_input_from_solar', 'savings_from_wwhrs')),
+    DemandStage('lighting', _updating(lighting_consumption),
+                ('annual_light_consumption', 'full_light_gain', 'lighting_C1', 'lighting_C2', 'lighting_GL')),
+    DemandStage('internal_gains', _updating(internal_heat_gain),
+                ('appliance_consumption', 'met_gain', 'cooking_gain', 'appliance_gain', 'light_gain',
+                 'water_heating_gains', 'losses_gain', 'total_internal_gains', 'total_internal_gains_summer')),
+    DemandStage('solar', _updating(solar),
+                ('solar_gain_winter', 'solar_gain_summer', 'winter_heat_gains', 'summer_heat_gains')),
+    DemandStage('heat_requirement', _heat_requirement, ('heat_calc_results', 'Q_required')),
+    DemandStage('cooling_requirement', _cooling_requirement, ('Q_cooling_required',)),
+    DemandStage('water_heater_output', _water_heater_output, ('output_from_water_heater', 'savings_from_fghrs')),
+)
+
+# Demand stage that sets each of its results
+DEMAND_OUTPUTS = {output: stage.name for stage in DEMAND_STAGES for output in stage.outputs}
+
+
+@timed()
+def perform_demand_calc(dwelling, until=None):
+    """
+    Calculate the SAP energy demand for a dwelling
 
-    dwelling.Q_cooling_required = cooling_requirement(dwelling)
+    Args:
+        dwelling (Dwelling):
+        until: name of the last of the DEMAND_STAGES to perform, all of them if None
 
-    dwelling.output_from_water_heater = water_heater_output(dwelling)
+    """
+    # TODO: modify functions to take only the arguments they need instead of the whole dwelling data.
+    for stage in DEMAND_STAGES:
+        stage.run(dwelling)
+        if stage.name == until:
+            break
 
     return dwelling
 
 
+@timed()
 def perform_full_calc(dwelling):
     """
     Perform a full SAP worksheet calculation on a dwelling, adding the results
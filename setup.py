@@ -13,17 +13,18 @@ setup(name='epc_tk',
       classifiers=[
         'Development Status :: 3 - Alpha',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
       ],
       keywords='epc energy uk',
       author='Jonathan Chambers',
       author_email='jonathan.chambers.13@ucl.ac.uk',
       license='MIT',
       packages=['sap'],
+      python_requires='>=3.7',
       install_requires=[
           'pyyaml',
-          'numpy',
+          'numpy>=1.17',
           'pyparsing'
       ],
       include_package_data=True,
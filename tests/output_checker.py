@@ -1,9 +1,41 @@
+import contextlib
 import logging
 
 from epctk.utils import sum_summer, sum_winter, float_or_zero
 
+# Set by collect(): list that checks are appended to instead of printed
+_COLLECTED = None
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collect the checks made inside the block instead of printing mismatches
+
+    Yields:
+        dict with 'checks', a list of (calctype, desc, actual, target,
+        max_err), and 'errors', a list of messages
+    """
+    global _COLLECTED
+    previous = _COLLECTED
+    _COLLECTED = dict(checks=[], errors=[])
+    try:
+        yield _COLLECTED
+    finally:
+        _COLLECTED = previous
+
+
+def report_error(message):
+    if _COLLECTED is not None:
+        _COLLECTED['errors'].append(message)
+    else:
+        print("ERROR: " + message)
+
 
 def check_result(calctype, actual, target, desc, max_err=0.1):
+    if _COLLECTED is not None:
+        _COLLECTED['checks'].append((calctype, desc, actual, target, max_err))
+        return
     if abs(actual - target) > max_err:
         print(("ERROR: %s: Mismatched %s: %.2f vs %.2f" % (
             calctype, desc, actual, target)))
@@ -402,7 +434,7 @@ def check_er_results(label, d, res):
                  "sap rating (rounded)", 0.5)
     check_result(label, d.sap_value,
                  float(res.sap_value_unrounded),
-                 "sap rating (rounded)", 0.01)
+                 "sap rating (unrounded)", 0.01)
 
 
 def check_fee(d, res):
@@ -448,16 +480,16 @@ def check_improvements(d, res):
 
     if res.improvements.effects == "(none)":
         if len(d.improvement_effects) != 0:
-            print(("ERROR: Mismatched number of improvements: %d vs 0" % (len(d.improvements),)))
+            report_error("Mismatched number of improvements: %d vs 0" % (len(d.improvement_effects),))
         return
 
     if len(d.improvement_effects) != len(res.improvements.effects):
-        print(("ERROR: Mismatched number of recommended improvements %d vs %d" % (len(d.improvement_effects), len(res.improvements.effects))))
+        report_error("Mismatched number of recommended improvements %d vs %d" % (len(d.improvement_effects), len(res.improvements.effects)))
 
     for calculated_improvement, correct_improvement in zip(d.improvement_effects, res.improvements.effects):
         if calculated_improvement.tag != correct_improvement.measure:
-            print(("ERROR: Mismatched effect tags: %s vs %s" % (
-                calculated_improvement.tag, correct_improvement.measure)))
+            report_error("Mismatched effect tags: %s vs %s" % (
+                calculated_improvement.tag, correct_improvement.measure))
             continue
 
         check_result("EPC Improvements", calculated_improvement.cost_change,
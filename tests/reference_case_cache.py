@@ -0,0 +1,188 @@
+"""
+Cache of parsed reference cases
+
+Parsing the BRE reference case RTF files with the pyparsing grammar of
+:mod:`tests.reference_case_parser` takes seconds per file. Parsed cases are
+pickled under a key made of the hash of the file contents and the version
+of the grammar, so that a cached case is reused only while neither has
+changed. Cache files are written to a temporary file and renamed into
+place, so an interrupted or concurrent run never leaves a partial pickle.
+
+:func:`parse_cases` parses a whole corpus, loading cached cases directly
+and parsing the others in parallel worker processes. To fill the cache
+for the official cases::
+
+    python -m tests.reference_case_cache --workers 8
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+import pyparsing
+
+from tests import reference_case_parser
+
+FOLDER = os.path.join(os.path.dirname(__file__), '..', '..', 'data_private', 'bre_test_cases')
+CACHE_FOLDER = os.path.join(FOLDER, 'pickled_reference_cases')
+
+_GRAMMAR_VERSION = None
+
+
+def grammar_version():
+    """
+    Returns:
+        hash of the grammar source and the pyparsing version
+    """
+    global _GRAMMAR_VERSION
+    if _GRAMMAR_VERSION is None:
+        with open(reference_case_parser.__file__, 'rb') as f:
+            source = f.read()
+        _GRAMMAR_VERSION = hashlib.sha256(source + pyparsing.__version__.encode()).hexdigest()[:16]
+    return _GRAMMAR_VERSION
+
+
+def cache_key(case_path, grammar='whole_file'):
+    """
+    Args:
+        case_path: path of the RTF file
+        grammar: name of the grammar element in tests.reference_case_parser
+
+    Returns:
+        str: hash of the file contents, grammar and grammar version
+    """
+    h = hashlib.sha256()
+    with open(case_path, 'rb') as f:
+        h.update(f.read())
+    h.update(grammar.encode())
+    h.update(grammar_version().encode())
+    return h.hexdigest()
+
+
+def cache_path(case_path, grammar='whole_file', cache_folder=CACHE_FOLDER):
+    return os.path.join(cache_folder, "{}.{}.pkl".format(os.path.basename(case_path),
+                                                         cache_key(case_path, grammar)))
+
+
+def parse_file(case_path, parser):
+    with open(case_path, 'r') as f:
+        txt = f.read()
+        txt = txt.replace('\\\'b', '')
+        txt = txt.replace('\\f1', '')
+        txt = txt.replace('\\f2', '')
+        return parser.parseString(txt)
+
+
+def _write_atomic(path, obj):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_cached(path):
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+        logging.warning("Ignoring unreadable cached case %s: %r", path, err)
+        return None
+
+
+def load_reference_case(case_path, grammar='whole_file', force_reparse=False, cache_folder=CACHE_FOLDER):
+    """
+    Parse a reference case file, or load it from the cache
+
+    Args:
+        case_path: path of the RTF file
+        grammar: name of the grammar element in tests.reference_case_parser
+        force_reparse: parse even if the case is cached
+        cache_folder: folder of the cached cases
+
+    Returns:
+        pyparsing.ParseResults
+    """
+    pickled_file = cache_path(case_path, grammar, cache_folder)
+    case = None if force_reparse else _read_cached(pickled_file)
+    if case is None:
+        case = parse_file(case_path, getattr(reference_case_parser, grammar))
+        _write_atomic(pickled_file, case)
+    return case
+
+
+def _parse_job(args):
+    case_path, grammar, cache_folder = args
+    return load_reference_case(case_path, grammar, True, cache_folder)
+
+
+def parse_cases(case_paths, grammar='whole_file', force_reparse=False, cache_folder=CACHE_FOLDER,
+                workers=None):
+    """
+    Parse many reference case files, the ones that are not cached in
+    parallel worker processes
+
+    Args:
+        case_paths: paths of the RTF files
+        grammar: name of the grammar element in tests.reference_case_parser
+        force_reparse: parse even the cases that are cached
+        cache_folder: folder of the cached cases
+        workers: number of worker processes, 1 to parse in this process
+
+    Returns:
+        dict of case path -> pyparsing.ParseResults
+    """
+    cases = dict()
+    to_parse = []
+    for case_path in case_paths:
+        case = None if force_reparse else _read_cached(cache_path(case_path, grammar, cache_folder))
+        if case is None:
+            to_parse.append(case_path)
+        else:
+            cases[case_path] = case
+
+    jobs = [(case_path, grammar, cache_folder) for case_path in to_parse]
+    if workers == 1 or len(jobs) <= 1:
+        parsed = [_parse_job(job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            parsed = list(executor.map(_parse_job, jobs))
+
+    cases.update(zip(to_parse, parsed))
+    return {case_path: cases[case_path] for case_path in case_paths}
+
+
+def official_case_paths(folder=FOLDER):
+    """
+    Returns:
+        paths of the official reference cases that are not skipped
+    """
+    from tests.reference_cases_lists import OFFICIAL_CASES, SKIP
+    return [os.path.join(folder, 'official_reference_cases', filename)
+            for filename in OFFICIAL_CASES if filename not in SKIP]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Parse the official reference cases into the cache")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="reparse cached cases")
+    options = parser.parse_args(args)
+
+    start = time.perf_counter()
+    cases = parse_cases(official_case_paths(), force_reparse=options.force, workers=options.workers)
+    print("{} cases in {:.1f}s".format(len(cases), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
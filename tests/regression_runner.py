@@ -0,0 +1,297 @@
+"""
+Regression run of the official reference cases
+
+Runs the SAP, FEE, DER, TER and improvements calculations of every
+official case in parallel worker processes, gathering every quantity that
+:mod:`tests.output_checker` checks instead of printing mismatches as they
+are found. The quantities of all the cases are then compared with the
+reference results in one pass over arrays, and the mismatches, the
+tolerances of each field and the timings of each stage are written to a
+JSON report::
+
+    python -m tests.regression_runner --workers 8 --report regression.json
+
+The tolerance of a field defaults to the one of its check in
+:mod:`tests.output_checker`, and can be overridden by a JSON file mapping
+either the field, e.g. ``"DER: total emissions"``, or the quantity,
+``"total emissions"``, to the maximum absolute error.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+import traceback
+
+import numpy
+
+from epctk.appendix import appendix_t
+from epctk.runner import run_sap, run_fee, run_der
+from tests import output_checker
+from tests.reference_case_cache import CACHE_FOLDER, load_reference_case, official_case_paths
+
+# Columns of the rows of checked quantities
+COLUMNS = ('case', 'field', 'actual', 'target', 'tolerance')
+
+
+def _check_er(dwelling, parsed):
+    output_checker.check_er_results("ER", dwelling, parsed.er)
+
+
+def _check_fee(dwelling, parsed):
+    output_checker.check_fee(dwelling, parsed)
+
+
+def _check_der(dwelling, parsed):
+    output_checker.check_der(dwelling, parsed)
+
+
+def _check_ter(dwelling, parsed):
+    output_checker.check_ter(dwelling, parsed)
+
+
+def _run_improvements(dwelling, results):
+    appendix_t.run_improvements(results['sap'])
+    return results['sap'].improvement_results
+
+
+def _check_improvements(improvement_results, parsed):
+    output_checker.check_improvements(improvement_results, parsed)
+
+
+# Calculation stages: name, function(dwelling, results so far), check
+STAGES = (
+    ('sap', lambda dwelling, results: run_sap(dwelling), _check_er),
+    ('fee', lambda dwelling, results: run_fee(dwelling), _check_fee),
+    ('der', lambda dwelling, results: run_der(dwelling), _check_der),
+    ('ter', lambda dwelling, results: appendix_t.run_ter(dwelling), _check_ter),
+    ('improvements', _run_improvements, _check_improvements),
+)
+
+
+def case_dwelling(case_path, parsed):
+    """
+    Input dwelling of a parsed reference case, with the SAP region of
+    :data:`tests.test_official_cases.SAP_REGIONS`
+    """
+    from tests.test_official_cases import SAP_REGIONS, create_sap_dwelling
+
+    dwelling = create_sap_dwelling(parsed.inputs)
+    region = SAP_REGIONS.get(os.path.basename(case_path))
+    if region is not None:
+        dwelling['sap_region'] = region
+    elif not dwelling.get('sap_region'):
+        dwelling['sap_region'] = 11
+    return dwelling
+
+
+def run_case(case_path, cache_folder=CACHE_FOLDER):
+    """
+    Calculate a reference case and collect its checked quantities
+
+    Args:
+        case_path: path of the RTF file
+        cache_folder: folder of the cached parsed cases
+
+    Returns:
+        dict with 'checks', list of (calctype, desc, actual, target,
+        max_err), 'errors', list of messages, and 'timings', dict of
+        stage -> seconds
+    """
+    timings = dict()
+    errors = []
+    with output_checker.collect() as collected:
+        stage = 'parse'
+        try:
+            start = time.perf_counter()
+            parsed = load_reference_case(case_path, cache_folder=cache_folder)
+            timings['parse'] = time.perf_counter() - start
+
+            stage = 'inputs'
+            start = time.perf_counter()
+            dwelling = case_dwelling(case_path, parsed)
+            timings['inputs'] = time.perf_counter() - start
+
+            results = dict()
+            for stage, run, check in STAGES:
+                start = time.perf_counter()
+                results[stage] = run(dwelling, results)
+                timings[stage] = time.perf_counter() - start
+                check(results[stage], parsed)
+        except Exception:
+            errors.append("{} failed: {}".format(stage, traceback.format_exc(limit=-3)))
+
+    return dict(checks=[(calctype, desc, float(actual), float(target), float(max_err))
+                        for calctype, desc, actual, target, max_err in collected['checks']],
+                errors=errors + collected['errors'],
+                timings=timings)
+
+
+def _case_job(args):
+    return run_case(*args)
+
+
+def run_cases(case_paths, cache_folder=CACHE_FOLDER, workers=None):
+    """
+    :func:`run_case` for each case, in parallel worker processes
+
+    Args:
+        case_paths: paths of the RTF files
+        cache_folder: folder of the cached parsed cases
+        workers: number of worker processes, 1 to run in this process
+
+    Returns:
+        dict of case name -> result of :func:`run_case`
+    """
+    jobs = [(case_path, cache_folder) for case_path in case_paths]
+    if workers == 1:
+        results = [_case_job(job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_case_job, jobs))
+    return {os.path.basename(case_path): result for case_path, result in zip(case_paths, results)}
+
+
+def field_name(calctype, desc):
+    return "{}: {}".format(calctype, desc)
+
+
+def quantity_table(case_results, tolerances=None):
+    """
+    Gather the checked quantities of all the cases into columns
+
+    Args:
+        case_results: dict of case name -> result of :func:`run_case`
+        tolerances: dict of field or quantity -> maximum absolute error,
+            overriding the tolerances of the checks
+
+    Returns:
+        dict of column -> numpy array, see COLUMNS
+    """
+    tolerances = tolerances or dict()
+    rows = []
+    for case, result in case_results.items():
+        for calctype, desc, actual, target, max_err in result['checks']:
+            field = field_name(calctype, desc)
+            rows.append((case, field, actual, target, tolerances.get(field, tolerances.get(desc, max_err))))
+
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    return dict(case=numpy.array(columns[0], dtype=object),
+                field=numpy.array(columns[1], dtype=object),
+                actual=numpy.array(columns[2], dtype=float),
+                target=numpy.array(columns[3], dtype=float),
+                tolerance=numpy.array(columns[4], dtype=float))
+
+
+def compare(table):
+    """
+    Compare all the calculated quantities with the reference results
+
+    Args:
+        table: columns of :func:`quantity_table`
+
+    Returns:
+        tuple of the array of errors and the boolean array of mismatches,
+        which include quantities that are not finite
+    """
+    error = table['actual'] - table['target']
+    mismatched = ~(numpy.abs(error) <= table['tolerance'])
+    return error, mismatched
+
+
+def field_summary(table, error, mismatched):
+    """
+    Returns:
+        dict of field -> dict of tolerance, count, mismatches and max_abs_error
+    """
+    fields, index = numpy.unique(table['field'].astype(str), return_inverse=True)
+    index = index.ravel()
+    abs_error = numpy.abs(error)
+    max_abs_error = numpy.zeros(len(fields))
+    numpy.maximum.at(max_abs_error, index, numpy.where(numpy.isnan(abs_error), numpy.inf, abs_error))
+    tolerance = numpy.zeros(len(fields))
+    numpy.maximum.at(tolerance, index, table['tolerance'])
+
+    counts = numpy.bincount(index, minlength=len(fields))
+    mismatches = numpy.bincount(index, weights=mismatched, minlength=len(fields)).astype(int)
+    return {field: dict(tolerance=float(tolerance[i]), count=int(counts[i]),
+                        mismatches=int(mismatches[i]), max_abs_error=float(max_abs_error[i]))
+            for i, field in enumerate(fields)}
+
+
+def build_report(case_results, tolerances=None, elapsed=None):
+    """
+    Machine readable report of a regression run
+
+    Args:
+        case_results: dict of case name -> result of :func:`run_case`
+        tolerances: dict of field or quantity -> maximum absolute error
+        elapsed: wall time of the run in seconds
+
+    Returns:
+        dict that can be written as JSON
+    """
+    table = quantity_table(case_results, tolerances)
+    error, mismatched = compare(table)
+
+    mismatches = [dict(case=table['case'][i], field=table['field'][i], actual=float(table['actual'][i]),
+                       target=float(table['target'][i]), error=float(error[i]),
+                       tolerance=float(table['tolerance'][i]))
+                  for i in numpy.flatnonzero(mismatched)]
+    errors = [dict(case=case, error=message)
+              for case, result in case_results.items() for message in result['errors']]
+    failed_cases = set(m['case'] for m in mismatches) | set(e['case'] for e in errors)
+
+    return dict(
+        summary=dict(cases=len(case_results), failed_cases=len(failed_cases),
+                     quantities=len(error), mismatches=len(mismatches), errors=len(errors),
+                     elapsed=elapsed),
+        fields=field_summary(table, error, mismatched),
+        mismatches=mismatches,
+        errors=errors,
+        timings={case: result['timings'] for case, result in case_results.items()})
+
+
+def run_regression(case_paths=None, tolerances=None, cache_folder=CACHE_FOLDER, workers=None):
+    """
+    Calculate the reference cases and compare them with the reference results
+
+    Args:
+        case_paths: paths of the RTF files, defaults to the official cases
+        tolerances: dict of field or quantity -> maximum absolute error
+        cache_folder: folder of the cached parsed cases
+        workers: number of worker processes, 1 to run in this process
+
+    Returns:
+        report, see :func:`build_report`
+    """
+    start = time.perf_counter()
+    case_paths = official_case_paths() if case_paths is None else case_paths
+    case_results = run_cases(case_paths, cache_folder, workers)
+    return build_report(case_results, tolerances, time.perf_counter() - start)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare the official reference cases with their results")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tolerances', help="JSON file of field or quantity -> maximum absolute error")
+    parser.add_argument('--report', default='regression_report.json', help="JSON report file")
+    options = parser.parse_args(args)
+
+    tolerances = None
+    if options.tolerances:
+        with open(options.tolerances) as f:
+            tolerances = json.load(f)
+
+    report = run_regression(tolerances=tolerances, workers=options.workers)
+    with open(options.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report['summary']
+    print("{cases} cases, {quantities} quantities: {mismatches} mismatches, {errors} errors "
+          "in {failed_cases} cases, {elapsed:.1f}s".format(**summary))
+    return 1 if summary['mismatches'] or summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
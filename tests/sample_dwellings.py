@@ -0,0 +1,80 @@
+"""
+Small hand built dwellings used by the unit tests
+"""
+from epctk import runner  # noqa: F401 (import order: avoids circular import of dwelling)
+from epctk.dwelling import Dwelling
+from epctk.elements import (GlazingTypes, HeatEmitters, HeatLossElement, HeatLossElementTypes, Opening,
+                            OpeningType, OvershadingTypes, TerrainTypes, VentilationTypes)
+from epctk.fuels import ELECTRICITY_STANDARD, fuel_from_code
+
+
+def gas_combi_house(**overrides):
+    """
+    Two storey house heated by a gas combi boiler (Table 4b code 104)
+
+    Args:
+        **overrides: dwelling values to replace the defaults
+
+    Returns:
+        Dwelling
+    """
+    glazing = OpeningType(glazing_type=GlazingTypes.DOUBLE, gvalue=0.72, frame_factor=0.7, Uvalue=2.0,
+                          roof_window=False)
+
+    dwelling = Dwelling()
+    dwelling.update(dict(
+        GFA=80.0,
+        volume=200.0,
+        Nstoreys=2,
+        living_area=25.0,
+        thermal_mass_parameter=250.0,
+        Uthermalbridges=0.15,
+        sap_region=11,
+        terrain_type=TerrainTypes.SUBURBAN,
+        is_flat=False,
+        overshading=OvershadingTypes.AVERAGE,
+
+        ventilation_type=VentilationTypes.NATURAL,
+        Nchimneys=0,
+        Nflues=0,
+        Nintermittentfans=2,
+        Npassivestacks=0,
+        Nshelteredsides=2,
+        pressurisation_test_result=7.0,
+
+        low_energy_bulb_ratio=0.5,
+        lighting_outlets_low_energy=5,
+        lighting_outlets_total=10,
+        low_water_use=False,
+        electricity_tariff=ELECTRICITY_STANDARD,
+
+        main_heating_type_code=104,
+        main_sys_fuel=fuel_from_code(1),
+        heating_emitter_type=HeatEmitters.RADIATORS,
+        control_type_code=2106,
+        sys1_has_boiler_interlock=True,
+        central_heating_pump_in_heated_space=True,
+        secondary_heating_type_code=None,
+
+        water_heating_type_code=901,
+        water_sys_fuel=fuel_from_code(1),
+        has_hw_cylinder=False,
+        has_hw_time_control=False,
+
+        heat_loss_elements=[
+            HeatLossElement(area=100.0, Uvalue=0.3, is_external=True,
+                            element_type=HeatLossElementTypes.EXTERNAL_WALL),
+            HeatLossElement(area=40.0, Uvalue=0.2, is_external=True,
+                            element_type=HeatLossElementTypes.EXTERNAL_FLOOR),
+            HeatLossElement(area=40.0, Uvalue=0.15, is_external=True,
+                            element_type=HeatLossElementTypes.EXTERNAL_ROOF),
+            HeatLossElement(area=15.0, Uvalue=2.0, is_external=True,
+                            element_type=HeatLossElementTypes.GLAZING),
+        ],
+        openings=[
+            Opening(area=7.5, orientation_degrees=180, opening_type=glazing),
+            Opening(area=7.5, orientation_degrees=0, opening_type=glazing),
+        ],
+    ))
+    dwelling.update(overrides)
+    return dwelling
@@ -0,0 +1,143 @@
+import collections
+import types
+import unittest
+
+import numpy
+
+from epctk import aggregation
+from epctk import runner
+from epctk import synthetic
+from epctk.utils import SAPCalculationError, SAPInputError
+
+
+def failing_run_sap(dwelling):
+    if dwelling['sap_region'] == 2:
+        raise SAPCalculationError('sap_region')
+    return runner.run_sap(dwelling)
+
+
+def broken_run_sap(dwelling):
+    raise KeyError('sap_region')
+
+
+class TestReducers(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = list(synthetic.generate(60, seed=3))
+        cls.results = [runner.run_sap(d) for d in cls.dwellings]
+
+    def reduce(self, reducers):
+        self.assertEqual(aggregation.reduce_results(self.results, reducers), len(self.results))
+        return {name: reducer.result() for name, reducer in reducers.items()}
+
+    def test_exact_reducers(self):
+        emissions = [d.emissions for d in self.results]
+        sap = [d.sap_value for d in self.results]
+        edges = [20, 40, 60, 80]
+        result = self.reduce(dict(
+            count=aggregation.Count(),
+            emissions=aggregation.Sum('emissions'),
+            mean=aggregation.Mean('sap_value'),
+            weighted=aggregation.Mean('sap_value', weight='sap_region'),
+            histogram=aggregation.Histogram('sap_value', edges),
+            missing=aggregation.Mean('no_such_result'),
+        ))
+
+        self.assertEqual(result['count'], len(self.results))
+        self.assertAlmostEqual(result['emissions'], sum(emissions))
+        self.assertAlmostEqual(result['mean'], numpy.mean(sap))
+        self.assertAlmostEqual(result['weighted'],
+                               numpy.average(sap, weights=[d['sap_region'] for d in self.results]))
+        self.assertEqual(result['histogram']['counts'],
+                         numpy.bincount(numpy.digitize(sap, edges), minlength=5).tolist())
+        self.assertIsNone(result['missing'])
+
+    def test_group_by(self):
+        result = self.reduce(dict(
+            regions=aggregation.GroupBy('sap_region', aggregation.Sum('emissions')),
+            bands=aggregation.GroupBy(aggregation.sap_band, aggregation.Count()),
+        ))
+
+        regions = collections.defaultdict(float)
+        for d in self.results:
+            regions[d['sap_region']] += d.emissions
+        self.assertEqual(set(result['regions']), set(regions))
+        for region, total in regions.items():
+            self.assertAlmostEqual(result['regions'][region], total)
+        self.assertEqual(result['bands'], collections.Counter(aggregation.sap_band(d) for d in self.results))
+
+    def test_sap_band(self):
+        for rating, band in ((0.2, 'G'), (20.5, 'F'), (68.4, 'D'), (68.5, 'C'), (91.6, 'A'), (130, 'A')):
+            self.assertEqual(aggregation.sap_band(types.SimpleNamespace(sap_value=rating)), band)
+
+    def test_quantiles(self):
+        rng = numpy.random.default_rng(0)
+        values = numpy.concatenate([rng.normal(40, 30, 3001), [0., 0.]])
+        quantiles = (0, 0.01, 0.1, 0.5, 0.9, 0.99, 1)
+
+        # Two halves merged, as from two workers
+        first, second = (aggregation.Quantiles(None, quantiles) for _ in range(2))
+        for value in values[::2]:
+            first.add_value(value, 1)
+        for value in values[1::2]:
+            second.add_value(value, 1)
+        first.merge(second)
+
+        result = first.result()
+        # numpy.quantile(method='lower'), which needs numpy 1.22
+        exact = numpy.sort(values)[numpy.floor(numpy.array(quantiles) * (len(values) - 1)).astype(int)]
+        for q, value in zip(quantiles, exact):
+            self.assertLessEqual(abs(result[q] - value), 0.005 * abs(value) + 1e-9)
+        self.assertEqual(result[0], values.min())
+        self.assertEqual(result[1], values.max())
+        self.assertIsNone(aggregation.Quantiles(None).quantile(0.5))
+
+    def test_merge_mismatch(self):
+        with self.assertRaises(SAPInputError):
+            aggregation.Histogram('sap_value', [1, 2]).merge(aggregation.Histogram('sap_value', [1, 3]))
+        with self.assertRaises(SAPInputError):
+            aggregation.Quantiles('sap_value').merge(aggregation.Quantiles('sap_value', relative_accuracy=0.01))
+
+
+class TestAggregate(unittest.TestCase):
+    def reducers(self):
+        return dict(
+            count=aggregation.Count(),
+            regions=aggregation.GroupBy('sap_region', aggregation.Mean('emissions')),
+            cost=aggregation.Quantiles('fuel_cost', (0.1, 0.5, 0.9)),
+        )
+
+    def test_workers(self):
+        dwellings = list(synthetic.generate(40, seed=4))
+        in_process = aggregation.aggregate(dwellings, self.reducers(), workers=1, chunk_size=7)
+        parallel = aggregation.aggregate(iter(dwellings), self.reducers(), workers=2, chunk_size=7)
+
+        self.assertEqual(in_process.n_dwellings, 40)
+        self.assertEqual(in_process.n_failed, 0)
+        self.assertEqual(in_process.values['count'], 40)
+        self.assertEqual(parallel[1:], in_process[1:])
+        self.assertEqual(parallel.values['cost'], in_process.values['cost'])
+        self.assertEqual(set(parallel.values['regions']), set(in_process.values['regions']))
+        for region, mean in in_process.values['regions'].items():
+            self.assertAlmostEqual(parallel.values['regions'][region], mean)
+
+    def test_failed(self):
+        dwellings = list(synthetic.generate(40, seed=4))
+        n_region_2 = sum(d['sap_region'] == 2 for d in dwellings)
+        with self.assertLogs(level='WARNING') as logs:
+            result = aggregation.aggregate(dwellings, self.reducers(), calculation=failing_run_sap, workers=1)
+        self.assertEqual(sum('calculation failed' in message for message in logs.output), n_region_2)
+
+        self.assertEqual(result.n_dwellings, 40)
+        self.assertEqual(result.n_failed, n_region_2)
+        self.assertEqual(result.values['count'], 40 - n_region_2)
+        self.assertNotIn(2, result.values['regions'])
+
+    def test_errors_raised(self):
+        with self.assertRaises(KeyError):
+            aggregation.aggregate(synthetic.generate(3, seed=4), self.reducers(), calculation=broken_run_sap,
+                                  workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import tracemalloc
+import types
+import unittest
+from unittest import mock
+
+from epctk import batch, runner, synthetic
+from tests.sample_dwellings import gas_combi_house
+
+
+class TestDuplicateCollapse(unittest.TestCase):
+    def test_groups_identical_dwellings(self):
+        dwellings = [gas_combi_house(), gas_combi_house(GFA=90.0), gas_combi_house(), gas_combi_house()]
+        groups = batch.collapse_duplicates(dwellings)
+
+        self.assertEqual(groups.n_unique, 2)
+        self.assertEqual(groups.members, [[0, 2, 3], [1]])
+        self.assertAlmostEqual(groups.compression_ratio, 2.0)
+        self.assertAlmostEqual(groups.duplicate_fraction, 0.5)
+
+    def test_results_fanned_out(self):
+        dwellings = [gas_combi_house(), gas_combi_house(living_area=30.0), gas_combi_house()]
+        out = batch.run_batch(dwellings)
+
+        self.assertEqual(out.summary()['n_calculated'], 2)
+        self.assertAlmostEqual(out.compression_ratio, 1.5)
+        self.assertEqual(len(out.results), 3)
+
+        for dwelling, result in zip(dwellings, out.results):
+            self.assertAlmostEqual(result.sap_value, runner.run_sap(dwelling).sap_value)
+
+        self.assertIsNot(out.results[0], out.results[2])
+        self.assertEqual(out.results[2].GFA, dwellings[2].GFA)
+
+    def test_no_collapse(self):
+        out = batch.run_batch([gas_combi_house(), gas_combi_house()], collapse=False)
+        self.assertEqual(out.summary()['n_calculated'], 2)
+        self.assertAlmostEqual(out.compression_ratio, 1.0)
+
+
+
+class TestLeanBatch(unittest.TestCase):
+    def test_lean_results(self):
+        dwellings = [gas_combi_house(), gas_combi_house(living_area=30.0), gas_combi_house()]
+        out = batch.run_batch(dwellings, outputs=['sap_value', 'emissions', 'Q_required'])
+
+        self.assertEqual(out.summary()['n_calculated'], 2)
+        for dwelling, result in zip(dwellings, out.results):
+            calculated = runner.run_sap(dwelling)
+            self.assertEqual(set(result), {'sap_value', 'emissions', 'Q_required'})
+            self.assertEqual(result['sap_value'], calculated.sap_value)
+            self.assertEqual(list(result['Q_required']), list(calculated.Q_required))
+        self.assertIsNot(out.results[0], out.results[2])
+
+    def test_memory(self):
+        dwellings = list(synthetic.generate(30, seed=9))
+        for dwelling in dwellings:
+            runner.run_sap(dwelling)
+
+        full = [batch.measure_memory(d) for d in dwellings]
+        lean = [batch.measure_memory(d, outputs=['sap_value', 'emissions']) for d in dwellings]
+
+        # Documented in the batch module
+        self.assertLess(max(peak for peak, _ in full), 64 * 1024)
+        self.assertLess(max(peak for peak, _ in lean), 64 * 1024)
+        self.assertGreater(min(kept for _, kept in full), 10 * 1024)
+        self.assertLess(max(kept for _, kept in lean), 1024)
+
+    def test_memory_without_reset_peak(self):
+        # tracemalloc before Python 3.9
+        legacy = types.SimpleNamespace(**{name: getattr(tracemalloc, name)
+                                          for name in ('is_tracing', 'start', 'stop', 'get_traced_memory')})
+        dwelling = next(synthetic.generate(1, seed=9))
+        runner.run_sap(dwelling)
+        with mock.patch.object(batch, 'tracemalloc', legacy):
+            peak, kept = batch.measure_memory(dwelling)
+            self.assertLess(peak, 64 * 1024)
+            self.assertGreater(kept, 10 * 1024)
+
+            tracemalloc.start()
+            try:
+                with self.assertRaises(RuntimeError):
+                    batch.measure_memory(dwelling)
+            finally:
+                tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
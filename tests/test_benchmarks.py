@@ -0,0 +1,25 @@
+import unittest
+
+from benchmarks import run_benchmarks
+from epctk import runner
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_reference_dwellings_run(self):
+        dwellings = run_benchmarks.load_reference_dwellings()
+        self.assertEqual(len(dwellings), 6)
+
+        for name, dwelling in dwellings.items():
+            self.assertGreater(runner.run_sap(dwelling).sap_value, 0, name)
+
+    def test_compare(self):
+        baseline = dict(timings=dict(a=1.0, b=2.0, c=1.0))
+        current = dict(timings=dict(a=1.1, b=3.0, d=5.0))
+
+        regressions = run_benchmarks.compare(baseline, current, threshold=0.2)
+        self.assertEqual([r[0] for r in regressions], ['b'])
+        self.assertAlmostEqual(regressions[0][3], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
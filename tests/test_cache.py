@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from epctk import cache, runner
+from epctk.appendix import appendix_t
+from tests.sample_dwellings import gas_combi_house
+
+
+class TestInputHash(unittest.TestCase):
+    def test_equal_inputs_equal_hash(self):
+        self.assertEqual(cache.input_hash(gas_combi_house(), 'sap'),
+                         cache.input_hash(gas_combi_house(), 'sap'))
+
+    def test_hash_depends_on_inputs_and_calc_type(self):
+        base = cache.input_hash(gas_combi_house(), 'sap')
+        self.assertNotEqual(base, cache.input_hash(gas_combi_house(), 'der'))
+        self.assertNotEqual(base, cache.input_hash(gas_combi_house(GFA=81.0), 'sap'))
+
+        changed_wall = gas_combi_house()
+        changed_wall.heat_loss_elements[0].Uvalue = 0.35
+        self.assertNotEqual(base, cache.input_hash(changed_wall, 'sap'))
+
+
+class TestResultsCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'results.sqlite')
+
+    def tearDown(self):
+        cache.disable_results_cache()
+        self.folder.cleanup()
+
+    def test_runner_uses_cache(self):
+        expected = runner.run_sap(gas_combi_house())
+
+        results_cache = cache.enable_results_cache(self.path)
+        first = runner.run_sap(gas_combi_house())
+        second = runner.run_sap(gas_combi_house())
+
+        self.assertEqual((results_cache.hits, results_cache.misses), (1, 1))
+        self.assertAlmostEqual(second.sap_value, expected.sap_value)
+        self.assertAlmostEqual(second.emissions, first.emissions)
+        self.assertAlmostEqual(second.fuel_cost, expected.fuel_cost)
+
+    def test_persists_between_processes(self):
+        cache.enable_results_cache(self.path)
+        ter = appendix_t.run_ter(gas_combi_house())
+
+        results_cache = cache.enable_results_cache(self.path)
+        cached_ter = appendix_t.run_ter(gas_combi_house())
+        self.assertEqual(results_cache.hits, 1)
+        self.assertAlmostEqual(cached_ter.ter_rating, ter.ter_rating)
+
+    def test_improvements_cached_on_input(self):
+        results_cache = cache.enable_results_cache(self.path)
+
+        improved = []
+        for _ in range(2):
+            dwelling = gas_combi_house()
+            sap = runner.run_sap(dwelling)
+            dwelling.sap_value = sap.sap_value
+            dwelling.emissions = sap.emissions
+            appendix_t.run_improvements(dwelling)
+            improved.append([i.tag for i in dwelling.improvement_results.improvement_effects])
+
+        self.assertEqual(results_cache.hits, 2)
+        self.assertEqual(improved[0], improved[1])
+        self.assertTrue(improved[0])
+
+    def test_size_bounded_eviction(self):
+        results_cache = cache.ResultsCache(self.path, max_bytes=1000)
+        for i in range(5):
+            results_cache.put(str(i), b'x' * 400)
+
+        self.assertLessEqual(results_cache.size_bytes(), 1000)
+        self.assertIsNone(results_cache.get('0'))
+        self.assertEqual(results_cache.get('4'), b'x' * 400)
+        results_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import math
+import unittest
+
+import numpy
+
+from epctk.climate import ORIENTATIONS, regional_climate
+from epctk.constants import SOLAR_HEATING, SolarConstants, T_EXTERNAL_HEATING
+from epctk.solar import incident_solar_vertical
+from epctk.tables import TABLE_10
+from epctk.utils import SAPInputError
+
+
+class TestRegionalClimate(unittest.TestCase):
+    def setUp(self):
+        self.climate = regional_climate()
+
+    def test_all_regions(self):
+        self.assertEqual(len(self.climate), len(TABLE_10))
+        for code, region in TABLE_10.items():
+            row = self.climate.row(code)
+            self.assertEqual(self.climate.latitude[row], region['latitude'])
+            numpy.testing.assert_array_equal(self.climate.Igh_summer[row], region['solar_radiation'])
+            numpy.testing.assert_array_equal(self.climate.external_temperature_summer[row],
+                                             region['external_temperature'])
+            numpy.testing.assert_array_equal(self.climate.external_temperature_heating[row],
+                                             T_EXTERNAL_HEATING)
+
+    def test_solar_coefficients(self):
+        row = self.climate.row(17)
+        constants = SolarConstants(TABLE_10[17]['latitude'])
+        coefficients = self.climate.solar_summer_coefficients(17)
+        for name in 'ABC':
+            numpy.testing.assert_array_equal(getattr(coefficients, name), getattr(constants, name))
+            numpy.testing.assert_array_equal(getattr(self.climate.solar_heating, name)[row],
+                                             getattr(SOLAR_HEATING, name))
+
+    def test_vertical_irradiance(self):
+        row = self.climate.row(5)
+        for i, degrees in enumerate(ORIENTATIONS):
+            numpy.testing.assert_allclose(
+                    self.climate.vertical_irradiance_summer[row, i],
+                    incident_solar_vertical(TABLE_10[5]['solar_radiation'],
+                                            SolarConstants(TABLE_10[5]['latitude']),
+                                            degrees * math.pi / 180))
+
+    def test_gather_by_region(self):
+        codes = [3, 21, 3, 1]
+        rows = self.climate.rows(codes)
+        numpy.testing.assert_array_equal(self.climate.codes[rows], codes)
+        self.assertEqual(self.climate.Igh_summer[rows].shape, (4, 12))
+
+    def test_unknown_region(self):
+        with self.assertRaises(SAPInputError):
+            self.climate.rows([1, 99])
+        with self.assertRaises(SAPInputError):
+            self.climate.row(None)
+
+    def test_read_only(self):
+        with self.assertRaises(ValueError):
+            self.climate.Igh_summer[0, 6] = 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epctk import runner
+from epctk import synthetic
+from epctk.io import columnar
+from epctk.utils import SAPInputError
+
+
+class TestColumnar(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = [runner.run_sap(d) for d in synthetic.generate(25, seed=2)]
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.folder = self._folder.name
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def test_round_trip(self):
+        self.assertEqual(columnar.write_results(self.results, self.folder, chunk_size=10), 25)
+        self.assertEqual(columnar.n_rows(self.folder), 25)
+
+        columns = columnar.read_columns(self.folder)
+        self.assertEqual(set(columns), set(columnar.ANNUAL_RESULTS + columnar.MONTHLY_RESULTS))
+        numpy.testing.assert_array_equal(columns['sap_value'], [d.sap_value for d in self.results])
+        numpy.testing.assert_array_equal(columns['emissions_heating_main'],
+                                         [d.emissions_heating_main for d in self.results])
+        numpy.testing.assert_array_equal(columns['Q_required'], [d.Q_required for d in self.results])
+        numpy.testing.assert_array_equal(columns['heat_calc_results.Tmean'],
+                                         [d.heat_calc_results['Tmean'] for d in self.results])
+        self.assertEqual(columns['infiltration_ach'].shape, (25, 12))
+
+        # Files are plain .npy arrays
+        numpy.testing.assert_array_equal(numpy.load(os.path.join(self.folder, 'fuel_cost.npy')),
+                                         [d.fuel_cost for d in self.results])
+
+    def test_missing_values(self):
+        rows = [dict(sap_value=60., water_effy=80.), dict(sap_value=None, water_effy=numpy.arange(12.))]
+        columnar.write_results(rows, self.folder, annual=('sap_value', 'emissions'), monthly=('water_effy',))
+
+        columns = columnar.read_columns(self.folder)
+        numpy.testing.assert_array_equal(columns['sap_value'], [60., numpy.nan])
+        self.assertTrue(numpy.isnan(columns['emissions']).all())
+        numpy.testing.assert_array_equal(columns['water_effy'], [[80.] * 12, numpy.arange(12.)])
+
+        with self.assertRaises(SAPInputError):
+            columnar.write_results([dict(water_effy=[1, 2])], self.folder, annual=(), monthly=('water_effy',))
+
+    def test_selective_and_partial_read(self):
+        writer = columnar.ColumnarWriter(self.folder, chunk_size=10)
+        writer.extend(self.results[:15])
+
+        # Only the flushed chunk is visible until the writer is closed
+        columns = columnar.read_columns(self.folder, ['emissions', 'Q_required'])
+        self.assertEqual(set(columns), {'emissions', 'Q_required'})
+        self.assertEqual(columns['Q_required'].shape, (10, 12))
+        self.assertIsInstance(columns['emissions'], numpy.memmap)
+
+        writer.close()
+        self.assertEqual(columnar.n_rows(self.folder), 15)
+        in_memory = columnar.read_columns(self.folder, ['emissions'], mmap_mode=None)['emissions']
+        self.assertNotIsInstance(in_memory, numpy.memmap)
+        numpy.testing.assert_array_equal(in_memory, [d.emissions for d in self.results[:15]])
+
+        with self.assertRaises(SAPInputError):
+            columnar.read_columns(self.folder, ['tenure'])
+
+    def test_schema(self):
+        with self.assertRaises(SAPInputError):
+            columnar.ColumnarWriter(self.folder, annual=('sap_value',), monthly=('sap_value',))
+
+        columnar.write_results([], self.folder, annual=('sap_value',), monthly=())
+        self.assertEqual(columnar.load_schema(self.folder)['annual'], ['sap_value'])
+        self.assertEqual(columnar.read_columns(self.folder)['sap_value'].shape, (0,))
+
+
+if __name__ == '__main__':
+    unittest.main()
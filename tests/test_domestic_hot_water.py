@@ -0,0 +1,77 @@
+import unittest
+
+import numpy
+
+from benchmarks import run_benchmarks
+from epctk import runner, synthetic
+from epctk.appendix import appendix_h
+from epctk.domestic_hot_water import hot_water_inputs, hot_water_kernel, hot_water_use, hot_water_use_cohort
+from epctk.tables import TABLE_H2, TABLE_H3, TABLE_H5, solar_orientation_index, solar_pitch_index
+from epctk.utils import SAPInputError
+
+
+class TestHotWaterKernel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dwellings = list(run_benchmarks.load_reference_dwellings().values()) + list(synthetic.generate(30, seed=5))
+        cls.dwellings = [runner.run_sap(d) for d in dwellings]
+
+    def test_cohort_matches_single_dwellings(self):
+        cohort = hot_water_use_cohort(self.dwellings)
+        for i, dwelling in enumerate(self.dwellings):
+            single = hot_water_use(dwelling)
+            for key, value in single.items():
+                numpy.testing.assert_array_equal(cohort[key][i], value, key)
+                numpy.testing.assert_array_equal(value, dwelling[key], key)
+
+        self.assertTrue(any(d.get('solar_collector_aperture') for d in self.dwellings))
+        self.assertTrue(any(d.get('wwhr_systems') for d in self.dwellings))
+
+    def test_masks(self):
+        inputs = hot_water_inputs(self.dwellings)
+        n = len(self.dwellings)
+        base = hot_water_kernel(**inputs)
+
+        inputs['instantaneous_pou'] = numpy.arange(n) % 2 == 0
+        inputs['cylinder_loss'] = numpy.where(inputs['instantaneous_pou'], 0, inputs['cylinder_loss'])
+        inputs['immersion_in_summer'] = numpy.ones(n, dtype=bool)
+        masked = hot_water_kernel(**inputs)
+
+        numpy.testing.assert_array_equal(masked['distribution_loss'][::2], 0)
+        numpy.testing.assert_array_equal(masked['distribution_loss'][1::2], base['distribution_loss'][1::2])
+        numpy.testing.assert_array_equal(masked['primary_circuit_loss'][:, 5:9], 0)
+
+    def test_solar_primary_loss(self):
+        inputs = hot_water_inputs(self.dwellings)
+        reduces = inputs['solar_reduces_primary_loss']
+        self.assertTrue(reduces.any())
+        reduced = hot_water_kernel(**inputs)['primary_circuit_loss']
+
+        inputs['solar_reduces_primary_loss'] = numpy.zeros_like(reduces)
+        full = hot_water_kernel(**inputs)['primary_circuit_loss']
+        numpy.testing.assert_array_equal(reduced[reduces], full[reduces] * TABLE_H5)
+        numpy.testing.assert_array_equal(reduced[~reduces], full[~reduces])
+
+
+class TestSolarTables(unittest.TestCase):
+    def test_collector_solar_data(self):
+        pitches = [30, 45, 60, "Vertical", "horizontal"]
+        orientations = [0, 135, 315, 180, 90]
+        Igh, factors, overshading = appendix_h.collector_solar_data(
+                [solar_pitch_index(p) for p in pitches], [solar_orientation_index(o) for o in orientations],
+                [1, 2, 3, 4, 4])
+
+        numpy.testing.assert_array_equal(Igh, [730, 997, 597, 746, TABLE_H2["Horizontal"]])
+        numpy.testing.assert_array_equal(factors[:4], [TABLE_H3[p] for p in pitches[:4]])
+        numpy.testing.assert_array_equal(factors[4], TABLE_H3["Horizontal"])
+        numpy.testing.assert_array_equal(overshading, [0.5, 0.65, 0.8, 1, 1])
+
+    def test_unknown_collector(self):
+        with self.assertRaises(SAPInputError):
+            solar_pitch_index(20)
+        with self.assertRaises(SAPInputError):
+            solar_orientation_index(100)
+
+
+if __name__ == '__main__':
+    unittest.main()
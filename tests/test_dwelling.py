@@ -0,0 +1,56 @@
+import numbers
+import pickle
+import unittest
+
+import numpy
+
+from epctk import runner
+from epctk.appendix import appendix_t
+from tests.sample_dwellings import gas_combi_house
+
+
+class TestDwellingResults(unittest.TestCase):
+    def assertSameResults(self, first, second):
+        self.assertEqual(set(first), set(second))
+        numeric = [key for key, value in first.items() if isinstance(value, (numbers.Number, numpy.ndarray))]
+        self.assertTrue(numeric)
+        for key in numeric:
+            numpy.testing.assert_array_equal(first[key], second[key], key)
+
+    def run_improvements(self, dwelling):
+        sap = runner.run_sap(dwelling)
+        dwelling.sap_value = sap.sap_value
+        dwelling.emissions = sap.emissions
+        appendix_t.run_improvements(dwelling)
+        return dwelling.improvement_results.improvement_effects, dwelling.improved_results
+
+    def test_run_sap_twice(self):
+        dwelling = gas_combi_house()
+        first = runner.run_sap(dwelling)
+        second = runner.run_sap(dwelling)
+
+        self.assertSameResults(first.results, second.results)
+        self.assertEqual(dwelling.results, {})
+
+    def test_run_improvements_twice(self):
+        dwelling = gas_combi_house()
+        first, first_improved = self.run_improvements(dwelling)
+        second, second_improved = self.run_improvements(dwelling)
+
+        self.assertTrue(first)
+        self.assertEqual([vars(effect) for effect in first], [vars(effect) for effect in second])
+        self.assertSameResults(first_improved, second_improved)
+        self.assertEqual(dwelling.results, {})
+
+    def test_pickle(self):
+        calculated = runner.run_sap(gas_combi_house())
+        restored = pickle.loads(pickle.dumps(calculated))
+        self.assertIs(type(restored), type(calculated))
+        self.assertSameResults(restored.results, calculated.results)
+
+        _, improved = self.run_improvements(gas_combi_house())
+        self.assertSameResults(pickle.loads(pickle.dumps(improved)), improved)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+import numpy
+
+from epctk import configure, runner, synthetic, worksheet
+from epctk.utils import SAPInputError
+
+
+class TestEvaluate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = list(synthetic.generate(40, seed=8))
+
+    def test_ratings(self):
+        for i, dwelling in enumerate(self.dwellings):
+            with self.subTest(dwelling=i):
+                sap = runner.run_sap(dwelling)
+                self.assertEqual(runner.evaluate(dwelling, ['sap_value', 'emissions']),
+                                 dict(sap_value=sap.sap_value, emissions=sap.emissions))
+                self.assertEqual(runner.evaluate(dwelling, ['fee_rating']),
+                                 dict(fee_rating=runner.run_fee(dwelling).fee_rating))
+                self.assertEqual(runner.evaluate(dwelling, ['der_rating'])['der_rating'],
+                                 runner.run_der(dwelling).der_rating)
+
+    def test_demand_outputs(self):
+        for i, dwelling in enumerate(self.dwellings):
+            sap = runner.run_sap(dwelling)
+            for name in worksheet.DEMAND_OUTPUTS:
+                with self.subTest(dwelling=i, output=name):
+                    value = runner.evaluate(dwelling, [name])[name]
+                    if name == 'heat_calc_results':
+                        for key, array in sap.heat_calc_results.items():
+                            numpy.testing.assert_array_equal(value[key], array)
+                    else:
+                        numpy.testing.assert_array_equal(value, sap.get(name))
+
+    def test_skipped_stages(self):
+        performed = []
+
+        def recorded(name, run):
+            def step(dwelling):
+                performed.append(name)
+                return run(dwelling)
+            return step
+
+        lookup_steps = tuple((name, recorded(name, step)) for name, step in configure.LOOKUP_STEPS)
+        demand_stages = tuple(stage._replace(run=recorded(stage.name, stage.run))
+                              for stage in worksheet.DEMAND_STAGES)
+        with mock.patch.object(configure, 'LOOKUP_STEPS', lookup_steps), \
+                mock.patch.object(worksheet, 'DEMAND_STAGES', demand_stages), \
+                mock.patch.object(worksheet, 'heating_systems_energy') as energy:
+            runner.evaluate(self.dwellings[0], ['hlp', 'infiltration_ach'])
+            energy.assert_not_called()
+
+        self.assertNotIn('renewables', performed)
+        self.assertNotIn('fuel_costs', performed)
+        self.assertEqual(performed[-2:], ['ventilation', 'heat_loss'])
+
+    def test_invalid_outputs(self):
+        dwelling = self.dwellings[0]
+        with self.assertRaises(SAPInputError):
+            runner.evaluate(dwelling, ['sap_value', 'fee_rating'])
+        with self.assertRaises(SAPInputError):
+            runner.evaluate(dwelling, ['sap_value'], calculation='der')
+        with self.assertRaises(SAPInputError):
+            runner.evaluate(dwelling, ['emissions'], calculation='fee')
+        with self.assertRaises(SAPInputError):
+            runner.evaluate(dwelling, ['no_such_result'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk.heating import (heat_required_inputs, heat_required_kernel, heat_utilisation_factor,
+                           heating_requirement, heating_requirement_cohort)
+
+
+def calculated_dwellings():
+    return [runner.run_sap(d) for d in run_benchmarks.load_reference_dwellings().values()]
+
+
+class TestHeatRequiredKernel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = calculated_dwellings()
+
+    def test_cohort_matches_single_dwellings(self):
+        cohort = heating_requirement_cohort(self.dwellings)
+
+        for i, dwelling in enumerate(self.dwellings):
+            single = heating_requirement(dwelling)
+            for key in ('Tmean', 'Tmean_living_area', 'Tmean_other', 'utilisation', 'heat_required'):
+                numpy.testing.assert_array_equal(cohort[key][i], single[key], key)
+            numpy.testing.assert_array_equal(single['heat_required'], dwelling.heat_calc_results['heat_required'])
+
+    def test_mixed_control_types(self):
+        inputs = heat_required_inputs(self.dwellings)
+        gains = numpy.array([d.winter_heat_gains for d in self.dwellings])
+
+        results = {}
+        for control_type in (1, 2, 3):
+            inputs['control_type_sys1'] = numpy.full(len(self.dwellings), control_type)
+            results[control_type] = heat_required_kernel(self.dwellings[0].heat_calc_results['Texternal'],
+                                                         gains, **inputs)['Tmean_other']
+
+        mixed = numpy.array([1, 2, 3, 1, 2, 3])
+        inputs['control_type_sys1'] = mixed
+        Tmean_other = heat_required_kernel(self.dwellings[0].heat_calc_results['Texternal'],
+                                           gains, **inputs)['Tmean_other']
+        for i, control_type in enumerate(mixed):
+            numpy.testing.assert_array_equal(Tmean_other[i], results[control_type][i])
+        self.assertFalse(numpy.array_equal(results[2], results[3]))
+
+    def test_second_system_weighting(self):
+        inputs = heat_required_inputs(self.dwellings)
+        gains = numpy.array([d.winter_heat_gains for d in self.dwellings])
+        Texternal = self.dwellings[0].heat_calc_results['Texternal']
+
+        inputs['control_type_sys2'] = numpy.full(len(self.dwellings), 3)
+        inputs['rest_of_dwelling_sys1_weight'] = numpy.zeros(len(self.dwellings))
+        sys2_only = heat_required_kernel(Texternal, gains, **inputs)['Tmean_other']
+
+        inputs['rest_of_dwelling_sys1_weight'] = numpy.full(len(self.dwellings), 0.25)
+        weighted = heat_required_kernel(Texternal, gains, **inputs)['Tmean_other']
+
+        sys1_only = heating_requirement_cohort(self.dwellings)['Tmean_other']
+        numpy.testing.assert_allclose(weighted, 0.25 * sys1_only + 0.75 * sys2_only)
+
+    def test_utilisation_factor_at_unit_gain_loss_ratio(self):
+        factor = heat_utilisation_factor(numpy.array([2.0, 2.0]), numpy.array([10.0, 5.0]),
+                                         numpy.array([10.0, 10.0]))
+        self.assertAlmostEqual(factor[0], 2 / 3)
+        self.assertAlmostEqual(factor[1], (1 - 0.5 ** 2) / (1 - 0.5 ** 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy
+
+from epctk.heating_tables import TABLE_4C_SUBSECTIONS, heating_tables
+from epctk.fuels import ELECTRICITY_7HR, ELECTRICITY_24HR, fuel_from_code
+from epctk.tables import TABLE_4A, TABLE_4B, TABLE_4E, get_4a_system, system_efficiency
+from epctk.utils import SAPInputError
+
+
+class TestHeatingTables(unittest.TestCase):
+    def setUp(self):
+        self.tables = heating_tables()
+
+    def assertRecord(self, table, row, record, names):
+        for name in names:
+            value = getattr(table, name)[row]
+            expected = record.get(name)
+            if isinstance(expected, str):
+                self.assertEqual(value, expected == 'TRUE', name)
+            elif expected is None:
+                # Missing from the water heating systems of Table 4a
+                self.assertTrue(not value if isinstance(value, numpy.bool_) else numpy.isnan(value), name)
+            else:
+                self.assertEqual(value, expected, name)
+
+    def test_table_4a(self):
+        table = self.tables.table_4a
+        for code in TABLE_4A:
+            for tariff in (ELECTRICITY_7HR, ELECTRICITY_24HR):
+                with self.subTest(code=code, tariff_24hr=tariff is ELECTRICITY_24HR):
+                    record = get_4a_system(tariff, code)
+                    row, = table.rows([code], [tariff])
+                    self.assertRecord(table, row, record,
+                                      ['effy', 'table2b_row', 'responsiveness', 'flue_fan', 'warm_air_fan'])
+                    self.assertEqual(table.water_heating_only[row], 'responsiveness' not in record)
+                    if record.get('water_effy') not in (None, 'same', ''):
+                        self.assertEqual(table.water_effy[row], float(record['water_effy']))
+
+    def test_tariff_variants(self):
+        rows = self.tables.table_4a.rows([402, 402, 151], [ELECTRICITY_24HR, ELECTRICITY_7HR, ELECTRICITY_24HR])
+        numpy.testing.assert_array_equal(self.tables.table_4a.responsiveness[rows], [.5, .25, .75])
+        numpy.testing.assert_array_equal(self.tables.table_4a.rows([402]), rows[1:2])
+
+    def test_efficiency(self):
+        table = self.tables.table_4a
+        codes = [code for code, records in TABLE_4A.items()
+                 if records[0]['effy'] > 0 or records[0].get('effy_gas', 0) > 0]
+        rows = table.rows(codes)
+        for fuel_code, mains_gas in ((1, True), (2, False)):
+            fuel = fuel_from_code(fuel_code)
+            expected = [system_efficiency(TABLE_4A[code][0], fuel) for code in codes]
+            numpy.testing.assert_array_equal(table.efficiency(rows, mains_gas), expected)
+
+        hetas = [code for code in codes if TABLE_4A[code][0].get('effy_hetas', 0) > 0]
+        self.assertTrue(hetas)
+        numpy.testing.assert_array_equal(table.efficiency(table.rows(hetas), True, hetas_approved=True),
+                                         [TABLE_4A[code][0]['effy_hetas'] for code in hetas])
+
+    def test_table_4b_4e(self):
+        for code, record in TABLE_4B.items():
+            row, = self.tables.table_4b.rows([code])
+            self.assertRecord(self.tables.table_4b, row, record,
+                              ['effy_winter', 'effy_summer', 'table2b_row', 'boiler_type', 'condensing',
+                               'flue_fan', 'responsiveness', 'fraction_of_heat_from_secondary'])
+        for code, record in TABLE_4E.items():
+            row, = self.tables.table_4e.rows([code])
+            self.assertRecord(self.tables.table_4e, row, record, ['control_type', 'Tadjustment', 'thermostat', 'trv'])
+            self.assertEqual(TABLE_4C_SUBSECTIONS[self.tables.table_4e.other_adj_table[row]],
+                             record['other_adj_table'])
+
+    def test_unknown_codes(self):
+        with self.assertRaises(SAPInputError):
+            self.tables.table_4a.rows([151, 99])
+        with self.assertRaises(SAPInputError):
+            self.tables.table_4e.rows([9999])
+
+    def test_read_only(self):
+        with self.assertRaises(ValueError):
+            self.tables.table_4e.Tadjustment[0] = 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import unittest
+
+from epctk import instrumentation, runner
+from tests.sample_dwellings import gas_combi_house
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_records_nothing(self):
+        instrumentation.disable()
+        runner.run_sap(gas_combi_house())
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot['timings'], {})
+        self.assertEqual(snapshot['counters'], {})
+
+    def test_stages_recorded(self):
+        instrumentation.enable()
+        runner.run_sap(gas_combi_house())
+        runner.run_sap(gas_combi_house())
+
+        timings = instrumentation.snapshot()['timings']
+        for name in ('runner.run_sap', 'configure.lookup_sap_tables', 'configure.configure_heat_systems',
+                     'ventilation.ventilation_properties', 'configure.configure_fans_and_pumps',
+                     'worksheet.perform_full_calc', 'heating.heating_requirement', 'fuel_use.fuel_use'):
+            self.assertEqual(timings[name]['calls'], 2, name)
+            self.assertGreaterEqual(timings[name]['total_s'], timings[name]['max_s'])
+
+        caches = instrumentation.snapshot()['caches']
+        self.assertEqual(caches['table_12']['hit_rate'], 1.0)
+
+    def test_exports(self):
+        instrumentation.enable()
+        with instrumentation.stage('custom'):
+            pass
+        instrumentation.cache_lookup('example', True)
+        instrumentation.cache_lookup('example', False)
+
+        data = json.loads(instrumentation.to_json())
+        self.assertEqual(data['timings']['custom']['calls'], 1)
+        self.assertEqual(data['caches']['example'], dict(hits=1, misses=1, hit_rate=0.5))
+
+        text = instrumentation.to_prometheus()
+        self.assertIn('# TYPE epctk_stage_seconds_total counter', text)
+        self.assertIn('epctk_stage_calls_total{stage="custom"} 1', text)
+        self.assertIn('epctk_cache_hit_ratio{cache="example"} 0.5', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk import inverse
+from epctk.appendix import appendix_t
+from epctk.elements import HeatLossElementTypes
+from epctk.utils import SAPInputError
+
+RUNNERS = dict(sap=runner.run_sap, der=runner.run_der, ter_margin=runner.run_der, fee=runner.run_fee)
+
+
+def wall_uvalue():
+    return inverse.ElementUValue(HeatLossElementTypes.EXTERNAL_WALL, 1.5, 0.15)
+
+
+class TestInverse(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = run_benchmarks.load_reference_dwellings()
+
+    def test_reused_configuration_matches_full_calculation(self):
+        parameters = [inverse.Attribute('pressurisation_test_result', 15, 2), wall_uvalue()]
+        for name, dwelling in self.dwellings.items():
+            for target in inverse.TARGETS:
+                problem = inverse.InverseProblem(dwelling, target, 0, parameters)
+                for position in (0, 0.4, 1):
+                    with self.subTest(dwelling=name, target=target, position=position):
+                        result = RUNNERS[target](problem.candidate_input(position))
+                        expected = result[problem._rating]
+                        if target == 'ter_margin':
+                            ter = appendix_t.run_ter(dwelling).ter_rating
+                            expected = 100 * (ter - expected) / ter
+                        self.assertEqual(problem.rating(position), expected)
+
+    def test_solve_sap(self):
+        dwelling = self.dwellings['gas_combi']
+        solution = inverse.solve(dwelling, 'sap', 65, [wall_uvalue()], ftol=1e-4)
+
+        self.assertTrue(solution.converged)
+        self.assertTrue(0.15 < solution.values['Uvalue_EXTERNAL_WALL'] < 1.5)
+        problem = inverse.InverseProblem(dwelling, 'sap', 65, [wall_uvalue()])
+        sap_value = runner.run_sap(problem.candidate_input(solution.position)).sap_value
+        self.assertAlmostEqual(sap_value, 65, delta=1e-4)
+        self.assertEqual(sap_value, solution.rating)
+
+    def test_solve_several_parameters(self):
+        parameters = [inverse.Attribute('thermal_mass_parameter', 50, 450), wall_uvalue()]
+        solution = inverse.solve(self.dwellings['heat_pump_appendix_n'], 'fee', 80, parameters)
+
+        self.assertTrue(solution.converged)
+        self.assertAlmostEqual(solution.rating, 80, delta=1e-3)
+        values = solution.values
+        self.assertAlmostEqual((values['thermal_mass_parameter'] - 50) / 400, solution.position)
+        self.assertAlmostEqual((1.5 - values['Uvalue_EXTERNAL_WALL']) / 1.35, solution.position)
+
+    def test_solve_ter_margin(self):
+        parameters = [inverse.Attribute('pressurisation_test_result', 15, 2), wall_uvalue()]
+        solution = inverse.solve(self.dwellings['pv_wind_appendix_m'], 'ter_margin', 10, parameters)
+
+        self.assertTrue(solution.converged)
+        self.assertAlmostEqual(solution.rating, 10, delta=1e-3)
+
+    def test_reconfigured_parameter(self):
+        dwelling = self.dwellings['solar_hot_water_appendix_h']
+        parameter = inverse.Attribute('hw_cylinder_insulation', 12, 100, reconfigure=True)
+        problem = inverse.InverseProblem(dwelling, 'sap', 0, [parameter])
+        start, end = problem.evaluate([0, 1])
+        self.assertLess(start, end)
+
+        solution = inverse.solve(dwelling, 'sap', (start + end) / 2, [parameter])
+        self.assertTrue(solution.converged)
+        sap_value = runner.run_sap(problem.candidate_input(solution.position)).sap_value
+        self.assertEqual(sap_value, solution.rating)
+
+    def test_configuration_inputs_calculated_in_full(self):
+        for name in ('living_area', 'GFA'):
+            parameter = inverse.Attribute(name, 20, 80)
+            self.assertTrue(parameter.reconfigure)
+            for target in ('sap', 'fee'):
+                with self.subTest(name=name, target=target):
+                    problem = inverse.InverseProblem(self.dwellings['gas_combi'], target, 0, [parameter])
+                    expected = RUNNERS[target](problem.candidate_input(1))[problem._rating]
+                    self.assertEqual(problem.rating(1), expected)
+
+        self.assertFalse(inverse.Attribute('thermal_mass_parameter', 50, 450).reconfigure)
+        with self.assertRaises(SAPInputError):
+            inverse.Attribute('living_area', 20, 80, reconfigure=False)
+
+    def test_unreachable_target(self):
+        solution = inverse.solve(self.dwellings['gas_combi'], 'sap', 99, [wall_uvalue()])
+
+        self.assertFalse(solution.converged)
+        self.assertEqual(solution.position, 1)
+        self.assertEqual(solution.evaluations, 2)
+
+    def test_invalid_problem(self):
+        dwelling = self.dwellings['gas_combi']
+        with self.assertRaises(SAPInputError):
+            inverse.InverseProblem(dwelling, 'ei', 80, [wall_uvalue()])
+        with self.assertRaises(SAPInputError):
+            inverse.InverseProblem(dwelling, 'sap', 80, [])
+
+    def test_solve_portfolio(self):
+        dwellings = list(self.dwellings.values())
+        solutions = inverse.solve_portfolio(dwellings, 'der', 30, [wall_uvalue()], workers=2)
+
+        self.assertEqual(len(solutions), len(dwellings))
+        for dwelling, solution in zip(dwellings, solutions):
+            self.assertEqual(solution, inverse.solve(dwelling, 'der', 30, [wall_uvalue()]))
+
+
+if __name__ == '__main__':
+    unittest.main()
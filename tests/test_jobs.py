@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epctk import batch, jobs, runner, synthetic
+from epctk.utils import SAPCalculationError, SAPInputError
+
+ANNUAL = ('sap_value', 'emissions')
+MONTHLY = ('Q_required',)
+
+# Dwellings calculated by interruptible_run_sap, and the one it stops at
+CALCULATED = []
+STOP_AT = None
+
+
+def interruptible_run_sap(dwelling):
+    if dwelling is STOP_AT:
+        # Not caught by the job, like the process being killed
+        raise KeyboardInterrupt
+    CALCULATED.append(dwelling)
+    return runner.run_sap(dwelling)
+
+
+def failing_run_sap(dwelling):
+    if dwelling['sap_region'] == 2:
+        raise SAPCalculationError("no region 2")
+    return runner.run_sap(dwelling)
+
+
+class TestJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = list(synthetic.generate(25, seed=4))
+        cls.sap_values = [runner.run_sap(d).sap_value for d in cls.dwellings]
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.folder = self._folder.name
+        CALCULATED.clear()
+
+    def tearDown(self):
+        global STOP_AT
+        STOP_AT = None
+        self._folder.cleanup()
+
+    def run_job(self, dwellings, calculation=interruptible_run_sap, workers=1):
+        return jobs.run_job(dwellings, self.folder, calculation, workers=workers, chunk_size=10,
+                            annual=ANNUAL, monthly=MONTHLY)
+
+    def test_run_job(self):
+        summary = self.run_job(self.dwellings)
+        self.assertEqual(summary, jobs.JobSummary(n_dwellings=25, n_failed=0, n_chunks=3, n_resumed_chunks=0))
+
+        results = jobs.read_results(self.folder)
+        self.assertEqual(set(results), {'sap_value', 'emissions', 'Q_required', 'index'})
+        numpy.testing.assert_array_equal(results['sap_value'], self.sap_values)
+        numpy.testing.assert_array_equal(results['index'], numpy.arange(25))
+        self.assertEqual(results['Q_required'].shape, (25, 12))
+
+        with open(os.path.join(self.folder, jobs.JOB_FILE)) as f:
+            self.assertTrue(json.load(f)['complete'])
+
+    def test_quarantine(self):
+        summary = self.run_job(self.dwellings, failing_run_sap)
+        failed = [i for i, d in enumerate(self.dwellings) if d['sap_region'] == 2]
+        self.assertTrue(failed)
+        self.assertEqual(summary.n_failed, len(failed))
+
+        quarantine = jobs.read_quarantine(self.folder)
+        self.assertEqual([record['index'] for record in quarantine], failed)
+        self.assertEqual(quarantine[0]['input_hash'], batch.dwelling_fingerprint(self.dwellings[failed[0]]))
+        self.assertEqual(quarantine[0]['error'], "SAPCalculationError: no region 2")
+        self.assertIn('failing_run_sap', quarantine[0]['traceback'])
+
+        sap_values = jobs.read_results(self.folder, ['sap_value'])['sap_value']
+        self.assertTrue(numpy.isnan(sap_values[failed]).all())
+        self.assertEqual(numpy.isnan(sap_values).sum(), len(failed))
+
+    def test_resume(self):
+        global STOP_AT
+        STOP_AT = self.dwellings[23]
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_job(self.dwellings)
+        os.makedirs(os.path.join(self.folder, jobs.CHUNKS_FOLDER, '.tmp-00000002-1'))
+
+        self.assertEqual(sorted(jobs.committed_chunks(self.folder)), [0, 1])
+        numpy.testing.assert_array_equal(jobs.read_results(self.folder)['index'], numpy.arange(20))
+
+        STOP_AT = None
+        CALCULATED.clear()
+        summary = self.run_job(self.dwellings)
+        self.assertEqual(summary, jobs.JobSummary(n_dwellings=25, n_failed=0, n_chunks=3, n_resumed_chunks=2))
+        self.assertEqual(CALCULATED, self.dwellings[20:])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.folder, jobs.CHUNKS_FOLDER))),
+                         ['00000000', '00000001', '00000002'])
+        numpy.testing.assert_array_equal(jobs.read_results(self.folder)['sap_value'], self.sap_values)
+
+    def test_resume_checks(self):
+        self.run_job(self.dwellings[:10])
+        with self.assertRaises(SAPInputError):
+            self.run_job(self.dwellings[:10], failing_run_sap)
+        with self.assertRaises(SAPInputError):
+            self.run_job(self.dwellings[5:15])
+
+    def test_workers(self):
+        summary = self.run_job(self.dwellings, failing_run_sap, workers=2)
+        self.assertEqual(summary.n_chunks, 3)
+        sap_values = jobs.read_results(self.folder, ['sap_value'])['sap_value']
+        expected = [numpy.nan if d['sap_region'] == 2 else value
+                    for d, value in zip(self.dwellings, self.sap_values)]
+        numpy.testing.assert_array_equal(sap_values, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
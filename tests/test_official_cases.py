@@ -1,6 +1,5 @@
 import logging
 import os
-import pickle
 import unittest
 
 from epctk.appendix import appendix_t
@@ -10,10 +9,9 @@ from epctk.runner import run_sap, run_fee, run_der
 from epctk.utils import SAPCalculationError
 from tests import output_checker
 from tests import reference_case_parser
+from tests.reference_case_cache import FOLDER as _FOLDER, load_reference_case, parse_file
 from tests.reference_cases_lists import OFFICIAL_CASES, SKIP
 
-_FOLDER = os.path.join(os.path.dirname(__file__), '..', '..', 'data_private', 'bre_test_cases')
-
 SAP_REGIONS = {
     '2.rtf': 11,
     '3.rtf': 11,
@@ -109,43 +107,11 @@ def set_up(loader, fname):
     return suite
 
 
-def parse_file(fname, parser):
-    with open(fname, 'r') as f:
-        txt = f.read()
-        txt = txt.replace('\\\'b', '')
-        txt = txt.replace('\\f1', '')
-        txt = txt.replace('\\f2', '')
-        return parser.parseString(txt)
-
-
 def parse_input_file(test_case_id):
     return parse_file(os.path.join("reference_dwellings", "%d.rtf" % (test_case_id,)),
                       reference_case_parser.whole_file)
 
 
-def load_reference_case(case_path, parser, force_reparse):
-    """
-    Load the given file with the given parser. First attempts to
-    load the cached parsed file (pickled), if that does not exist
-    or if force_reparse is true, will reparse the original file
-
-    :param case_path:
-    :param parser:
-    :param force_reparse:
-    :return:
-    """
-    pickled_file = os.path.join(_FOLDER, 'pickled_reference_cases', os.path.basename(case_path) + ".pkl")
-
-    if os.path.exists(pickled_file) and not force_reparse:
-        case = pickle.load(open(pickled_file, "rb"))
-    else:
-        # print("Reparsing ", case_path)
-        case = parse_file(case_path, parser)
-        pickle.dump(case, open(pickled_file, "w"))
-
-    return case
-
-
 def create_sap_dwelling(inputs):
     """
     Create a SAP dwelling object from parsed SAP input file
@@ -167,7 +133,7 @@ def dwelling_from_file(fname, reparse):
     if os.path.exists(yaml_file) and not reparse:
         dwelling = yaml_io.from_yaml(yaml_file)
     else:
-        parsed_ref_case = load_reference_case(fname, reference_case_parser.whole_file, reparse)
+        parsed_ref_case = load_reference_case(fname, force_reparse=reparse)
         dwelling = create_sap_dwelling(parsed_ref_case.inputs)
         with open(yaml_file, 'w') as f:
             yaml_io.to_yaml(dwelling, f)
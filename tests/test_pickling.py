@@ -0,0 +1,45 @@
+import pickle
+import unittest
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk.appendix import appendix_n
+from epctk.fuels import fuel_from_code
+
+
+class TestPickleConfiguredDwellings(unittest.TestCase):
+    def assertRoundTrips(self, dwelling):
+        calculated = runner.run_sap(dwelling)
+        restored = pickle.loads(pickle.dumps(calculated))
+
+        self.assertEqual(restored.sap_value, calculated.sap_value)
+        self.assertEqual(restored.emissions, calculated.emissions)
+        self.assertEqual(runner.run_sap(pickle.loads(pickle.dumps(dwelling))).sap_value,
+                         calculated.sap_value)
+        return restored
+
+    def test_reference_dwellings(self):
+        for name, dwelling in run_benchmarks.load_reference_dwellings().items():
+            with self.subTest(name):
+                self.assertRoundTrips(dwelling)
+
+    def test_heat_pump(self):
+        dwelling = run_benchmarks.load_reference_dwellings()['heat_pump_appendix_n']
+        restored = self.assertRoundTrips(dwelling)
+
+        self.assertIsInstance(restored.main_sys_1, appendix_n.HeatPumpSystem)
+        self.assertIsInstance(restored.longer_heating_days, appendix_n.LongerHeatingDays)
+        self.assertAlmostEqual(restored.main_sys_1.space_heat_effy(0, restored),
+                               restored.sys1_space_effy)
+
+    def test_micro_chp(self):
+        dwelling = run_benchmarks.load_reference_dwellings()['heat_pump_appendix_n']
+        dwelling.main_heating_pcdf_id = '040005'
+        dwelling.main_sys_fuel = fuel_from_code(1)
+
+        restored = self.assertRoundTrips(dwelling)
+        self.assertIsInstance(restored.main_sys_1, appendix_n.MicroCHPSystem)
+
+
+if __name__ == '__main__':
+    unittest.main()
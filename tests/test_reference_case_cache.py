@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import reference_case_cache
+
+
+class TestReferenceCaseCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.folder = self._tmp.name
+        self.cache_folder = os.path.join(self.folder, 'cache')
+        self.paths = [self.write_case('case{}.rtf'.format(i), 'lab{}:val{}'.format(i, i)) for i in range(3)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write_case(self, name, txt):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write(txt)
+        return path
+
+    def load(self, path, **kwargs):
+        return reference_case_cache.load_reference_case(path, 'field_value', cache_folder=self.cache_folder,
+                                                        **kwargs)
+
+    def test_cached_case_is_reused(self):
+        case = self.load(self.paths[0])
+        self.assertEqual(case[0].label, 'lab0')
+        self.assertEqual(os.listdir(self.cache_folder),
+                         [os.path.basename(reference_case_cache.cache_path(
+                             self.paths[0], 'field_value', self.cache_folder))])
+
+        with mock.patch.object(reference_case_cache, 'parse_file', side_effect=AssertionError):
+            cached = self.load(self.paths[0])
+        self.assertEqual(cached[0].vals[0].value, 'val0')
+
+    def test_changed_file_is_reparsed(self):
+        self.load(self.paths[0])
+        key = reference_case_cache.cache_key(self.paths[0], 'field_value')
+
+        self.write_case('case0.rtf', 'lab0:changed')
+        self.assertNotEqual(reference_case_cache.cache_key(self.paths[0], 'field_value'), key)
+        self.assertEqual(self.load(self.paths[0])[0].vals[0].value, 'changed')
+
+    def test_key_depends_on_grammar(self):
+        self.assertNotEqual(reference_case_cache.cache_key(self.paths[0], 'field_value'),
+                            reference_case_cache.cache_key(self.paths[0], 'whole_file'))
+
+        with mock.patch.object(reference_case_cache, '_GRAMMAR_VERSION', 'other'):
+            other = reference_case_cache.cache_key(self.paths[0], 'field_value')
+        self.assertNotEqual(reference_case_cache.cache_key(self.paths[0], 'field_value'), other)
+
+    def test_unreadable_cache_file_is_replaced(self):
+        pickled = reference_case_cache.cache_path(self.paths[0], 'field_value', self.cache_folder)
+        os.makedirs(self.cache_folder)
+        with open(pickled, 'wb') as f:
+            f.write(b'truncated')
+
+        self.assertEqual(self.load(self.paths[0])[0].label, 'lab0')
+        self.assertEqual(os.listdir(self.cache_folder), [os.path.basename(pickled)])
+
+    def test_parse_cases(self):
+        cases = reference_case_cache.parse_cases(self.paths, 'field_value', cache_folder=self.cache_folder,
+                                                 workers=2)
+
+        self.assertEqual(list(cases), self.paths)
+        self.assertEqual([case[0].label for case in cases.values()], ['lab0', 'lab1', 'lab2'])
+        self.assertEqual(len(os.listdir(self.cache_folder)), 3)
+
+        with mock.patch.object(reference_case_cache, 'parse_file', side_effect=AssertionError):
+            cached = reference_case_cache.parse_cases(self.paths, 'field_value', cache_folder=self.cache_folder,
+                                                      workers=1)
+        self.assertEqual([case[0].label for case in cached.values()], ['lab0', 'lab1', 'lab2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import math
+import unittest
+from unittest import mock
+
+from tests import output_checker
+from tests import regression_runner
+
+
+def case_result(*checks, errors=()):
+    return dict(checks=list(checks), errors=list(errors), timings=dict(sap=0.1))
+
+
+class TestRegressionRunner(unittest.TestCase):
+    def setUp(self):
+        self.case_results = {
+            'a.rtf': case_result(('ER', 'total emissions', 3000.4, 3000, 1),
+                                 ('ER', 'sap rating (unrounded)', 65.2, 65.18, 0.01)),
+            'b.rtf': case_result(('ER', 'total emissions', 2500, 2502, 1),
+                                 ('DER', 'der', math.nan, 20.1, 0.01),
+                                 errors=["ter failed: KeyError"]),
+        }
+
+    def test_collect(self):
+        with output_checker.collect() as collected:
+            output_checker.check_result("ER", 2, 1, "lighting cost", .25)
+            output_checker.report_error("Mismatched effect tags: E vs N")
+
+        self.assertEqual(collected['checks'], [("ER", "lighting cost", 2, 1, .25)])
+        self.assertEqual(collected['errors'], ["Mismatched effect tags: E vs N"])
+        self.assertIsNone(output_checker._COLLECTED)
+
+    def test_compare(self):
+        table = regression_runner.quantity_table(self.case_results)
+        error, mismatched = regression_runner.compare(table)
+
+        self.assertEqual(list(table['field']), ['ER: total emissions', 'ER: sap rating (unrounded)',
+                                                'ER: total emissions', 'DER: der'])
+        self.assertEqual(mismatched.tolist(), [False, True, True, True])
+        self.assertAlmostEqual(error[2], -2)
+
+    def test_tolerance_overrides(self):
+        table = regression_runner.quantity_table(
+            self.case_results, {'total emissions': 5, 'ER: sap rating (unrounded)': 0.05})
+        self.assertEqual(table['tolerance'].tolist(), [5, 0.05, 5, 0.01])
+        self.assertEqual(regression_runner.compare(table)[1].tolist(), [False, False, False, True])
+
+    def test_report(self):
+        report = json.loads(json.dumps(regression_runner.build_report(self.case_results, elapsed=1.5)))
+
+        self.assertEqual(report['summary'], dict(cases=2, failed_cases=2, quantities=4, mismatches=3,
+                                                 errors=1, elapsed=1.5))
+        self.assertEqual(report['fields']['ER: total emissions'],
+                         dict(tolerance=1, count=2, mismatches=1, max_abs_error=2))
+        self.assertEqual(report['mismatches'][0]['case'], 'a.rtf')
+        self.assertEqual(report['errors'], [dict(case='b.rtf', error="ter failed: KeyError")])
+        self.assertEqual(report['timings']['a.rtf'], dict(sap=0.1))
+
+    def test_empty_report(self):
+        report = regression_runner.build_report(dict())
+        self.assertEqual(report['summary']['quantities'], 0)
+        self.assertEqual(report['fields'], dict())
+
+    def test_run_case(self):
+        def check(dwelling, parsed):
+            output_checker.check_result("ER", dwelling, parsed, "sap rating", 0.5)
+
+        def fail(dwelling, results):
+            raise KeyError('main_sys_1')
+
+        stages = (('sap', lambda dwelling, results: dwelling + 0.2, check),
+                  ('der', fail, check))
+        with mock.patch.object(regression_runner, 'load_reference_case', return_value=60.), \
+                mock.patch.object(regression_runner, 'case_dwelling', return_value=60.), \
+                mock.patch.object(regression_runner, 'STAGES', stages):
+            result = regression_runner.run_case('a.rtf')
+
+        self.assertEqual(result['checks'], [("ER", "sap rating", 60.2, 60., 0.5)])
+        self.assertEqual(len(result['errors']), 1)
+        self.assertTrue(result['errors'][0].startswith("der failed"))
+        self.assertIn('KeyError', result['errors'][0])
+        self.assertEqual(set(result['timings']), {'parse', 'inputs', 'sap'})
+
+
+if __name__ == '__main__':
+    unittest.main()
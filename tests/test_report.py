@@ -0,0 +1,52 @@
+import json
+import unittest
+
+from epctk import batch, dwelling, runner
+from epctk.appendix import appendix_t
+from tests.sample_dwellings import gas_combi_house
+
+
+class TestCalculationReport(unittest.TestCase):
+    def test_structured_entries(self):
+        ter = appendix_t.run_ter(gas_combi_house())
+        entries = ter.report.entries
+
+        self.assertEqual(entries[0], dwelling.ReportEntry(('', 'TER Calculation'), None, None, None))
+        self.assertEqual(entries[-1].label, 'TER')
+        self.assertEqual(entries[-1].code, 273)
+        self.assertAlmostEqual(entries[-1].value, ter.ter_rating)
+
+    def test_render(self):
+        sap = runner.run_sap(gas_combi_house())
+        sap.report.build_report()
+
+        text = sap.report.to_text()
+        self.assertIn("\n4 Water heating\n================\n", text)
+        self.assertIn("Thermal bridging 29.25 (36)\n", text)
+        self.assertEqual(str(sap.report), text)
+
+        rows = json.loads(sap.report.to_json())
+        effective_ach = [row for row in rows if row['label'] == 'Effective ach'][0]
+        self.assertEqual(effective_ach['section'], '2 Ventilation rate')
+        self.assertEqual(len(effective_ach['value']), 12)
+
+        self.assertIn("<h2>3 Heat losses and heat loss parameter</h2>", sap.report.to_html())
+
+    def test_not_recorded_when_disabled(self):
+        with dwelling.reporting(False):
+            ter = appendix_t.run_ter(gas_combi_house())
+        self.assertEqual(ter.report.entries, [])
+        self.assertTrue(dwelling.is_reporting_enabled())
+
+        out = batch.run_batch([gas_combi_house()], calculation=appendix_t.run_ter)
+        self.assertEqual(out.results[0].report.entries, [])
+
+    def test_report_not_shared_with_input(self):
+        house = gas_combi_house()
+        ter = appendix_t.run_ter(house)
+        self.assertIsNot(ter.report, house.report)
+        self.assertEqual(house.report.entries, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
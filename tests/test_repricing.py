@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk.repricing import CostExposure, PriceTable
+from epctk.utils import SAPInputError
+
+
+def calculate(use_pcdf_fuel_prices=True):
+    dwellings = []
+    for dwelling in run_benchmarks.load_reference_dwellings().values():
+        dwelling.use_pcdf_fuel_prices = use_pcdf_fuel_prices
+        dwellings.append(runner.run_sap(dwelling))
+    return dwellings
+
+
+class TestRepricing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = calculate()
+        cls.exposure = CostExposure.from_dwellings(cls.dwellings)
+
+    def test_reproduces_calculated_cost(self):
+        result = self.exposure.reprice(PriceTable.from_pcdf())
+
+        numpy.testing.assert_allclose(result.fuel_cost[:, 0],
+                                      [d.fuel_cost for d in self.dwellings], rtol=1e-9)
+        numpy.testing.assert_allclose(result.sap_value[:, 0],
+                                      [d.sap_value for d in self.dwellings], rtol=1e-9)
+
+    def test_matches_recalculation_with_table_12_prices(self):
+        recalculated = calculate(use_pcdf_fuel_prices=False)
+        result = self.exposure.reprice([PriceTable.from_pcdf(), PriceTable.from_table_12()])
+
+        numpy.testing.assert_allclose(result.fuel_cost[:, 1],
+                                      [d.fuel_cost for d in recalculated], rtol=1e-9)
+        numpy.testing.assert_allclose(result.sap_energy_cost_factor[:, 1],
+                                      [d.sap_energy_cost_factor for d in recalculated], rtol=1e-9)
+        numpy.testing.assert_allclose(result.sap_value[:, 1],
+                                      [d.sap_value for d in recalculated], rtol=1e-9)
+
+    def test_price_change_is_linear(self):
+        base = PriceTable.from_table_12()
+        fuel_id = self.exposure.fuel_ids[0]
+        dearer = base.updated(prices={fuel_id: base.prices[fuel_id] + 10})
+
+        cost = self.exposure.fuel_cost([base, dearer])
+        numpy.testing.assert_allclose(cost[:, 1] - cost[:, 0],
+                                      self.exposure.energy[:, 0] * 10 / 100)
+
+    def test_missing_price(self):
+        table = PriceTable({}, {}, 'empty')
+        with self.assertRaises(SAPInputError):
+            self.exposure.reprice(table)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'exposure.npz')
+            self.exposure.save(path)
+            loaded = CostExposure.load(path)
+
+        self.assertEqual(loaded.fuel_ids, self.exposure.fuel_ids)
+        table = PriceTable.from_table_12()
+        numpy.testing.assert_array_equal(loaded.fuel_cost([table]), self.exposure.fuel_cost([table]))
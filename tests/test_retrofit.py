@@ -0,0 +1,121 @@
+import unittest
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk import retrofit
+from epctk.cache import input_items
+from epctk.configure import lookup_sap_tables
+from epctk.dwelling import Dwelling
+from epctk.elements import HeatLossElement, HeatLossElementTypes
+from epctk.retrofit import Package
+from epctk.utils import SAPInputError
+
+
+def uninsulated(dwelling):
+    dwelling = Dwelling(**input_items(dwelling))
+    dwelling.heat_loss_elements = [
+        HeatLossElement(e.area, 1.6, e.is_external, e.element_type, e.name)
+        if e.element_type == HeatLossElementTypes.EXTERNAL_WALL else e
+        for e in dwelling.heat_loss_elements]
+    dwelling.pressurisation_test_result = 12
+    return dwelling
+
+
+class TestRetrofit(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwelling = uninsulated(run_benchmarks.load_reference_dwellings()['gas_combi'])
+        cls.evaluator = retrofit.PackageEvaluator(cls.dwelling)
+        cls.packages = cls.evaluator.packages()
+
+    def test_applicable_measures(self):
+        tags = [m.tag for m in self.evaluator.measures]
+        self.assertIn('W', tags)
+        self.assertIn('A', tags)
+        self.assertEqual(len(self.packages), 2 ** len(tags))
+
+    def test_packages_match_full_calculation(self):
+        base = runner.run_sap(self.dwelling)
+        self.assertEqual(self.evaluator.base.sap_value, base.sap_value)
+
+        for package in self.packages[::7] + [self.packages[-1]]:
+            with self.subTest(measures=package.measures):
+                dwelling = runner.prepare_sap(self.dwelling)
+                for m in self.evaluator.measures:
+                    if m.tag in package.measures:
+                        m.apply(self.evaluator._base, dwelling)
+                calculated = runner.complete_sap(lookup_sap_tables(dwelling))
+                self.assertEqual(package.sap_value, calculated.sap_value)
+                self.assertEqual(package.emissions, calculated.emissions)
+                self.assertEqual(package.sap_gain, calculated.sap_value - base.sap_value)
+
+    def test_configurations_shared_by_fabric_measures(self):
+        reconfiguring = [m for m in self.evaluator.measures if m.reconfigure]
+        self.assertEqual(len(self.evaluator._configured), 2 ** len(reconfiguring))
+
+    def test_wall_insulation(self):
+        wall = [m for m in self.evaluator.measures if m.tag == 'W'][0]
+        package = self.evaluator.evaluate([wall])
+
+        self.assertGreater(package.sap_gain, 0)
+        self.assertGreater(package.co2_saving, 0)
+        wall_area = sum(e.area for e in self.dwelling.heat_loss_elements
+                        if e.element_type == HeatLossElementTypes.EXTERNAL_WALL)
+        self.assertAlmostEqual(package.cost, 100 * wall_area)
+
+    def test_budget(self):
+        packages = self.evaluator.packages(budget=3000)
+
+        self.assertTrue(all(p.cost <= 3000 for p in packages))
+        self.assertLess(len(packages), len(self.packages))
+        self.assertEqual(len(self.evaluator.packages(max_measures=1)), len(self.evaluator.measures) + 1)
+
+    def test_pareto_front(self):
+        for objective, field in retrofit.OBJECTIVES.items():
+            front = retrofit.pareto_front(self.packages, objective)
+            self.assertEqual(front[0].measures, ())
+            for cheaper, dearer in zip(front, front[1:]):
+                self.assertLess(cheaper.cost, dearer.cost)
+                self.assertLess(getattr(cheaper, field), getattr(dearer, field))
+            for package in self.packages:
+                self.assertTrue(any(p.cost <= package.cost and getattr(p, field) >= getattr(package, field)
+                                    for p in front))
+
+    def test_skip_dominated_extensions(self):
+        for objective in retrofit.OBJECTIVES:
+            with self.subTest(objective=objective):
+                evaluator = retrofit.PackageEvaluator(self.dwelling)
+                packages = evaluator.packages(objective=objective)
+
+                self.assertEqual(packages[0].measures, ())
+                self.assertEqual(len(evaluator._packages), len(packages))
+                self.assertLess(len(packages), len(self.packages))
+                self.assertEqual(retrofit.pareto_front(packages, objective),
+                                 retrofit.pareto_front(self.packages, objective))
+
+        self.assertEqual(retrofit.optimize(self.dwelling, exhaustive=True), retrofit.pareto_front(self.packages))
+        with self.assertRaises(SAPInputError):
+            self.evaluator.packages(objective='cost')
+
+    def test_pareto_front_dominated(self):
+        packages = [Package((), 0, 60, 3000, 0, 0),
+                    Package(('A',), 100, 62, 2900, 2, 100),
+                    Package(('B',), 200, 61, 2950, 1, 50),
+                    Package(('A', 'B'), 300, 64, 2850, 4, 150)]
+
+        front = retrofit.pareto_front(packages)
+        self.assertEqual([p.measures for p in front], [(), ('A',), ('A', 'B')])
+        with self.assertRaises(SAPInputError):
+            retrofit.pareto_front(packages, 'cost')
+
+    def test_optimize_portfolio(self):
+        dwellings = [self.dwelling, run_benchmarks.load_reference_dwellings()['pv_wind_appendix_m']]
+        fronts = retrofit.optimize_portfolio(dwellings, workers=2, budget=10000, objective='co2')
+
+        self.assertEqual(len(fronts), 2)
+        for dwelling, front in zip(dwellings, fronts):
+            self.assertEqual(front, retrofit.optimize(dwelling, budget=10000, objective='co2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import copy
+import unittest
+
+import numpy
+
+from benchmarks import run_benchmarks
+from epctk import runner, fuels
+from epctk.fuels import fuel_from_code
+from epctk.scenarios import FactorExposure, FactorSet
+from epctk.utils import SAPInputError
+
+
+def chp_dwelling():
+    dwelling = run_benchmarks.load_reference_dwellings()['community_heating_appendix_c']
+    dwelling.community_heat_sources = [
+        dict(heat_source_type=2, fraction=0.4, efficiency=0.75, heat_to_power=2.0, fuel=fuel_from_code(51)),
+        dict(heat_source_type=1, fraction=0.6, efficiency=0.8, fuel=fuel_from_code(51)),
+    ]
+    return dwelling
+
+
+def calculate_all():
+    dwellings = list(run_benchmarks.load_reference_dwellings().values()) + [chp_dwelling()]
+    return [runner.run_der(d) for d in dwellings]
+
+
+class TestScenarios(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = calculate_all()
+        cls.exposure = FactorExposure.from_dwellings(cls.dwellings)
+
+    def test_reproduces_calculated_emissions(self):
+        result = self.exposure.evaluate(FactorSet.from_table_12())
+
+        numpy.testing.assert_allclose(result.emissions[:, 0],
+                                      [d.emissions for d in self.dwellings], rtol=1e-9)
+        numpy.testing.assert_allclose(result.primary_energy[:, 0],
+                                      [d.primary_energy for d in self.dwellings], rtol=1e-9)
+        numpy.testing.assert_allclose(result.der[:, 0],
+                                      [d.der_rating for d in self.dwellings], rtol=1e-9)
+
+    def test_matches_recalculation_with_other_factors(self):
+        scenario = FactorSet.from_table_12().with_electricity(co2=0.3, primary_energy=2.0)
+        scenario = scenario.updated(co2={51: 0.15})
+
+        table_12 = fuels._TABLE_12_DATA_CACHE
+        modified = copy.deepcopy(table_12)
+        for fuel_id, factor in scenario.co2.items():
+            modified[fuel_id].co2_factor = factor
+        for fuel_id, factor in scenario.primary_energy.items():
+            modified[fuel_id].primary_energy_factor = factor
+
+        fuels._TABLE_12_DATA_CACHE = modified
+        try:
+            recalculated = calculate_all()
+        finally:
+            fuels._TABLE_12_DATA_CACHE = table_12
+
+        result = self.exposure.evaluate([FactorSet.from_table_12(), scenario])
+        numpy.testing.assert_allclose(result.emissions[:, 1],
+                                      [d.emissions for d in recalculated], rtol=1e-9)
+        numpy.testing.assert_allclose(result.primary_energy[:, 1],
+                                      [d.primary_energy for d in recalculated], rtol=1e-9)
+
+    def test_monthly_factors(self):
+        base = FactorSet.from_table_12()
+        flat = base.with_electricity(co2=numpy.full(12, 0.517)).updated(co2={37: numpy.full(12, 0.529)})
+        winter = numpy.array([1.0] * 4 + [0.0] * 6 + [1.0] * 2)
+        winter_only = base.with_electricity(co2=winter)
+
+        result = self.exposure.evaluate([base, flat, winter_only])
+        numpy.testing.assert_allclose(result.emissions[:, 1], result.emissions[:, 0])
+
+        electric = [i for i, fuel_id in enumerate(self.exposure.fuel_ids) if fuel_id in (30, 37)]
+        base_factors = numpy.array([base.co2[self.exposure.fuel_ids[i]] for i in electric])
+        energy = self.exposure.energy[:, electric, :]
+        expected = (result.emissions[:, 0] -
+                    numpy.einsum('nkm,k->n', energy, base_factors) +
+                    numpy.einsum('nkm,m->n', energy, winter))
+        numpy.testing.assert_allclose(result.emissions[:, 2], expected)
+
+    def test_missing_factor(self):
+        with self.assertRaises(SAPInputError):
+            self.exposure.evaluate(FactorSet({}, {}, 'empty'))
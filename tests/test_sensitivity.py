@@ -0,0 +1,106 @@
+import copy
+import unittest
+
+import numpy
+
+from benchmarks import run_benchmarks
+from epctk import runner
+from epctk import sensitivity
+from epctk.cache import input_items
+from epctk.dwelling import Dwelling
+from epctk.sensitivity import Dual
+from epctk.utils import SAPInputError
+
+
+def with_element_value(dwelling, key, index, attr, delta):
+    modified = Dwelling(**input_items(dwelling))
+    items = [copy.copy(e) for e in modified[key]]
+    setattr(items[index], attr, getattr(items[index], attr) + delta)
+    modified[key] = items
+    return modified
+
+
+class TestDual(unittest.TestCase):
+    def test_arithmetic(self):
+        x = Dual(2., numpy.array([1., 0.]))
+        y = Dual(3., numpy.array([0., 1.]))
+
+        z = (x * y + x / y - 1) ** 2
+        dz_dx = 2 * (2 * 3 + 2 / 3 - 1) * (3 + 1 / 3)
+        dz_dy = 2 * (2 * 3 + 2 / 3 - 1) * (2 - 2 / 9)
+        self.assertAlmostEqual(z.value, (2 * 3 + 2 / 3 - 1) ** 2)
+        numpy.testing.assert_allclose(z.grad, [dz_dx, dz_dy])
+
+    def test_object_arrays(self):
+        x = Dual(2., numpy.array([1.]))
+        monthly = numpy.arange(1., 13.) * x
+        total = numpy.sum(numpy.exp(monthly / 12))
+
+        self.assertEqual(monthly.dtype, object)
+        self.assertAlmostEqual(total.grad[0], sum(m / 12 * numpy.exp(m / 6) for m in range(1, 13)))
+
+    def test_no_silent_conversion(self):
+        with self.assertRaises(TypeError):
+            float(Dual(1., numpy.array([1.])))
+
+
+class TestSensitivities(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = run_benchmarks.load_reference_dwellings()
+
+    def test_values_match_calculation(self):
+        for name, dwelling in self.dwellings.items():
+            with self.subTest(dwelling=name):
+                result = sensitivity.sensitivities(dwelling)
+                calculated = runner.run_sap(dwelling)
+                for output in sensitivity.OUTPUTS:
+                    self.assertEqual(result.values[output], calculated[output])
+                    self.assertEqual(result.gradients[output].shape, (len(result.inputs),))
+
+    def test_gradient_matches_finite_differences(self):
+        h = 1e-6
+        for name in ('gas_combi', 'heat_pump_appendix_n', 'community_heating_appendix_c'):
+            dwelling = self.dwellings[name]
+            result = sensitivity.sensitivities(dwelling)
+            for key, attr in (('heat_loss_elements', 'Uvalue'), ('heat_loss_elements', 'area'),
+                              ('openings', 'area')):
+                up = runner.run_sap(with_element_value(dwelling, key, 0, attr, h))
+                down = runner.run_sap(with_element_value(dwelling, key, 0, attr, -h))
+                for output in ('sap_value', 'emissions', 'fuel_cost'):
+                    with self.subTest(dwelling=name, input=(key, attr), output=output):
+                        expected = (up[output] - down[output]) / (2 * h)
+                        actual = result.gradient(output)['{}[0].{}'.format(key, attr)]
+                        self.assertAlmostEqual(actual, expected, delta=1e-4 * max(1, abs(expected)))
+
+    def test_inputs(self):
+        dwelling = self.dwellings['gas_combi']
+        inputs = sensitivity.continuous_inputs(dwelling)
+
+        self.assertIn('thermal_mass_parameter', inputs)
+        self.assertIn('main_sys_1.heating_effy_winter', inputs)
+        self.assertIn('heat_loss_elements[0].Uvalue', inputs)
+
+        full = sensitivity.sensitivities(dwelling)
+        subset = sensitivity.sensitivities(dwelling, outputs=['sap_value'],
+                                           inputs=['main_sys_1.heating_effy_winter'])
+        self.assertEqual(subset.inputs, ['main_sys_1.heating_effy_winter'])
+        self.assertAlmostEqual(subset.gradients['sap_value'][0],
+                               full.gradient('sap_value')['main_sys_1.heating_effy_winter'])
+        self.assertGreater(subset.gradients['sap_value'][0], 0)
+
+        with self.assertRaises(SAPInputError):
+            sensitivity.sensitivities(dwelling, inputs=['GFA'])
+
+    def test_does_not_modify_dwelling(self):
+        dwelling = self.dwellings['gas_combi']
+        before = runner.run_sap(Dwelling(**input_items(dwelling))).sap_value
+        sensitivity.sensitivities(dwelling)
+
+        self.assertFalse(any(isinstance(v, Dual) for v in input_items(dwelling).values()))
+        self.assertFalse(any(isinstance(e.Uvalue, Dual) for e in dwelling.heat_loss_elements))
+        self.assertEqual(runner.run_sap(Dwelling(**input_items(dwelling))).sap_value, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import run_benchmarks
+from epctk import runner, service, shared_tables
+from epctk.io import json_io
+from tests.sample_dwellings import gas_combi_house
+
+
+async def http_request(path, method, url, payload=None):
+    reader, writer = await asyncio.open_unix_connection(path)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                 .format(method, url, len(body)).encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ')[1])
+    return status, content.decode()
+
+
+class TestCalculationService(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, 'epctk.sock')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_with_server(self, test, **kwargs):
+        async def run():
+            calc_service = service.CalculationService(workers=1, **kwargs)
+            server = await service.start_server(calc_service, path=self.socket_path)
+            try:
+                return await test(calc_service)
+            finally:
+                server.close()
+                await server.wait_closed()
+                await calc_service.close()
+
+        return asyncio.run(run())
+
+    def test_sap_over_unix_socket(self):
+        dwelling = gas_combi_house()
+        data = json_io.dwelling_to_dict(dwelling)
+
+        async def test(_):
+            single = await http_request(self.socket_path, 'POST', '/calculate/sap', data)
+            batch = await http_request(self.socket_path, 'POST', '/calculate/sap',
+                                       dict(dwellings=[data, data], outputs=['sap_value', 'Q_required']))
+            health = await http_request(self.socket_path, 'GET', '/health')
+            return single, batch, health
+
+        single, batch, health = self.run_with_server(test)
+        expected = runner.run_sap(dwelling)
+
+        self.assertEqual(single[0], 200)
+        self.assertAlmostEqual(json.loads(single[1])['results']['sap_value'], expected.sap_value)
+
+        self.assertEqual(batch[0], 200)
+        results = json.loads(batch[1])['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(results[1]['results']['Q_required']), 12)
+
+        self.assertEqual(json.loads(health[1])['calculated'], 3)
+
+    def test_errors_reported_per_dwelling(self):
+        bad = json_io.dwelling_to_dict(gas_combi_house(GFA=None))
+        good = json_io.dwelling_to_dict(gas_combi_house())
+
+        async def test(_):
+            return await http_request(self.socket_path, 'POST', '/calculate/der', dict(dwellings=[bad, good]))
+
+        status, content = self.run_with_server(test)
+        results = json.loads(content)['results']
+        self.assertEqual(status, 200)
+        self.assertIn('error', results[0])
+        self.assertIn('der_rating', results[1]['results'])
+
+    def test_shared_tables(self):
+        data = json_io.dwelling_to_dict(run_benchmarks.load_reference_dwellings()['heat_pump_appendix_n'])
+
+        async def test(_):
+            return await http_request(self.socket_path, 'POST', '/calculate/sap', data)
+
+        status, content = self.run_with_server(test, shared_tables=True)
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(json.loads(content)['results']['sap_value'],
+                               runner.run_sap(json_io.dwelling_from_dict(data)).sap_value)
+        self.assertIsNone(os.environ.get(shared_tables.SHARED_TABLES_ENV))
+
+    def test_backpressure(self):
+        data = json_io.dwelling_to_dict(gas_combi_house())
+
+        async def test(calc_service):
+            # The long batch window keeps the first request pending
+            first = asyncio.ensure_future(calc_service.calculate('sap', [data] * 2))
+            await asyncio.sleep(0)
+            status, _ = await http_request(self.socket_path, 'POST', '/calculate/sap', data)
+            await first
+            return status, calc_service.n_rejected
+
+        self.assertEqual(self.run_with_server(test, max_pending=2, batch_window=0.5), (503, 1))
+
+    def test_request_too_large(self):
+        data = json_io.dwelling_to_dict(gas_combi_house())
+
+        async def test(calc_service):
+            status, content = await http_request(self.socket_path, 'POST', '/calculate/sap',
+                                                 dict(dwellings=[data] * 3))
+            return status, json.loads(content)['error'], calc_service.n_rejected
+
+        status, error, n_rejected = self.run_with_server(test, max_pending=2)
+        self.assertEqual(status, 413)
+        self.assertIn('At most 2 dwellings', error)
+        self.assertEqual(n_rejected, 0)
+
+    def test_bad_requests(self):
+        async def test(_):
+            return [(await http_request(self.socket_path, method, url, payload))[0]
+                    for method, url, payload in [('POST', '/calculate/xyz', {}),
+                                                 ('GET', '/calculate/sap', None),
+                                                 ('POST', '/calculate/sap', [1, 2])]]
+
+        self.assertEqual(self.run_with_server(test), [404, 405, 400])
+
+    def test_malformed_content_length(self):
+        async def request(content_length):
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            writer.write("POST /calculate/sap HTTP/1.1\r\nContent-Length: {}\r\n\r\n{{}}"
+                         .format(content_length).encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        async def test(_):
+            return [await request(content_length) for content_length in ['abc', '-2']]
+
+        for response in self.run_with_server(test):
+            self.assertTrue(response.startswith(b'HTTP/1.1 400 '), response)
+            self.assertIn(b'Malformed Content-Length', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+import unittest
+
+from epctk import runner, shared_tables
+from epctk.io import pcdf
+from tests.sample_dwellings import gas_combi_house
+
+
+def heat_pump_product(_):
+    return pcdf.get_product('361', '100011'), os.environ.get(shared_tables.SHARED_TABLES_ENV)
+
+
+class TestSharedTables(unittest.TestCase):
+    def setUp(self):
+        self.reference = pcdf.load_pcdf(pcdf._PCDF_DATA_FILE)
+        self.tables = shared_tables.create_shared_tables()
+
+    def tearDown(self):
+        shared_tables.close_shared_tables(self.tables)
+
+    def test_same_rows_as_pcdf(self):
+        self.assertEqual(list(self.tables), list(self.reference))
+        for table_id, rows in self.reference.items():
+            shared = self.tables[table_id]
+            self.assertEqual(len(shared), len(rows))
+            self.assertEqual(list(shared), list(rows))
+            self.assertEqual(dict(shared.items()), rows)
+
+        self.assertNotIn('no such id', self.tables['104'])
+        self.assertIsNone(pcdf.get_boiler('no such id'))
+
+    def test_calculation_uses_shared_tables(self):
+        self.assertIs(pcdf._PCDF_CACHE, self.tables)
+        dwelling = gas_combi_house(main_heating_type_code=None, main_heating_pcdf_id='001731')
+        with_shared = runner.run_sap(dwelling).sap_value
+
+        shared_tables.close_shared_tables(self.tables)
+        self.assertFalse(os.path.exists(self.tables.path))
+        self.assertEqual(runner.run_sap(dwelling).sap_value, with_shared)
+        self.tables = shared_tables.create_shared_tables()
+
+    def test_spawned_worker_attaches(self):
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            product, path = pool.map(heat_pump_product, [0])[0]
+
+        self.assertEqual(path, self.tables.path)
+        self.assertEqual(product, self.reference['361']['100011'])
+
+
+if __name__ == '__main__':
+    unittest.main()
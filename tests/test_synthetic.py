@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from epctk import runner
+from epctk import synthetic
+from epctk.appendix import appendix_t
+from epctk.dwelling import Dwelling
+from epctk.io import json_io, validator, yaml_io
+
+
+def has_inputs(rule, dwelling):
+    """
+    Whether the dwelling has the inputs of a rule of validator.ATTRIBUTES.
+    Unlike the validator rules, False and 0 count as given.
+    """
+    if isinstance(rule, validator.required):
+        return dwelling.get(rule.name) is not None
+    if isinstance(rule, validator.group):
+        return all(has_inputs(r, dwelling) for r in rule.rules)
+    if isinstance(rule, validator.one_of):
+        return sum(has_inputs(r, dwelling) for r in rule.rules) == 1
+    if isinstance(rule, validator.optional_group):
+        return sum(has_inputs(r, dwelling) for r in rule.rules) in (0, len(rule.rules))
+    if isinstance(rule, validator.required_if_and_only_if):
+        return has_inputs(rule.group, dwelling) == bool(rule.condition(dwelling))
+    if isinstance(rule, validator.required_if):
+        return not rule.condition(dwelling) or has_inputs(rule.group, dwelling)
+    raise TypeError(rule)
+
+
+class TestSynthetic(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dwellings = list(synthetic.generate(300, seed=5))
+
+    def test_reproducible(self):
+        first = [json_io.dwelling_to_dict(d) for d in synthetic.generate(20, seed=5)]
+        self.assertEqual(first, [json_io.dwelling_to_dict(d) for d in self.dwellings[:20]])
+        self.assertEqual([json_io.dwelling_to_dict(d) for d in synthetic.generate(5, seed=5, start=15)],
+                         first[15:])
+        self.assertNotEqual([json_io.dwelling_to_dict(d) for d in synthetic.generate(20, seed=6)], first)
+
+    def test_validator_inputs(self):
+        for i, dwelling in enumerate(self.dwellings):
+            for rule in validator.ATTRIBUTES:
+                with self.subTest(dwelling=i, rule=rule):
+                    self.assertTrue(has_inputs(rule, dwelling))
+
+    def test_coverage(self):
+        codes = set(d['main_heating_type_code'] for d in self.dwellings)
+        self.assertTrue(codes & set(synthetic.GAS_COMBI_CODES))
+        self.assertTrue(codes & set(synthetic.HEAT_PUMP_CODES))
+        self.assertTrue(codes & set(synthetic.STORAGE_HEATER_CODES))
+        self.assertIn('community', codes)
+
+        pcdf_ids = set(d.get('main_heating_pcdf_id') for d in self.dwellings)
+        self.assertTrue(pcdf_ids & set(synthetic.pcdf_boilers()))
+        self.assertTrue(pcdf_ids & set(hp[0] for hp in synthetic.pcdf_heat_pumps()))
+
+        self.assertEqual(set(d['ventilation_type'] for d in synthetic.generate(2000, seed=5)),
+                         set(synthetic.VENTILATION))
+        self.assertEqual(len(set(d['sap_region'] for d in self.dwellings)), 21)
+
+    def test_calculations(self):
+        for i, dwelling in enumerate(self.dwellings[::4]):
+            with self.subTest(dwelling=i):
+                sap = runner.run_sap(dwelling)
+                self.assertTrue(-50 < sap.sap_value < 120)
+                runner.run_der(dwelling)
+                runner.run_fee(dwelling)
+                appendix_t.run_ter(dwelling)
+
+    def test_batch_format(self):
+        stream = io.StringIO()
+        self.assertEqual(synthetic.write_batch(self.dwellings[:10], stream), 10)
+
+        loaded = [json_io.dwelling_from_dict(d) for d in json.loads(stream.getvalue())['dwellings']]
+        self.assertEqual([runner.run_sap(d).sap_value for d in loaded],
+                         [runner.run_sap(d).sap_value for d in self.dwellings[:10]])
+
+    def test_yaml_format(self):
+        stream = io.StringIO()
+        self.assertEqual(synthetic.write_yaml(self.dwellings[:10], stream), 10)
+
+        yaml_io.configure_yaml()
+        loaded = []
+        for data in yaml.load_all(stream.getvalue(), Loader=yaml.Loader):
+            dwelling = Dwelling()
+            dwelling.update(data)
+            loaded.append(dwelling)
+        self.assertEqual([runner.run_sap(d).sap_value for d in loaded],
+                         [runner.run_sap(d).sap_value for d in self.dwellings[:10]])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'dwellings.json')
+            synthetic.main(['-n', '3', '--seed', '5', '--start', '2', '-o', path])
+            with open(path) as f:
+                data = json.load(f)
+        self.assertEqual(data['dwellings'], [json_io.dwelling_to_dict(d) for d in self.dwellings[2:5]])
+
+
+if __name__ == '__main__':
+    unittest.main()